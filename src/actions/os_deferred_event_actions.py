@@ -33,16 +33,21 @@ charms_openstack.bus.discover()
 
 
 def handle_package_updates():
-    """Ensure DB services are restarted PKG update."""
-    _svcs = ['ovn-central', 'ovn-northd']
-    with charms_openstack.charm.provide_charm_instance() as charm_instance:
-        for _svc in ['ovn-ovsdb-server-nb', 'ovn-ovsdb-server-sb']:
-            if _svc in charm_instance.services:
-                _svcs.append(_svc)
+    """Ensure DB services are restarted PKG update.
+
+    Raft leadership is transferred away from this unit before the services
+    are restarted, see the ``rolling-restart`` action.  Like that action the
+    restart is refused while another unit is restarting.
+
+    :raises: RuntimeError
+    """
     for event in deferred_events.get_deferred_events():
         if (event.reason == 'Package update' and
                 event.service.startswith('ovn-central')):
-            os_utils.restart_services_action(services=_svcs)
+            with charms_openstack.charm.provide_charm_instance() as \
+                    charm_instance:
+                charm_instance.rolling_restart()
+            break
 
 
 def restart_services(args):
@@ -61,7 +66,11 @@ def restart_services(args):
         hookenv.action_fail("Please specify deferred-only or services")
         return
     if deferred_only:
-        handle_package_updates()
+        try:
+            handle_package_updates()
+        except RuntimeError as e:
+            hookenv.action_fail(str(e))
+            return
         os_utils.restart_services_action(deferred_only=True)
     else:
         os_utils.restart_services_action(services=services)
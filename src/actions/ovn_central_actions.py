@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# Copyright 2021 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import subprocess
+import sys
+
+# Load modules from $CHARM_DIR/lib
+sys.path.append('lib')
+# and the scripts shipped in $CHARM_DIR/files
+sys.path.append('files')
+
+from charms.layer import basic
+basic.bootstrap_charm_deps()
+
+import charmhelpers.core.hookenv as hookenv
+import charms_openstack.bus
+import charms_openstack.charm
+import charms.reactive as reactive
+
+import ovn_db_connection_report
+
+charms_openstack.bus.discover()
+
+
+def compact(args):
+    """Compact OVN databases on this unit.
+
+    :param args: Unused
+    :type args: List[str]
+    """
+    databases = hookenv.action_get('databases').split()
+    invalid = [db for db in databases if db not in ('nb', 'sb')]
+    if not databases or invalid:
+        hookenv.action_fail('Invalid databases: "{}", must be one or more of '
+                            '"nb" and "sb"'
+                            .format(hookenv.action_get('databases')))
+        return
+    with charms_openstack.charm.provide_charm_instance() as charm_instance:
+        for db in databases:
+            try:
+                result = charm_instance.compact_ovsdb(db)
+            except subprocess.CalledProcessError as e:
+                hookenv.action_fail('Unable to compact {} database: {}'
+                                    .format(db, e))
+                return
+            hookenv.action_set({
+                '{}.{}'.format(db, key): value
+                for key, value in result.items()})
+
+
+def rolling_restart(args):
+    """Restart OVN services on this unit as a step of a rolling restart.
+
+    :param args: Unused
+    :type args: List[str]
+    """
+    with charms_openstack.charm.provide_charm_instance() as charm_instance:
+        try:
+            timings = charm_instance.rolling_restart(
+                force=hookenv.action_get('force'))
+        except RuntimeError as e:
+            hookenv.action_fail(str(e))
+            return
+        hookenv.action_set({
+            'timings.{}'.format(step): duration
+            for step, duration in timings.items()})
+        pending = charm_instance.peers_restart_pending()
+        if pending:
+            hookenv.action_set({'pending-units': ' '.join(pending)})
+        charm_instance._assess_status()
+
+
+def backup(args):
+    """Stream compressed snapshots of OVN databases to local files.
+
+    :param args: Unused
+    :type args: List[str]
+    """
+    databases = hookenv.action_get('databases').split()
+    invalid = [db for db in databases if db not in ('nb', 'sb')]
+    if not databases or invalid:
+        hookenv.action_fail('Invalid databases: "{}", must be one or more of '
+                            '"nb" and "sb"'
+                            .format(hookenv.action_get('databases')))
+        return
+    ovsdb_peer = reactive.endpoint_from_flag('ovsdb-peer.available')
+    if not ovsdb_peer:
+        hookenv.action_fail('Peer relation not available')
+        return
+    ports = {'nb': ovsdb_peer.db_nb_port,
+             'sb': ovsdb_peer.db_sb_admin_port}
+    with charms_openstack.charm.provide_charm_instance() as charm_instance:
+        for db in databases:
+            try:
+                result = charm_instance.backup_ovsdb(
+                    db, hookenv.action_get('directory'), ports[db])
+            except (subprocess.CalledProcessError, RuntimeError) as e:
+                hookenv.action_fail('Unable to back up {} database: {}'
+                                    .format(db, e))
+                return
+            hookenv.action_set({
+                '{}.{}'.format(db, key): value
+                for key, value in result.items()})
+
+
+def restore(args):
+    """Restore OVN database from backup or join the restored cluster.
+
+    :param args: Unused
+    :type args: List[str]
+    """
+    db = hookenv.action_get('database')
+    backup_file = hookenv.action_get('file')
+    if db not in ('nb', 'sb'):
+        hookenv.action_fail('Invalid database: "{}", must be "nb" or "sb"'
+                            .format(db))
+        return
+    if backup_file and not hookenv.is_leader():
+        hookenv.action_fail('Restore from backup must be run on the leader '
+                            'unit, run without file on the other units')
+        return
+    ovsdb_peer = reactive.endpoint_from_flag('ovsdb-peer.available')
+    if not ovsdb_peer:
+        hookenv.action_fail('Peer relation not available')
+        return
+    cluster_port = (ovsdb_peer.db_nb_cluster_port if db == 'nb'
+                    else ovsdb_peer.db_sb_cluster_port)
+    local_conn = ovsdb_peer.db_connection_strs(
+        (ovsdb_peer.cluster_local_addr,), cluster_port)
+    with charms_openstack.charm.provide_charm_instance() as charm_instance:
+        try:
+            if backup_file:
+                saved = charm_instance.restore_ovsdb(
+                    db, backup_file, list(local_conn)[0])
+            else:
+                saved = charm_instance.rejoin_ovsdb(
+                    db, local_conn,
+                    ovsdb_peer.db_connection_strs(
+                        ovsdb_peer.cluster_remote_addrs, cluster_port))
+        except (subprocess.CalledProcessError, ValueError) as e:
+            hookenv.action_fail('Unable to restore {} database: {}'
+                                .format(db, e))
+            return
+        hookenv.action_set({'saved-file': saved})
+        status = charm_instance.cluster_status('ovn{}_db'.format(db))
+        if status:
+            hookenv.action_set({'cluster-id': str(status.cluster_id)})
+            if backup_file:
+                hookenv.leader_set({
+                    '{}_cid'.format(db): str(status.cluster_id)})
+        charm_instance._assess_status()
+
+
+def connection_report(args):
+    """Report clients of the local OVN database servers by load.
+
+    :param args: Unused
+    :type args: List[str]
+    """
+    top = hookenv.action_get('top')
+    if top < 0:
+        hookenv.action_fail('Invalid top: {}, must be >= 0'.format(top))
+        return
+    with charms_openstack.charm.provide_charm_instance() as charm_instance:
+        rundir = charm_instance.ovn_rundir()
+    report = ovn_db_connection_report.report(rundir, top)
+    hookenv.action_set({
+        'total-clients': report['total-clients'],
+        'report': json.dumps(report),
+    })
+
+
+# Actions to function mapping, to allow for illegal python action names that
+# can map to a python function.
+ACTIONS = {
+    "backup": backup,
+    "compact": compact,
+    "connection-report": connection_report,
+    "restore": restore,
+    "rolling-restart": rolling_restart,
+}
+
+
+def main(args):
+    hookenv._run_atstart()
+    action_name = os.path.basename(args[0])
+    try:
+        action = ACTIONS[action_name]
+    except KeyError:
+        return "Action %s undefined" % action_name
+    else:
+        try:
+            action(args)
+        except Exception as e:
+            hookenv.action_fail(str(e))
+    hookenv._run_atexit()
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# Copyright 2021 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+This script collects OVSDB cluster and ovn-northd health metrics and writes
+them in Prometheus textfile collector format.
+"""
+
+import argparse
+import collections
+import os
+import re
+import sys
+import time
+
+try:
+    import ovsdb_client
+except ImportError:
+    # NOTE: the charm installs the module next to this script, fall back to
+    # the charm library when running from the charm directory.
+    from charm.openstack import ovsdb_client
+
+OVN_RUNDIR = "/var/run/ovn"
+OUTPUT_DIR = "/var/lib/prometheus/node-exporter"
+OUTPUT_FILENAME = "ovn_central.prom"
+TIMEOUT = 10
+
+DATABASES = collections.OrderedDict((
+    ("nb", ("ovnnb_db", "OVN_Northbound")),
+    ("sb", ("ovnsb_db", "OVN_Southbound")),
+))
+
+ROLES = ("leader", "follower", "candidate")
+NORTHD_STATES = ("active", "standby", "paused")
+
+Metric = collections.namedtuple("Metric", "help type samples")
+
+
+class Metrics(object):
+    """Accumulate samples and render them in text exposition format."""
+
+    def __init__(self):
+        self.metrics = collections.OrderedDict()
+
+    def add(self, name, help_text, value, mtype="gauge", **labels):
+        """Add sample of metric.
+
+        :param name: Name of metric
+        :type name: str
+        :param help_text: Description of metric
+        :type help_text: str
+        :param value: Value of sample
+        :type value: Union[int, float]
+        :param mtype: Prometheus metric type
+        :type mtype: str
+        :param labels: Labels of sample
+        :type labels: str
+        """
+        metric = self.metrics.setdefault(name, Metric(help_text, mtype, []))
+        metric.samples.append((labels, value))
+
+    @staticmethod
+    def _escape(value):
+        return (str(value).replace("\\", "\\\\").replace("\n", "\\n")
+                .replace('"', '\\"'))
+
+    def render(self):
+        """Render metrics.
+
+        :returns: Metrics in Prometheus text exposition format
+        :rtype: str
+        """
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append("# HELP {} {}".format(name, metric.help))
+            lines.append("# TYPE {} {}".format(name, metric.type))
+            for labels, value in metric.samples:
+                label_str = ",".join(
+                    '{}="{}"'.format(key, self._escape(val))
+                    for key, val in sorted(labels.items()))
+                lines.append("{}{} {}".format(
+                    name, "{{{}}}".format(label_str) if label_str else "",
+                    value))
+        return "\n".join(lines) + "\n"
+
+
+def collect_cluster_status(metrics, db, status):
+    """Add metrics from parsed cluster status."""
+    role = status.get("Role", "")
+    for candidate in ROLES:
+        metrics.add("ovn_ovsdb_cluster_role",
+                    "Raft role of the local server.",
+                    int(role == candidate), db=db, role=candidate)
+    if "Term" in status:
+        metrics.add("ovn_ovsdb_cluster_term",
+                    "Current Raft term.",
+                    int(status["Term"]), db=db)
+    if "Election timer" in status:
+        metrics.add("ovn_ovsdb_cluster_election_timer_milliseconds",
+                    "Raft election timer.",
+                    int(status["Election timer"]), db=db)
+    log = re.match(r"\[(\d+), (\d+)\]", status.get("Log", ""))
+    if log:
+        metrics.add("ovn_ovsdb_cluster_log_entries",
+                    "Number of entries in the Raft log.",
+                    int(log.group(2)) - int(log.group(1)), db=db)
+        metrics.add("ovn_ovsdb_cluster_log_index",
+                    "Index of the next entry in the Raft log.",
+                    int(log.group(2)), db=db)
+    for key, name, help_text in (
+            ("Entries not yet committed",
+             "ovn_ovsdb_cluster_uncommitted_entries",
+             "Raft log entries not yet committed."),
+            ("Entries not yet applied",
+             "ovn_ovsdb_cluster_unapplied_entries",
+             "Committed Raft log entries not yet applied."),
+            ("Disconnections",
+             "ovn_ovsdb_cluster_disconnections",
+             "Raft connections lost since the server started.")):
+        if key in status:
+            metrics.add(name, help_text, int(status[key]), db=db)
+    # Unconnected peers are listed in parentheses
+    connections = status.get("Connections", "").split()
+    for direction, prefix in (("outbound", "->"), ("inbound", "<-")):
+        metrics.add("ovn_ovsdb_cluster_connections",
+                    "Established Raft connections.",
+                    len([conn for conn in connections
+                         if conn.startswith(prefix)]),
+                    db=db, direction=direction)
+    metrics.add("ovn_ovsdb_cluster_servers",
+                "Number of servers in the cluster.",
+                len(status["Servers"]), db=db)
+
+
+def collect_memory(metrics, db, usage):
+    """Add metrics from parsed memory usage."""
+    for item, value in usage.items():
+        metrics.add("ovn_ovsdb_memory_usage",
+                    "Memory usage of ovsdb-server by item, see memory/show.",
+                    value, db=db, item=item)
+    if "sessions" in usage:
+        metrics.add("ovn_ovsdb_sessions",
+                    "Number of JSON-RPC client sessions.",
+                    usage["sessions"], db=db)
+
+
+def collect_ovsdb(metrics, rundir):
+    """Add metrics for each database server."""
+    for db, (name, schema) in DATABASES.items():
+        ctl = os.path.join(rundir, "{}.ctl".format(name))
+        try:
+            with ovsdb_client.OVSDBClient(ctl, timeout=TIMEOUT) as client:
+                status = ovsdb_client.parse_cluster_status(
+                    client.unixctl("cluster/status", schema))
+                usage = ovsdb_client.parse_memory_show(
+                    client.unixctl("memory/show"))
+        except (OSError, ovsdb_client.OVSDBError) as error:
+            print("Unable to query {}: {}".format(ctl, error),
+                  file=sys.stderr)
+            metrics.add("ovn_ovsdb_up",
+                        "Whether the database server could be queried.",
+                        0, db=db)
+            continue
+        metrics.add("ovn_ovsdb_up",
+                    "Whether the database server could be queried.",
+                    1, db=db)
+        collect_cluster_status(metrics, db, status)
+        collect_memory(metrics, db, usage)
+
+
+def northd_ctl(rundir):
+    """Get path to ovn-northd control socket.
+
+    :returns: Path to socket, None if ovn-northd is not running
+    :rtype: Optional[str]
+    """
+    try:
+        with open(os.path.join(rundir, "ovn-northd.pid")) as pidfile:
+            pid = int(pidfile.read().strip())
+    except (OSError, ValueError):
+        return
+    return os.path.join(rundir, "ovn-northd.{}.ctl".format(pid))
+
+
+def collect_northd(metrics, rundir):
+    """Add ovn-northd metrics."""
+    state = None
+    ctl = northd_ctl(rundir)
+    if ctl:
+        try:
+            with ovsdb_client.OVSDBClient(ctl, timeout=TIMEOUT) as client:
+                output = client.unixctl("status")
+            state = output.partition(":")[2].strip()
+        except (OSError, ovsdb_client.OVSDBError) as error:
+            print("Unable to query {}: {}".format(ctl, error),
+                  file=sys.stderr)
+    metrics.add("ovn_northd_up",
+                "Whether ovn-northd could be queried.",
+                int(state is not None))
+    for candidate in NORTHD_STATES:
+        metrics.add("ovn_northd_state",
+                    "HA state of ovn-northd.",
+                    int(state == candidate), state=candidate)
+
+
+def collect(rundir):
+    """Collect all metrics.
+
+    :param rundir: OVN run directory
+    :type rundir: str
+    :returns: Metrics
+    :rtype: Metrics
+    """
+    start = time.monotonic()
+    metrics = Metrics()
+    collect_ovsdb(metrics, rundir)
+    collect_northd(metrics, rundir)
+    metrics.add("ovn_central_collector_duration_seconds",
+                "Time spent collecting metrics.",
+                round(time.monotonic() - start, 6))
+    return metrics
+
+
+def write_output_file(output_dir, output):
+    """Atomically replace the metrics file.
+
+    The temporary file is written in the same directory, which the textfile
+    collector ignores as it does not have the ``.prom`` suffix.
+    """
+    path = os.path.join(output_dir, OUTPUT_FILENAME)
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+    try:
+        with open(tmp_path, "w") as output_file:
+            output_file.write(output)
+        os.rename(tmp_path, path)
+    except OSError as err:
+        print("Cannot write output file {}, error {}".format(path, err))
+        sys.exit(1)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rundir", default=OVN_RUNDIR,
+                        help="OVN run directory")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR,
+                        help="textfile collector directory")
+    args = parser.parse_args(args)
+    write_output_file(args.output_dir, collect(args.rundir).render())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# Copyright 2021 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+This script reports the clients connected to the local OVN database servers,
+aggregated by client address and sorted by the load they put on the servers.
+
+ovsdb-server has no per-session statistics, the sessions of each client and
+the bytes queued on them are read from the kernel TCP socket tables for the
+database server ports.  Bytes queued for sending are updates and replies the
+client has not received yet, bytes queued for receiving are requests, e.g.
+transactions, the server has not read yet.  The totals of sessions,
+monitors, pending triggers and backlog of each server are read from the
+``memory/show`` unixctl command.
+"""
+
+import argparse
+import collections
+import ipaddress
+import json
+import os
+import sys
+
+try:
+    import ovsdb_client
+except ImportError:
+    # NOTE: the charm installs the module next to this script, fall back to
+    # the charm library when running from the charm directory.
+    from charm.openstack import ovsdb_client
+
+OVN_RUNDIR = "/var/run/ovn"
+PROC_NET_TCP = ("/proc/net/tcp", "/proc/net/tcp6")
+TCP_ESTABLISHED = "01"
+TIMEOUT = 10
+DEFAULT_TOP = 10
+
+# Database name, schema and ports clients connect to
+DATABASES = collections.OrderedDict((
+    ("nb", ("ovnnb_db", "OVN_Northbound", (6641,))),
+    ("sb", ("ovnsb_db", "OVN_Southbound", (6642, 16642))),
+))
+
+
+def decode_address(hex_address):
+    """Decode address from the kernel socket tables.
+
+    :param hex_address: Address, e.g. ``0100007F:19A1``
+    :type hex_address: str
+    :returns: IP address, IPv4 mapped IPv6 addresses as IPv4, and port
+    :rtype: Tuple[str, int]
+    """
+    address, port = hex_address.split(":")
+    raw = bytes.fromhex(address)
+    if sys.byteorder == "little":
+        # NOTE: the kernel prints each 32 bit word in host byte order
+        raw = b"".join(raw[i:i + 4][::-1] for i in range(0, len(raw), 4))
+    ip = ipaddress.ip_address(raw)
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return str(ip), int(port, 16)
+
+
+def read_sessions(ports, paths=PROC_NET_TCP):
+    """Read established TCP sessions to local ports.
+
+    :param ports: Local ports to get sessions for
+    :type ports: Iterable[int]
+    :param paths: Kernel socket tables to read
+    :type paths: Iterable[str]
+    :returns: Local port, remote address, bytes queued for sending and
+              bytes queued for receiving of each session
+    :rtype: List[Tuple[int, str, int, int]]
+    """
+    ports = set(ports)
+    sessions = []
+    for path in paths:
+        try:
+            with open(path) as table:
+                lines = table.readlines()[1:]
+        except OSError:
+            continue
+        for line in lines:
+            fields = line.split()
+            if len(fields) < 5 or fields[3] != TCP_ESTABLISHED:
+                continue
+            _, local_port = decode_address(fields[1])
+            if local_port not in ports:
+                continue
+            remote, _ = decode_address(fields[2])
+            tx_queue, rx_queue = fields[4].split(":")
+            sessions.append((local_port, remote, int(tx_queue, 16),
+                             int(rx_queue, 16)))
+    return sessions
+
+
+def server_report(rundir, name, schema):
+    """Get role and memory usage of a database server.
+
+    :returns: Role and ``memory/show`` items, error if unavailable
+    :rtype: Dict[str, any]
+    """
+    ctl = os.path.join(rundir, "{}.ctl".format(name))
+    try:
+        with ovsdb_client.OVSDBClient(ctl, timeout=TIMEOUT) as client:
+            status = ovsdb_client.parse_cluster_status(
+                client.unixctl("cluster/status", schema))
+            usage = ovsdb_client.parse_memory_show(
+                client.unixctl("memory/show"))
+    except (OSError, ovsdb_client.OVSDBError) as error:
+        return {"error": str(error)}
+    return collections.OrderedDict((
+        ("role", status.get("Role", "")),
+        ("memory", usage),
+    ))
+
+
+def aggregate_clients(sessions_by_db):
+    """Aggregate sessions by client address.
+
+    :param sessions_by_db: Sessions as returned by ``read_sessions`` by
+                           database
+    :type sessions_by_db: Dict[str, List[Tuple[int, str, int, int]]]
+    :returns: Clients, most sessions and queued bytes first
+    :rtype: List[Dict[str, any]]
+    """
+    clients = {}
+    for db, sessions in sessions_by_db.items():
+        for port, remote, send_queue, receive_queue in sessions:
+            client = clients.setdefault(remote, collections.OrderedDict((
+                ("address", remote),
+                ("sessions", 0),
+                ("sessions-by-port", collections.Counter()),
+                ("send-queue-bytes", 0),
+                ("receive-queue-bytes", 0),
+            )))
+            client["sessions"] += 1
+            client["sessions-by-port"][str(port)] += 1
+            client["send-queue-bytes"] += send_queue
+            client["receive-queue-bytes"] += receive_queue
+    return sorted(
+        clients.values(),
+        key=lambda client: (-client["sessions"],
+                            -client["send-queue-bytes"] -
+                            client["receive-queue-bytes"],
+                            client["address"]))
+
+
+def report(rundir=OVN_RUNDIR, top=DEFAULT_TOP, paths=PROC_NET_TCP):
+    """Build connection report for the local database servers.
+
+    :param rundir: OVN run directory
+    :type rundir: str
+    :param top: Number of clients to include, all if 0
+    :type top: int
+    :param paths: Kernel socket tables to read
+    :type paths: Iterable[str]
+    :returns: Report
+    :rtype: Dict[str, any]
+    """
+    servers = collections.OrderedDict()
+    sessions_by_db = collections.OrderedDict()
+    for db, (name, schema, ports) in DATABASES.items():
+        servers[db] = server_report(rundir, name, schema)
+        sessions_by_db[db] = read_sessions(ports, paths=paths)
+        servers[db]["sessions"] = len(sessions_by_db[db])
+    clients = aggregate_clients(sessions_by_db)
+    return collections.OrderedDict((
+        ("servers", servers),
+        ("total-clients", len(clients)),
+        ("clients", clients[:top] if top else clients),
+    ))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rundir", default=OVN_RUNDIR,
+                        help="OVN run directory")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP,
+                        help="number of clients to report, 0 for all")
+    args = parser.parse_args(args)
+    print(json.dumps(report(args.rundir, args.top), indent=2))
+
+
+if __name__ == "__main__":
+    main()
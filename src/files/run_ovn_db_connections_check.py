@@ -14,15 +14,31 @@
 # limitations under the License.
 """
 This script checks the output of 'ovn-sbctl list connections' for error
-conditions.
+conditions, and the Raft cluster status of the OVN NB and SB databases for
+log lag, leader churn, long logs and disconnected servers.
+
+When started with ``--daemon`` it instead holds a single JSON-RPC session
+with the local Southbound DB server, monitoring the ``Connection`` table and
+the leadership status from the ``_Server`` database, and updates the output
+file as soon as anything changes.
 """
 
+import argparse
 import sys
 import os
 import json
+import re
+import time
 from collections import namedtuple
 from subprocess import check_output, CalledProcessError
 
+try:
+    import ovsdb_client
+except ImportError:
+    # NOTE: the charm installs the module next to this script, fall back to
+    # the charm library when running from the charm directory.
+    from charm.openstack import ovsdb_client
+
 NAGIOS_STATUS_OK = 0
 NAGIOS_STATUS_WARNING = 1
 NAGIOS_STATUS_CRITICAL = 2
@@ -36,11 +52,40 @@ NAGIOS_STATUS = {
 }
 
 OUTPUT_FILE = "/var/lib/nagios/ovn_db_connections.out"
+OVNNB_DB_CTL = "/var/run/ovn/ovnnb_db.ctl"
 OVNSB_DB_CTL = "/var/run/ovn/ovnsb_db.ctl"
+OVNSB_DB_SOCK = "/var/run/ovn/ovnsb_db.sock"
+OVNNB_DB = "OVN_Northbound"
+OVNSB_DB = "OVN_Southbound"
 TMP_OUTPUT_FILE = OUTPUT_FILE + ".tmp"
+# Raft term last seen per database, used to track leader changes
+STATE_FILE = "/var/lib/nagios/ovn_db_raft_state.json"
+
+CLUSTER_DBS = (
+    (OVNNB_DB, OVNNB_DB_CTL),
+    (OVNSB_DB, OVNSB_DB_CTL),
+)
+TIMEOUT = 10
+
+# Raft check thresholds as (warning, critical), 0 disables. The alert for
+# leader_change is raised when the last leader change happened less than the
+# given number of seconds ago, the others when the value reaches the
+# threshold. The charm moves leadership on purpose for compaction and
+# rolling restarts, so leader_change is disabled unless asked for.
+DEFAULT_THRESHOLDS = {
+    "uncommitted_entries": (100, 1000),
+    "leader_change": (0, 0),
+    "log_entries": (10000, 100000),
+    "disconnected_servers": (1, 2),
+}
 
 EXPECTED_CONNECTIONS = 2
 
+# Seconds between rewrites of the output file in daemon mode when nothing
+# changes, must be well within the freshness check of the NRPE plugin.
+REFRESH_INTERVAL = 60
+RECONNECT_INTERVAL = 5
+
 Alert = namedtuple("Alert", "status msg")
 
 
@@ -152,8 +197,12 @@ def write_output_file(output):
     os.rename(TMP_OUTPUT_FILE, OUTPUT_FILE)
 
 
-def is_leader():
-    """Check whether the current unit is OVN Southbound DB leader."""
+def is_leader(output=None):
+    """Check whether the current unit is OVN Southbound DB leader.
+
+    The output of 'cluster/status' is retrieved with ovs-appctl unless
+    provided.
+    """
     cmd = [
         "ovs-appctl",
         "-t",
@@ -161,7 +210,8 @@ def is_leader():
         "cluster/status",
         "OVN_Southbound",
     ]
-    output = check_output(cmd).decode("utf-8")
+    if output is None:
+        output = check_output(cmd).decode("utf-8")
 
     output_lines = output.split("\n")
     role_line = [line for line in output_lines if line.startswith("Role:")]
@@ -174,6 +224,134 @@ def is_leader():
     return False
 
 
+def check_threshold(value, thresholds, msg, below=False):
+    """Compare value against (warning, critical) thresholds."""
+    def exceeds(limit):
+        if not limit:
+            return False
+        return value < limit if below else value >= limit
+
+    warn, crit = thresholds
+    if exceeds(crit):
+        return Alert(NAGIOS_STATUS_CRITICAL, msg)
+    if exceeds(warn):
+        return Alert(NAGIOS_STATUS_WARNING, msg)
+    return Alert(NAGIOS_STATUS_OK, msg)
+
+
+def log_entries(status):
+    """Get number of Raft log entries since the last snapshot."""
+    match = re.match(r"\[(\d+), (\d+)\]", status.get("Log", ""))
+    if not match:
+        return 0
+    return int(match.group(2)) - int(match.group(1))
+
+
+def disconnected_servers(status):
+    """Get number of other cluster servers without a Raft connection."""
+    connected = set(
+        conn[2:] for conn in status.get("Connections", "").split()
+        if conn.startswith("->") or conn.startswith("<-"))
+    return len([
+        server for server in status["Servers"]
+        if "(self)" not in server and server.split()[0] not in connected])
+
+
+def seconds_since_leader_change(db, status, state, now):
+    """Get seconds since the last observed leader change.
+
+    A change of Raft term is recorded in ``state``, a recent election
+    started by the local server is taken into account as well.
+
+    :returns: Seconds, None if no change has been observed
+    :rtype: Optional[float]
+    """
+    term = int(status.get("Term", 0))
+    previous = state.get(db)
+    if previous is None or previous["term"] != term:
+        # the first term seen is not counted as a change
+        state[db] = {"term": term,
+                     "changed": now if previous is not None else None}
+    since = None
+    if state[db]["changed"] is not None:
+        since = now - state[db]["changed"]
+    for key in status:
+        match = re.match(r"Last Election started (\d+) ms ago", key)
+        if match:
+            started = int(match.group(1)) / 1000
+            since = started if since is None else min(since, started)
+    return since
+
+
+def check_raft(db, status, thresholds, state, now):
+    """Run checks against parsed 'cluster/status' of a database."""
+    alerts = []
+    uncommitted = int(status.get("Entries not yet committed", 0))
+    alerts.append(check_threshold(
+        uncommitted, thresholds["uncommitted_entries"],
+        "{}: {} uncommitted entries".format(db, uncommitted)))
+    since = seconds_since_leader_change(db, status, state, now)
+    if since is not None:
+        alerts.append(check_threshold(
+            since, thresholds["leader_change"],
+            "{}: leader changed {}s ago".format(db, int(since)),
+            below=True))
+    entries = log_entries(status)
+    alerts.append(check_threshold(
+        entries, thresholds["log_entries"],
+        "{}: {} log entries since last snapshot".format(db, entries)))
+    disconnected = disconnected_servers(status)
+    alerts.append(check_threshold(
+        disconnected, thresholds["disconnected_servers"],
+        "{}: {} disconnected servers".format(db, disconnected)))
+    return alerts
+
+
+def load_state(path=STATE_FILE):
+    """Load state of previous runs."""
+    try:
+        with open(path) as state_file:
+            return json.load(state_file)
+    except (IOError, ValueError):
+        return {}
+
+
+def save_state(state, path=STATE_FILE):
+    """Atomically save state for subsequent runs."""
+    try:
+        with open(path + ".tmp", "w") as state_file:
+            json.dump(state, state_file)
+        os.rename(path + ".tmp", path)
+    except IOError as err:
+        print("Cannot write state file {}, error {}".format(path, err))
+
+
+def check_cluster(thresholds):
+    """Run Raft checks for all databases on the local unit.
+
+    :returns: Alerts and output of 'cluster/status' by database
+    :rtype: Tuple[List[Alert], Dict[str, str]]
+    """
+    alerts = []
+    outputs = {}
+    state = load_state()
+    now = time.time()
+    for db, ctl in CLUSTER_DBS:
+        try:
+            with ovsdb_client.OVSDBClient(ctl, timeout=TIMEOUT) as client:
+                outputs[db] = client.unixctl("cluster/status", db)
+        except (OSError, ovsdb_client.OVSDBError) as error:
+            alerts.append(Alert(
+                NAGIOS_STATUS_CRITICAL,
+                "{}: unable to get cluster status: {}".format(db, error)))
+            continue
+        alerts.extend(check_raft(
+            db, ovsdb_client.parse_cluster_status(outputs[db]),
+            thresholds, state, now))
+    save_state(state)
+    return alerts, outputs
+
+
 def aggregate_alerts(alerts):
     """Reduce results down to an overall single status based on the highest
     level."""
@@ -226,23 +404,125 @@ def aggregate_alerts(alerts):
     return "{}: {}".format(severity, status_detail)
 
 
-def run_checks():
-    """Check health of OVN SB DB connections."""
+def run_checks(thresholds=None):
+    """Check health of OVN DB cluster and OVN SB DB connections.
+
+    Raft checks are run on every unit, connections are checked on the
+    OVN SB DB leader.
+    """
     output = "UNKNOWN"
     try:
-        if is_leader():
+        alerts, outputs = check_cluster(thresholds or DEFAULT_THRESHOLDS)
+        if OVNSB_DB in outputs and is_leader(outputs[OVNSB_DB]):
             cmd = ["ovn-sbctl", "--format=json", "list", "connection"]
             cmd_output = check_output(cmd).decode("utf-8")
             connections = parse_output(cmd_output)
-            alerts = check_connections(connections)
-            output = aggregate_alerts(alerts)
-        else:
-            output = "OK: no-op (unit is not the DB leader)"
+            alerts.extend(check_connections(connections))
+        output = aggregate_alerts(alerts)
     except CalledProcessError as error:
         output = "UKNOWN: {}".format(error.stdout.decode(errors="ignore"))
 
     write_output_file(output)
 
 
+class ConnectionsMonitor(object):
+    """Track OVN SB DB connections and leadership over one session."""
+
+    MONITOR_REQUESTS = {
+        OVNSB_DB: {"Connection": {"columns": ["target", "role",
+                                              "read_only"]}},
+        "_Server": {"Database": {"columns": ["name", "leader"]}},
+    }
+
+    def __init__(self, path=OVNSB_DB_SOCK, timeout=REFRESH_INTERVAL,
+                 thresholds=None):
+        self.client = ovsdb_client.OVSDBClient(path, timeout=timeout)
+        self.thresholds = thresholds or DEFAULT_THRESHOLDS
+        self.tables = {}
+
+    def update(self, table_updates):
+        """Apply table updates received from the server."""
+        for table, rows in table_updates.items():
+            current = self.tables.setdefault(table, {})
+            for uuid, row in rows.items():
+                if row.get("new") is None:
+                    current.pop(uuid, None)
+                else:
+                    current[uuid] = dict(row["new"], _uuid=["uuid", uuid])
+
+    def start(self):
+        """(Re-)establish monitors and load initial table contents."""
+        self.tables = {}
+        for db, requests in sorted(self.MONITOR_REQUESTS.items()):
+            self.update(self.client.monitor(db, db, requests))
+
+    def poll(self):
+        """Wait for and apply changes.
+
+        Returns False if nothing changed before the timeout expired.
+        """
+        msg = self.client.wait_notification()
+        if msg and msg.get("method") == "update":
+            self.update(msg["params"][1])
+            return True
+        return False
+
+    def is_leader(self):
+        """Check whether the local server is OVN Southbound DB leader."""
+        for row in self.tables.get("Database", {}).values():
+            if row.get("name") == OVNSB_DB:
+                return row.get("leader") is True
+        return False
+
+    def connections(self):
+        """Get rows of the Connection table ordered by UUID."""
+        return [row for _, row in
+                sorted(self.tables.get("Connection", {}).items())]
+
+    def status(self):
+        """Run checks against the current state.
+
+        Raft status is not part of the monitored tables and is retrieved
+        on every call.
+        """
+        alerts, _ = check_cluster(self.thresholds)
+        if self.is_leader():
+            alerts.extend(check_connections(self.connections()))
+        return aggregate_alerts(alerts)
+
+
+def run_daemon(monitor=None, thresholds=None):
+    """Keep the output file up to date until killed."""
+    monitor = monitor or ConnectionsMonitor(thresholds=thresholds)
+    while True:
+        try:
+            monitor.start()
+            while True:
+                write_output_file(monitor.status())
+                monitor.poll()
+        except (OSError, ovsdb_client.OVSDBError) as error:
+            monitor.client.close()
+            write_output_file("UNKNOWN: {}".format(error))
+            time.sleep(RECONNECT_INTERVAL)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--daemon", action="store_true",
+                        help="monitor the database instead of polling once")
+    for name, default in sorted(DEFAULT_THRESHOLDS.items()):
+        parser.add_argument("--" + name.replace("_", "-"), dest=name,
+                            nargs=2, type=int, metavar=("WARN", "CRIT"),
+                            default=list(default),
+                            help="Raft check thresholds, 0 disables")
+    args = parser.parse_args(args)
+    thresholds = {name: tuple(getattr(args, name))
+                  for name in DEFAULT_THRESHOLDS}
+    if args.daemon:
+        run_daemon(thresholds=thresholds)
+    else:
+        run_checks(thresholds)
+
+
 if __name__ == "__main__":
-    run_checks()
+    main()
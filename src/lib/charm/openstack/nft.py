@@ -0,0 +1,256 @@
+# Copyright 2021 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""nftables firewall backend using named sets for allowed addresses."""
+
+import collections
+import ipaddress
+import json
+import subprocess
+
+import charmhelpers.core as ch_core
+
+NFT = 'nft'
+FAMILY = 'inet'
+
+# Allowed addresses for a group of ports, split by address family
+PortGroup = collections.namedtuple('PortGroup', 'ports v4 v6')
+
+
+def set_name(ports, version):
+    """Get name of named set for group of ports and address family.
+
+    :param ports: Ports in group
+    :type ports: Iterable[int]
+    :param version: IP version, 4 or 6
+    :type version: int
+    :returns: Name of set
+    :rtype: str
+    """
+    return 'ovn_v{}_{}'.format(
+        version, '_'.join(str(port) for port in sorted(ports)))
+
+
+def _element(network):
+    """Format network as set element, single addresses without prefix.
+
+    :param network: Network
+    :type network: Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+    :returns: Set element
+    :rtype: str
+    """
+    if network.prefixlen == network.max_prefixlen:
+        return network.network_address.compressed
+    return network.compressed
+
+
+def _without_overlap(networks):
+    """Remove networks contained in other networks.
+
+    :param networks: Networks of one address family
+    :type networks: Iterable[Union[ipaddress.IPv4Network,
+                                   ipaddress.IPv6Network]]
+    :returns: Set elements
+    :rtype: Set[str]
+    """
+    kept = []
+    for network in sorted(set(networks),
+                          key=lambda network: network.prefixlen):
+        # NOTE: ``subnet_of`` is not available on Python 3.6
+        if not any(network.network_address in other and
+                   network.broadcast_address in other for other in kept):
+            kept.append(network)
+    return set(_element(network) for network in kept)
+
+
+def port_groups(port_addr_map):
+    """Normalize port to address map into port groups.
+
+    Addresses may be given as networks in CIDR notation, networks contained
+    in others are dropped as elements of interval sets must not overlap.
+    Anything else, e.g. a hostname, is logged and skipped.
+
+    :param port_addr_map: Map of ports to addresses to allow.
+    :type port_addr_map: Dict[Tuple[int, ...], Optional[Iterator]]
+    :returns: Port groups sorted by ports
+    :rtype: List[PortGroup]
+    """
+    networks = collections.OrderedDict()
+    for ports, addrs in port_addr_map.items():
+        key = tuple(sorted(set(ports)))
+        group = networks.setdefault(key, {4: [], 6: []})
+        for addr in addrs or []:
+            try:
+                network = ipaddress.ip_network(addr, strict=False)
+            except ValueError:
+                ch_core.hookenv.log('Ignoring invalid firewall address: {}'
+                                    .format(addr),
+                                    level=ch_core.hookenv.WARNING)
+                continue
+            group[network.version].append(network)
+    return [
+        PortGroup(key, *(_without_overlap(networks[key][version])
+                         for version in (4, 6)))
+        for key in sorted(networks.keys())
+    ]
+
+
+def _elements(addrs):
+    return ', '.join(sorted(addrs))
+
+
+def render_ruleset(table, port_addr_map, elements=True):
+    """Render nft script that atomically replaces our table.
+
+    :param table: Name of table
+    :type table: str
+    :param port_addr_map: Map of ports to addresses to allow.
+    :type port_addr_map: Dict[Tuple[int, ...], Optional[Iterator]]
+    :param elements: Include set elements, set to False to render structure
+                     only.
+    :type elements: bool
+    :returns: nft script
+    :rtype: str
+    """
+    groups = port_groups(port_addr_map)
+    reject_ports = sorted(set().union(*(group.ports for group in groups)))
+    lines = [
+        # declare table so that the delete does not fail on first run, the
+        # whole script is applied as a single transaction.
+        'table {} {}'.format(FAMILY, table),
+        'delete table {} {}'.format(FAMILY, table),
+        'table {} {} {{'.format(FAMILY, table),
+    ]
+    rules = []
+    for group in groups:
+        ports = ', '.join(str(port) for port in group.ports)
+        for version, addr_type, match, addrs in (
+                (4, 'ipv4_addr', 'ip', group.v4),
+                (6, 'ipv6_addr', 'ip6', group.v6)):
+            name = set_name(group.ports, version)
+            lines.append('\tset {} {{'.format(name))
+            lines.append('\t\ttype {}'.format(addr_type))
+            lines.append('\t\tflags interval')
+            if elements and addrs:
+                lines.append('\t\telements = {{ {} }}'.format(
+                    _elements(addrs)))
+            lines.append('\t}')
+            rules.append('\t\ttcp dport {{ {} }} {} saddr @{} accept'
+                         .format(ports, match, name))
+    lines.append('\tchain input {')
+    lines.append('\t\ttype filter hook input priority 0; policy accept;')
+    # NOTE: same as the ufw before.rules, local clients such as the relays
+    # and established sessions are never rejected.
+    lines.append('\t\tiifname "lo" accept')
+    lines.append('\t\tct state established,related accept')
+    lines.extend(rules)
+    if reject_ports:
+        lines.append('\t\ttcp dport {{ {} }} reject with tcp reset'.format(
+            ', '.join(str(port) for port in reject_ports)))
+    lines.append('\t}')
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+def parse_set_elements(listing):
+    """Get elements of named sets from JSON table listing.
+
+    :param listing: Output of ``nft -j list table``
+    :type listing: str
+    :returns: Map of set name to elements
+    :rtype: Dict[str, Set[str]]
+    """
+    sets = {}
+    for obj in json.loads(listing).get('nftables', []):
+        if 'set' not in obj:
+            continue
+        elems = set()
+        for elem in obj['set'].get('elem', []):
+            if isinstance(elem, dict) and 'prefix' in elem:
+                elem = '{}/{}'.format(elem['prefix']['addr'],
+                                      elem['prefix']['len'])
+            elif not isinstance(elem, str):
+                continue
+            elems.add(_element(ipaddress.ip_network(elem)))
+        sets[obj['set']['name']] = elems
+    return sets
+
+
+def render_element_delta(table, port_addr_map, current):
+    """Render nft script with set element changes.
+
+    :param table: Name of table
+    :type table: str
+    :param port_addr_map: Map of ports to addresses to allow.
+    :type port_addr_map: Dict[Tuple[int, ...], Optional[Iterator]]
+    :param current: Current elements as returned by ``parse_set_elements``
+    :type current: Dict[str, Set[str]]
+    :returns: nft script, empty when there is nothing to do
+    :rtype: str
+    :raises: KeyError if a set is missing
+    """
+    lines = []
+    for group in port_groups(port_addr_map):
+        for version, addrs in ((4, group.v4), (6, group.v6)):
+            name = set_name(group.ports, version)
+            add = addrs - current[name]
+            delete = current[name] - addrs
+            # NOTE: delete first, an added network may overlap a deleted
+            # address.
+            if delete:
+                lines.append('delete element {} {} {} {{ {} }}'.format(
+                    FAMILY, table, name, _elements(delete)))
+            if add:
+                lines.append('add element {} {} {} {{ {} }}'.format(
+                    FAMILY, table, name, _elements(add)))
+    return '\n'.join(lines) + '\n' if lines else ''
+
+
+def list_table(table):
+    """Get JSON listing of table.
+
+    :param table: Name of table
+    :type table: str
+    :returns: JSON listing, None if the table does not exist
+    :rtype: Optional[str]
+    """
+    try:
+        return subprocess.check_output(
+            [NFT, '-j', 'list', 'table', FAMILY, table],
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True)
+    except subprocess.CalledProcessError:
+        return
+
+
+def apply(script):
+    """Apply nft script as a single transaction.
+
+    :param script: nft script
+    :type script: str
+    :raises: subprocess.CalledProcessError
+    """
+    subprocess.run([NFT, '-f', '-'], input=script, check=True,
+                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                   universal_newlines=True)
+
+
+def delete_table(table):
+    """Delete table if it exists.
+
+    :param table: Name of table
+    :type table: str
+    :raises: subprocess.CalledProcessError
+    """
+    apply('table {family} {table}\ndelete table {family} {table}\n'
+          .format(family=FAMILY, table=table))
@@ -13,10 +13,20 @@
 # limitations under the License.
 
 import collections
-import operator
+import concurrent.futures
+import gzip
+import hashlib
+import json
 import os
+import re
+import shutil
+import socket
+import ssl
 import subprocess
 import time
+import uuid
+
+import yaml
 
 import charmhelpers.core as ch_core
 import charmhelpers.contrib.charmsupport.nrpe as nrpe
@@ -24,12 +34,17 @@ import charmhelpers.contrib.network.ovs.ovn as ch_ovn
 import charmhelpers.contrib.network.ovs.ovsdb as ch_ovsdb
 from charmhelpers.contrib.network import ufw as ch_ufw
 import charmhelpers.contrib.openstack.deferred_events as deferred_events
+import charmhelpers.fetch as ch_fetch
 
 import charms.reactive as reactive
 
 import charms_openstack.adapters
 import charms_openstack.charm
 
+import charm.openstack.nft as nft
+import charm.openstack.ovsdb_client as ovsdb_client
+import charm.openstack.profiling as profiling
+
 # Release selection need to happen here for correct determination during
 # bus discovery and action exection
 charms_openstack.charm.use_defaults('charm.default-select-release')
@@ -41,6 +56,186 @@ CERT_RELATION = 'certificates'
 NAGIOS_PLUGINS_PATH = '/usr/local/lib/nagios/plugins'
 SCRIPTS_DIR = '/usr/local/bin'
 NRPE_CRON_FILE = '/etc/cron.d/check_ovn_db_connections'
+METRICS_CRON_FILE = '/etc/cron.d/ovn-central-metrics'
+# Scripts installed to SCRIPTS_DIR that depend on the OVSDB client module
+OVSDB_CLIENT_SCRIPTS = (
+    'run_ovn_db_connections_check.py',
+    'collect_ovn_central_metrics.py',
+)
+# Raft checks of the OVN DB connections check, each with a
+# ``nagios-raft-<check>-warn`` and ``nagios-raft-<check>-crit`` option
+NAGIOS_RAFT_CHECKS = (
+    'uncommitted-entries',
+    'leader-change',
+    'log-entries',
+    'disconnected-servers',
+)
+CONNECTIONS_MONITOR_SERVICE = 'ovn-db-connections-check'
+CONNECTIONS_MONITOR_UNIT = (
+    '/etc/systemd/system/{}.service'.format(CONNECTIONS_MONITOR_SERVICE))
+
+# Unit-local storage key for time and size of the last election timer step
+# taken by this unit, used to space steps by an election window
+ELECTION_TIMER_KEY = 'ovn-central.election-timer.{}'
+# Unit-local storage keys for firewall backend in use and digest of the
+# structure of the nftables ruleset last loaded
+FIREWALL_BACKEND_KEY = 'ovn-central.firewall-backend'
+NFT_STRUCTURE_KEY = 'ovn-central.nftables-structure'
+FIREWALL_BACKENDS = ('ufw', 'nftables',)
+# Unit-local storage key for result of last compaction of a database
+COMPACTION_KEY = 'ovn-central.compaction.{}'
+# Unit-local storage key for time the local leader was last asked to compact,
+# used to space steps by an election window
+COMPACTION_HANDOVER_KEY = 'ovn-central.compaction-handover.{}'
+# Upper bound of ovn-northd parallel build threads, enforced by ovn-northd
+NORTHD_MAX_THREADS = 256
+# OVN Southbound relay instances, the instance name is the port to listen on
+SB_RELAY_SERVICE = 'ovn-sb-relay@{}'
+SB_RELAY_UNIT = '/etc/systemd/system/ovn-sb-relay@.service'
+# ovsdb-server configuration file of each relay instance
+SB_RELAY_CONFIG = '/etc/ovn/ovn-sb-relay-{}.json'
+# Unit-local storage key for ports of enabled relay instances
+SB_RELAY_KEY = 'ovn-central.sb-relay-ports'
+# Unit-local storage key for digest of the template unit systemd has loaded
+SB_RELAY_UNIT_KEY = 'ovn-central.sb-relay-unit'
+# Relays need ``--config-file`` support, the only way to assign the RBAC role
+# to a relay remote, which ovsdb-server has since Open vSwitch 3.3.
+SB_RELAY_MIN_VERSION = '3.3'
+# Package shipping ovsdb-server
+OVSDB_SERVER_PACKAGE = 'openvswitch-common'
+# Ports used by the OVSDB servers which relays must not use
+OVSDB_PORTS = (6641, 6642, 6643, 6644, 16642)
+
+OVN_CTL = '/usr/share/ovn/scripts/ovn-ctl'
+# Supported ``ovsdb-server-tuning`` keys.  Tunables with a ``unixctl``
+# command are applied at runtime, the others are passed to ovn-ctl through
+# ``/etc/default/ovn-central`` and take effect when ovsdb-server restarts.
+OVSDB_TUNABLES = {
+    'memory-trim-on-compaction': {
+        'unixctl': 'ovsdb-server/memory-trim-on-compaction',
+        'default': False,
+    },
+    'disable-file-column-diff': {
+        'ctl-opt': '--ovsdb-disable-file-column-diff',
+        'server-opt': '--disable-file-column-diff',
+        'default': False,
+    },
+}
+# Unit-local storage key for tunables supported by the installed package
+OVSDB_TUNABLES_KEY = 'ovn-central.ovsdb-tunables'
+# Seconds to wait before probing tunables again after a failed probe
+OVSDB_TUNABLES_RETRY = 3600
+# Unit-local storage key for runtime tunables last applied and the pids of
+# the ovsdb-server processes they were applied to
+OVSDB_TUNING_APPLIED_KEY = 'ovn-central.ovsdb-tuning-applied'
+# Peer relation key set by units with deferred restarts of OVN services
+RESTART_PENDING_KEY = 'ovn-restart-pending'
+# Seconds to wait for a restarted server to catch up with the cluster
+CATCH_UP_TIMEOUT = 300
+# Size of chunks when streaming database snapshots
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+JOIN_SNAPSHOT_REQUEST_KEY = 'ovn-join-snapshot-request'
+JOIN_SNAPSHOT_READY_KEY = 'ovn-join-snapshot-ready'
+JOIN_SNAPSHOT_KEY = 'ovn-central.join-snapshot-requested'
+# Seconds a new unit waits for peers to compact before joining anyway
+JOIN_SNAPSHOT_TIMEOUT = 600
+
+# Unit-local storage key for TLS certificate written but not yet confirmed
+# in use by the local ovsdb-server
+TLS_PENDING_KEY = 'ovn-central.tls-pending'
+# Local listener used to confirm which certificate ovsdb-server serves
+TLS_CHECK_PORT = 6641
+TLS_CHECK_TIMEOUT = 5
+
+# Peer relation key with digest of the newest CA the unit trusts
+TLS_CA_READY_KEY = 'ovn-tls-ca-ready'
+# Unit-local storage key for CAs in the trusted bundle during staged rotation
+TLS_CA_BUNDLE_KEY = 'ovn-central.tls-ca-bundle'
+# Seconds a unit waits for peers to trust a new CA before switching anyway
+CA_ROTATION_TIMEOUT = 3600
+
+# Unit-local storage key for digest of the inputs configuration files were
+# last rendered from
+RENDER_DIGEST_KEY = 'ovn-central.render-digest'
+# Attributes of the peer relation endpoint and configuration adapter the
+# templates are rendered from
+TEMPLATE_ENDPOINT_ATTRS = (
+    'cluster_local_addr',
+    'cluster_remote_addrs',
+    'db_nb_cluster_port',
+    'db_sb_cluster_port',
+    'db_nb_connection_strs',
+    'db_sb_connection_strs',
+)
+TEMPLATE_OPTION_ATTRS = (
+    'ovn_key',
+    'ovn_cert',
+    'ovn_ca_cert',
+    'is_charm_leader',
+    'ovsdb_tuning_ctl_opts',
+)
+
+# Unit-local storage key for output of last native cluster status query
+CLUSTER_STATUS_KEY = 'ovn-central.cluster-status.{}'
+# Seconds the ``update-status`` hook may reuse the cluster status queried by
+# a previous hook, a bit longer than the default update-status interval so
+# that at most every other update-status hook queries the servers.
+CLUSTER_STATUS_MAX_AGE = 330
+
+# Unit-local storage key for state of the adaptive inactivity probe
+INACTIVITY_PROBE_KEY = 'ovn-central.inactivity-probe.{}'
+# Minimum seconds between adaptive inactivity probe changes of a database
+INACTIVITY_PROBE_INTERVAL = 1800
+# Number of unixctl round-trips timed to estimate poll loop latency
+INACTIVITY_PROBE_SAMPLES = 5
+# Poll loop latency in milliseconds at which the probe is raised, the same
+# threshold at which ovsdb-server reports an unreasonably long poll interval
+INACTIVITY_PROBE_LATENCY_HIGH = 1000
+# Poll loop latency in milliseconds below which the probe is lowered
+INACTIVITY_PROBE_LATENCY_LOW = 100
+# Inactivity probes per second the probe is kept from exceeding, idle
+# sessions are sent one probe each per interval
+INACTIVITY_PROBE_MAX_RATE = 100
+
+OVN_SCHEMAS = {
+    'ovnnb_db': 'OVN_Northbound',
+    'ovnsb_db': 'OVN_Southbound',
+}
+
+
+def cluster_status_from_output(output):
+    """Build cluster status object from ``cluster/status`` output.
+
+    The output is parsed by ``ovsdb_client.parse_cluster_status``, the
+    result is interchangeable with ``ch_ovn.cluster_status``.
+
+    :param output: Textual output from ``cluster/status`` command
+    :type output: str
+    :returns: Object describing the cluster status
+    :rtype: ch_ovn.OVNClusterStatus
+    :raises: KeyError, ValueError
+    """
+    status = ovsdb_client.parse_cluster_status(output)
+    return ch_ovn.OVNClusterStatus(
+        status['Name'],
+        # e.g. 'Cluster ID: 2d8b (2d8b5e4e-6ae8-41b1-a6a8-ea0d26bd26d5)'
+        uuid.UUID(status['Cluster ID'].split()[1].strip('()')),
+        uuid.UUID(status['Server ID'].split()[1].strip('()')),
+        status['Address'],
+        status['Status'],
+        status['Role'],
+        int(status['Term']),
+        status['Leader'],
+        status['Vote'] == 'self',
+        int(status['Election timer']),
+        status['Log'],
+        int(status['Entries not yet committed']),
+        int(status['Entries not yet applied']),
+        status['Connections'],
+        # e.g. 'a6c3 (a6c3 at ssl:10.0.0.1:6644) (self) next_index=8'
+        [tuple(server.replace(')', '').split()[0:4:3])
+         for server in status['Servers']])
 
 
 # NOTE(fnordahl): We should split the ``OVNConfigurationAdapter`` in
@@ -67,6 +262,10 @@ class OVNCentralConfigurationAdapter(
     def is_charm_leader(self):
         return reactive.is_flag_set('leadership.is_leader')
 
+    @property
+    def ovsdb_tuning_ctl_opts(self):
+        return self.charm_instance.ovsdb_tuning_ctl_opts()
+
 
 class BaseOVNCentralCharm(charms_openstack.charm.OpenStackCharm):
     abstract_class = True
@@ -80,6 +279,8 @@ class BaseOVNCentralCharm(charms_openstack.charm.OpenStackCharm):
     packages = ['ovn-central']
     services = ['ovn-central']
     nrpe_check_services = []
+    # Daemons restarted by ``rolling_restart``, in order
+    rolling_restart_services = []
     release_pkg = 'ovn-central'
     configuration_class = OVNCentralConfigurationAdapter
     required_relations = [PEER_RELATION, CERT_RELATION]
@@ -87,6 +288,7 @@ class BaseOVNCentralCharm(charms_openstack.charm.OpenStackCharm):
     source_config_key = 'source'
     min_election_timer = 1
     max_election_timer = 60
+    nft_table = 'charm-ovn-central'
 
     def __init__(self, **kwargs):
         """Override class init to populate restart map with instance method."""
@@ -95,6 +297,15 @@ class BaseOVNCentralCharm(charms_openstack.charm.OpenStackCharm):
             os.path.join(self.ovn_sysconfdir(),
                          'ovn-northd-db-params.conf'): ['ovn-northd'],
         }
+        # Cluster status is retrieved several times for each database during
+        # a hook execution, cache it for the lifetime of the instance.
+        self._cluster_status_cache = {}
+        self._cluster_status_cache_stats = collections.Counter()
+        # Databases whose cached status was stored by a previous hook
+        self._cluster_status_reused = set()
+        # Querying the package database forks processes, read versions once
+        # for the lifetime of the instance.
+        self._upstream_versions = {}
         super().__init__(**kwargs)
 
     def restart_on_change(self):
@@ -114,6 +325,81 @@ class BaseOVNCentralCharm(charms_openstack.charm.OpenStackCharm):
             can_restart_now_f=deferred_events.check_and_record_restart_request,
             post_svc_restart_f=deferred_events.process_svc_restart)
 
+    def render_inputs_digest(self, interfaces, configs):
+        """Get digest of everything configuration files are rendered from.
+
+        Covers the relation data and options referenced by the templates,
+        the charm configuration, the release and the template files
+        themselves, which change on charm upgrade.
+
+        :param interfaces: Relation endpoints to render with
+        :type interfaces: List[charms.reactive.Endpoint]
+        :param configs: Paths of files to render
+        :type configs: Iterable[str]
+        :returns: SHA-256 digest
+        :rtype: str
+        """
+        templates_dir = os.path.join(ch_core.hookenv.charm_dir(), 'templates')
+        templates = []
+        for root, _, files in os.walk(templates_dir):
+            for name in files:
+                stat = os.stat(os.path.join(root, name))
+                templates.append((
+                    os.path.relpath(os.path.join(root, name), templates_dir),
+                    stat.st_size, stat.st_mtime_ns))
+        inputs = {
+            'release': self.release,
+            'configs': sorted(configs),
+            'templates': sorted(templates),
+            'config': dict(self.config),
+            'options': {attr: getattr(self.options, attr)
+                        for attr in TEMPLATE_OPTION_ATTRS},
+            'endpoints': [{attr: getattr(endpoint, attr, None)
+                           for attr in TEMPLATE_ENDPOINT_ATTRS}
+                          for endpoint in interfaces],
+        }
+
+        def _serialize(value):
+            # NOTE: the endpoint provides addresses as generators
+            if hasattr(value, '__iter__'):
+                return list(value)
+            return str(value)
+
+        return hashlib.sha256(json.dumps(
+            inputs, sort_keys=True,
+            default=_serialize).encode('utf-8')).hexdigest()
+
+    def render_with_interfaces(self, interfaces, configs=None):
+        """Render configuration files unless their inputs are unchanged.
+
+        The templates are only rendered, and their targets checksummed for
+        ``restart_on_change``, when the digest of the inputs differs from
+        the one of the previous render or a target is missing.
+
+        :param interfaces: Relation endpoints to render with
+        :type interfaces: List[charms.reactive.Endpoint]
+        :param configs: Paths of files to render, all in restart map if None
+        :type configs: Optional[Iterable[str]]
+        """
+        targets = list(configs or self.full_restart_map.keys())
+        digest = self.render_inputs_digest(interfaces, targets)
+        kv = ch_core.unitdata.kv()
+        if (kv.get(RENDER_DIGEST_KEY) == digest and
+                all(os.path.exists(target) for target in targets)):
+            ch_core.hookenv.log('Render cache hit, inputs unchanged ({}), '
+                                'skipping render of {}'
+                                .format(digest[:12], ', '.join(targets)),
+                                level=ch_core.hookenv.DEBUG)
+            return
+        ch_core.hookenv.log('Render cache miss ({}), rendering {}'
+                            .format(digest[:12], ', '.join(targets)),
+                            level=ch_core.hookenv.DEBUG)
+        # NOTE: the digest is dropped first so that a render failing half way
+        # through is retried by the next hook.
+        kv.unset(RENDER_DIGEST_KEY)
+        super().render_with_interfaces(interfaces, configs=configs)
+        kv.set(RENDER_DIGEST_KEY, digest)
+
     @property
     def deferable_services(self):
         """Services which should be stopped from restarting.
@@ -247,7 +533,7 @@ class BaseOVNCentralCharm(charms_openstack.charm.OpenStackCharm):
         :returns: ports numbers the payload listens to.
         :rtype List[int]
         """
-        return self._default_port_list()
+        return self._default_port_list() + self.sb_relay_ports()
 
     def validate_config(self):
         """Validate configuration and inform user of any issues.
@@ -255,14 +541,87 @@ class BaseOVNCentralCharm(charms_openstack.charm.OpenStackCharm):
         :returns: Tuple with status and message describing configuration issue.
         :rtype: Tuple[Optional[str],Optional[str]]
         """
-        tgt_timer = self.config['ovsdb-server-election-timer']
-        if (tgt_timer > self.max_election_timer or
-                tgt_timer < self.min_election_timer):
+        for key in ('ovsdb-server-election-timer',
+                    'ovsdb-server-nb-election-timer',
+                    'ovsdb-server-sb-election-timer'):
+            tgt_timer = self.config[key]
+            if key != 'ovsdb-server-election-timer' and not tgt_timer:
+                continue
+            if (tgt_timer > self.max_election_timer or
+                    tgt_timer < self.min_election_timer):
+                return (
+                    'blocked',
+                    "Invalid configuration: '{}' must be > {} < {}."
+                    .format(key, self.min_election_timer,
+                            self.max_election_timer))
+        for db in ('nb', 'sb'):
+            key = 'ovsdb-server-{}-inactivity-probe'.format(db)
+            if self.config[key] < 0:
+                return (
+                    'blocked',
+                    "Invalid configuration: '{}' must be >= 0.".format(key))
+        if self.config['firewall-backend'] not in FIREWALL_BACKENDS:
+            return (
+                'blocked',
+                "Invalid configuration: 'firewall-backend' must be one of: "
+                "{}.".format(', '.join(FIREWALL_BACKENDS)))
+        if (self.config['hook-profiling'] and
+                self.config['hook-profiling'] not in
+                profiling.PROFILING_MODES):
             return (
                 'blocked',
-                "Invalid configuration: 'ovsdb-server-election-timer' must be "
-                "> {} < {}."
-                .format(self.min_election_timer, self.max_election_timer))
+                "Invalid configuration: 'hook-profiling' must be one of: "
+                "{}.".format(', '.join(profiling.PROFILING_MODES)))
+        if self.config['ovsdb-compaction-window']:
+            try:
+                self.parse_compaction_window(
+                    self.config['ovsdb-compaction-window'])
+            except ValueError:
+                return (
+                    'blocked',
+                    "Invalid configuration: 'ovsdb-compaction-window' must "
+                    "be in the format HH:MM-HH:MM.")
+        n_threads = self.config['ovn-northd-n-threads']
+        if n_threads < 1 or n_threads > NORTHD_MAX_THREADS:
+            return (
+                'blocked',
+                "Invalid configuration: 'ovn-northd-n-threads' must be "
+                ">= 1 <= {}.".format(NORTHD_MAX_THREADS))
+        try:
+            self.ovsdb_server_tuning()
+        except ValueError as e:
+            return (
+                'blocked',
+                "Invalid configuration: 'ovsdb-server-tuning': {}".format(e))
+        if self.config['ovn-sb-relay-count'] < 0:
+            return (
+                'blocked',
+                "Invalid configuration: 'ovn-sb-relay-count' must be >= 0.")
+        if self.config['ovsdb-server-adaptive-inactivity-probe'] and not (
+                0 < self.config['ovsdb-server-inactivity-probe-min'] <=
+                self.config['ovsdb-server-inactivity-probe-max']):
+            return (
+                'blocked',
+                "Invalid configuration: 'ovsdb-server-inactivity-probe-min' "
+                "must be > 0 <= 'ovsdb-server-inactivity-probe-max'.")
+        if self.config['ca-rotation-grace-period'] < 0:
+            return (
+                'blocked',
+                "Invalid configuration: 'ca-rotation-grace-period' must be "
+                ">= 0.")
+        relay_ports = self.sb_relay_ports()
+        if relay_ports and not self.sb_relay_supported():
+            return (
+                'blocked',
+                "Invalid configuration: 'ovn-sb-relay-count' requires "
+                "ovsdb-server {} or later.".format(SB_RELAY_MIN_VERSION))
+        if set(relay_ports) & set(OVSDB_PORTS) or (
+                relay_ports and relay_ports[-1] > 65535):
+            return (
+                'blocked',
+                "Invalid configuration: OVN Southbound relay ports {}-{} "
+                "overlap with OVSDB ports or are out of range."
+                .format(relay_ports[0], relay_ports[-1]))
         return None, None
 
     def custom_assess_status_last_check(self):
@@ -278,7 +637,11 @@ class BaseOVNCentralCharm(charms_openstack.charm.OpenStackCharm):
         if invalid_config != (None, None):
             return invalid_config
 
-        cluster_str = self.cluster_status_message()
+        msg = [self.cluster_status_message()]
+        for db, step in sorted(self.election_timer_progress().items()):
+            msg.append('{} election timer: {}ms -> {}ms'.format(
+                db, step['timer'], step['target']))
+        cluster_str = ' '.join(filter(None, msg))
         if cluster_str:
             return ('active', 'Unit is ready ({})'.format(cluster_str))
         return None, None
@@ -293,28 +656,125 @@ class BaseOVNCentralCharm(charms_openstack.charm.OpenStackCharm):
             return False
         for service in self.services:
             ch_core.host.service_resume(service)
+        # Services may have been (re-)started, any cached state is stale.
+        self.invalidate_cluster_status()
         return True
 
-    def cluster_status(self, db):
+    def invalidate_cluster_status(self, db=None):
+        """Invalidate cached cluster status.
+
+        Must be called after any operation that changes cluster state.
+
+        :param db: Database to invalidate cache for, all if None
+        :type db: Optional[str]
+        """
+        kv = ch_core.unitdata.kv()
+        for name in [db] if db else OVN_SCHEMAS.keys():
+            self._cluster_status_cache.pop(name, None)
+            self._cluster_status_reused.discard(name)
+            kv.unset(CLUSTER_STATUS_KEY.format(name))
+
+    def _recent_cluster_status_output(self, db):
+        """Get cluster status output stored by a recent hook.
+
+        Only the ``update-status`` hook may reuse the output.  Handlers in
+        that hook still change cluster state, so they must request a fresh
+        status before acting on the role of the local server.
+
+        :param db: Database to get output for
+        :type db: str
+        :returns: Output of ``cluster/status``, None if there is none recent
+        :rtype: Optional[str]
+        """
+        if ch_core.hookenv.hook_name() != 'update-status':
+            return
+        stored = ch_core.unitdata.kv().get(CLUSTER_STATUS_KEY.format(db))
+        if not stored:
+            return
+        age = time.time() - stored['time']
+        if 0 <= age < CLUSTER_STATUS_MAX_AGE:
+            ch_core.hookenv.log('Reusing cluster status of {} queried {:.0f} '
+                                'seconds ago'.format(db, age),
+                                level=ch_core.hookenv.DEBUG)
+            return stored['output']
+
+    def cluster_status(self, db, fresh=False):
         """OVN version agnostic cluster_status helper.
 
+        The result is cached per database for the lifetime of the charm
+        instance, use ``invalidate_cluster_status`` to force a refresh.  The
+        ``update-status`` hook also reuses status queried by a recent hook.
+
         :param db: Database to operate on
         :type db: str
+        :param fresh: Do not use status stored by a previous hook, for
+                      callers about to act on the role of the server.
+        :type fresh: bool
         :returns: Object describing the cluster status or None
         :rtype: Optional[ch_ovn.OVNClusterStatus]
         """
+        if fresh and db in self._cluster_status_reused:
+            self.invalidate_cluster_status(db)
+        result = 'hit' if db in self._cluster_status_cache else 'miss'
+        self._cluster_status_cache_stats[result] += 1
+        ch_core.hookenv.log('cluster_status cache {} for {} (hits={}, '
+                            'misses={})'
+                            .format(result, db,
+                                    self._cluster_status_cache_stats['hit'],
+                                    self._cluster_status_cache_stats['miss']),
+                            level=ch_core.hookenv.DEBUG)
+        if result == 'hit':
+            return self._cluster_status_cache[db]
         try:
             # The charm will attempt to retrieve cluster status before OVN
             # is clustered and while units are paused, so we need to handle
             # errors from this call gracefully.
-            return ch_ovn.cluster_status(db, rundir=self.ovn_rundir(),
-                                         use_ovs_appctl=(
-                                             self.release == 'train'))
-        except (ValueError, subprocess.CalledProcessError) as e:
+            try:
+                output = None if fresh else (
+                    self._recent_cluster_status_output(db))
+                if output is not None:
+                    self._cluster_status_reused.add(db)
+                else:
+                    with self.ovsdb_connection(db, control=True) as conn:
+                        output = conn.unixctl('cluster/status',
+                                              OVN_SCHEMAS[db])
+                    ch_core.unitdata.kv().set(
+                        CLUSTER_STATUS_KEY.format(db),
+                        {'output': output, 'time': time.time()})
+                status = cluster_status_from_output(output)
+            except OSError as e:
+                ch_core.hookenv.log('Unable to use unixctl socket for {}, '
+                                    'falling back to CLI: {}'.format(db, e),
+                                    level=ch_core.hookenv.DEBUG)
+                status = ch_ovn.cluster_status(db, rundir=self.ovn_rundir(),
+                                               use_ovs_appctl=(
+                                                   self.release == 'train'))
+        except (KeyError,
+                ValueError,
+                ovsdb_client.OVSDBError,
+                subprocess.CalledProcessError) as e:
             ch_core.hookenv.log('Unable to get cluster status, ovsdb-server '
                                 'not ready yet?: {}'.format(e),
                                 level=ch_core.hookenv.DEBUG)
             return
+        # NOTE: failures are not cached as the ovsdb-server may become ready
+        # later in the same hook.
+        self._cluster_status_cache[db] = status
+        return status
+
+    def ovsdb_connection(self, db, control=False):
+        """Get in-process JSON-RPC client for local ovsdb-server.
+
+        :param db: Database to connect to, 'ovnnb_db' or 'ovnsb_db'
+        :type db: str
+        :param control: Connect to unixctl socket instead of database socket
+        :type control: bool
+        :returns: Client object, connection is established on first use
+        :rtype: ovsdb_client.OVSDBClient
+        """
+        return ovsdb_client.OVSDBClient(
+            os.path.join(self.ovn_rundir(),
+                         '{}.{}'.format(db, 'ctl' if control else 'sock')))
 
     def cluster_status_message(self):
         """Get cluster status message suitable for use as workload message.
@@ -332,17 +792,355 @@ class BaseOVNCentralCharm(charms_openstack.charm.OpenStackCharm):
         if db_leader:
             msg.append('leader: {}'.format(', '.join(db_leader)))
         if self.is_northd_active():
-            msg.append('northd: active')
+            n_threads = self.northd_n_threads()
+            if n_threads and n_threads > 1:
+                msg.append('northd: active ({} threads)'.format(n_threads))
+            else:
+                msg.append('northd: active')
         return ' '.join(msg)
 
+    def northd_unixctl(self, command, *args):
+        """Run unixctl command of local ovn-northd in-process.
+
+        :param command: Command
+        :type command: str
+        :param args: Command arguments
+        :type args: str
+        :returns: Command output
+        :rtype: str
+        :raises: OSError, ovsdb_client.OVSDBError
+        """
+        pid = self.service_pid('ovn-northd')
+        if not pid:
+            raise OSError('ovn-northd is not running')
+        with ovsdb_client.OVSDBClient(
+                os.path.join(self.ovn_rundir(),
+                             'ovn-northd.{}.ctl'.format(pid))) as conn:
+            return conn.unixctl(command, *args)
+
     def is_northd_active(self):
         """OVN version agnostic is_northd_active helper.
 
         :returns: True if northd is active, False if not, None if not supported
         :rtype: Optional[bool]
         """
-        if self.release != 'train':
-            return ch_ovn.is_northd_active()
+        if self.release == 'train':
+            return
+        try:
+            output = self.northd_unixctl('status')
+        except (OSError, ovsdb_client.OVSDBError) as e:
+            ch_core.hookenv.log('Unable to get ovn-northd status: {}'
+                                .format(e),
+                                level=ch_core.hookenv.DEBUG)
+            return False
+        return 'Status: active' in output
+
+    def northd_n_threads(self):
+        """Get number of threads ovn-northd uses to build logical flows.
+
+        :returns: Number of threads, None if not supported or not running
+        :rtype: Optional[int]
+        """
+        if self.release == 'train':
+            return
+        try:
+            output = self.northd_unixctl('parallel-build/get-n-threads')
+        except (OSError, ovsdb_client.OVSDBError) as e:
+            ch_core.hookenv.log('Unable to get ovn-northd thread count: {}'
+                                .format(e),
+                                level=ch_core.hookenv.DEBUG)
+            return
+        match = re.search(r'\d+', output)
+        if match:
+            return int(match.group(0))
+
+    def configure_northd_threads(self):
+        """Apply configured thread count to local ovn-northd.
+
+        ovn-northd does not persist the setting, call this on every hook to
+        have it re-applied after a service restart.
+        """
+        n_threads = self.config['ovn-northd-n-threads']
+        current = self.northd_n_threads()
+        if current is None or current == n_threads:
+            return
+        ch_core.hookenv.log('change ovn-northd threads {} -> {}'
+                            .format(current, n_threads),
+                            level=ch_core.hookenv.INFO)
+        try:
+            self.northd_unixctl('parallel-build/set-n-threads',
+                                str(n_threads))
+        except (OSError, ovsdb_client.OVSDBError) as e:
+            ch_core.hookenv.log('Unable to set ovn-northd thread count: {}'
+                                .format(e),
+                                level=ch_core.hookenv.WARNING)
+
+    def ovsdb_server_tuning(self):
+        """Get parsed ``ovsdb-server-tuning`` configuration.
+
+        :returns: Map of tunable to value
+        :rtype: Dict[str, bool]
+        :raises: ValueError
+        """
+        try:
+            tuning = yaml.safe_load(self.config['ovsdb-server-tuning'] or '')
+        except yaml.YAMLError:
+            raise ValueError('not valid YAML')
+        if tuning is None:
+            return {}
+        if not isinstance(tuning, dict):
+            raise ValueError('must be a mapping')
+        for key, value in tuning.items():
+            if key not in OVSDB_TUNABLES:
+                raise ValueError('unknown tunable {}'.format(key))
+            if not isinstance(value, bool):
+                raise ValueError('{} must be true or false'.format(key))
+        return tuning
+
+    def _probe_ovsdb_tunables(self):
+        """Probe which tunables the installed ovsdb-server supports.
+
+        :returns: Supported tunables, None if the probe could not complete
+        :rtype: Optional[List[str]]
+        """
+        try:
+            with self.ovsdb_connection('ovnsb_db', control=True) as conn:
+                commands = conn.unixctl('list-commands')
+            server_help = subprocess.check_output(
+                ['ovsdb-server', '--help'], universal_newlines=True)
+        except (OSError,
+                ovsdb_client.OVSDBError,
+                subprocess.CalledProcessError) as e:
+            ch_core.hookenv.log('Unable to probe ovsdb-server tunables: {}'
+                                .format(e),
+                                level=ch_core.hookenv.DEBUG)
+            return
+        ovn_ctl = ''
+        # NOTE: At Train the charm provides its own systemd service files and
+        # the ``ovn-central`` defaults file does not pass extra options.
+        if self.release != 'train' and os.path.exists(OVN_CTL):
+            with open(OVN_CTL) as f:
+                ovn_ctl = f.read()
+        supported = []
+        for key, tunable in sorted(OVSDB_TUNABLES.items()):
+            if 'unixctl' in tunable:
+                if tunable['unixctl'] in commands:
+                    supported.append(key)
+            elif (tunable['server-opt'] in server_help and
+                    tunable['ctl-opt'] in ovn_ctl):
+                supported.append(key)
+        return supported
+
+    def upstream_version(self, package=None):
+        """Get upstream version of an installed package.
+
+        :param package: Name of package, ``release_pkg`` if None
+        :type package: Optional[str]
+        :returns: Upstream version, None if not installed
+        :rtype: Optional[str]
+        """
+        package = package or self.release_pkg
+        if package not in self._upstream_versions:
+            self._upstream_versions[package] = (
+                ch_fetch.get_upstream_version(package))
+        return self._upstream_versions[package]
+
+    def service_pid(self, name):
+        """Get pid of a local OVN daemon from its pidfile.
+
+        :param name: Name of daemon, e.g. 'ovnsb_db' or 'ovn-northd'
+        :type name: str
+        :returns: pid, None if the daemon is not running
+        :rtype: Optional[int]
+        """
+        try:
+            with open(os.path.join(self.ovn_rundir(),
+                                   '{}.pid'.format(name))) as pidfile:
+                return int(pidfile.read().strip())
+        except (OSError, ValueError):
+            return
+
+    def ovsdb_tunables_supported(self):
+        """Get tunables supported by the installed OVN and ovsdb-server.
+
+        Probing forks processes, the result is cached in unit-local storage
+        until the version of either package changes.  A failed probe is
+        cached for ``OVSDB_TUNABLES_RETRY`` seconds or until the
+        ovsdb-server processes change.
+
+        :returns: Supported tunables, None if not known
+        :rtype: Optional[Set[str]]
+        """
+        version = [self.upstream_version(),
+                   self.upstream_version(OVSDB_SERVER_PACKAGE)]
+        if None in version:
+            return
+        pids = {db: self.service_pid(db) for db in ('ovnnb_db', 'ovnsb_db')}
+        kv = ch_core.unitdata.kv()
+        cached = kv.get(OVSDB_TUNABLES_KEY)
+        if cached and cached['version'] == version:
+            if cached['supported'] is not None:
+                return set(cached['supported'])
+            if (cached['pids'] == pids and
+                    time.time() - cached['time'] < OVSDB_TUNABLES_RETRY):
+                return
+        supported = self._probe_ovsdb_tunables()
+        if supported is None:
+            # NOTE: the servers may not be running yet, e.g. at install.
+            kv.set(OVSDB_TUNABLES_KEY, {
+                'version': version,
+                'supported': None,
+                'pids': pids,
+                'time': time.time(),
+            })
+            return
+        ch_core.hookenv.log('ovsdb-server tunables supported by {} {}, {} '
+                            '{}: {}'
+                            .format(self.release_pkg, version[0],
+                                    OVSDB_SERVER_PACKAGE, version[1],
+                                    ', '.join(supported)),
+                            level=ch_core.hookenv.INFO)
+        kv.set(OVSDB_TUNABLES_KEY, {
+            'version': version,
+            'supported': supported,
+        })
+        return set(supported)
+
+    def ovsdb_tuning_ctl_opts(self):
+        """Get ovn-ctl options for tunables applied at startup.
+
+        :returns: ovn-ctl options
+        :rtype: List[str]
+        """
+        try:
+            tuning = self.ovsdb_server_tuning()
+        except ValueError:
+            return []
+        opts = []
+        supported = None
+        for key, tunable in sorted(OVSDB_TUNABLES.items()):
+            if 'ctl-opt' not in tunable or not tuning.get(key):
+                continue
+            if supported is None:
+                supported = self.ovsdb_tunables_supported() or set()
+            if key not in supported:
+                ch_core.hookenv.log('ovsdb-server tunable {} not supported '
+                                    'by installed version'.format(key),
+                                    level=ch_core.hookenv.WARNING)
+                continue
+            opts.append('{}=yes'.format(tunable['ctl-opt']))
+        return opts
+
+    def configure_ovsdb_tuning(self):
+        """Apply runtime tunables to the local ovsdb-server processes.
+
+        Tunables missing from the configuration are reset to their default.
+        ovsdb-server does not persist the settings, call this on every hook
+        to have them re-applied after a service restart.  Nothing is done
+        unless the configuration or the ovsdb-server processes changed since
+        the tunables were last applied.
+        """
+        try:
+            tuning = self.ovsdb_server_tuning()
+        except ValueError:
+            return
+        runtime = {key: tunable
+                   for key, tunable in OVSDB_TUNABLES.items()
+                   if 'unixctl' in tunable}
+        applied = {
+            'tuning': {key: tuning.get(key, tunable['default'])
+                       for key, tunable in runtime.items()},
+            'pids': {db: self.service_pid(db)
+                     for db in ('ovnnb_db', 'ovnsb_db')},
+        }
+        kv = ch_core.unitdata.kv()
+        if kv.get(OVSDB_TUNING_APPLIED_KEY) == applied:
+            return
+        supported = self.ovsdb_tunables_supported()
+        if supported is None:
+            # NOTE: retried on the next hook, the applied state is only
+            # stored once the probe succeeded.
+            return
+        for key in sorted(set(tuning) & set(runtime) - supported):
+            ch_core.hookenv.log('ovsdb-server tunable {} not supported by '
+                                'installed version'.format(key),
+                                level=ch_core.hookenv.WARNING)
+        for db in ('ovnnb_db', 'ovnsb_db'):
+            try:
+                with self.ovsdb_connection(db, control=True) as conn:
+                    for key, tunable in sorted(runtime.items()):
+                        if key not in supported:
+                            continue
+                        value = applied['tuning'][key]
+                        conn.unixctl(tunable['unixctl'],
+                                     'on' if value else 'off')
+            except (OSError, ovsdb_client.OVSDBError) as e:
+                ch_core.hookenv.log('Unable to apply ovsdb-server tuning '
+                                    'to {}: {}'.format(db, e),
+                                    level=ch_core.hookenv.WARNING)
+                return
+        if None not in applied['pids'].values():
+            kv.set(OVSDB_TUNING_APPLIED_KEY, applied)
+
+    def configure_northd_parallel_build(self):
+        """Update ``use_parallel_build`` option of ``NB_Global``.
+
+        Versions of ovn-northd prior to 21.12 have no thread count setting
+        and only read this option.  The option is removed when parallel
+        build is disabled.
+        """
+        status = self.cluster_status('ovnnb_db', fresh=True)
+        if not (status and status.is_cluster_leader):
+            return
+        value = ('true' if self.config['ovn-northd-n-threads'] > 1
+                 else None)
+        try:
+            self._configure_northd_parallel_build_native(value)
+        except OSError as e:
+            ch_core.hookenv.log('Unable to use database socket for nb, '
+                                'falling back to CLI: {}'.format(e),
+                                level=ch_core.hookenv.DEBUG)
+            if value:
+                self.run('ovn-nbctl', 'set', 'NB_Global', '.',
+                         'options:use_parallel_build={}'.format(value))
+            else:
+                self.run('ovn-nbctl', 'remove', 'NB_Global', '.',
+                         'options', 'use_parallel_build')
+
+    def _configure_northd_parallel_build_native(self, value):
+        """Update ``use_parallel_build`` option over JSON-RPC.
+
+        :param value: Value of option, None to remove it
+        :type value: Optional[str]
+        :raises: OSError, ovsdb_client.OVSDBError
+        """
+        schema = OVN_SCHEMAS['ovnnb_db']
+        with self.ovsdb_connection('ovnnb_db') as conn:
+            rows = conn.select(schema, 'NB_Global', columns=['options'])
+            if not rows:
+                return
+            # Maps are encoded as ['map', [[key, value], ...]]
+            options = dict(rows[0]['options'][1])
+            if options.get('use_parallel_build') == value:
+                ch_core.hookenv.log('NB_Global use_parallel_build up to '
+                                    'date', level=ch_core.hookenv.DEBUG)
+                return
+            mutations = [
+                ['options', 'delete', ['set', ['use_parallel_build']]],
+            ]
+            if value:
+                mutations.append(
+                    ['options', 'insert',
+                     ['map', [['use_parallel_build', value]]]])
+            ch_core.hookenv.log('set NB_Global use_parallel_build={}'
+                                .format(value),
+                                level=ch_core.hookenv.DEBUG)
+            conn.transact(schema, {
+                'op': 'mutate',
+                'table': 'NB_Global',
+                'where': [],
+                'mutations': mutations,
+            })
 
     def run(self, *args):
         """Fork off a proc and run commands, collect output and return code.
@@ -358,7 +1156,8 @@ class BaseOVNCentralCharm(charms_openstack.charm.OpenStackCharm):
             universal_newlines=True)
         ch_core.hookenv.log(cp, level=ch_core.hookenv.INFO)
 
-    def join_cluster(self, db_file, schema_name, local_conn, remote_conn):
+    def join_cluster(self, db_file, schema_name, local_conn, remote_conn,
+                     cid=None):
         """Maybe create a OVSDB file with remote peer connection information.
 
         This function will return immediately if the database file already
@@ -383,23 +1182,260 @@ class BaseOVNCentralCharm(charms_openstack.charm.OpenStackCharm):
         :type local_conn: Union[str, ...]
         :param remote_conn: Connection string for remote unit(s)
         :type remote_conn: Union[str, ...]
+        :param cid: Only join the cluster with this cluster ID
+        :type cid: Optional[str]
         :raises: subprocess.CalledProcessError
         """
-        if self.release == 'train':
-            absolute_path = os.path.join('/var/lib/openvswitch', db_file)
-        else:
-            absolute_path = os.path.join('/var/lib/ovn', db_file)
+        absolute_path = self.ovsdb_path(db_file)
         if os.path.exists(absolute_path):
             ch_core.hookenv.log('OVN database "{}" exists on disk, not '
                                 'creating a new one joining cluster',
                                 level=ch_core.hookenv.DEBUG)
             return
-        cmd = ['ovsdb-tool', 'join-cluster', absolute_path, schema_name]
+        cmd = ['ovsdb-tool']
+        if cid:
+            cmd.append('--cid={}'.format(cid))
+        cmd.extend(['join-cluster', absolute_path, schema_name])
         cmd.extend(list(local_conn))
         cmd.extend(list(remote_conn))
         ch_core.hookenv.log(cmd, level=ch_core.hookenv.INFO)
         self.run(*cmd)
 
+    def join_clusters(self, joins):
+        """Create OVSDB files for several databases in parallel.
+
+        Runs ``join_cluster`` for each database in a thread of its own.
+
+        :param joins: Arguments for ``join_cluster`` for each database
+        :type joins: Iterable[Tuple[str, str, Iterable[str], Iterable[str]]]
+        :raises: subprocess.CalledProcessError
+        """
+        joins = list(joins)
+        if not joins:
+            return
+        try:
+            with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=len(joins)) as executor:
+                futures = [executor.submit(self.join_cluster, *join)
+                           for join in joins]
+            for future in futures:
+                future.result()
+        finally:
+            # NOTE: unit-local storage must only be used from this thread
+            self.invalidate_cluster_status()
+
+    def databases_exist(self):
+        """Check whether both database files exist on this unit.
+
+        :returns: True if both exist, False otherwise
+        :rtype: bool
+        """
+        return all(os.path.exists(self.ovsdb_path('{}.db'.format(ovn_db)))
+                   for ovn_db in ('ovnnb_db', 'ovnsb_db'))
+
+    def join_snapshot_ready(self):
+        """Request peers to compact their databases before joining.
+
+        A server joining a Raft cluster receives the snapshot of the leader
+        followed by every log entry since, which it has to replay.  Having
+        the peers compact first makes the new server start from a fresh
+        snapshot, sparing both the leader and the new server the replay.
+
+        The request is published on the peer relation on first call, peers
+        acknowledge it once compacted.  To not block scale-out on a broken
+        peer the unit joins anyway after ``JOIN_SNAPSHOT_TIMEOUT`` seconds.
+
+        :returns: True if the unit should join now, False to wait
+        :rtype: bool
+        """
+        db = ch_core.unitdata.kv()
+        requested = db.get(JOIN_SNAPSHOT_KEY)
+        if requested is None:
+            requested = time.time()
+            db.set(JOIN_SNAPSHOT_KEY, requested)
+            for rid in ch_core.hookenv.relation_ids(PEER_RELATION):
+                ch_core.hookenv.relation_set(
+                    relation_id=rid,
+                    relation_settings={JOIN_SNAPSHOT_REQUEST_KEY: 'true'})
+        local_unit = ch_core.hookenv.local_unit()
+        waiting = []
+        for rid in ch_core.hookenv.relation_ids(PEER_RELATION):
+            for unit in ch_core.hookenv.related_units(rid):
+                # NOTE: peers that are joining themselves have nothing to
+                # compact.
+                if ch_core.hookenv.relation_get(JOIN_SNAPSHOT_REQUEST_KEY,
+                                                unit=unit, rid=rid):
+                    continue
+                ready = ch_core.hookenv.relation_get(
+                    JOIN_SNAPSHOT_READY_KEY, unit=unit, rid=rid) or ''
+                if local_unit not in ready.split():
+                    waiting.append(unit)
+        if not waiting:
+            return True
+        if time.time() - requested > JOIN_SNAPSHOT_TIMEOUT:
+            ch_core.hookenv.log('Peers {} did not compact databases within '
+                                '{}s, joining cluster anyway'
+                                .format(', '.join(sorted(waiting)),
+                                        JOIN_SNAPSHOT_TIMEOUT),
+                                level=ch_core.hookenv.WARNING)
+            return True
+        ch_core.hookenv.log('Waiting for peers {} to compact databases '
+                            'before joining cluster'
+                            .format(', '.join(sorted(waiting))),
+                            level=ch_core.hookenv.DEBUG)
+        return False
+
+    def clear_join_snapshot_request(self):
+        """Withdraw request for peers to compact once the unit has joined."""
+        db = ch_core.unitdata.kv()
+        if db.get(JOIN_SNAPSHOT_KEY) is None:
+            return
+        for rid in ch_core.hookenv.relation_ids(PEER_RELATION):
+            ch_core.hookenv.relation_set(
+                relation_id=rid,
+                relation_settings={JOIN_SNAPSHOT_REQUEST_KEY: None})
+        db.unset(JOIN_SNAPSHOT_KEY)
+
+    def prepare_join_snapshots(self):
+        """Compact local databases for peers requesting to join the cluster.
+
+        The databases are compacted once for all units requesting at the
+        time, which are then acknowledged on the peer relation.  Units that
+        withdrew their request are removed from the acknowledgement.
+        """
+        if not self.databases_exist():
+            return
+        local_unit = ch_core.hookenv.local_unit()
+        for rid in ch_core.hookenv.relation_ids(PEER_RELATION):
+            requests = [
+                unit for unit in ch_core.hookenv.related_units(rid)
+                if ch_core.hookenv.relation_get(JOIN_SNAPSHOT_REQUEST_KEY,
+                                                unit=unit, rid=rid)]
+            current = (ch_core.hookenv.relation_get(
+                JOIN_SNAPSHOT_READY_KEY, unit=local_unit, rid=rid) or '')
+            ready = [unit for unit in current.split() if unit in requests]
+            new = [unit for unit in requests if unit not in ready]
+            if new:
+                for db in ('nb', 'sb'):
+                    try:
+                        self.compact_ovsdb(db)
+                    except subprocess.CalledProcessError as e:
+                        # NOTE: acknowledge anyway, the peer can still join
+                        # and replay the log.
+                        ch_core.hookenv.log(
+                            'Unable to compact {} for {}: {}'
+                            .format(OVN_SCHEMAS['ovn{}_db'.format(db)],
+                                    ', '.join(new), e),
+                            level=ch_core.hookenv.WARNING)
+            value = ' '.join(sorted(ready + new)) or None
+            if (current or None) != value:
+                ch_core.hookenv.relation_set(
+                    relation_id=rid,
+                    relation_settings={JOIN_SNAPSHOT_READY_KEY: value})
+
+    def sb_relay_ports(self):
+        """Get ports of configured OVN Southbound relay instances.
+
+        :returns: Port of each relay instance
+        :rtype: List[int]
+        """
+        count = self.config['ovn-sb-relay-count']
+        port = self.config['ovn-sb-relay-port']
+        return list(range(port, port + max(count, 0)))
+
+    def sb_relay_supported(self):
+        """Whether the installed ovsdb-server can run Southbound relays.
+
+        :returns: True if relays are supported, False otherwise
+        :rtype: bool
+        """
+        if self.release == 'train':
+            return False
+        version = self.upstream_version(OVSDB_SERVER_PACKAGE)
+        return bool(version) and ch_fetch.apt_pkg.version_compare(
+            version, SB_RELAY_MIN_VERSION) >= 0
+
+    @staticmethod
+    def sb_relay_config(port, remote_conn):
+        """Get ovsdb-server configuration of a relay instance.
+
+        :param port: Port the relay listens on
+        :type port: int
+        :param remote_conn: Connection strings for Southbound cluster members
+        :type remote_conn: Iterable[str]
+        :returns: Configuration for the ``--config-file`` option
+        :rtype: Dict[str, Any]
+        """
+        return {
+            'remotes': {
+                'pssl:{}'.format(port): {'role': 'ovn-controller'},
+            },
+            'databases': {
+                'OVN_Southbound': {
+                    'service-model': 'relay',
+                    'source': {conn: {} for conn in remote_conn},
+                },
+            },
+        }
+
+    def configure_sb_relays(self, remote_conn):
+        """Start, reconfigure or stop OVN Southbound relay instances.
+
+        The relay instances are instances of the ``ovn-sb-relay@`` systemd
+        template unit rendered by the charm, each reads its remotes and
+        upstream servers from a configuration file.  Instances are restarted
+        when their configuration or the template unit change.
+
+        :param remote_conn: Connection strings for Southbound cluster members
+        :type remote_conn: Iterable[str]
+        """
+        ports = self.sb_relay_ports()
+        if not self.sb_relay_supported():
+            ports = []
+        kv = ch_core.unitdata.kv()
+        previous = kv.get(SB_RELAY_KEY, [])
+        for port in previous:
+            if port not in ports:
+                ch_core.hookenv.log('stop OVN SB relay on port {}'
+                                    .format(port),
+                                    level=ch_core.hookenv.INFO)
+                ch_core.host.service_stop(SB_RELAY_SERVICE.format(port))
+                ch_core.host.service('disable', SB_RELAY_SERVICE.format(port))
+                if os.path.exists(SB_RELAY_CONFIG.format(port)):
+                    os.unlink(SB_RELAY_CONFIG.format(port))
+        if not ports:
+            kv.set(SB_RELAY_KEY, [])
+            return
+        # the template unit is written by render_with_interfaces, only have
+        # systemd reload units when it changed.
+        unit_hash = ch_core.host.file_hash(SB_RELAY_UNIT)
+        unit_changed = unit_hash != kv.get(SB_RELAY_UNIT_KEY)
+        if unit_changed:
+            subprocess.check_call(['systemctl', 'daemon-reload'])
+            kv.set(SB_RELAY_UNIT_KEY, unit_hash)
+        for port in ports:
+            path = SB_RELAY_CONFIG.format(port)
+            content = json.dumps(self.sb_relay_config(port, remote_conn),
+                                 indent=4, sort_keys=True)
+            changed = unit_changed
+            if os.path.exists(path):
+                with open(path) as config:
+                    changed = config.read() != content or changed
+            else:
+                changed = True
+            if changed:
+                ch_core.host.write_file(path, content, perms=0o644)
+            service = SB_RELAY_SERVICE.format(port)
+            ch_core.host.service('enable', service)
+            if changed and port in previous:
+                ch_core.hookenv.log('restart OVN SB relay on port {}'
+                                    .format(port),
+                                    level=ch_core.hookenv.INFO)
+                ch_core.host.service_restart(service)
+            else:
+                ch_core.host.service_start(service)
+        kv.set(SB_RELAY_KEY, ports)
+
     def configure_tls(self, certificates_interface=None):
         """Override default handler prepare certs per OVNs taste.
 
@@ -410,30 +1446,269 @@ class BaseOVNCentralCharm(charms_openstack.charm.OpenStackCharm):
         tls_objects = self.get_certs_and_keys(
             certificates_interface=certificates_interface)
 
-        with charms_openstack.charm.utils.is_data_changed(
-                'configure_tls.tls_objects', tls_objects) as changed:
-            for tls_object in tls_objects:
-                with open(
-                        self.options.ovn_ca_cert, 'w') as crt:
-                    chain = tls_object.get('chain')
-                    if chain:
-                        crt.write(tls_object['ca'] + os.linesep + chain)
-                    else:
-                        crt.write(tls_object['ca'])
-
-                self.configure_cert(self.ovn_sysconfdir(),
-                                    tls_object['cert'],
-                                    tls_object['key'],
-                                    cn='host')
-                if changed:
-                    # The `ovn-northd` daemon will not detect changes to the
-                    # certificate data and needs to be restarted. LP: #1895303
-                    self.service_reload('ovn-northd')
-                break
+        for tls_object in tls_objects:
+            ca = tls_object['ca']
+            chain = tls_object.get('chain')
+            if chain:
+                ca = ca + os.linesep + chain
+            if self.config['staged-ca-rotation']:
+                ca_bundle, switch = self.stage_ca(ca)
+            else:
+                ch_core.unitdata.kv().unset(TLS_CA_BUNDLE_KEY)
+                ca_bundle, switch = ca, True
+            ca_changed = self._write_tls_file(self.options.ovn_ca_cert,
+                                              ca_bundle, 0o644)
+            # NOTE: the certificate and key are written together, a partial
+            # rotation would leave the servers with a key not matching their
+            # certificate.
+            cert_changed = False
+            if switch:
+                cert_changed = any([
+                    self._write_tls_file(self.options.ovn_cert,
+                                         tls_object['cert'], 0o644),
+                    self._write_tls_file(self.options.ovn_key,
+                                         tls_object['key'], 0o640),
+                ])
+            if self.config['staged-ca-rotation']:
+                self.publish_ca_ready(ca)
+            if ca_changed or cert_changed:
+                ch_core.hookenv.log('TLS material changed, reloading',
+                                    level=ch_core.hookenv.INFO)
+                # only a certificate actually written is expected to be
+                # served, a staged one would never be confirmed
+                if cert_changed:
+                    ch_core.unitdata.kv().set(TLS_PENDING_KEY, {
+                        'cert': tls_object['cert'], 'time': time.time()})
+                self.reload_ssl()
+                self.check_tls_in_use()
+            break
+
+    def stage_ca(self, ca):
+        """Get CA bundle to trust and whether to switch certificates.
+
+        A new CA is first added to the trusted bundle next to the current
+        ones while the unit keeps presenting its current certificate.  Once
+        all peers trust the new CA, or after ``CA_ROTATION_TIMEOUT``
+        seconds, the unit switches to the certificate signed by the new CA.
+        The previous CAs are kept in the bundle for the
+        ``ca-rotation-grace-period`` so that clients not yet rotated can
+        still connect.
+
+        :param ca: PEM encoded CA certificate and chain
+        :type ca: str
+        :returns: PEM encoded CA bundle and whether to write the certificate
+                  and key
+        :rtype: Tuple[str, bool]
+        """
+        kv = ch_core.unitdata.kv()
+        state = kv.get(TLS_CA_BUNDLE_KEY) or {'cas': [], 'staged': None}
+        cas = state['cas']
+        now = time.time()
+        if not cas:
+            # NOTE: the CA in use before staged rotation was enabled
+            try:
+                with open(self.options.ovn_ca_cert) as current:
+                    current_ca = current.read()
+            except FileNotFoundError:
+                current_ca = None
+            if current_ca and current_ca != ca:
+                cas.append({'pem': current_ca, 'retired': None})
+        if not cas or cas[-1]['pem'] != ca:
+            cas = [entry for entry in cas if entry['pem'] != ca]
+            if cas:
+                ch_core.hookenv.log('Staging new CA, switching certificate '
+                                    'once all peers trust it',
+                                    level=ch_core.hookenv.INFO)
+                state['staged'] = now
+            cas.append({'pem': ca, 'retired': None})
+        if state['staged'] is not None:
+            waiting = self.peers_not_trusting_ca(ca)
+            if waiting and now - state['staged'] > CA_ROTATION_TIMEOUT:
+                ch_core.hookenv.log('Peers {} do not trust the new CA after '
+                                    '{}s, switching certificate anyway'
+                                    .format(', '.join(sorted(waiting)),
+                                            CA_ROTATION_TIMEOUT),
+                                    level=ch_core.hookenv.WARNING)
+                waiting = []
+            if not waiting:
+                state['staged'] = None
+                for entry in cas[:-1]:
+                    if entry['retired'] is None:
+                        entry['retired'] = now
+        grace = self.config['ca-rotation-grace-period'] * 3600
+        state['cas'] = [
+            entry for entry in cas[:-1]
+            if entry['retired'] is None or now - entry['retired'] < grace
+        ] + cas[-1:]
+        kv.set(TLS_CA_BUNDLE_KEY, state)
+        return (os.linesep.join(entry['pem'] for entry in state['cas']),
+                state['staged'] is None)
+
+    def ca_rotation_in_progress(self):
+        """Whether a staged CA rotation awaits peers or a CA retirement.
+
+        :rtype: bool
+        """
+        state = ch_core.unitdata.kv().get(TLS_CA_BUNDLE_KEY)
+        return bool(state and (state['staged'] is not None or
+                               len(state['cas']) > 1))
+
+    @staticmethod
+    def _ca_digest(ca):
+        return hashlib.sha256(ca.encode('utf-8')).hexdigest()
+
+    def peers_not_trusting_ca(self, ca):
+        """Get peers that have not confirmed trusting CA.
+
+        :param ca: PEM encoded CA certificate and chain
+        :type ca: str
+        :returns: Names of peer units
+        :rtype: List[str]
+        """
+        digest = self._ca_digest(ca)
+        waiting = []
+        for rid in ch_core.hookenv.relation_ids(PEER_RELATION):
+            for unit in ch_core.hookenv.related_units(rid):
+                if ch_core.hookenv.relation_get(
+                        TLS_CA_READY_KEY, unit=unit, rid=rid) != digest:
+                    waiting.append(unit)
+        return waiting
+
+    def publish_ca_ready(self, ca):
+        """Confirm to peers that the unit trusts CA.
+
+        :param ca: PEM encoded CA certificate and chain
+        :type ca: str
+        """
+        digest = self._ca_digest(ca)
+        local_unit = ch_core.hookenv.local_unit()
+        for rid in ch_core.hookenv.relation_ids(PEER_RELATION):
+            if ch_core.hookenv.relation_get(
+                    TLS_CA_READY_KEY, unit=local_unit, rid=rid) != digest:
+                ch_core.hookenv.relation_set(
+                    relation_id=rid,
+                    relation_settings={TLS_CA_READY_KEY: digest})
+
+    @staticmethod
+    def _write_tls_file(path, content, perms):
+        """Atomically replace file with TLS material unless unchanged.
+
+        The ``ovsdb-server`` processes re-read certificates and keys whose
+        modification time changed, rewriting unchanged files makes them do
+        so needlessly, writing in place may make them read partial files.
+
+        :param path: Path to file
+        :type path: str
+        :param content: PEM encoded material
+        :type content: str
+        :param perms: Permissions of file
+        :type perms: int
+        :returns: True if file was written, False if already up to date
+        :rtype: bool
+        """
+        data = content.encode('utf-8')
+        try:
+            with open(path, 'rb') as current:
+                if current.read() == data:
+                    return False
+        except FileNotFoundError:
+            pass
+        tmp_path = '{}.tmp'.format(path)
+        try:
+            with os.fdopen(os.open(tmp_path,
+                                   os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                                   perms), 'wb') as tmp:
+                os.fchmod(tmp.fileno(), perms)
+                tmp.write(data)
+                tmp.flush()
+                os.fsync(tmp.fileno())
+            os.rename(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return True
+
+    def reload_ssl(self):
+        """Make the OVN daemons use new TLS material without restarts.
+
+        ``ovsdb-server`` re-reads changed certificate, key and CA files on
+        its next main loop iteration.  A unixctl request wakes it up so the
+        new material is used right away, existing sessions are not
+        interrupted.  Only ``ovn-northd``, which does not detect changes to
+        the files, is reloaded through its service.  LP: #1895303
+        """
+        for db in OVN_SCHEMAS:
+            try:
+                with self.ovsdb_connection(db, control=True) as conn:
+                    conn.unixctl('ovsdb-server/list-remotes')
+            except (OSError, ovsdb_client.OVSDBError) as e:
+                ch_core.hookenv.log('Unable to wake {} to reload TLS '
+                                    'material: {}'.format(db, e),
+                                    level=ch_core.hookenv.DEBUG)
+        self.service_reload('ovn-northd')
+
+    def _served_certificate(self):
+        """Get certificate served by the local ovsdb-server.
+
+        :returns: DER encoded certificate and its notBefore timestamp
+        :rtype: Tuple[bytes, float]
+        :raises: OSError
+        """
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+        context.check_hostname = False
+        context.load_verify_locations(cafile=self.options.ovn_ca_cert)
+        # NOTE: ovsdb-server requires clients to present a certificate
+        context.load_cert_chain(self.options.ovn_cert, self.options.ovn_key)
+        with socket.create_connection(('127.0.0.1', TLS_CHECK_PORT),
+                                      timeout=TLS_CHECK_TIMEOUT) as sock:
+            with context.wrap_socket(sock) as tls:
+                return (tls.getpeercert(binary_form=True),
+                        ssl.cert_time_to_seconds(
+                            tls.getpeercert()['notBefore']))
+
+    def check_tls_in_use(self):
+        """Report time from certificate issue until ovsdb-server serves it.
+
+        :returns: True if the most recently written certificate is in use,
+                  None if there is none pending confirmation.
+        :rtype: Optional[bool]
+        """
+        kv = ch_core.unitdata.kv()
+        pending = kv.get(TLS_PENDING_KEY)
+        if not pending:
+            return
+        try:
+            served, not_before = self._served_certificate()
+        except OSError as e:
+            ch_core.hookenv.log('Unable to get certificate served by '
+                                'ovsdb-server: {}'.format(e),
+                                level=ch_core.hookenv.DEBUG)
+            return False
+        try:
+            expected = ssl.PEM_cert_to_DER_cert(pending['cert'])
+        except ValueError as e:
+            ch_core.hookenv.log('Unable to decode certificate: {}'.format(e),
+                                level=ch_core.hookenv.WARNING)
+            kv.unset(TLS_PENDING_KEY)
+            return
+        if served != expected:
+            return False
+        now = time.time()
+        ch_core.hookenv.log('TLS certificate in use by ovsdb-server {:.1f}s '
+                            'after issue, {:.1f}s after it was written'
+                            .format(now - not_before, now - pending['time']),
+                            level=ch_core.hookenv.INFO)
+        kv.unset(TLS_PENDING_KEY)
+        return True
 
     def configure_ovn_listener(self, db, port_map):
         """Create or update OVN listener configuration.
 
+        The ``port_map`` must describe the complete desired listener
+        configuration for the database.  The current configuration is read
+        once and any required changes are applied in a single transaction.
+
         :param db: Database to operate on, 'nb' or 'sb'
         :type db: str
         :param port_map: Dictionary with port number and associated settings
@@ -448,44 +1723,205 @@ class BaseOVNCentralCharm(charms_openstack.charm.OpenStackCharm):
         #
         # However, at bootstrap time the OVSDB cluster leaders will
         # coincide with the charm leader.
-        status = self.cluster_status('ovn{}_db'.format(db))
+        status = self.cluster_status('ovn{}_db'.format(db), fresh=True)
         if status and status.is_cluster_leader:
             ch_core.hookenv.log('is_cluster_leader {}'.format(db),
                                 level=ch_core.hookenv.DEBUG)
-            connections = ch_ovsdb.SimpleOVSDB(
-                'ovn-{}ctl'.format(db)).connection
-            for port, settings in port_map.items():
-                ch_core.hookenv.log('port {} {}'.format(port, settings),
+            try:
+                self._configure_ovn_listener_native(db, port_map)
+            except OSError as e:
+                ch_core.hookenv.log('Unable to use database socket for {}, '
+                                    'falling back to CLI: {}'.format(db, e),
                                     level=ch_core.hookenv.DEBUG)
-                # discover and create any non-existing listeners first
-                for connection in connections.find(
-                        'target="pssl:{}"'.format(port)):
-                    break
-                else:
-                    ch_core.hookenv.log('create port {}'.format(port),
-                                        level=ch_core.hookenv.DEBUG)
-                    # NOTE(fnordahl) the listener configuration is written to
-                    # the database and used by all units, so we cannot bind to
-                    # specific space/address here.  We might consider not
-                    # using listener configuration from DB, but that is
-                    # currently not supported by ``ovn-ctl`` script.
-                    self.run('ovn-{}ctl'.format(db),
-                             '--',
-                             '--id=@connection',
-                             'create', 'connection',
-                             'target="pssl:{}"'.format(port),
-                             '--',
-                             'add', '{}_Global'.format(db.upper()),
-                             '.', 'connections', '@connection')
-                # set/update connection settings
-                for connection in connections.find(
-                        'target="pssl:{}"'.format(port)):
-                    for k, v in settings.items():
-                        ch_core.hookenv.log(
-                            'set {} {} {}'
-                            .format(str(connection['_uuid']), k, v),
-                            level=ch_core.hookenv.DEBUG)
-                        connections.set(str(connection['_uuid']), k, v)
+                self._configure_ovn_listener_cli(db, port_map)
+
+    @staticmethod
+    def _listener_delta(port_map, connections):
+        """Compute changes required to reach desired listener configuration.
+
+        :param port_map: Dictionary with port number and associated settings
+        :type port_map: Dict[int,Dict[str,str]]
+        :param connections: Current rows of the ``Connection`` table
+        :type connections: Iterable[Dict[str,any]]
+        :returns: Listeners to create and existing listeners to update, the
+                  latter identified by the ``_uuid`` value of their row.
+        :rtype: Tuple[List[Tuple[int,Dict[str,any]]],
+                      List[Tuple[any,Dict[str,any]]]]
+        """
+        def datum_matches(datum, value):
+            # Optional columns are represented as a set with zero or one
+            # member, ``ovsdb-server`` encodes it as ['set', [...]] while
+            # ``SimpleOVSDB`` gives us a list.
+            if isinstance(datum, list):
+                if datum and datum[0] == 'set':
+                    datum = datum[1]
+                return datum == [value]
+            return datum == value
+
+        connections = list(connections)
+        create = []
+        update = []
+        for port, settings in port_map.items():
+            target = 'pssl:{}'.format(port)
+            rows = [row for row in connections if row['target'] == target]
+            if not rows:
+                create.append((port, settings))
+            for row in rows:
+                changed = {
+                    k: v for k, v in settings.items()
+                    if not datum_matches(row.get(k), v)
+                }
+                if changed:
+                    update.append((row['_uuid'], changed))
+        return create, update
+
+    def _configure_ovn_listener_native(self, db, port_map):
+        """Create or update OVN listener configuration over JSON-RPC.
+
+        :param db: Database to operate on, 'nb' or 'sb'
+        :type db: str
+        :param port_map: Dictionary with port number and associated settings
+        :type port_map: Dict[int,Dict[str,str]]
+        :raises: OSError, ovsdb_client.OVSDBError
+        """
+        ovn_db = 'ovn{}_db'.format(db)
+        schema = OVN_SCHEMAS[ovn_db]
+        columns = set(['_uuid', 'target'])
+        for settings in port_map.values():
+            columns.update(settings.keys())
+        with self.ovsdb_connection(ovn_db) as conn:
+            create, update = self._listener_delta(
+                port_map,
+                conn.select(schema, 'Connection', columns=sorted(columns)))
+            if not (create or update):
+                ch_core.hookenv.log('{} listeners up to date'.format(db),
+                                    level=ch_core.hookenv.DEBUG)
+                return
+            ops = []
+            for port, settings in create:
+                ch_core.hookenv.log('create port {} {}'.format(port, settings),
+                                    level=ch_core.hookenv.DEBUG)
+                ops.append({
+                    'op': 'insert',
+                    'table': 'Connection',
+                    'row': dict(settings, target='pssl:{}'.format(port)),
+                    'uuid-name': 'connection{}'.format(port),
+                })
+            if create:
+                ops.append({
+                    'op': 'mutate',
+                    'table': '{}_Global'.format(db.upper()),
+                    'where': [],
+                    'mutations': [
+                        ['connections', 'insert',
+                         ['set', [['named-uuid', 'connection{}'.format(port)]
+                                  for port, _ in create]]],
+                    ],
+                })
+            for row_uuid, settings in update:
+                ch_core.hookenv.log('set {} {}'.format(row_uuid, settings),
+                                    level=ch_core.hookenv.DEBUG)
+                ops.append({
+                    'op': 'update',
+                    'table': 'Connection',
+                    'where': [['_uuid', '==', row_uuid]],
+                    'row': settings,
+                })
+            conn.transact(schema, *ops)
+
+    def _configure_ovn_listener_cli(self, db, port_map):
+        """Create or update OVN listener configuration using CLI tools.
+
+        :param db: Database to operate on, 'nb' or 'sb'
+        :type db: str
+        :param port_map: Dictionary with port number and associated settings
+        :type port_map: Dict[int,Dict[str,str]]
+        :raises: subprocess.CalledProcessError
+        """
+        connections = ch_ovsdb.SimpleOVSDB(
+            'ovn-{}ctl'.format(db)).connection
+        create, update = self._listener_delta(port_map, connections)
+        if not (create or update):
+            ch_core.hookenv.log('{} listeners up to date'.format(db),
+                                level=ch_core.hookenv.DEBUG)
+            return
+        # Perform all operations as one transaction in a single invocation
+        cmd = ['ovn-{}ctl'.format(db)]
+        for port, settings in create:
+            ch_core.hookenv.log('create port {} {}'.format(port, settings),
+                                level=ch_core.hookenv.DEBUG)
+            # NOTE(fnordahl) the listener configuration is written to
+            # the database and used by all units, so we cannot bind to
+            # specific space/address here.  We might consider not
+            # using listener configuration from DB, but that is
+            # currently not supported by ``ovn-ctl`` script.
+            cmd.extend([
+                '--',
+                '--id=@connection{}'.format(port),
+                'create', 'connection',
+                'target="pssl:{}"'.format(port)])
+            cmd.extend(
+                '{}={}'.format(k, v) for k, v in sorted(settings.items()))
+            cmd.extend([
+                '--',
+                'add', '{}_Global'.format(db.upper()),
+                '.', 'connections', '@connection{}'.format(port)])
+        for row_uuid, settings in update:
+            ch_core.hookenv.log('set {} {}'.format(row_uuid, settings),
+                                level=ch_core.hookenv.DEBUG)
+            cmd.extend(['--', 'set', 'connection', str(row_uuid)])
+            cmd.extend(
+                '{}={}'.format(k, v) for k, v in sorted(settings.items()))
+        self.run(*cmd)
+
+    def election_timer_progress(self):
+        """Get election timer changes this unit has to make.
+
+        Progress is derived from the election timer reported by the
+        cluster status rather than from unit-local storage, so that a unit
+        taking over Raft leadership resumes a change started by another
+        unit.
+
+        :returns: Map of database, 'nb' or 'sb', to current and target
+                  election timer in ms for the databases this unit hosts
+                  the Raft leader of.
+        :rtype: Dict[str,Dict[str,int]]
+        """
+        progress = {}
+        for db in ('nb', 'sb'):
+            tgt_timer = self.election_timer(db)
+            if (tgt_timer > self.max_election_timer or
+                    tgt_timer < self.min_election_timer):
+                continue
+            status = self.cluster_status('ovn{}_db'.format(db))
+            if not (status and status.is_cluster_leader):
+                continue
+            if status.election_timer != tgt_timer * 1000:
+                progress[db] = {
+                    'timer': status.election_timer,
+                    'target': tgt_timer * 1000,
+                }
+        return progress
+
+    def advance_election_timer(self):
+        """Take next step of any election timer change in progress.
+
+        Meant to be called from hooks that do not otherwise configure OVN,
+        such as ``update-status``.
+        """
+        for db in sorted(self.election_timer_progress().keys()):
+            self.configure_ovsdb_election_timer(db, self.election_timer(db))
+
+    def election_timer(self, db):
+        """Get configured Raft election timer of a database.
+
+        :param db: Database, 'nb' or 'sb'
+        :type db: str
+        :returns: Election timer in seconds
+        :rtype: int
+        """
+        return (self.config['ovsdb-server-{}-election-timer'.format(db)] or
+                self.config['ovsdb-server-election-timer'])
 
     def configure_ovsdb_election_timer(self, db, tgt_timer):
         """Set the OVSDB cluster Raft election timer.
@@ -496,10 +1932,20 @@ class BaseOVNCentralCharm(charms_openstack.charm.OpenStackCharm):
         reality by iteratively decreasing / increasing the value in a safe
         pace.
 
+        To avoid blocking the hook while waiting for an election window to
+        pass between each change, at most one step is taken per call.  The
+        current value is read from the cluster status, so any unit hosting
+        the Raft leader resumes the change.  The last step taken by this
+        unit is kept in unit-local storage to wait for an election window to
+        pass before taking the next one.
+
         :param db: Database to operate on, 'nb' or 'sb'
         :type db: str
         :param tgt_timer: Target value for election timer in seconds
         :type tgt_timer: int
+        :returns: True if no further changes are required on this unit,
+                  False if the change is in progress.
+        :rtype: bool
         :raises: ValueError
         """
         if db not in ('nb', 'sb'):
@@ -516,64 +1962,612 @@ class BaseOVNCentralCharm(charms_openstack.charm.OpenStackCharm):
                                     self.min_election_timer,
                                     self.max_election_timer),
                                 level=ch_core.hookenv.ERROR)
-            return
+            return True
         # OVN uses ms as unit for the election timer
         tgt_timer = tgt_timer * 1000
 
         ovn_db = 'ovn{}_db'.format(db)
-        ovn_schema = 'OVN_Northbound' if db == 'nb' else 'OVN_Southbound'
-        status = self.cluster_status(ovn_db)
-        if status and status.is_cluster_leader:
-            ch_core.hookenv.log('is_cluster_leader {}'.format(db),
+        ovn_schema = OVN_SCHEMAS[ovn_db]
+        kv = ch_core.unitdata.kv()
+        kv_key = ELECTION_TIMER_KEY.format(db)
+        status = self.cluster_status(ovn_db, fresh=True)
+        if not (status and status.is_cluster_leader):
+            # Only the cluster leader can change the timer, should leadership
+            # move the new leader will take over.
+            kv.unset(kv_key)
+            return True
+        ch_core.hookenv.log('is_cluster_leader {}'.format(db),
+                            level=ch_core.hookenv.DEBUG)
+        cur_timer = status.election_timer
+        if tgt_timer == cur_timer:
+            ch_core.hookenv.log('Election timer already set to target '
+                                'value: {} == {}'
+                                .format(tgt_timer, cur_timer),
                                 level=ch_core.hookenv.DEBUG)
-            cur_timer = status.election_timer
-            if tgt_timer == cur_timer:
-                ch_core.hookenv.log('Election timer already set to target '
-                                    'value: {} == {}'
-                                    .format(tgt_timer, cur_timer),
+            kv.unset(kv_key)
+            return True
+        now = time.time()
+        step = kv.get(kv_key)
+        if step:
+            # wait for an election window to pass before changing the value
+            # again
+            not_before = step['timestamp'] + (
+                step['previous'] + step['timer']) / 1000
+            if now < not_before:
+                ch_core.hookenv.log('Election timer change for {} in '
+                                    'progress, next step in {:.1f}s'
+                                    .format(ovn_schema, not_before - now),
                                     level=ch_core.hookenv.DEBUG)
+                return False
+        # election timer decrease/increase cannot be more than 2x current
+        # value per iteration
+        if tgt_timer > cur_timer:
+            change_timer = min(cur_timer * 2, tgt_timer)
+        else:
+            change_timer = max(cur_timer // 2, tgt_timer)
+        ch_core.hookenv.log('change {} election timer {}ms -> {}ms '
+                            '(target {}ms)'
+                            .format(ovn_schema, cur_timer, change_timer,
+                                    tgt_timer),
+                            level=ch_core.hookenv.INFO)
+        try:
+            ch_ovn.ovn_appctl(
+                ovn_db, (
+                    'cluster/change-election-timer',
+                    ovn_schema,
+                    str(change_timer),
+                ),
+                rundir=self.ovn_rundir(),
+                use_ovs_appctl=(self.release == 'train'))
+        except subprocess.CalledProcessError as e:
+            # NOTE: the server refuses the change when it is no longer the
+            # leader or a previous change is not committed yet, retry on a
+            # later hook.
+            ch_core.hookenv.log('Unable to change {} election timer: {}'
+                                .format(ovn_schema, e),
+                                level=ch_core.hookenv.WARNING)
+            self.invalidate_cluster_status(ovn_db)
+            return False
+        self.invalidate_cluster_status(ovn_db)
+        kv.set(kv_key, {
+            'target': tgt_timer,
+            'previous': cur_timer,
+            'timer': change_timer,
+            'timestamp': now,
+        })
+        return False
+
+    def ovsdb_path(self, db_file):
+        """Get absolute path to OVSDB file.
+
+        :param db_file: Name of OVSDB file, e.g. ``ovnsb_db.db``
+        :type db_file: str
+        :returns: Absolute path
+        :rtype: str
+        """
+        if self.release == 'train':
+            return os.path.join('/var/lib/openvswitch', db_file)
+        return os.path.join('/var/lib/ovn', db_file)
+
+    def transfer_ovsdb_leadership(self, db):
+        """Transfer Raft leadership of database to another server.
+
+        ovsdb-server does not provide a dedicated command for this, the
+        ``transfer-leadership`` failure test makes the leader step down at
+        its next iteration.  Waits for up to two election timer periods for
+        the change to be visible.
+
+        :param db: Database to operate on, 'nb' or 'sb'
+        :type db: str
+        :raises: subprocess.CalledProcessError, RuntimeError
+        """
+        ovn_db = 'ovn{}_db'.format(db)
+        ovn_schema = OVN_SCHEMAS[ovn_db]
+        status = self.cluster_status(ovn_db, fresh=True)
+        if not (status and status.is_cluster_leader):
+            return
+        ch_ovn.ovn_appctl(
+            ovn_db, (
+                'cluster/failure-test',
+                'transfer-leadership',
+            ),
+            rundir=self.ovn_rundir(),
+            use_ovs_appctl=(self.release == 'train'))
+        deadline = time.time() + 2 * status.election_timer / 1000
+        while time.time() < deadline:
+            time.sleep(1)
+            self.invalidate_cluster_status(ovn_db)
+            status = self.cluster_status(ovn_db)
+            if status and not status.is_cluster_leader:
+                ch_core.hookenv.log('Transferred leadership of {} to {}'
+                                    .format(ovn_schema, status.leader),
+                                    level=ch_core.hookenv.INFO)
                 return
-            # to be able to reuse the change loop to both increase and decrease
-            # the timer we assign the operators used to variables
-            if tgt_timer > cur_timer:
-                # when increasing timer, we will multiply the value
-                change_op = operator.mul
-                # when increasing timer, we want the smaller between target
-                # value and current value multiplied with 2
-                change_select = min
-            else:
-                # when decreasing timer, we will divide the value and do not
-                # want fractional values
-                change_op = operator.floordiv
-                # when decreasing timer, we want the larger of target value and
-                # current value divided by 2
-                change_select = max
-            while status and status.is_cluster_leader and (
-                    status.election_timer != tgt_timer):
-                # election timer decrease/increase cannot be more than 2x
-                # current value per iteration
-                change_timer = change_select(
-                    change_op(cur_timer, 2), tgt_timer)
-                ch_core.hookenv.status_set(
-                    'maintenance',
-                    'change {} election timer {}ms -> {}ms'
-                    .format(ovn_schema, cur_timer, change_timer))
-                ch_ovn.ovn_appctl(
-                    ovn_db, (
-                        'cluster/change-election-timer',
-                        ovn_schema,
-                        str(change_timer),
-                    ),
-                    rundir=self.ovn_rundir(),
-                    use_ovs_appctl=(self.release == 'train'))
-                # wait for an election window to pass before changing the value
-                # again
-                time.sleep((cur_timer + change_timer) / 1000)
-                cur_timer = change_timer
-                status = self.cluster_status(ovn_db)
+        raise RuntimeError('Unable to transfer leadership of {}'
+                           .format(ovn_schema))
 
-    def configure_ovn(self, nb_port, sb_port, sb_admin_port):
-        """Create or update OVN listener configuration.
+    def _ovsdb_server_compact(self, db):
+        """Request compaction of database from the local server.
+
+        :param db: Database to operate on, 'nb' or 'sb'
+        :type db: str
+        :raises: subprocess.CalledProcessError
+        """
+        ovn_db = 'ovn{}_db'.format(db)
+        ch_ovn.ovn_appctl(
+            ovn_db, (
+                'ovsdb-server/compact',
+                OVN_SCHEMAS[ovn_db],
+            ),
+            rundir=self.ovn_rundir(),
+            use_ovs_appctl=(self.release == 'train'))
+
+    def compact_ovsdb(self, db):
+        """Compact database on the local server.
+
+        Compacting a large database blocks the server for the duration.  A
+        clustered ovsdb-server that is the Raft leader hands leadership over
+        to another server before it writes the snapshot, so no election is
+        triggered.
+
+        :param db: Database to operate on, 'nb' or 'sb'
+        :type db: str
+        :returns: Result with role at start, duration in seconds, file size
+                  in bytes before and after and timestamp.
+        :rtype: Dict[str,Union[str,int,float]]
+        :raises: ValueError, subprocess.CalledProcessError
+        """
+        if db not in ('nb', 'sb'):
+            raise ValueError
+        ovn_db = 'ovn{}_db'.format(db)
+        ovn_schema = OVN_SCHEMAS[ovn_db]
+        db_path = self.ovsdb_path('{}.db'.format(ovn_db))
+        status = self.cluster_status(ovn_db, fresh=True)
+        role = status.role if status else 'unknown'
+        size_before = os.path.getsize(db_path)
+        start = time.time()
+        self._ovsdb_server_compact(db)
+        end = time.time()
+        self.invalidate_cluster_status(ovn_db)
+        result = {
+            'role': role,
+            'duration': round(end - start, 3),
+            'size-before': size_before,
+            'size-after': os.path.getsize(db_path),
+            'timestamp': end,
+        }
+        ch_core.hookenv.log('Compacted {} ({}) in {}s, {} -> {} bytes'
+                            .format(ovn_schema, role, result['duration'],
+                                    result['size-before'],
+                                    result['size-after']),
+                            level=ch_core.hookenv.INFO)
+        ch_core.unitdata.kv().set(COMPACTION_KEY.format(db), result)
+        return result
+
+    def ovsdb_service(self, db):
+        """Get name of systemd service for database server.
+
+        :param db: Database, 'nb' or 'sb'
+        :type db: str
+        :returns: Name of service
+        :rtype: str
+        """
+        if self.release == 'train':
+            return 'ovn-{}-ovsdb'.format(db)
+        return 'ovn-ovsdb-server-{}'.format(db)
+
+    def ovsdb_backup_source(self, db, port):
+        """Select server to take backup of database from.
+
+        The local server is used unless it is the Raft leader, in which case
+        a follower is selected from the cluster status so that the leader is
+        not loaded with streaming the snapshot.
+
+        :param db: Database, 'nb' or 'sb'
+        :type db: str
+        :param port: Client port without RBAC restrictions of the peers
+        :type port: int
+        :returns: ovsdb-client remote and Raft role of the server
+        :rtype: Tuple[str, str]
+        :raises: RuntimeError
+        """
+        ovn_db = 'ovn{}_db'.format(db)
+        status = self.cluster_status(ovn_db)
+        if not status:
+            raise RuntimeError('{} is not running'.format(OVN_SCHEMAS[ovn_db]))
+        if not status.is_cluster_leader:
+            return ('unix:{}'.format(
+                os.path.join(self.ovn_rundir(), '{}.sock'.format(ovn_db))),
+                status.role)
+        for sid, address in status.servers:
+            if str(status.server_id).startswith(sid):
+                continue
+            # the Raft address of the server, use its database client port
+            return ('{}:{}'.format(address.rsplit(':', 1)[0], port),
+                    'follower')
+        raise RuntimeError('No follower to take backup of {} from'
+                           .format(OVN_SCHEMAS[ovn_db]))
+
+    def _ovsdb_client_cmd(self, *args):
+        return ['ovsdb-client', '--no-leader-only',
+                '--private-key={}'.format(self.options.ovn_key),
+                '--certificate={}'.format(self.options.ovn_cert),
+                '--ca-cert={}'.format(self.options.ovn_ca_cert)] + list(args)
+
+    def backup_ovsdb(self, db, backup_dir, port):
+        """Stream standalone snapshot of database to compressed file.
+
+        The snapshot is compressed as it is received so it is never held in
+        memory, and only renamed into place once complete.
+
+        :param db: Database to operate on, 'nb' or 'sb'
+        :type db: str
+        :param backup_dir: Directory to write backup to
+        :type backup_dir: str
+        :param port: Client port without RBAC restrictions of the peers,
+                     used when the local server is the Raft leader
+        :type port: int
+        :returns: Result with path of backup file, source server and its
+                  role, schema version, size in bytes of snapshot and
+                  compressed file and duration in seconds.
+        :rtype: Dict[str,Union[str,int,float]]
+        :raises: ValueError, RuntimeError, subprocess.CalledProcessError
+        """
+        if db not in ('nb', 'sb'):
+            raise ValueError
+        ovn_schema = OVN_SCHEMAS['ovn{}_db'.format(db)]
+        remote, role = self.ovsdb_backup_source(db, port)
+        schema_version = subprocess.check_output(
+            self._ovsdb_client_cmd('get-schema-version', remote, ovn_schema),
+            universal_newlines=True).strip()
+        ch_core.host.mkdir(backup_dir, perms=0o700)
+        path = os.path.join(backup_dir, '{}-{}.db.gz'.format(
+            ovn_schema, time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())))
+        tmp_path = '{}.tmp'.format(path)
+        size = 0
+        start = time.time()
+        proc = subprocess.Popen(
+            self._ovsdb_client_cmd('backup', remote, ovn_schema),
+            stdout=subprocess.PIPE)
+        try:
+            try:
+                with gzip.open(tmp_path, 'wb') as out:
+                    while True:
+                        chunk = proc.stdout.read(STREAM_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        out.write(chunk)
+                        size += len(chunk)
+            finally:
+                proc.stdout.close()
+                returncode = proc.wait()
+            if returncode:
+                raise subprocess.CalledProcessError(returncode, proc.args)
+            os.rename(tmp_path, path)
+        except Exception:
+            # NOTE: a partial file is left behind whichever side failed,
+            # and may be missing when gzip.open itself failed.
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        result = {
+            'file': path,
+            'source': remote,
+            'role': role,
+            'schema-version': schema_version,
+            'bytes': size,
+            'compressed-bytes': os.path.getsize(path),
+            'duration': round(time.time() - start, 3),
+        }
+        ch_core.hookenv.log('Backed up {} {} from {} ({}) to {}, {} bytes '
+                            'in {}s'
+                            .format(ovn_schema, schema_version, remote, role,
+                                    path, size, result['duration']),
+                            level=ch_core.hookenv.INFO)
+        return result
+
+    def _replace_ovsdb(self, db, replace_f):
+        """Stop database server, move database file aside and start again.
+
+        :param db: Database to operate on, 'nb' or 'sb'
+        :type db: str
+        :param replace_f: Function creating the new database file, called
+                          with its path while the server is stopped.
+        :type replace_f: Callable[[str], None]
+        :returns: Path the previous database file was moved to
+        :rtype: str
+        """
+        ovn_db = 'ovn{}_db'.format(db)
+        db_path = self.ovsdb_path('{}.db'.format(ovn_db))
+        saved_path = '{}.{}'.format(
+            db_path, time.strftime('%Y%m%dT%H%M%SZ', time.gmtime()))
+        service = self.ovsdb_service(db)
+        ch_core.host.service_stop(service)
+        try:
+            if os.path.exists(db_path):
+                os.rename(db_path, saved_path)
+            replace_f(db_path)
+        finally:
+            ch_core.host.service_start(service)
+            self.invalidate_cluster_status(ovn_db)
+        return saved_path
+
+    def restore_ovsdb(self, db, backup_file, local_conn):
+        """Create new single server cluster from backup.
+
+        The remaining units must subsequently join the new cluster, see
+        ``rejoin_ovsdb``.
+
+        :param db: Database to operate on, 'nb' or 'sb'
+        :type db: str
+        :param backup_file: Path to backup, optionally gzip compressed
+        :type backup_file: str
+        :param local_conn: Raft connection string for local unit
+        :type local_conn: str
+        :returns: Path the previous database file was moved to
+        :rtype: str
+        :raises: ValueError, subprocess.CalledProcessError
+        """
+        if db not in ('nb', 'sb'):
+            raise ValueError
+        if not os.path.exists(backup_file):
+            raise ValueError('{} does not exist'.format(backup_file))
+
+        def create_cluster(db_path):
+            standalone = '{}.restore'.format(db_path)
+            opener = gzip.open if backup_file.endswith('.gz') else open
+            try:
+                with opener(backup_file, 'rb') as src, \
+                        open(standalone, 'wb') as dst:
+                    shutil.copyfileobj(src, dst, STREAM_CHUNK_SIZE)
+                self.run('ovsdb-tool', 'create-cluster', db_path, standalone,
+                         local_conn)
+            finally:
+                if os.path.exists(standalone):
+                    os.unlink(standalone)
+
+        return self._replace_ovsdb(db, create_cluster)
+
+    def rejoin_ovsdb(self, db, local_conn, remote_conn):
+        """Discard local database and join the cluster of the peers.
+
+        :param db: Database to operate on, 'nb' or 'sb'
+        :type db: str
+        :param local_conn: Connection string for local unit
+        :type local_conn: Union[str, ...]
+        :param remote_conn: Connection string for remote unit(s)
+        :type remote_conn: Union[str, ...]
+        :returns: Path the previous database file was moved to
+        :rtype: str
+        :raises: ValueError, subprocess.CalledProcessError
+        """
+        if db not in ('nb', 'sb'):
+            raise ValueError
+        ovn_db = 'ovn{}_db'.format(db)
+        # NOTE: Only join the cluster the leader recorded after the restore,
+        # not a cluster some peer that has not been restored yet is part of.
+        cid = ch_core.hookenv.leader_get('{}_cid'.format(db))
+        return self._replace_ovsdb(
+            db, lambda db_path: self.join_cluster(
+                '{}.db'.format(ovn_db), OVN_SCHEMAS[ovn_db],
+                local_conn, remote_conn, cid=cid))
+
+    @staticmethod
+    def parse_compaction_window(window):
+        """Parse compaction window.
+
+        :param window: Window in UTC, e.g. ``02:00-04:30``
+        :type window: str
+        :returns: Start and end as minutes after midnight
+        :rtype: Tuple[int,int]
+        :raises: ValueError
+        """
+        minutes = []
+        for part in window.split('-'):
+            hours, _, mins = part.strip().partition(':')
+            if not (hours.isdigit() and mins.isdigit()):
+                raise ValueError('invalid time: {}'.format(part))
+            if int(hours) > 23 or int(mins) > 59:
+                raise ValueError('invalid time: {}'.format(part))
+            minutes.append(int(hours) * 60 + int(mins))
+        if len(minutes) != 2 or minutes[0] == minutes[1]:
+            raise ValueError('invalid window: {}'.format(window))
+        return tuple(minutes)
+
+    def run_compaction_policy(self):
+        """Compact databases according to the configured policy.
+
+        Within the ``ovsdb-compaction-window`` each database with at least
+        ``ovsdb-compaction-log-entries`` Raft log entries since the last
+        snapshot is compacted once.  Followers compact in the first half of
+        the window, each in a slot of its own derived from the unit number
+        so that a majority of the servers keeps committing.  The leader is
+        asked to compact in the second half of the window, ovsdb-server
+        hands leadership over before it writes the snapshot and the unit
+        compacts as a follower in a later hook if still required.
+        """
+        window = self.config['ovsdb-compaction-window']
+        if not window:
+            return
+        try:
+            start, end = self.parse_compaction_window(window)
+        except ValueError:
+            # reported by ``validate_config``
+            return
+        now = time.time()
+        length = (end - start) % 1440
+        elapsed = (int(now // 60) % 1440 - start) % 1440
+        if elapsed >= length:
+            return
+        unit_number = int(ch_core.hookenv.local_unit().split('/')[1])
+        kv = ch_core.unitdata.kv()
+        for db in ('nb', 'sb'):
+            ovn_db = 'ovn{}_db'.format(db)
+            last = kv.get(COMPACTION_KEY.format(db))
+            if last and now - last['timestamp'] < length * 60:
+                continue
+            status = self.cluster_status(ovn_db, fresh=True)
+            if not status:
+                continue
+            match = re.match(r'\[(\d+), (\d+)\]', status.log)
+            if not match or (int(match.group(2)) - int(match.group(1)) <
+                             self.config['ovsdb-compaction-log-entries']):
+                continue
+            try:
+                if status.is_cluster_leader:
+                    handover_key = COMPACTION_HANDOVER_KEY.format(db)
+                    handover = kv.get(handover_key)
+                    if elapsed < length / 2 or (
+                            handover and now - handover <
+                            2 * status.election_timer / 1000):
+                        continue
+                    ch_core.hookenv.log('Requesting compaction of {} from '
+                                        'the leader'
+                                        .format(OVN_SCHEMAS[ovn_db]),
+                                        level=ch_core.hookenv.INFO)
+                    kv.set(handover_key, now)
+                    self._ovsdb_server_compact(db)
+                    self.invalidate_cluster_status(ovn_db)
+                    continue
+                slots = max(len(status.servers), 1)
+                if elapsed < (unit_number % slots) * (length / 2) / slots:
+                    continue
+                self.compact_ovsdb(db)
+            except subprocess.CalledProcessError as e:
+                ch_core.hookenv.log('Scheduled compaction of {} failed: {}'
+                                    .format(OVN_SCHEMAS[ovn_db], e),
+                                    level=ch_core.hookenv.WARNING)
+
+    def restart_pending(self):
+        """Check for deferred restarts of OVN services on this unit.
+
+        :returns: True if a restart is pending, False otherwise
+        :rtype: bool
+        """
+        services = set(self.deferable_services)
+        return any(event.service in services
+                   for event in deferred_events.get_deferred_events())
+
+    def publish_restart_pending(self):
+        """Publish whether restarts are pending on the peer relation.
+
+        The unit hosting a Raft leader uses this to check that its peers
+        have been restarted before restarting itself.
+        """
+        value = 'true' if self.restart_pending() else None
+        for rid in ch_core.hookenv.relation_ids(PEER_RELATION):
+            current = ch_core.hookenv.relation_get(
+                RESTART_PENDING_KEY, unit=ch_core.hookenv.local_unit(),
+                rid=rid)
+            if (current or None) != value:
+                ch_core.hookenv.relation_set(
+                    relation_id=rid,
+                    relation_settings={RESTART_PENDING_KEY: value})
+
+    @staticmethod
+    def peers_restart_pending():
+        """Get peer units that have published pending restarts.
+
+        :returns: Names of units
+        :rtype: List[str]
+        """
+        units = []
+        for rid in ch_core.hookenv.relation_ids(PEER_RELATION):
+            for unit in ch_core.hookenv.related_units(rid):
+                if ch_core.hookenv.relation_get(RESTART_PENDING_KEY,
+                                                unit=unit, rid=rid):
+                    units.append(unit)
+        return sorted(units)
+
+    def wait_for_ovsdb_catch_up(self, db, timeout=CATCH_UP_TIMEOUT):
+        """Wait for local server to rejoin cluster and apply its log.
+
+        :param db: Database to operate on, 'nb' or 'sb'
+        :type db: str
+        :param timeout: Seconds to wait
+        :type timeout: int
+        :raises: RuntimeError
+        """
+        ovn_db = 'ovn{}_db'.format(db)
+        deadline = time.time() + timeout
+        while True:
+            self.invalidate_cluster_status(ovn_db)
+            status = self.cluster_status(ovn_db)
+            if (status and status.status == 'cluster member' and
+                    status.leader not in ('', 'unknown') and
+                    status.entries_not_yet_applied == 0):
+                return
+            if time.time() >= deadline:
+                raise RuntimeError('{} did not catch up with the cluster '
+                                   'within {}s'
+                                   .format(OVN_SCHEMAS[ovn_db], timeout))
+            time.sleep(1)
+
+    def rolling_restart(self, force=False):
+        """Restart OVN services on this unit as a step of a rolling restart.
+
+        Run on one unit at a time.  Leadership of any database led by this
+        unit is transferred before restarting, and the step is only
+        complete once the local servers have caught up with the cluster.
+
+        Unless forced, the restart is refused while a Raft connection of
+        the local servers is down, as another unit is probably restarting,
+        and on the unit hosting a Raft leader while peers have pending
+        restarts.
+
+        :param force: Skip the checks
+        :type force: bool
+        :returns: Duration in seconds of each step
+        :rtype: collections.OrderedDict[str, float]
+        :raises: RuntimeError, subprocess.CalledProcessError
+        """
+        statuses = {db: self.cluster_status('ovn{}_db'.format(db),
+                                            fresh=True)
+                    for db in ('nb', 'sb')}
+        leader_dbs = [db for db, status in sorted(statuses.items())
+                      if status and status.is_cluster_leader]
+        if not force:
+            disconnected = [db for db, status in sorted(statuses.items())
+                            if status and '(' in status.connections]
+            if disconnected:
+                raise RuntimeError(
+                    'Raft connections of {} databases are down, wait for '
+                    'the cluster to recover'.format(', '.join(disconnected)))
+            pending = leader_dbs and self.peers_restart_pending()
+            if pending:
+                raise RuntimeError(
+                    'Unit hosts the Raft leader of {} databases, restart {} '
+                    'first'.format(', '.join(leader_dbs), ', '.join(pending)))
+
+        timings = collections.OrderedDict()
+        start = time.time()
+        for db in leader_dbs:
+            step_start = time.time()
+            self.transfer_ovsdb_leadership(db)
+            timings['transfer-leadership-{}'.format(db)] = round(
+                time.time() - step_start, 3)
+        step_start = time.time()
+        # NOTE: ``ovn-central`` is an umbrella unit, restart the daemons
+        # individually so that each is restarted exactly once.
+        for service in self.rolling_restart_services:
+            ch_core.hookenv.log('rolling restart of {}'.format(service),
+                                level=ch_core.hookenv.INFO)
+            ch_core.host.service_restart(service)
+        for service in self.rolling_restart_services + ['ovn-central']:
+            deferred_events.process_svc_restart(service)
+        self.invalidate_cluster_status()
+        timings['restart'] = round(time.time() - step_start, 3)
+        for db in ('nb', 'sb'):
+            step_start = time.time()
+            self.wait_for_ovsdb_catch_up(db)
+            timings['catch-up-{}'.format(db)] = round(
+                time.time() - step_start, 3)
+        timings['total'] = round(time.time() - start, 3)
+        self.publish_restart_pending()
+        return timings
+
+    def listener_port_maps(self, nb_port, sb_port, sb_admin_port):
+        """Get desired listener configuration of both databases.
 
         :param nb_port: Port for Northbound DB listener
         :type nb_port: int
@@ -581,33 +2575,231 @@ class BaseOVNCentralCharm(charms_openstack.charm.OpenStackCharm):
         :type sb_port: int
         :param sb_admin_port: Port for cluster private Southbound DB listener
         :type sb_admin_port: int
+        :returns: Map of database, 'nb' or 'sb', to port map suitable for
+                  ``configure_ovn_listener``
+        :rtype: Dict[str,Dict[int,Dict[str,any]]]
         """
-        inactivity_probe = int(
-            self.config['ovsdb-server-inactivity-probe']) * 1000
-
-        self.configure_ovn_listener(
-            'nb', {
+        nb_probe = int(self.inactivity_probe('nb')) * 1000
+        sb_probe = int(self.inactivity_probe('sb')) * 1000
+        return {
+            'nb': {
                 nb_port: {
-                    'inactivity_probe': inactivity_probe,
+                    'inactivity_probe': nb_probe,
                 },
-            })
-        self.configure_ovn_listener(
-            'sb', {
+            },
+            'sb': {
                 sb_port: {
                     'role': 'ovn-controller',
-                    'inactivity_probe': inactivity_probe,
+                    'inactivity_probe': sb_probe,
                 },
-            })
-        self.configure_ovn_listener(
-            'sb', {
                 sb_admin_port: {
-                    'inactivity_probe': inactivity_probe,
+                    'inactivity_probe': sb_probe,
                 },
-            })
+            },
+        }
+
+    def inactivity_probe(self, db):
+        """Get inactivity probe for the listeners of a database.
+
+        The database specific option takes precedence over
+        ``ovsdb-server-inactivity-probe``.  With
+        ``ovsdb-server-adaptive-inactivity-probe`` enabled this is the
+        value currently set on the listeners of the clustered database,
+        last chosen by ``adapt_inactivity_probe`` on whichever unit hosted
+        the Raft leader, kept within the configured bounds.
+
+        :param db: Database, 'nb' or 'sb'
+        :type db: str
+        :returns: Inactivity probe in seconds
+        :rtype: int
+        """
+        probe = (
+            self.config['ovsdb-server-{}-inactivity-probe'.format(db)] or
+            self.config['ovsdb-server-inactivity-probe'])
+        if not self.config['ovsdb-server-adaptive-inactivity-probe']:
+            return probe
+        current = self.current_inactivity_probe(db)
+        if current:
+            probe = current
+        return min(max(probe,
+                       self.config['ovsdb-server-inactivity-probe-min']),
+                   self.config['ovsdb-server-inactivity-probe-max'])
+
+    def current_inactivity_probe(self, db):
+        """Get inactivity probe currently set on listeners of a database.
+
+        :param db: Database, 'nb' or 'sb'
+        :type db: str
+        :returns: Largest inactivity probe in seconds of the ``Connection``
+                  rows, None if not set or unavailable
+        :rtype: Optional[int]
+        """
+        ovn_db = 'ovn{}_db'.format(db)
+        try:
+            with self.ovsdb_connection(ovn_db) as conn:
+                rows = conn.select(OVN_SCHEMAS[ovn_db], 'Connection',
+                                   columns=['inactivity_probe'])
+        except (OSError, ovsdb_client.OVSDBError) as e:
+            ch_core.hookenv.log('Unable to read {} listeners: {}'
+                                .format(db, e),
+                                level=ch_core.hookenv.DEBUG)
+            return
+        # Optional columns are encoded as ['set', []] when empty
+        probes = [row['inactivity_probe'] for row in rows
+                  if isinstance(row.get('inactivity_probe'), int)]
+        if probes:
+            return max(probes) // 1000
+
+    def sample_ovsdb_load(self, db):
+        """Sample load of local ovsdb-server.
+
+        ovsdb-server only serves unixctl requests between iterations of its
+        poll loop, the slowest of a few round-trips approximates the time
+        an iteration takes.
+
+        :param db: Database, 'ovnnb_db' or 'ovnsb_db'
+        :type db: str
+        :returns: Poll loop latency in milliseconds, number of sessions
+                  and total of long poll intervals, None if unavailable
+        :rtype: Optional[Dict[str,int]]
+        """
+        latency = 0.0
+        try:
+            with self.ovsdb_connection(db, control=True) as conn:
+                for _ in range(INACTIVITY_PROBE_SAMPLES):
+                    start = time.time()
+                    memory = conn.unixctl('memory/show')
+                    latency = max(latency, time.time() - start)
+                coverage = conn.unixctl('coverage/show')
+        except (OSError, ovsdb_client.OVSDBError) as e:
+            ch_core.hookenv.log('Unable to sample load of {}: {}'
+                                .format(db, e),
+                                level=ch_core.hookenv.DEBUG)
+            return
+        sessions = re.search(r'\bsessions:(\d+)', memory)
+        long_polls = re.search(r'^long_poll_interval\s.*total: (\d+)',
+                               coverage, re.MULTILINE)
+        return {
+            'latency': int(latency * 1000),
+            'sessions': int(sessions.group(1)) if sessions else 0,
+            'long-polls': int(long_polls.group(1)) if long_polls else 0,
+        }
+
+    def next_inactivity_probe(self, probe, latency, sessions, long_polls):
+        """Choose inactivity probe for observed load.
+
+        The probe is doubled when the server is too busy to serve clients
+        timely and lowered by a quarter when it is idle, never below the
+        value that keeps probe traffic for all sessions under
+        ``INACTIVITY_PROBE_MAX_RATE`` per second.
+
+        :param probe: Current inactivity probe in seconds
+        :type probe: int
+        :param latency: Poll loop latency in milliseconds
+        :type latency: int
+        :param sessions: Number of client sessions
+        :type sessions: int
+        :param long_polls: Long poll intervals since the previous sample
+        :type long_polls: int
+        :returns: Inactivity probe in seconds
+        :rtype: int
+        """
+        if latency >= INACTIVITY_PROBE_LATENCY_HIGH or long_polls:
+            probe *= 2
+        elif latency < INACTIVITY_PROBE_LATENCY_LOW:
+            probe -= probe // 4
+        floor = max(self.config['ovsdb-server-inactivity-probe-min'],
+                    -(-sessions // INACTIVITY_PROBE_MAX_RATE))
+        return min(max(probe, floor),
+                   self.config['ovsdb-server-inactivity-probe-max'])
+
+    def adapt_inactivity_probe(self, nb_port, sb_port, sb_admin_port):
+        """Move listener inactivity probes within bounds following load.
+
+        Only the unit hosting the Raft leader of a database samples it and
+        updates its listeners, at most once every
+        ``INACTIVITY_PROBE_INTERVAL`` seconds.  The current value is read
+        back from the listeners in the clustered database, so a new leader
+        continues from it and ``configure_ovn`` does not revert it.  Only
+        the load counters and time of the last change are kept in
+        unit-local storage.
+
+        :param nb_port: Port for Northbound DB listener
+        :type nb_port: int
+        :param sb_port: Port for Southbound DB listener
+        :type sb_port: int
+        :param sb_admin_port: Port for cluster private Southbound DB listener
+        :type sb_admin_port: int
+        """
+        kv = ch_core.unitdata.kv()
+        if not self.config['ovsdb-server-adaptive-inactivity-probe']:
+            for db in ('nb', 'sb'):
+                kv.unset(INACTIVITY_PROBE_KEY.format(db))
+            return
+        now = time.time()
+        for db in ('nb', 'sb'):
+            ovn_db = 'ovn{}_db'.format(db)
+            status = self.cluster_status(ovn_db, fresh=True)
+            if not status or not status.is_cluster_leader:
+                continue
+            load = self.sample_ovsdb_load(ovn_db)
+            if not load:
+                continue
+            key = INACTIVITY_PROBE_KEY.format(db)
+            state = kv.get(key) or {}
+            long_polls = load['long-polls'] - state.get('long-polls', 0)
+            if long_polls < 0:
+                # NOTE: the counter starts over when ovsdb-server restarts
+                long_polls = load['long-polls']
+            elif 'long-polls' not in state:
+                long_polls = 0
+            state['long-polls'] = load['long-polls']
+            probe = self.inactivity_probe(db)
+            target = self.next_inactivity_probe(
+                probe, load['latency'], load['sessions'], long_polls)
+            if (target == probe or
+                    now - state.get('time', 0) < INACTIVITY_PROBE_INTERVAL):
+                kv.set(key, state)
+                continue
+            ch_core.hookenv.log(
+                'Changing {} inactivity probe from {}s to {}s, poll loop '
+                'latency {}ms, {} sessions, {} long poll intervals'
+                .format(OVN_SCHEMAS[ovn_db], probe, target, load['latency'],
+                        load['sessions'], long_polls),
+                level=ch_core.hookenv.INFO)
+            state['time'] = now
+            kv.set(key, state)
+            port_map = self.listener_port_maps(
+                nb_port, sb_port, sb_admin_port)[db]
+            for settings in port_map.values():
+                settings['inactivity_probe'] = target * 1000
+            try:
+                self.configure_ovn_listener(db, port_map)
+            except subprocess.CalledProcessError as e:
+                ch_core.hookenv.log('Unable to update {} listeners: {}'
+                                    .format(db, e),
+                                    level=ch_core.hookenv.WARNING)
+
+    def configure_ovn(self, nb_port, sb_port, sb_admin_port):
+        """Create or update OVN listener configuration.
 
-        election_timer = self.config['ovsdb-server-election-timer']
-        self.configure_ovsdb_election_timer('nb', election_timer)
-        self.configure_ovsdb_election_timer('sb', election_timer)
+        :param nb_port: Port for Northbound DB listener
+        :type nb_port: int
+        :param sb_port: Port for Southbound DB listener
+        :type sb_port: int
+        :param sb_admin_port: Port for cluster private Southbound DB listener
+        :type sb_admin_port: int
+        """
+        port_maps = self.listener_port_maps(nb_port, sb_port, sb_admin_port)
+        self.configure_ovn_listener('nb', port_maps['nb'])
+        self.configure_ovn_listener('sb', port_maps['sb'])
+
+        # NOTE: each call takes at most one step without waiting, changes
+        # to both databases progress side by side on subsequent hooks.
+        for db in ('nb', 'sb'):
+            self.configure_ovsdb_election_timer(db, self.election_timer(db))
+
+        self.configure_northd_parallel_build()
 
     @staticmethod
     def initialize_firewall():
@@ -625,40 +2817,148 @@ class BaseOVNCentralCharm(charms_openstack.charm.OpenStackCharm):
     def configure_firewall(self, port_addr_map):
         """Configure firewall.
 
-        Lock down access to ports not protected by OVN RBAC.
+        Lock down access to ports not protected by OVN RBAC using the
+        backend selected by the ``firewall-backend`` configuration option.
+        Rules managed by a previously selected backend are removed.
+
+        :param port_addr_map: Map of ports to addresses to allow.
+        :type port_addr_map: Dict[Tuple[int, ...], Optional[Iterator]]
+        """
+        backend = self.config['firewall-backend']
+        if backend not in FIREWALL_BACKENDS:
+            # Please refer to `custom_assess_status_last_check` for how the
+            # user is informed.
+            ch_core.hookenv.log('Invalid firewall backend: {}'
+                                .format(backend),
+                                level=ch_core.hookenv.ERROR)
+            return
+        kv = ch_core.unitdata.kv()
+        previous = kv.get(FIREWALL_BACKEND_KEY, 'ufw')
+        if previous != backend:
+            ch_core.hookenv.log('Switching firewall backend {} -> {}'
+                                .format(previous, backend),
+                                level=ch_core.hookenv.INFO)
+            if previous == 'nftables':
+                nft.delete_table(self.nft_table)
+                kv.unset(NFT_STRUCTURE_KEY)
+            else:
+                self._configure_firewall_ufw({})
+        if backend == 'nftables':
+            self._configure_firewall_nftables(port_addr_map)
+        else:
+            self._configure_firewall_ufw(port_addr_map)
+        kv.set(FIREWALL_BACKEND_KEY, backend)
+
+    def _configure_firewall_nftables(self, port_addr_map):
+        """Configure firewall using nftables named sets.
+
+        The allowed addresses for each group of ports are kept in named sets
+        so that membership checks are O(1) regardless of the number of
+        addresses.  The full ruleset is only loaded when its structure
+        changes, otherwise set elements are added and deleted in a single
+        transaction.
+
+        :param port_addr_map: Map of ports to addresses to allow.
+        :type port_addr_map: Dict[Tuple[int, ...], Optional[Iterator]]
+        :raises: subprocess.CalledProcessError
+        """
+        if not shutil.which(nft.NFT):
+            ch_fetch.apt_install(['nftables'], fatal=True)
+        kv = ch_core.unitdata.kv()
+        structure = hashlib.sha256(
+            nft.render_ruleset(self.nft_table, port_addr_map,
+                               elements=False).encode('utf-8')).hexdigest()
+        listing = None
+        if kv.get(NFT_STRUCTURE_KEY) == structure:
+            listing = nft.list_table(self.nft_table)
+        script = None
+        if listing:
+            try:
+                script = nft.render_element_delta(
+                    self.nft_table, port_addr_map,
+                    nft.parse_set_elements(listing))
+            except KeyError:
+                # set missing, table modified outside of the charm
+                pass
+            else:
+                if not script:
+                    ch_core.hookenv.log('nftables ruleset up to date',
+                                        level=ch_core.hookenv.DEBUG)
+                    return
+        if script is None:
+            script = nft.render_ruleset(self.nft_table, port_addr_map)
+        ch_core.hookenv.log('Applying nftables changes:\n{}'.format(script),
+                            level=ch_core.hookenv.DEBUG)
+        nft.apply(script)
+        kv.set(NFT_STRUCTURE_KEY, structure)
+
+    def _configure_firewall_ufw(self, port_addr_map):
+        """Configure firewall using ufw.
+
+        The current ruleset is read once and only the rules required to
+        reach the desired state are added or deleted, nothing is done when
+        the firewall is already up to date.
 
         :param port_addr_map: Map of ports to addresses to allow.
         :type port_addr_map: Dict[Tuple[int, ...], Optional[Iterator]]
-        :param allowed_hosts: Hosts allowed to connect.
-        :type allowed_hosts: Iterator
         """
         ufw_comment = 'charm-' + self.name
 
-        # reject connection to protected ports
-        for port in set().union(*port_addr_map.keys()):
-            ch_ufw.modify_access(src=None, dst='any', port=port,
-                                 proto='tcp', action='reject',
-                                 comment=ufw_comment)
-        # allow connections from provided addresses
-        allowed_addrs = {}
+        # desired state, keyed by the string representation used by ufw
+        reject_ports = {
+            str(port): port for port in set().union(*port_addr_map.keys())}
+        allow_rules = {}
         for ports, addrs in port_addr_map.items():
             # store List copy of addrs to iterate over it multiple times
             _addrs = list(addrs or [])
             for port in ports:
                 for addr in _addrs:
-                    ch_ufw.modify_access(addr, port=port, proto='tcp',
-                                         action='allow', prepend=True,
-                                         comment=ufw_comment)
-                    allowed_addrs[addr] = 1
-        # delete any rules managed by us that do not match provided addresses
+                    allow_rules[(addr, str(port))] = (addr, port)
+
+        # current state
+        present = set()
         delete_rules = []
         for num, rule in ch_ufw.status():
-            if 'comment' in rule and rule['comment'] == ufw_comment:
-                if (rule['action'] == 'allow in' and
-                        rule['from'] not in allowed_addrs):
-                    delete_rules.append(num)
+            if rule.get('comment') != ufw_comment:
+                continue
+            port = rule['to'].split('/')[0]
+            if rule['action'] == 'allow in':
+                key = (rule['from'], port)
+                wanted = key in allow_rules
+            elif rule['action'] == 'reject in' and rule['from'] == 'any':
+                key = port
+                wanted = key in reject_ports
+            else:
+                key = None
+                wanted = False
+            if wanted:
+                present.add(key)
+            else:
+                delete_rules.append(num)
+
+        # delete rules managed by us that are no longer wanted, in reverse
+        # order so that the rule numbers remain valid
         for rule in sorted(delete_rules, reverse=True):
             ch_ufw.modify_access(None, dst=None, action='delete', index=rule)
+        # reject connection to protected ports
+        add_reject = [port for key, port in reject_ports.items()
+                      if key not in present]
+        for port in sorted(add_reject):
+            ch_ufw.modify_access(src=None, dst='any', port=port,
+                                 proto='tcp', action='reject',
+                                 comment=ufw_comment)
+        # allow connections from provided addresses
+        add_allow = [rule for key, rule in allow_rules.items()
+                     if key not in present]
+        for addr, port in sorted(add_allow):
+            ch_ufw.modify_access(addr, port=port, proto='tcp',
+                                 action='allow', prepend=True,
+                                 comment=ufw_comment)
+        ch_core.hookenv.log('Firewall rules: {} added, {} deleted, {} '
+                            'unchanged'
+                            .format(len(add_reject) + len(add_allow),
+                                    len(delete_rules), len(present)),
+                            level=ch_core.hookenv.DEBUG)
 
     def render_nrpe(self):
         """Configure Nagios NRPE checks."""
@@ -672,23 +2972,68 @@ class BaseOVNCentralCharm(charms_openstack.charm.OpenStackCharm):
         nrpe_files_path = os.path.join(ch_core.hookenv.charm_dir(), "files")
         nrpe.copy_nrpe_checks(nrpe_files_dir=nrpe_files_path)
 
-        cron_script = os.path.join(ch_core.hookenv.charm_dir(), "files",
-                                   "run_ovn_db_connections_check.py")
-        ch_core.host.rsync(cron_script, SCRIPTS_DIR,
-                           options=["--executability"])
-        cron_cmd = os.path.join(SCRIPTS_DIR, "run_ovn_db_connections_check.py")
-        cron_line = "*/5 * * * * root {} | logger -p local0.notice".format(
-            cron_cmd
-        )
-        with open(NRPE_CRON_FILE, "w") as fd:
-            fd.write("# Juju generated - DO NOT EDIT\n{}\n\n"
-                     .format(cron_line))
+        self._install_script("run_ovn_db_connections_check.py")
+        cron_cmd = " ".join(
+            [os.path.join(SCRIPTS_DIR, "run_ovn_db_connections_check.py")] +
+            ["--{check} {warn} {crit}".format(
+                check=check,
+                warn=self.config['nagios-raft-{}-warn'.format(check)],
+                crit=self.config['nagios-raft-{}-crit'.format(check)])
+             for check in NAGIOS_RAFT_CHECKS])
+        if self.config['ovn-db-connections-monitor']:
+            self._enable_connections_monitor(cron_cmd)
+            if os.path.exists(NRPE_CRON_FILE):
+                os.unlink(NRPE_CRON_FILE)
+        else:
+            cron_line = "*/5 * * * * root {} | logger -p local0.notice".format(
+                cron_cmd
+            )
+            with open(NRPE_CRON_FILE, "w") as fd:
+                fd.write("# Juju generated - DO NOT EDIT\n{}\n\n"
+                         .format(cron_line))
+            self._disable_connections_monitor()
 
         charm_nrpe.add_check(shortname="ovn_db_connections",
                              description="Check OVN DB connections",
                              check_cmd="check_ovn_db_connections.py")
         charm_nrpe.write()
 
+    def _enable_connections_monitor(self, cmd):
+        """Install and (re-)start the OVN DB connections monitor daemon.
+
+        The daemon holds a persistent session with the local SB DB server
+        and replaces the polling cron job.
+
+        :param cmd: Connections check command line
+        :type cmd: str
+        """
+        ch_core.host.write_file(
+            CONNECTIONS_MONITOR_UNIT,
+            '# Juju generated - DO NOT EDIT\n'
+            '[Unit]\n'
+            'Description=Monitor OVN DB connections for Nagios\n'
+            '\n'
+            '[Service]\n'
+            'ExecStart={} --daemon\n'
+            'Restart=always\n'
+            '\n'
+            '[Install]\n'
+            'WantedBy=multi-user.target\n'.format(cmd),
+            perms=0o644)
+        subprocess.check_call(['systemctl', 'daemon-reload'])
+        ch_core.host.service('enable', CONNECTIONS_MONITOR_SERVICE)
+        # restart to pick up any change to the script
+        ch_core.host.service_restart(CONNECTIONS_MONITOR_SERVICE)
+
+    def _disable_connections_monitor(self):
+        """Stop and remove the OVN DB connections monitor daemon."""
+        if not os.path.exists(CONNECTIONS_MONITOR_UNIT):
+            return
+        ch_core.host.service_stop(CONNECTIONS_MONITOR_SERVICE)
+        ch_core.host.service('disable', CONNECTIONS_MONITOR_SERVICE)
+        os.unlink(CONNECTIONS_MONITOR_UNIT)
+        subprocess.check_call(['systemctl', 'daemon-reload'])
+
     def remove_nrpe(self):
         """Remove no longer needed NRPE configuration and cronfiles"""
         hostname = nrpe.get_nagios_hostname()
@@ -698,16 +3043,78 @@ class BaseOVNCentralCharm(charms_openstack.charm.OpenStackCharm):
         charm_nrpe.remove_check(shortname="ovn_db_connections")
         charm_nrpe.write()
 
-        files = [
-            NRPE_CRON_FILE,
-            os.path.join(SCRIPTS_DIR, "run_ovn_db_connections_check.py"),
-        ]
+        self._disable_connections_monitor()
+        self._remove_script("run_ovn_db_connections_check.py",
+                            cron_file=NRPE_CRON_FILE)
+
+    @staticmethod
+    def _install_script(name):
+        """Install script from the charm ``files`` directory.
+
+        NOTE: the scripts import the OVSDB client module from the charm
+        library, it is installed alongside them.
+
+        :param name: Name of script
+        :type name: str
+        """
+        for path in (
+                os.path.join(ch_core.hookenv.charm_dir(), "files", name),
+                os.path.join(ch_core.hookenv.charm_dir(), "lib", "charm",
+                             "openstack", "ovsdb_client.py")):
+            ch_core.host.rsync(path, SCRIPTS_DIR,
+                               options=["--executability"])
+
+    @staticmethod
+    def _remove_script(name, cron_file=None):
+        """Remove script installed by ``_install_script`` and its cron job.
+
+        The OVSDB client module is removed along with the last script.
+
+        :param name: Name of script
+        :type name: str
+        :param cron_file: Path to cron job running the script
+        :type cron_file: Optional[str]
+        """
+        files = [os.path.join(SCRIPTS_DIR, name)]
+        if cron_file:
+            files.insert(0, cron_file)
+        if not any(os.path.exists(os.path.join(SCRIPTS_DIR, other))
+                   for other in OVSDB_CLIENT_SCRIPTS if other != name):
+            files.append(os.path.join(SCRIPTS_DIR, "ovsdb_client.py"))
         for filename in files:
             if os.path.exists(filename):
                 os.unlink(filename)
 
+    def configure_metrics_exporter(self):
+        """Install or remove the Prometheus textfile metrics collector.
+
+        The collector is run every minute and exports OVSDB cluster and
+        ovn-northd health metrics to the configured directory for the
+        node-exporter textfile collector.
+        """
+        output_dir = self.config['prometheus-textfile-directory']
+        if not output_dir:
+            self._remove_script("collect_ovn_central_metrics.py",
+                                cron_file=METRICS_CRON_FILE)
+            return
+        self._install_script("collect_ovn_central_metrics.py")
+        ch_core.host.mkdir(output_dir, perms=0o755)
+        cron_line = ("* * * * * root {} --rundir {} --output-dir {} "
+                     "2>&1 | logger -p local0.notice"
+                     .format(os.path.join(SCRIPTS_DIR,
+                                          "collect_ovn_central_metrics.py"),
+                             self.ovn_rundir(), output_dir))
+        ch_core.host.write_file(
+            METRICS_CRON_FILE,
+            "# Juju generated - DO NOT EDIT\n{}\n\n".format(cron_line),
+            perms=0o644)
+
     def custom_assess_status_check(self):
         """Report deferred events in charm status message."""
+        if (ch_core.unitdata.kv().get(JOIN_SNAPSHOT_KEY) is not None and
+                not self.databases_exist()):
+            return ('waiting',
+                    'Waiting for peers to compact databases before joining')
         state = None
         message = None
         deferred_events.check_restart_timestamps()
@@ -774,6 +3181,13 @@ class TrainOVNCentralCharm(BaseOVNCentralCharm):
             'ovn-nb-ovsdb',
             'ovn-sb-ovsdb',
         ]
+        # Database servers first so that ovn-northd connects to the
+        # restarted servers once.
+        self.rolling_restart_services = [
+            'ovn-nb-ovsdb',
+            'ovn-sb-ovsdb',
+            'ovn-northd',
+        ]
 
     def install(self):
         """Override charm install method.
@@ -813,11 +3227,21 @@ class UssuriOVNCentralCharm(BaseOVNCentralCharm):
             'ovn-ovsdb-server-nb',
             'ovn-ovsdb-server-sb',
         ])
+        # The relay instances are managed by ``configure_sb_relays``, only
+        # write the template unit here.
+        self.restart_map[SB_RELAY_UNIT] = []
         self.nrpe_check_services = [
             'ovn-northd',
             'ovn-ovsdb-server-nb',
             'ovn-ovsdb-server-sb',
         ]
+        # Database servers first so that ovn-northd connects to the
+        # restarted servers once.
+        self.rolling_restart_services = [
+            'ovn-ovsdb-server-nb',
+            'ovn-ovsdb-server-sb',
+            'ovn-northd',
+        ]
 
     def install(self):
         """Override charm install method."""
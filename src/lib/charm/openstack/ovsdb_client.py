@@ -0,0 +1,306 @@
+# Copyright 2021 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Minimal in-process OVSDB JSON-RPC client.
+
+Talks to the local ``ovsdb-server`` database sockets (RFC 7047) and unixctl
+control sockets without forking the ``ovn-*ctl`` / ``ovn-appctl`` tools.
+
+NOTE: This module must only depend on the Python standard library as it is
+also shipped alongside the scripts in ``files/``.
+"""
+
+import collections
+import json
+import re
+import socket
+
+DEFAULT_TIMEOUT = 30
+RECV_SIZE = 65536
+
+
+def parse_cluster_status(output):
+    """Parse output of the ``cluster/status`` unixctl command.
+
+    :param output: Output of command
+    :type output: str
+    :returns: Map of field name to value, servers listed under ``Servers``
+    :rtype: Dict[str, Union[str, List[str]]]
+    """
+    status = {'Servers': []}
+    in_servers = False
+    for line in output.splitlines()[1:]:
+        if in_servers and line.startswith(' '):
+            status['Servers'].append(line.strip())
+            continue
+        in_servers = False
+        key, sep, value = line.partition(':')
+        if not sep:
+            continue
+        if key == 'Servers':
+            in_servers = True
+            continue
+        status[key.strip()] = value.strip()
+    return status
+
+
+def parse_memory_show(output):
+    """Parse output of the ``memory/show`` unixctl command.
+
+    :param output: Output of command, e.g. ``cells:42 monitors:2``
+    :type output: str
+    :returns: Map of item to count
+    :rtype: Dict[str, int]
+    """
+    return collections.OrderedDict(
+        (key, int(value))
+        for key, value in re.findall(r'([\w-]+):(\d+)', output))
+
+
+class OVSDBError(Exception):
+    """Error reported by the remote end of a JSON-RPC session."""
+
+    def __init__(self, error, details=None):
+        self.error = error
+        self.details = details
+        super().__init__(
+            '{}: {}'.format(error, details) if details else str(error))
+
+
+class OVSDBClient(object):
+    """JSON-RPC session with a local OVSDB or unixctl server.
+
+    The connection is established on first use and may be reused for any
+    number of requests, use as context manager to have it closed on exit.
+    """
+
+    def __init__(self, path, timeout=DEFAULT_TIMEOUT):
+        """Initialize client.
+
+        :param path: Path to unix socket
+        :type path: str
+        :param timeout: Timeout in seconds for socket operations
+        :type timeout: Optional[float]
+        """
+        self.path = path
+        self.timeout = timeout
+        self._sock = None
+        self._buf = ''
+        self._next_id = 0
+        self._decoder = json.JSONDecoder()
+        self.notifications = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def connect(self):
+        """Connect to server if not already connected.
+
+        :raises: OSError
+        """
+        if self._sock:
+            return
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+
+    def close(self):
+        """Close connection to server."""
+        if self._sock:
+            self._sock.close()
+        self._sock = None
+        self._buf = ''
+
+    def fileno(self):
+        """Allow client to be used with ``select``.
+
+        :returns: File descriptor of connected socket
+        :rtype: int
+        """
+        self.connect()
+        return self._sock.fileno()
+
+    def send(self, msg):
+        """Send JSON-RPC message.
+
+        :param msg: Message
+        :type msg: Dict[str, any]
+        :raises: OSError
+        """
+        self.connect()
+        self._sock.sendall(json.dumps(msg).encode('utf-8'))
+
+    def receive(self):
+        """Receive one JSON-RPC message, blocking until one is available.
+
+        :returns: Message
+        :rtype: Dict[str, any]
+        :raises: OSError
+        """
+        self.connect()
+        while True:
+            self._buf = self._buf.lstrip()
+            if self._buf:
+                try:
+                    msg, end = self._decoder.raw_decode(self._buf)
+                except ValueError:
+                    # Partial message, need more data
+                    pass
+                else:
+                    self._buf = self._buf[end:]
+                    return msg
+            data = self._sock.recv(RECV_SIZE)
+            if not data:
+                self.close()
+                raise ConnectionResetError(
+                    'Connection closed by {}'.format(self.path))
+            self._buf += data.decode('utf-8')
+
+    def handle_message(self, msg):
+        """Process messages initiated by the server.
+
+        Replies to ``echo`` keep-alive requests and queues notifications in
+        ``self.notifications``.
+
+        :param msg: Message
+        :type msg: Dict[str, any]
+        """
+        if msg.get('method') == 'echo':
+            self.send({'id': msg['id'], 'result': msg['params'],
+                       'error': None})
+        elif msg.get('method'):
+            self.notifications.append(msg)
+
+    def wait_notification(self):
+        """Wait for next notification from server.
+
+        Blocks for at most the configured timeout, any ``echo`` requests
+        received meanwhile are answered.
+
+        :returns: Notification, None if none arrived before the timeout
+        :rtype: Optional[Dict[str, any]]
+        :raises: OSError
+        """
+        while not self.notifications:
+            try:
+                msg = self.receive()
+            except socket.timeout:
+                return
+            self.handle_message(msg)
+        return self.notifications.pop(0)
+
+    def request(self, method, params):
+        """Perform JSON-RPC request and wait for the response.
+
+        :param method: Method
+        :type method: str
+        :param params: Parameters
+        :type params: List[any]
+        :returns: Result
+        :rtype: any
+        :raises: OSError, OVSDBError
+        """
+        self._next_id += 1
+        req_id = self._next_id
+        self.send({'method': method, 'params': params, 'id': req_id})
+        while True:
+            msg = self.receive()
+            if 'method' in msg:
+                self.handle_message(msg)
+                continue
+            if msg.get('id') != req_id:
+                continue
+            if msg.get('error') is not None:
+                error = msg['error']
+                if isinstance(error, dict):
+                    raise OVSDBError(error.get('error'), error.get('details'))
+                raise OVSDBError(error)
+            return msg.get('result')
+
+    def transact(self, db, *operations):
+        """Perform OVSDB transaction.
+
+        :param db: Name of database, e.g. ``OVN_Northbound``
+        :type db: str
+        :param operations: OVSDB operations as defined in RFC 7047 5.2
+        :type operations: Dict[str, any]
+        :returns: Result of each operation
+        :rtype: List[Dict[str, any]]
+        :raises: OSError, OVSDBError
+        """
+        result = self.request('transact', [db] + list(operations))
+        for op_result in result:
+            if op_result and 'error' in op_result:
+                raise OVSDBError(op_result['error'],
+                                 op_result.get('details'))
+        return result
+
+    def select(self, db, table, where=None, columns=None):
+        """Select rows from table.
+
+        :param db: Name of database
+        :type db: str
+        :param table: Name of table
+        :type table: str
+        :param where: OVSDB conditions, all rows if None
+        :type where: Optional[List[List[any]]]
+        :param columns: Columns to return, all if None
+        :type columns: Optional[List[str]]
+        :returns: Rows
+        :rtype: List[Dict[str, any]]
+        :raises: OSError, OVSDBError
+        """
+        op = {'op': 'select', 'table': table, 'where': where or []}
+        if columns is not None:
+            op['columns'] = columns
+        return self.transact(db, op)[0]['rows']
+
+    def monitor(self, db, monitor_id, requests):
+        """Start monitoring tables.
+
+        Changes are subsequently delivered as ``update`` notifications with
+        ``[monitor_id, table_updates]`` as params, see ``wait_notification``.
+
+        :param db: Name of database
+        :type db: str
+        :param monitor_id: Identifier of monitor in notifications
+        :type monitor_id: str
+        :param requests: Map of table name to monitor request as defined in
+                         RFC 7047 4.1.5, e.g. ``{'columns': ['target']}``
+        :type requests: Dict[str, Dict[str, any]]
+        :returns: Initial contents of tables as table updates
+        :rtype: Dict[str, Dict[str, Dict[str, any]]]
+        :raises: OSError, OVSDBError
+        """
+        return self.request('monitor', [db, monitor_id, requests])
+
+    def unixctl(self, command, *args):
+        """Execute unixctl command, equivalent to ``ovn-appctl -t``.
+
+        :param command: Command, e.g. ``cluster/status``
+        :type command: str
+        :param args: Arguments for command
+        :type args: str
+        :returns: Textual output from command
+        :rtype: str
+        :raises: OSError, OVSDBError
+        """
+        return self.request(command, [str(arg) for arg in args])
@@ -0,0 +1,315 @@
+# Copyright 2021 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Opt-in hook profiling and subprocess accounting.
+
+When enabled, every process forked during the hook, whether by the charm
+itself or by charmhelpers, and every in-process OVSDB JSON-RPC request is
+recorded along with the reactive handler that caused it.  A JSON summary,
+and optionally cProfile statistics, is written when the hook exits.
+"""
+
+import collections
+import json
+import os
+import subprocess
+import time
+
+import charmhelpers.core as ch_core
+
+import charm.openstack.ovsdb_client as ovsdb_client
+
+PROFILE_DIR = '/var/lib/charm/ovn-central'
+PROFILING_MODES = ('summary', 'cprofile',)
+# Number of hooks to keep profiling output for
+PROFILE_RETENTION = 50
+# Attributed to work done outside of any reactive handler
+NO_HANDLER = '(none)'
+
+_profiler = None
+
+
+class Profiler(object):
+    """Accumulate command and handler timings for one hook execution."""
+
+    def __init__(self, hook_name, cprofile=False):
+        """Initialize profiler.
+
+        :param hook_name: Name of hook being profiled
+        :type hook_name: str
+        :param cprofile: Also collect cProfile statistics
+        :type cprofile: bool
+        """
+        self.hook_name = hook_name
+        self.start = time.time()
+        self.handler = NO_HANDLER
+        self.handlers = collections.OrderedDict()
+        self.commands = []
+        self.profile = None
+        if cprofile:
+            # NOTE: imported here to keep it off the path of every hook
+            import cProfile
+            self.profile = cProfile.Profile()
+
+    def record_command(self, kind, command, duration, returncode):
+        """Record a forked process or JSON-RPC request.
+
+        :param kind: 'exec' for processes, 'rpc' for JSON-RPC requests
+        :type kind: str
+        :param command: Command line or method and params
+        :type command: List[str]
+        :param duration: Duration in seconds
+        :type duration: float
+        :param returncode: Exit code, 0 or 1 for JSON-RPC requests
+        :type returncode: int
+        """
+        self.commands.append(collections.OrderedDict((
+            ('handler', self.handler),
+            ('kind', kind),
+            ('command', [str(arg) for arg in command]),
+            ('duration', round(duration, 6)),
+            ('returncode', returncode),
+        )))
+
+    def record_handler(self, handler, duration):
+        """Record execution of a reactive handler.
+
+        :param handler: Identifier of handler
+        :type handler: str
+        :param duration: Duration in seconds
+        :type duration: float
+        """
+        entry = self.handlers.setdefault(handler, {
+            'calls': 0, 'duration': 0.0})
+        entry['calls'] += 1
+        entry['duration'] = round(entry['duration'] + duration, 6)
+
+    def summary(self):
+        """Summarize hook execution.
+
+        :returns: Hook, duration, per handler totals and commands
+        :rtype: collections.OrderedDict
+        """
+        handlers = collections.OrderedDict(
+            (handler, dict(entry, commands=0, command_duration=0.0))
+            for handler, entry in self.handlers.items())
+        by_command = collections.defaultdict(
+            lambda: {'count': 0, 'duration': 0.0, 'failures': 0})
+        for cmd in self.commands:
+            entry = handlers.setdefault(cmd['handler'], {
+                'calls': 0, 'duration': 0.0, 'commands': 0,
+                'command_duration': 0.0})
+            entry['commands'] += 1
+            entry['command_duration'] = round(
+                entry['command_duration'] + cmd['duration'], 6)
+            name = (os.path.basename(cmd['command'][0])
+                    if cmd['kind'] == 'exec' else
+                    'rpc:{}'.format(cmd['command'][0]))
+            by_command[name]['count'] += 1
+            by_command[name]['duration'] = round(
+                by_command[name]['duration'] + cmd['duration'], 6)
+            if cmd['returncode']:
+                by_command[name]['failures'] += 1
+        return collections.OrderedDict((
+            ('hook', self.hook_name),
+            ('start', self.start),
+            ('duration', round(time.time() - self.start, 6)),
+            ('handlers', handlers),
+            ('by-command', collections.OrderedDict(
+                sorted(by_command.items(),
+                       key=lambda item: -item[1]['duration']))),
+            ('commands', self.commands),
+        ))
+
+
+class ProfiledPopen(subprocess.Popen):
+    """``subprocess.Popen`` recording duration and exit code of processes.
+
+    ``subprocess.run``, ``check_output``, ``check_call`` and ``call`` all
+    create their processes through ``Popen``, so do the charmhelpers
+    helpers.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._profile_start = time.time()
+        self._profile_recorded = False
+        super().__init__(*args, **kwargs)
+
+    def _profile_record(self):
+        if self._profile_recorded or _profiler is None:
+            return
+        self._profile_recorded = True
+        command = self.args
+        if isinstance(command, (str, bytes)):
+            command = [command]
+        _profiler.record_command('exec', command,
+                                 time.time() - self._profile_start,
+                                 self.returncode)
+
+    def wait(self, timeout=None):
+        returncode = super().wait(timeout=timeout)
+        self._profile_record()
+        return returncode
+
+    def poll(self):
+        returncode = super().poll()
+        if returncode is not None:
+            self._profile_record()
+        return returncode
+
+
+def _profiled_request(request):
+    def wrapper(self, method, params):
+        start = time.time()
+        returncode = 1
+        try:
+            result = request(self, method, params)
+            returncode = 0
+            return result
+        finally:
+            if _profiler:
+                _profiler.record_command(
+                    'rpc', [method] + list(params), time.time() - start,
+                    returncode)
+    wrapper.__wrapped__ = request
+    return wrapper
+
+
+def _profiled_invoke(invoke):
+    def wrapper(handler):
+        if _profiler is None:
+            return invoke(handler)
+        previous = _profiler.handler
+        _profiler.handler = handler.id()
+        start = time.time()
+        try:
+            return invoke(handler)
+        finally:
+            _profiler.record_handler(_profiler.handler, time.time() - start)
+            _profiler.handler = previous
+    wrapper.__wrapped__ = invoke
+    return wrapper
+
+
+def enable(hook_name, cprofile=False):
+    """Start profiling the current hook.
+
+    :param hook_name: Name of hook
+    :type hook_name: str
+    :param cprofile: Also collect cProfile statistics
+    :type cprofile: bool
+    :returns: Profiler
+    :rtype: Profiler
+    """
+    global _profiler
+    if _profiler:
+        return _profiler
+    _profiler = Profiler(hook_name, cprofile=cprofile)
+    subprocess.Popen = ProfiledPopen
+    ovsdb_client.OVSDBClient.request = _profiled_request(
+        ovsdb_client.OVSDBClient.request)
+    try:
+        import charms.reactive.bus as bus
+        bus.Handler.invoke = _profiled_invoke(bus.Handler.invoke)
+    except (ImportError, AttributeError):
+        ch_core.hookenv.log('Unable to attribute profiling to handlers',
+                            level=ch_core.hookenv.DEBUG)
+    if _profiler.profile:
+        _profiler.profile.enable()
+    return _profiler
+
+
+def disable():
+    """Stop profiling and restore the wrapped functions.
+
+    :returns: Profiler of the hook, None if not profiling
+    :rtype: Optional[Profiler]
+    """
+    global _profiler
+    profiler = _profiler
+    if not profiler:
+        return
+    if profiler.profile:
+        profiler.profile.disable()
+    subprocess.Popen = ProfiledPopen.__bases__[0]
+    ovsdb_client.OVSDBClient.request = (
+        ovsdb_client.OVSDBClient.request.__wrapped__)
+    try:
+        import charms.reactive.bus as bus
+        bus.Handler.invoke = getattr(bus.Handler.invoke, '__wrapped__',
+                                     bus.Handler.invoke)
+    except ImportError:
+        pass
+    _profiler = None
+    return profiler
+
+
+def write_output(profiler, output_dir=PROFILE_DIR,
+                 retention=PROFILE_RETENTION):
+    """Write JSON summary and cProfile statistics of hook.
+
+    Output of all but the ``retention`` most recent hooks is removed.
+
+    :param profiler: Profiler of the hook
+    :type profiler: Profiler
+    :param output_dir: Directory to write files to
+    :type output_dir: str
+    :param retention: Number of hooks to keep output for
+    :type retention: int
+    :returns: Path to JSON summary
+    :rtype: str
+    """
+    os.makedirs(output_dir, mode=0o700, exist_ok=True)
+    prefix = os.path.join(output_dir, 'profile-{}-{}'.format(
+        time.strftime('%Y%m%dT%H%M%SZ', time.gmtime(profiler.start)),
+        profiler.hook_name))
+    with open(prefix + '.json', 'w') as summary_file:
+        json.dump(profiler.summary(), summary_file, indent=2)
+    if profiler.profile:
+        profiler.profile.dump_stats(prefix + '.prof')
+    # NOTE: file names sort by time of hook
+    hooks = sorted(set(
+        os.path.splitext(name)[0] for name in os.listdir(output_dir)
+        if name.startswith('profile-')))
+    for stale in hooks[:-retention]:
+        for ext in ('.json', '.prof'):
+            path = os.path.join(output_dir, stale + ext)
+            if os.path.exists(path):
+                os.unlink(path)
+    return prefix + '.json'
+
+
+def _finish():
+    profiler = disable()
+    if not profiler:
+        return
+    try:
+        path = write_output(profiler)
+    except OSError as e:
+        ch_core.hookenv.log('Unable to write profiling output: {}'
+                            .format(e), level=ch_core.hookenv.WARNING)
+        return
+    ch_core.hookenv.log('Hook profile written to {}'.format(path),
+                        level=ch_core.hookenv.INFO)
+
+
+def enable_from_config():
+    """Profile the current hook if enabled by ``hook-profiling`` config.
+
+    The output is written when the hook exits.
+    """
+    mode = ch_core.hookenv.config().get('hook-profiling')
+    if mode not in PROFILING_MODES:
+        return
+    enable(ch_core.hookenv.hook_name(), cprofile=(mode == 'cprofile'))
+    ch_core.hookenv.atexit(_finish)
@@ -15,11 +15,16 @@
 import charms.reactive as reactive
 import charms.leadership as leadership
 
-import charms_openstack.bus
 import charms_openstack.charm as charm
 
+# NOTE: importing the module registers the charm classes and their release
+# selector, which is all ``charms_openstack.bus.discover()`` would do after
+# walking and importing every module of the charm library.
+import charm.openstack.ovn_central as ovn_central  # noqa
+import charm.openstack.profiling as profiling
 
-charms_openstack.bus.discover()
+
+profiling.enable_from_config()
 
 # Use the charms.openstack defaults for common states and hooks
 charm.use_defaults(
@@ -114,7 +119,7 @@ def configure_firewall():
     ovsdb_peer = reactive.endpoint_from_flag('ovsdb-peer.available')
     ovsdb_cms = reactive.endpoint_from_flag('ovsdb-cms.connected')
     with charm.provide_charm_instance() as ovn_charm:
-        ovn_charm.configure_firewall({
+        port_addr_map = {
             (ovsdb_peer.db_nb_port,
                 ovsdb_peer.db_sb_admin_port,
                 ovsdb_peer.db_sb_cluster_port,
@@ -124,7 +129,16 @@ def configure_firewall():
             (ovsdb_peer.db_nb_port,
                 ovsdb_peer.db_sb_admin_port,):
             ovsdb_cms.client_remote_addrs if ovsdb_cms else None,
-        })
+        }
+        if ovn_charm.sb_relay_ports():
+            # NOTE: The relay ports are open to all like the Southbound DB
+            # port.  Each relay connects to the admin port of every cluster
+            # member, including the local one, so only open that port to the
+            # peers and not to the relay clients.
+            port_addr_map[(ovsdb_peer.db_sb_admin_port,)] = (
+                (ovsdb_peer.cluster_local_addr,) +
+                tuple(ovsdb_peer.cluster_remote_addrs))
+        ovn_charm.configure_firewall(port_addr_map)
         ovn_charm.assess_status()
 
 
@@ -136,11 +150,26 @@ def configure_firewall():
                'certificates.available')
 def publish_addr_to_clients():
     ovsdb_peer = reactive.endpoint_from_flag('ovsdb-peer.available')
-    for ep in [reactive.endpoint_from_flag('ovsdb.connected'),
+    ovsdb = reactive.endpoint_from_flag('ovsdb.connected')
+    for ep in [ovsdb,
                reactive.endpoint_from_flag('ovsdb-cms.connected')]:
         if not ep:
             continue
         ep.publish_cluster_local_addr(ovsdb_peer.cluster_local_addr)
+    if not ovsdb:
+        return
+    with charm.provide_charm_instance() as ovn_charm:
+        relay_conn = ','.join(
+            conn
+            for port in ovn_charm.sb_relay_ports()
+            for conn in ovsdb_peer.db_connection_strs(
+                (ovsdb_peer.cluster_local_addr,), port))
+    # NOTE: The ovsdb interface has no notion of relays, publish the
+    # connection strings of the relays on this unit for clients that
+    # support them.  The key is removed when relays are disabled.
+    for relation in ovsdb.relations:
+        relation.to_publish_raw['sb-relay-connection-strs'] = (
+            relay_conn or None)
 
 
 @reactive.when_none('is-update-status-hook')
@@ -176,30 +205,175 @@ def render():
         #
         # Replace this with functionality in ``ovn-ctl`` when support has been
         # added upstream.
-        ovn_charm.join_cluster('ovnnb_db.db', 'OVN_Northbound',
-                               ovsdb_peer.db_connection_strs(
-                                   (ovsdb_peer.cluster_local_addr,),
-                                   ovsdb_peer.db_nb_cluster_port),
-                               ovsdb_peer.db_connection_strs(
-                                   ovsdb_peer.cluster_remote_addrs,
-                                   ovsdb_peer.db_nb_cluster_port))
-        ovn_charm.join_cluster('ovnsb_db.db', 'OVN_Southbound',
-                               ovsdb_peer.db_connection_strs(
-                                   (ovsdb_peer.cluster_local_addr,),
-                                   ovsdb_peer.db_sb_cluster_port),
-                               ovsdb_peer.db_connection_strs(
-                                   ovsdb_peer.cluster_remote_addrs,
-                                   ovsdb_peer.db_sb_cluster_port))
+        if (ovn_charm.config['ovsdb-fast-join'] and
+                not ovn_charm.databases_exist() and
+                not ovn_charm.join_snapshot_ready()):
+            reactive.set_flag('cluster.join-deferred')
+            ovn_charm.assess_status()
+            return
+        ovn_charm.join_clusters([
+            ('ovnnb_db.db', 'OVN_Northbound',
+             ovsdb_peer.db_connection_strs(
+                 (ovsdb_peer.cluster_local_addr,),
+                 ovsdb_peer.db_nb_cluster_port),
+             ovsdb_peer.db_connection_strs(
+                 ovsdb_peer.cluster_remote_addrs,
+                 ovsdb_peer.db_nb_cluster_port)),
+            ('ovnsb_db.db', 'OVN_Southbound',
+             ovsdb_peer.db_connection_strs(
+                 (ovsdb_peer.cluster_local_addr,),
+                 ovsdb_peer.db_sb_cluster_port),
+             ovsdb_peer.db_connection_strs(
+                 ovsdb_peer.cluster_remote_addrs,
+                 ovsdb_peer.db_sb_cluster_port)),
+        ])
+        ovn_charm.clear_join_snapshot_request()
+        reactive.clear_flag('cluster.join-deferred')
         if ovn_charm.enable_services():
             # Handle any post deploy configuration changes impacting listeners
             ovn_charm.configure_ovn(
                 ovsdb_peer.db_nb_port,
                 ovsdb.db_sb_port,
                 ovsdb_peer.db_sb_admin_port)
+            ovn_charm.configure_sb_relays(
+                ovsdb_peer.db_connection_strs(
+                    [ovsdb_peer.cluster_local_addr] +
+                    list(ovsdb_peer.cluster_remote_addrs),
+                    ovsdb_peer.db_sb_admin_port))
             reactive.set_flag('config.rendered')
         ovn_charm.assess_status()
 
 
+@reactive.when('is-update-status-hook',
+               'cluster.join-deferred',
+               'ovsdb-peer.available',
+               'leadership.set.nb_cid',
+               'leadership.set.sb_cid',
+               'certificates.connected',
+               'certificates.available')
+def retry_deferred_join():
+    """Retry joining the cluster while waiting for peers to compact.
+
+    Makes the unit join after the timeout even when peers never respond.
+    """
+    render()
+
+
+@reactive.when_none('charm.paused', 'is-update-status-hook')
+@reactive.when('config.rendered', 'ovsdb-peer.available')
+def prepare_join_snapshots():
+    """Compact databases for peers waiting to join the cluster."""
+    with charm.provide_charm_instance() as ovn_charm:
+        ovn_charm.prepare_join_snapshots()
+
+
+@reactive.when_none('charm.paused')
+@reactive.when('config.rendered',
+               'leadership.set.nb_cid',
+               'leadership.set.sb_cid')
+def advance_election_timer():
+    """Take next step of any election timer change in progress.
+
+    The election timer is changed one step at a time to avoid blocking hook
+    execution, this handler also runs in the ``update-status`` hook so that
+    the change converges even when no other hooks fire.
+    """
+    with charm.provide_charm_instance() as ovn_charm:
+        if ovn_charm.election_timer_progress():
+            ovn_charm.advance_election_timer()
+            ovn_charm.assess_status()
+
+
+@reactive.when_none('charm.paused')
+@reactive.when('config.rendered',
+               'leadership.set.nb_cid',
+               'leadership.set.sb_cid')
+def run_compaction_policy():
+    """Compact databases within the configured compaction window.
+
+    Also runs in the ``update-status`` hook as the window is time based.
+    """
+    with charm.provide_charm_instance() as ovn_charm:
+        ovn_charm.run_compaction_policy()
+
+
+@reactive.when_none('charm.paused')
+@reactive.when('config.rendered')
+def configure_northd_threads():
+    """Apply ovn-northd parallel build thread count.
+
+    Also runs in the ``update-status`` hook so that the setting is restored
+    after ovn-northd has been restarted.
+    """
+    with charm.provide_charm_instance() as ovn_charm:
+        ovn_charm.configure_northd_threads()
+
+
+@reactive.when_none('charm.paused')
+@reactive.when('config.rendered')
+def configure_ovsdb_tuning():
+    """Apply ovsdb-server runtime tunables.
+
+    Also runs in the ``update-status`` hook so that the settings are restored
+    after ovsdb-server has been restarted.
+    """
+    with charm.provide_charm_instance() as ovn_charm:
+        ovn_charm.configure_ovsdb_tuning()
+
+
+@reactive.when_none('charm.paused')
+@reactive.when('config.rendered')
+def check_tls_in_use():
+    """Report when rotated TLS material is served by ovsdb-server.
+
+    Also runs in the ``update-status`` hook, which is a no-op unless a
+    certificate written by an earlier hook is not confirmed in use yet.
+    """
+    with charm.provide_charm_instance() as ovn_charm:
+        ovn_charm.check_tls_in_use()
+
+
+@reactive.when_none('charm.paused')
+@reactive.when('config.rendered', 'certificates.available')
+def advance_ca_rotation():
+    """Progress staged CA rotation.
+
+    Switches certificate once peers trust the new CA and prunes old CAs
+    after the grace period, hence also runs in the ``update-status`` hook.
+    """
+    with charm.provide_charm_instance() as ovn_charm:
+        if ovn_charm.ca_rotation_in_progress():
+            ovn_charm.configure_tls(
+                certificates_interface=reactive.endpoint_from_flag(
+                    'certificates.available'))
+
+
+@reactive.when_none('charm.paused')
+@reactive.when('is-update-status-hook',
+               'config.rendered',
+               'ovsdb-peer.available')
+def adapt_inactivity_probe():
+    """Adjust listener inactivity probes to the observed load."""
+    ovsdb = reactive.endpoint_from_name('ovsdb')
+    ovsdb_peer = reactive.endpoint_from_flag('ovsdb-peer.available')
+    with charm.provide_charm_instance() as ovn_charm:
+        ovn_charm.adapt_inactivity_probe(
+            ovsdb_peer.db_nb_port,
+            ovsdb.db_sb_port,
+            ovsdb_peer.db_sb_admin_port)
+
+
+@reactive.when('ovsdb-peer.connected')
+def publish_restart_pending():
+    """Publish pending restarts to peers for the rolling-restart action.
+
+    Also runs in the ``update-status`` hook as package updates may defer
+    restarts outside of hook execution.
+    """
+    with charm.provide_charm_instance() as ovn_charm:
+        ovn_charm.publish_restart_pending()
+
+
 @reactive.when_none('charm.paused', 'is-update-status-hook')
 @reactive.when('config.rendered')
 @reactive.when_not('nrpe-external-master.configured')
@@ -214,6 +388,21 @@ def configure_nrpe():
     reactive.set_flag('nrpe-external-master.configured')
 
 
+@reactive.when('nrpe-external-master.configured')
+@reactive.when_any('config.changed.ovn-db-connections-monitor',
+                   'config.changed.nagios-raft-uncommitted-entries-warn',
+                   'config.changed.nagios-raft-uncommitted-entries-crit',
+                   'config.changed.nagios-raft-leader-change-warn',
+                   'config.changed.nagios-raft-leader-change-crit',
+                   'config.changed.nagios-raft-log-entries-warn',
+                   'config.changed.nagios-raft-log-entries-crit',
+                   'config.changed.nagios-raft-disconnected-servers-warn',
+                   'config.changed.nagios-raft-disconnected-servers-crit')
+def reconfigure_nrpe():
+    """Re-render NRPE configuration when the connections check changes."""
+    reactive.clear_flag('nrpe-external-master.configured')
+
+
 @reactive.when_not('nrpe-external-master.available')
 @reactive.when('nrpe-external-master.configured')
 def remove_nrpe_config():
@@ -223,6 +412,14 @@ def remove_nrpe_config():
     reactive.clear_flag('nrpe-external-master.configured')
 
 
+@reactive.when_not('is-update-status-hook')
+@reactive.when('charm.installed')
+def configure_metrics_exporter():
+    """Install or remove the Prometheus textfile metrics collector."""
+    with charm.provide_charm_instance() as ovn_charm:
+        ovn_charm.configure_metrics_exporter()
+
+
 @reactive.when_not('is-update-status-hook')
 def configure_deferred_restarts():
     with charm.provide_charm_instance() as instance:
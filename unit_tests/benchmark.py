@@ -0,0 +1,654 @@
+# Copyright 2021 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmark reactive handler hot paths.
+
+Runs the ``render``, ``configure_firewall``, ``announce_leader_ready`` and
+``configure_nrpe`` handlers end to end with a real charm instance against
+fake ``ovsdb-server`` processes and a fake ``ufw``, for clusters of several
+sizes and numbers of CMS client addresses.  Each handler is run twice, the
+``cold`` run starts from a pristine unit and the ``warm`` run measures the
+steady state of a hook re-running with nothing to change.
+
+For each run the number of processes the charm would have forked, the wall
+time and the number of bytes written to disk are reported as JSON.  Calls
+to charmhelpers functions that fork, e.g. ``service_restart`` or the ufw
+helpers, are counted as forks.  Templates are rendered by charmhelpers,
+which is mocked in the unit tests, so the template sources are written in
+place of the rendered files.
+
+The time taken to import the handlers module in a fresh interpreter, which
+every hook pays before running any handler, is reported as ``(startup)``.
+
+Run from the top of the repository::
+
+    python3 -m unit_tests.benchmark --output results.json
+
+and compare with earlier results to detect regressions::
+
+    python3 -m unit_tests.benchmark --baseline results.json
+"""
+
+import argparse
+import collections
+import contextlib
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import yaml
+
+import unittest.mock as mock
+
+import reactive.ovn_central_handlers as handlers
+
+import charm.openstack.ovn_central as ovn_central
+
+from unit_tests.fake_ovsdb_server import FakeOVSDBServer
+
+UNITS = (3, 5, 7)
+CLIENTS = (10, 100, 1000)
+HANDLERS = (
+    'render',
+    'configure_firewall',
+    'announce_leader_ready',
+    'configure_nrpe',
+)
+RUNS = ('cold', 'warm')
+# Wall time increase tolerated when comparing with a baseline
+TOLERANCE = 0.5
+
+CHARM_DIR = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'src')
+
+CLUSTER_STATUS = """{sid:.4}
+Name: {schema}
+Cluster ID: {cid:.4} ({cid})
+Server ID: {sid:.4} ({sid})
+Address: ssl:10.0.0.1:{port}
+Status: cluster member
+Role: leader
+Term: 2
+Leader: self
+Vote: self
+
+Election timer: 4000
+Log: [2, 42]
+Entries not yet committed: 0
+Entries not yet applied: 0
+Connections: {connections}
+Disconnections: 0
+Servers:
+{servers}
+"""
+
+
+class FakeKV(dict):
+    """Minimal stand-in for ``charmhelpers.core.unitdata.Storage``."""
+
+    def set(self, key, value):
+        self[key] = value
+
+    def unset(self, key):
+        self.pop(key, None)
+
+    def flush(self):
+        pass
+
+
+class FakeClusterStatus(collections.namedtuple('FakeClusterStatus', (
+        'name', 'cluster_id', 'server_id', 'address', 'status', 'role',
+        'term', 'leader', 'vote', 'election_timer', 'log',
+        'entries_not_yet_committed', 'entries_not_yet_applied',
+        'connections', 'servers'))):
+    """Stand-in for ``charmhelpers.contrib.network.ovs.ovn``'s class."""
+
+    @property
+    def is_cluster_leader(self):
+        return self.leader == 'self'
+
+
+class Recorder(object):
+    """Record processes forked by the charm."""
+
+    def __init__(self):
+        self.forks = []
+
+    def fork(self, *argv):
+        self.forks.append([str(arg) for arg in argv])
+
+    def commands(self):
+        """Number of forks by command name.
+
+        :rtype: Dict[str, int]
+        """
+        counts = collections.Counter(
+            os.path.basename(argv[0]) for argv in self.forks)
+        return dict(sorted(counts.items()))
+
+
+class FakePopen(object):
+    """Stand-in for ``subprocess.Popen`` that records and emulates forks."""
+
+    recorder = None
+
+    def __init__(self, args, stdout=None, stderr=None,
+                 universal_newlines=None, text=None, **_):
+        self.args = args
+        self.recorder.fork(*args)
+        self.returncode = 0
+        output = ''
+        if list(args[:2]) == ['ovsdb-tool', 'join-cluster']:
+            with open(args[2], 'w') as db_file:
+                db_file.write('CLUSTER\n')
+        self.text = universal_newlines or text
+        self.output = output if self.text else output.encode()
+        self.stdout = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+    def communicate(self, input=None, timeout=None):
+        return self.output, None
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self, timeout=None):
+        return self.returncode
+
+    def kill(self):
+        pass
+
+
+class FakeUFW(object):
+    """In-memory ufw, each call is recorded as a fork of ``ufw``."""
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+        self.rules = []
+
+    def enable(self, *_):
+        self.recorder.fork('ufw', 'enable')
+        return True
+
+    def default_policy(self, policy, direction):
+        self.recorder.fork('ufw', 'default', policy, direction)
+        return True
+
+    def status(self):
+        self.recorder.fork('ufw', 'status', 'numbered')
+        for num, rule in enumerate(list(self.rules), 1):
+            yield num, dict(rule)
+
+    def modify_access(self, src, dst='any', port=None, proto=None,
+                      action='allow', index=None, prepend=False,
+                      comment=None):
+        self.recorder.fork('ufw', action, src, port)
+        if action == 'delete':
+            del self.rules[index - 1]
+            return
+        rule = {
+            'to': '{}/{}'.format(port, proto) if proto else str(port),
+            'action': '{} in'.format(action),
+            'from': src or 'any',
+            'comment': comment,
+        }
+        if prepend:
+            self.rules.insert(0, rule)
+        else:
+            self.rules.append(rule)
+
+
+class FakeDatabase(object):
+    """In-memory OVSDB tables served by a ``FakeOVSDBServer``."""
+
+    def __init__(self, tables=()):
+        self.tables = {table: collections.OrderedDict() for table in tables}
+
+    @staticmethod
+    def _matches(row, where):
+        for column, function, value in where:
+            if column == '_uuid':
+                value = value[1]
+            if function != '==' or row.get(column) != value:
+                return False
+        return True
+
+    def transact(self, params):
+        results = []
+        for op in params[1:]:
+            table = self.tables.setdefault(op['table'],
+                                           collections.OrderedDict())
+            rows = [row for row in table.values()
+                    if self._matches(row, op.get('where', []))]
+            if op['op'] == 'select':
+                columns = op.get('columns')
+                results.append({'rows': [
+                    {k: (['uuid', v] if k == '_uuid' else v)
+                     for k, v in row.items()
+                     if columns is None or k in columns}
+                    for row in rows]})
+            elif op['op'] == 'insert':
+                row_uuid = str(uuid.uuid4())
+                table[row_uuid] = dict(op['row'], _uuid=row_uuid)
+                results.append({'uuid': ['uuid', row_uuid]})
+            elif op['op'] == 'update':
+                for row in rows:
+                    row.update(op['row'])
+                results.append({'count': len(rows)})
+            else:
+                results.append({'count': len(rows)})
+        return results
+
+
+class Sandbox(object):
+    """Run handlers for a simulated unit in an isolated environment.
+
+    :param units: Number of units in the cluster
+    :type units: int
+    :param clients: Number of CMS client addresses
+    :type clients: int
+    """
+
+    def __init__(self, units, clients):
+        self.units = units
+        self.clients = clients
+        self.recorder = Recorder()
+        self.ufw = FakeUFW(self.recorder)
+        self.kv = FakeKV()
+        self.databases = {
+            'nb': FakeDatabase(('Connection', 'NB_Global')),
+            'sb': FakeDatabase(('Connection', 'SB_Global')),
+        }
+        self.databases['nb'].tables['NB_Global']['global'] = {
+            '_uuid': 'global', 'options': ['map', []]}
+        self._stack = contextlib.ExitStack()
+
+    def __enter__(self):
+        self.root = tempfile.mkdtemp()
+        self._stack.callback(shutil.rmtree, self.root)
+        for path in ('run', 'lib', 'scripts', 'plugins', 'etc/cron.d',
+                     'etc/systemd/system'):
+            os.makedirs(os.path.join(self.root, path))
+        self._start_ovsdb_servers()
+        self._patch_environment()
+        self.charm = self._make_charm()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._stack.__exit__(*exc_info)
+
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def _start_ovsdb_servers(self):
+        peers = ['10.0.0.{}'.format(n) for n in range(1, self.units + 1)]
+        for db, port in (('nb', 6643), ('sb', 6644)):
+            ovn_db = 'ovn{}_db'.format(db)
+            sids = [str(uuid.uuid4()) for _ in peers]
+            status = CLUSTER_STATUS.format(
+                sid=sids[0], cid=str(uuid.uuid4()), port=port,
+                schema=ovn_central.OVN_SCHEMAS[ovn_db],
+                connections=' '.join('->{0:.4} <-{0:.4}'.format(sid)
+                                     for sid in sids[1:]),
+                servers='\n'.join(
+                    '    {0:.4} ({0:.4} at ssl:{1}:{2})'.format(
+                        sid, addr, port)
+                    for sid, addr in zip(sids, peers)))
+            ctl = self._stack.enter_context(FakeOVSDBServer({
+                'cluster/status': lambda params, status=status: status,
+            }, name='{}.ctl'.format(ovn_db)))
+            sock = self._stack.enter_context(FakeOVSDBServer({
+                'transact': self.databases[db].transact,
+            }, name='{}.sock'.format(ovn_db)))
+            for server in (ctl, sock):
+                os.symlink(server.path,
+                           self.path('run', os.path.basename(server.path)))
+        northd = self._stack.enter_context(FakeOVSDBServer({
+            'status': lambda params: 'Status: active\n',
+            'parallel-build/get-n-threads': lambda params: '1\n',
+            'parallel-build/set-n-threads': lambda params: '',
+        }, name='ovn-northd.4242.ctl'))
+        os.symlink(northd.path, self.path('run', 'ovn-northd.4242.ctl'))
+        with open(self.path('run', 'ovn-northd.pid'), 'w') as pidfile:
+            pidfile.write('4242\n')
+
+    def _fork(self, *argv, result=True):
+        def _record(*args, **kwargs):
+            self.recorder.fork(*(argv + args))
+            return result
+        return _record
+
+    def _write_file(self, path, content, *args, **kwargs):
+        if not path.startswith(self.root):
+            path = self.path(path.lstrip('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        with open(path, 'wb') as target:
+            target.write(content)
+
+    def _rsync(self, from_path, to_path, options=None, **_):
+        self.recorder.fork('rsync', from_path, to_path)
+        target = os.path.join(to_path, os.path.basename(from_path))
+        if not os.path.exists(target):
+            shutil.copy(from_path, target)
+
+    def _render(self, charm, interfaces, configs=None):
+        # NOTE: templates are rendered by charmhelpers which is mocked, write
+        # the template sources instead.
+        for target in configs or charm.full_restart_map:
+            name = os.path.basename(target)
+            source = os.path.join(CHARM_DIR, 'templates', charm.release, name)
+            if not os.path.exists(source):
+                source = os.path.join(CHARM_DIR, 'templates', name)
+            with open(source) as template:
+                self._write_file(target, template.read())
+
+    def _patch(self, target, attribute, **kwargs):
+        self._stack.enter_context(
+            mock.patch.object(target, attribute, **kwargs))
+
+    def _patch_environment(self):
+        FakePopen.recorder = self.recorder
+        self._patch(subprocess, 'Popen', new=FakePopen)
+        for name, value in (
+                ('SCRIPTS_DIR', self.path('scripts')),
+                ('NAGIOS_PLUGINS_PATH', self.path('plugins')),
+                ('NRPE_CRON_FILE', self.path(
+                    'etc/cron.d/check_ovn_db_connections')),
+                ('METRICS_CRON_FILE', self.path(
+                    'etc/cron.d/ovn-central-metrics')),
+                ('CONNECTIONS_MONITOR_UNIT', self.path(
+                    'etc/systemd/system/ovn-db-connections-check.service')),
+                ('SB_RELAY_UNIT', self.path(
+                    'etc/systemd/system/ovn-sb-relay@.service')),
+                ('SB_RELAY_CONFIG', self.path(
+                    'etc/ovn/ovn-sb-relay-{}.json'))):
+            self._patch(ovn_central, name, new=value)
+        hookenv = ovn_central.ch_core.hookenv
+        self._patch(hookenv, 'charm_dir', return_value=CHARM_DIR)
+        self._patch(hookenv, 'relation_ids', return_value=[])
+        self._patch(hookenv, 'local_unit', return_value='ovn-central/0')
+        host = ovn_central.ch_core.host
+        for name in ('service_resume', 'service_restart', 'service_start',
+                     'service_stop', 'service_reload'):
+            self._patch(host, name, side_effect=self._fork(
+                'systemctl', name.split('_')[1]))
+        self._patch(host, 'service', side_effect=self._fork('systemctl'))
+        self._patch(host, 'rsync', side_effect=self._rsync)
+        self._patch(host, 'write_file', side_effect=self._write_file)
+        self._patch(ovn_central.ch_core.unitdata, 'kv',
+                    return_value=self.kv)
+        for name in ('enable', 'default_policy', 'status', 'modify_access'):
+            self._patch(ovn_central.ch_ufw, name,
+                        side_effect=getattr(self.ufw, name))
+        self._patch(ovn_central.ch_ovn, 'OVNClusterStatus',
+                    new=FakeClusterStatus)
+        self._patch(ovn_central.ch_ovn, 'ovn_appctl',
+                    side_effect=self._fork('ovn-appctl', result=''))
+        nrpe = mock.MagicMock()
+        nrpe.get_nagios_hostname.return_value = 'ovn-central-0'
+        nrpe.get_nagios_unit_name.return_value = 'ovn-central/0'
+        nrpe.NRPE.return_value.write.side_effect = self._fork(
+            'systemctl', 'restart', 'nagios-nrpe-server')
+        self._patch(ovn_central, 'nrpe', new=nrpe)
+
+    def _make_charm(self):
+        config = {
+            key: option.get('default')
+            for key, option in yaml.safe_load(open(os.path.join(
+                CHARM_DIR, 'config.yaml')))['options'].items()}
+        with mock.patch.object(ovn_central.charms_openstack.adapters,
+                               'config_property'):
+            instance = ovn_central.UssuriOVNCentralCharm(
+                config=config,
+                release=ovn_central.UssuriOVNCentralCharm.release)
+        self._patch(instance, 'ovn_rundir', return_value=self.path('run'))
+        self._patch(instance, 'ovsdb_path',
+                    side_effect=lambda db_file: self.path('lib', db_file))
+        self._patch(instance, 'check_if_paused', return_value=(None, None))
+        self._patch(instance, 'sb_relay_supported', return_value=True)
+        instance.restart_map = {
+            self.path(target.lstrip('/')): services
+            for target, services in instance.restart_map.items()}
+        self._patch(ovn_central.charms_openstack.charm.OpenStackCharm,
+                    'render_with_interfaces', autospec=True,
+                    side_effect=self._render)
+        self._patch(instance, 'assess_status',
+                    side_effect=instance.custom_assess_status_last_check)
+        return instance
+
+    def endpoints(self):
+        """Fake endpoints of relations.
+
+        :returns: Map of flag or relation name to endpoint
+        :rtype: Dict[str, mock.MagicMock]
+        """
+        ovsdb_peer = mock.MagicMock()
+        ovsdb_peer.cluster_local_addr = '10.0.0.1'
+        ovsdb_peer.cluster_remote_addrs = tuple(
+            '10.0.0.{}'.format(n) for n in range(2, self.units + 1))
+        ovsdb_peer.db_nb_port = 6641
+        ovsdb_peer.db_sb_port = 6642
+        ovsdb_peer.db_sb_admin_port = 16642
+        ovsdb_peer.db_nb_cluster_port = 6643
+        ovsdb_peer.db_sb_cluster_port = 6644
+        ovsdb_peer.db_connection_strs.side_effect = lambda addrs, port: [
+            'ssl:{}:{}'.format(addr, port) for addr in addrs]
+        ovsdb = mock.MagicMock()
+        ovsdb.db_sb_port = 6642
+        ovsdb.relations = []
+        ovsdb_cms = mock.MagicMock()
+        ovsdb_cms.client_remote_addrs = [
+            '10.{}.{}.{}'.format(1 + n // 65536, n // 256 % 256, n % 256)
+            for n in range(self.clients)]
+        return {
+            'ovsdb-peer.available': ovsdb_peer,
+            'ovsdb-peer.connected': ovsdb_peer,
+            'ovsdb-cms.connected': ovsdb_cms,
+            'ovsdb.connected': ovsdb,
+            'ovsdb': ovsdb,
+        }
+
+    def _disk_usage(self):
+        usage = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                if os.path.isfile(path) and not os.path.islink(path):
+                    stat = os.stat(path)
+                    usage[path] = (stat.st_size, stat.st_mtime_ns)
+        return usage
+
+    def run(self, handler):
+        """Run handler and measure it.
+
+        :param handler: Name of handler in the handlers module
+        :type handler: str
+        :returns: Forks, forks by command, wall time and bytes written
+        :rtype: Dict[str, any]
+        """
+        endpoints = self.endpoints()
+
+        @contextlib.contextmanager
+        def provide_charm_instance():
+            yield self.charm
+
+        with contextlib.ExitStack() as stack:
+            for target, attribute, kwargs in (
+                    (handlers.charm, 'provide_charm_instance',
+                     {'new': provide_charm_instance}),
+                    (handlers.reactive, 'endpoint_from_flag',
+                     {'side_effect': endpoints.get}),
+                    (handlers.reactive, 'endpoint_from_name',
+                     {'side_effect': endpoints.get}),
+                    (handlers.reactive, 'set_flag', {}),
+                    (handlers.reactive, 'clear_flag', {}),
+                    (handlers.leadership, 'leader_set', {})):
+                stack.enter_context(
+                    mock.patch.object(target, attribute, **kwargs))
+            del self.recorder.forks[:]
+            before = self._disk_usage()
+            start = time.perf_counter()
+            getattr(handlers, handler)()
+            wall_time = time.perf_counter() - start
+        after = self._disk_usage()
+        return {
+            'forks': len(self.recorder.forks),
+            'fork_commands': self.recorder.commands(),
+            'wall_time': round(wall_time, 6),
+            'bytes_written': sum(
+                size for path, (size, mtime) in after.items()
+                if before.get(path) != (size, mtime)),
+        }
+
+
+def run_benchmarks(units=UNITS, clients=CLIENTS, handler_names=HANDLERS,
+                   repeat=1):
+    """Run all scenarios.
+
+    The wall time reported is the minimum over the repetitions.
+
+    :returns: Result for each handler, run, cluster size and client count
+    :rtype: List[Dict[str, any]]
+    """
+    results = []
+    for n_units, n_clients, handler in itertools.product(
+            units, clients, handler_names):
+        best = {}
+        for _ in range(repeat):
+            with Sandbox(n_units, n_clients) as sandbox:
+                for run in RUNS:
+                    result = sandbox.run(handler)
+                    if (run not in best or
+                            result['wall_time'] < best[run]['wall_time']):
+                        best[run] = result
+        for run in RUNS:
+            results.append(collections.OrderedDict(
+                [('handler', handler), ('run', run), ('units', n_units),
+                 ('clients', n_clients)] + sorted(best[run].items())))
+    return results
+
+
+def _key(result):
+    return (result['handler'], result['run'], result['units'],
+            result['clients'])
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Find regressions compared with a baseline.
+
+    Any increase in forks or bytes written is a regression, as is wall time
+    growing by more than ``tolerance``.
+
+    :returns: Description of each regression
+    :rtype: List[str]
+    """
+    previous = {_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        base = previous.get(_key(result))
+        if not base:
+            continue
+        for metric in ('forks', 'bytes_written', 'wall_time'):
+            limit = base[metric]
+            if metric == 'wall_time':
+                limit *= 1 + tolerance
+            if result[metric] > limit:
+                regressions.append(
+                    '{} {} units={} clients={}: {} {} -> {}'.format(
+                        result['handler'], result['run'], result['units'],
+                        result['clients'], metric, base[metric],
+                        result[metric]))
+    return regressions
+
+
+STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+import unit_tests
+mocked = time.perf_counter()
+import reactive.ovn_central_handlers
+print(time.perf_counter() - mocked)
+"""
+
+
+def measure_startup(repeat=1):
+    """Measure time to load the handlers module in a fresh interpreter.
+
+    This is what every hook pays before any handler runs.  The time spent
+    setting up the unit test mocks is not included.
+
+    :returns: Result with the fastest of the repetitions
+    :rtype: Dict[str, any]
+    """
+    root = os.path.dirname(CHARM_DIR)
+    times = [
+        float(subprocess.check_output(
+            [sys.executable, '-c', STARTUP_SCRIPT], cwd=root,
+            universal_newlines=True))
+        for _ in range(repeat)]
+    return collections.OrderedDict((
+        ('handler', '(startup)'), ('run', 'cold'), ('units', 0),
+        ('clients', 0), ('bytes_written', 0), ('fork_commands', {}),
+        ('forks', 0), ('wall_time', round(min(times), 6)),
+    ))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--units', type=int, nargs='+', default=UNITS)
+    parser.add_argument('--clients', type=int, nargs='+', default=CLIENTS)
+    parser.add_argument('--handlers', nargs='+', default=HANDLERS,
+                        choices=HANDLERS)
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='repetitions, the fastest is reported')
+    parser.add_argument('--output', help='write results to file')
+    parser.add_argument('--baseline',
+                        help='compare with results from earlier run')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='relative wall time increase tolerated')
+    args = parser.parse_args(args)
+    results = [measure_startup(args.repeat)]
+    results.extend(run_benchmarks(args.units, args.clients, args.handlers,
+                                  args.repeat))
+    output = json.dumps({'results': results}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results,
+                                  json.load(baseline_file)['results'],
+                                  args.tolerance)
+        for regression in regressions:
+            print('REGRESSION: {}'.format(regression), file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
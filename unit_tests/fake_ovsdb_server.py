@@ -0,0 +1,130 @@
+# Copyright 2021 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Fake OVSDB JSON-RPC server listening on a local unix socket."""
+
+import json
+import os
+import shutil
+import socketserver
+import tempfile
+import threading
+
+
+class FakeError(Exception):
+    """Raise from a method handler to return a JSON-RPC error."""
+
+    def __init__(self, error):
+        self.error = error
+        super().__init__(error)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+
+    def send(self, msg):
+        data = json.dumps(msg).encode('utf-8')
+        chunk_size = self.server.chunk_size or len(data)
+        for i in range(0, len(data), chunk_size):
+            self.request.sendall(data[i:i + chunk_size])
+
+    def handle(self):
+        decoder = json.JSONDecoder()
+        buf = ''
+        self.server.sessions.append(self)
+        while True:
+            data = self.request.recv(65536)
+            if not data:
+                return
+            buf += data.decode('utf-8')
+            while buf.strip():
+                buf = buf.lstrip()
+                try:
+                    msg, end = decoder.raw_decode(buf)
+                except ValueError:
+                    break
+                buf = buf[end:]
+                self.dispatch(msg)
+
+    def dispatch(self, msg):
+        self.server.requests.append(msg)
+        if 'method' not in msg:
+            # reply to a request initiated by us, e.g. echo
+            return
+        if self.server.echo_first:
+            self.send({'method': 'echo', 'params': [], 'id': 'echo'})
+        try:
+            handler = self.server.handlers[msg['method']]
+        except KeyError:
+            self.send({'id': msg['id'], 'result': None,
+                       'error': 'unknown method'})
+            return
+        try:
+            result = handler(msg['params'])
+        except FakeError as e:
+            self.send({'id': msg['id'], 'result': None, 'error': e.error})
+        else:
+            self.send({'id': msg['id'], 'result': result, 'error': None})
+
+    def notify(self, method, params):
+        self.send({'id': None, 'method': method, 'params': params})
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class FakeOVSDBServer(object):
+    """Fake server, use as context manager.
+
+    :param handlers: Map of JSON-RPC method name to callable that receives
+                     request params and returns the result.
+    :type handlers: Dict[str, Callable[[List[any]], any]]
+    :param echo_first: Send ``echo`` request before every response
+    :type echo_first: bool
+    :param chunk_size: Send responses in chunks of this many bytes
+    :type chunk_size: Optional[int]
+    """
+
+    def __init__(self, handlers=None, echo_first=False, chunk_size=None,
+                 name='ovsdb.sock'):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, name)
+        self.server = _Server(self.path, _Handler)
+        self.server.handlers = handlers or {}
+        self.server.echo_first = echo_first
+        self.server.chunk_size = chunk_size
+        self.server.requests = []
+        self.server.sessions = []
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       daemon=True)
+
+    @property
+    def handlers(self):
+        return self.server.handlers
+
+    @property
+    def requests(self):
+        return self.server.requests
+
+    @property
+    def sessions(self):
+        return self.server.sessions
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *_):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmpdir)
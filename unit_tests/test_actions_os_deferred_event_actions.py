@@ -79,6 +79,37 @@ class TestOSDeferredEventActions(test_utils.PatchHelper):
         self.action_fail.assert_called_once_with(
             'Please specify deferred-only or services')
 
+    def test_restart_services_refused(self):
+        self.patch_object(
+            os_deferred_event_actions.os_utils,
+            'restart_services_action')
+        self.patch_object(
+            os_deferred_event_actions, 'handle_package_updates')
+        self.handle_package_updates.side_effect = RuntimeError(
+            'restart ovn-central/1 first')
+        self.action_config = {
+            'deferred-only': True,
+            'services': ''}
+        os_deferred_event_actions.restart_services(['restart-services'])
+        self.action_fail.assert_called_once_with(
+            'restart ovn-central/1 first')
+        self.assertFalse(self.restart_services_action.called)
+
+    def test_handle_package_updates(self):
+        self.patch_object(
+            os_deferred_event_actions.deferred_events,
+            'get_deferred_events')
+        event = mock.MagicMock()
+        event.reason = 'Package update'
+        event.service = 'ovn-central'
+        self.get_deferred_events.return_value = [event, event]
+        os_deferred_event_actions.handle_package_updates()
+        self.charm_instance.rolling_restart.assert_called_once_with()
+        self.charm_instance.reset_mock()
+        event.reason = 'Some other reason'
+        os_deferred_event_actions.handle_package_updates()
+        self.assertFalse(self.charm_instance.rolling_restart.called)
+
     def test_show_deferred_events(self):
         self.patch_object(
             os_deferred_event_actions.os_utils,
@@ -0,0 +1,195 @@
+# Copyright 2021 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import subprocess
+import unittest.mock as mock
+
+import actions.ovn_central_actions as ovn_central_actions
+import charms_openstack.test_utils as test_utils
+
+
+class TestOVNCentralActions(test_utils.PatchHelper):
+
+    def setUp(self):
+        super().setUp()
+        self.patch_object(ovn_central_actions.hookenv, 'action_get')
+        self.action_config = {}
+        self.action_get.side_effect = lambda x: self.action_config.get(x)
+        self.patch_object(ovn_central_actions.hookenv, 'action_fail')
+        self.patch_object(ovn_central_actions.hookenv, 'action_set')
+
+        self.patch_object(
+            ovn_central_actions.charms_openstack.charm,
+            'provide_charm_instance')
+        self.charm_instance = mock.MagicMock()
+        self.provide_charm_instance.return_value.__enter__.return_value = \
+            self.charm_instance
+
+    def test_compact(self):
+        self.action_config = {'databases': 'nb sb'}
+        self.charm_instance.compact_ovsdb.return_value = {
+            'role': 'leader', 'duration': 1.5}
+        ovn_central_actions.compact(['compact'])
+        self.charm_instance.compact_ovsdb.assert_has_calls([
+            mock.call('nb'), mock.call('sb')])
+        self.assertFalse(self.charm_instance.transfer_ovsdb_leadership.called)
+        self.action_set.assert_has_calls([
+            mock.call({'nb.role': 'leader', 'nb.duration': 1.5}),
+            mock.call({'sb.role': 'leader', 'sb.duration': 1.5})])
+        self.assertFalse(self.action_fail.called)
+
+    def test_compact_invalid(self):
+        self.action_config = {'databases': 'nb xb'}
+        ovn_central_actions.compact(['compact'])
+        self.action_fail.assert_called_once_with(
+            'Invalid databases: "nb xb", must be one or more of "nb" and '
+            '"sb"')
+        self.assertFalse(self.charm_instance.compact_ovsdb.called)
+
+    def test_compact_failed(self):
+        self.action_config = {'databases': 'nb sb'}
+        self.charm_instance.compact_ovsdb.side_effect = (
+            subprocess.CalledProcessError(1, 'ovn-appctl'))
+        ovn_central_actions.compact(['compact'])
+        self.action_fail.assert_called_once_with(mock.ANY)
+        self.charm_instance.compact_ovsdb.assert_called_once_with('nb')
+        self.assertFalse(self.action_set.called)
+
+    def test_rolling_restart(self):
+        self.action_config = {'force': False}
+        self.charm_instance.rolling_restart.return_value = (
+            collections.OrderedDict([('restart', 2.5), ('total', 3.0)]))
+        self.charm_instance.peers_restart_pending.return_value = []
+        ovn_central_actions.rolling_restart(['rolling-restart'])
+        self.charm_instance.rolling_restart.assert_called_once_with(
+            force=False)
+        self.action_set.assert_called_once_with({
+            'timings.restart': 2.5, 'timings.total': 3.0})
+        self.charm_instance._assess_status.assert_called_once_with()
+        self.action_set.reset_mock()
+        self.charm_instance.peers_restart_pending.return_value = [
+            'ovn-central/1', 'ovn-central/2']
+        ovn_central_actions.rolling_restart(['rolling-restart'])
+        self.action_set.assert_has_calls([
+            mock.call({'timings.restart': 2.5, 'timings.total': 3.0}),
+            mock.call({'pending-units': 'ovn-central/1 ovn-central/2'}),
+        ])
+        self.assertFalse(self.action_fail.called)
+
+    def test_rolling_restart_refused(self):
+        self.action_config = {'force': False}
+        self.charm_instance.rolling_restart.side_effect = RuntimeError(
+            'restart ovn-central/1 first')
+        ovn_central_actions.rolling_restart(['rolling-restart'])
+        self.action_fail.assert_called_once_with(
+            'restart ovn-central/1 first')
+        self.assertFalse(self.action_set.called)
+
+    def test_backup(self):
+        self.patch_object(ovn_central_actions.reactive, 'endpoint_from_flag')
+        ovsdb_peer = mock.MagicMock()
+        ovsdb_peer.db_nb_port = 6641
+        ovsdb_peer.db_sb_admin_port = 16642
+        self.endpoint_from_flag.return_value = ovsdb_peer
+        self.action_config = {'databases': 'nb sb', 'directory': '/backup'}
+        self.charm_instance.backup_ovsdb.return_value = {
+            'bytes': 42, 'duration': 1.5}
+        ovn_central_actions.backup(['backup'])
+        self.endpoint_from_flag.assert_called_with('ovsdb-peer.available')
+        self.charm_instance.backup_ovsdb.assert_has_calls([
+            mock.call('nb', '/backup', 6641),
+            mock.call('sb', '/backup', 16642)])
+        self.action_set.assert_has_calls([
+            mock.call({'nb.bytes': 42, 'nb.duration': 1.5}),
+            mock.call({'sb.bytes': 42, 'sb.duration': 1.5})])
+        self.assertFalse(self.action_fail.called)
+        self.charm_instance.backup_ovsdb.side_effect = RuntimeError('no')
+        ovn_central_actions.backup(['backup'])
+        self.action_fail.assert_called_once_with(
+            'Unable to back up nb database: no')
+        self.action_fail.reset_mock()
+        self.action_config = {'databases': '', 'directory': '/backup'}
+        ovn_central_actions.backup(['backup'])
+        self.action_fail.assert_called_once_with(mock.ANY)
+        self.action_fail.reset_mock()
+        self.charm_instance.backup_ovsdb.reset_mock()
+        self.endpoint_from_flag.return_value = None
+        self.action_config = {'databases': 'nb', 'directory': '/backup'}
+        ovn_central_actions.backup(['backup'])
+        self.action_fail.assert_called_once_with(
+            'Peer relation not available')
+        self.assertFalse(self.charm_instance.backup_ovsdb.called)
+
+    def test_connection_report(self):
+        self.patch_object(ovn_central_actions.ovn_db_connection_report,
+                          'report')
+        self.report.return_value = {'total-clients': 1, 'clients': []}
+        self.charm_instance.ovn_rundir.return_value = '/var/run/ovn'
+        self.action_config = {'top': 5}
+        ovn_central_actions.connection_report(['connection-report'])
+        self.report.assert_called_once_with('/var/run/ovn', 5)
+        self.action_set.assert_called_once_with({
+            'total-clients': 1,
+            'report': '{"total-clients": 1, "clients": []}'})
+        self.action_config = {'top': -1}
+        ovn_central_actions.connection_report(['connection-report'])
+        self.action_fail.assert_called_once_with(
+            'Invalid top: -1, must be >= 0')
+
+    def test_restore(self):
+        self.patch_object(ovn_central_actions.hookenv, 'is_leader')
+        self.patch_object(ovn_central_actions.hookenv, 'leader_set')
+        self.patch_object(ovn_central_actions.reactive, 'endpoint_from_flag')
+        ovsdb_peer = mock.MagicMock()
+        ovsdb_peer.cluster_local_addr = '10.0.0.1'
+        ovsdb_peer.cluster_remote_addrs = ('10.0.0.2', '10.0.0.3')
+        ovsdb_peer.db_connection_strs.side_effect = lambda addrs, port: [
+            'ssl:{}:{}'.format(addr, port) for addr in addrs]
+        ovsdb_peer.db_sb_cluster_port = 6644
+        self.endpoint_from_flag.return_value = ovsdb_peer
+        self.charm_instance.cluster_status.return_value.cluster_id = 'cid'
+
+        self.action_config = {'database': 'xb', 'file': ''}
+        ovn_central_actions.restore(['restore'])
+        self.action_fail.assert_called_once_with(mock.ANY)
+        self.action_fail.reset_mock()
+
+        self.is_leader.return_value = False
+        self.action_config = {'database': 'sb', 'file': '/backup/sb.db.gz'}
+        ovn_central_actions.restore(['restore'])
+        self.action_fail.assert_called_once_with(mock.ANY)
+        self.assertFalse(self.charm_instance.restore_ovsdb.called)
+        self.action_fail.reset_mock()
+
+        self.is_leader.return_value = True
+        self.charm_instance.restore_ovsdb.return_value = '/saved'
+        ovn_central_actions.restore(['restore'])
+        self.charm_instance.restore_ovsdb.assert_called_once_with(
+            'sb', '/backup/sb.db.gz', 'ssl:10.0.0.1:6644')
+        self.leader_set.assert_called_once_with({'sb_cid': 'cid'})
+        self.action_set.assert_has_calls([
+            mock.call({'saved-file': '/saved'}),
+            mock.call({'cluster-id': 'cid'})])
+        self.assertFalse(self.action_fail.called)
+
+        self.leader_set.reset_mock()
+        self.is_leader.return_value = False
+        self.action_config = {'database': 'sb', 'file': ''}
+        ovn_central_actions.restore(['restore'])
+        self.charm_instance.rejoin_ovsdb.assert_called_once_with(
+            'sb', ['ssl:10.0.0.1:6644'],
+            ['ssl:10.0.0.2:6644', 'ssl:10.0.0.3:6644'])
+        self.assertFalse(self.leader_set.called)
+        self.assertFalse(self.action_fail.called)
@@ -0,0 +1,70 @@
+# Copyright 2021 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest.mock as mock
+
+import charms_openstack.test_utils as test_utils
+
+import unit_tests.benchmark as benchmark
+
+
+class TestBenchmark(test_utils.PatchHelper):
+
+    def test_run_benchmarks(self):
+        results = benchmark.run_benchmarks(
+            units=(3,), clients=(10,),
+            handler_names=('render', 'configure_firewall'), repeat=1)
+        self.assertEquals(
+            [(r['handler'], r['run'], r['units'], r['clients'])
+             for r in results],
+            [('render', 'cold', 3, 10),
+             ('render', 'warm', 3, 10),
+             ('configure_firewall', 'cold', 3, 10),
+             ('configure_firewall', 'warm', 3, 10)])
+        render_cold, render_warm, firewall_cold, firewall_warm = results
+        self.assertEquals(render_cold['fork_commands']['ovsdb-tool'], 2)
+        self.assertNotIn('ovsdb-tool', render_warm['fork_commands'])
+        self.assertGreater(render_cold['bytes_written'], 0)
+        self.assertEquals(render_warm['bytes_written'], 0)
+        # one reject rule per port plus an allow rule per port and address
+        self.assertEquals(firewall_cold['fork_commands']['ufw'],
+                          1 + 4 + 4 * 2 + 2 * 10)
+        self.assertEquals(firewall_warm['fork_commands']['ufw'], 1)
+        for result in results:
+            self.assertGreater(result['wall_time'], 0)
+
+    def test_compare(self):
+        baseline = [{
+            'handler': 'render', 'run': 'warm', 'units': 3, 'clients': 10,
+            'forks': 5, 'bytes_written': 0, 'wall_time': 0.01,
+        }]
+        results = [dict(baseline[0], wall_time=0.014)]
+        self.assertEquals(benchmark.compare(results, baseline), [])
+        results = [dict(baseline[0], forks=6, wall_time=0.016)]
+        self.assertEquals(benchmark.compare(results, baseline), [
+            'render warm units=3 clients=10: forks 5 -> 6',
+            'render warm units=3 clients=10: wall_time 0.01 -> 0.016',
+        ])
+        self.assertEquals(benchmark.compare(
+            results, [dict(baseline[0], clients=100)]), [])
+
+    def test_measure_startup(self):
+        self.patch_object(benchmark.subprocess, 'check_output')
+        self.check_output.side_effect = ['0.02\n', '0.01\n']
+        result = benchmark.measure_startup(repeat=2)
+        self.assertEquals(result['handler'], '(startup)')
+        self.assertEquals(result['wall_time'], 0.01)
+        self.check_output.assert_called_with(
+            [benchmark.sys.executable, '-c', benchmark.STARTUP_SCRIPT],
+            cwd=mock.ANY, universal_newlines=True)
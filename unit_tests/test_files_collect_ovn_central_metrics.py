@@ -0,0 +1,156 @@
+# Copyright 2021 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import re
+import shutil
+import tempfile
+from unittest import mock
+
+from charms_openstack import test_utils
+
+import collect_ovn_central_metrics as collector
+
+from unit_tests.fake_ovsdb_server import FakeOVSDBServer
+
+CLUSTER_STATUS = """a1b2
+Name: OVN_Southbound
+Cluster ID: 0123 (01234567-89ab-cdef-0123-456789abcdef)
+Server ID: a1b2 (a1b2c3d4-89ab-cdef-0123-456789abcdef)
+Address: ssl:10.0.0.1:6644
+Status: cluster member
+Role: leader
+Term: 12
+Leader: self
+Vote: self
+
+Last Election started 409 ms ago, reason: timeout
+Last Election won: 409 ms ago
+Election timer: 4000
+Log: [2, 1025]
+Entries not yet committed: 3
+Entries not yet applied: 5
+Connections: ->c3d4 (->e5f6) <-c3d4 <-e5f6
+Disconnections: 1
+Servers:
+    a1b2 (a1b2 at ssl:10.0.0.1:6644) (self) next_index=1024 match_index=1024
+    c3d4 (c3d4 at ssl:10.0.0.2:6644) next_index=1025 match_index=1024
+    e5f6 (e5f6 at ssl:10.0.0.3:6644) next_index=1025 match_index=1020
+"""
+
+MEMORY_SHOW = "cells:4242 monitors:3 raft-log:1023 sessions:17 triggers:0\n"
+
+
+def parse_metrics(text):
+    """Parse text exposition format into map of sample to value."""
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith("#"):
+            continue
+        m = re.match(r"^(\w+)(\{.*\})? (\S+)$", line)
+        samples[m.group(1) + (m.group(2) or "")] = float(m.group(3))
+    return samples
+
+
+class TestCollectOVNCentralMetrics(test_utils.PatchHelper):
+
+    def test_metrics_render(self):
+        metrics = collector.Metrics()
+        metrics.add("fake_metric", "Fake help.", 1, db="nb")
+        metrics.add("fake_metric", "Fake help.", 2, db='s"b')
+        metrics.add("other_metric", "Other help.", 3.5, mtype="counter")
+        self.assertEquals(
+            metrics.render(),
+            '# HELP fake_metric Fake help.\n'
+            '# TYPE fake_metric gauge\n'
+            'fake_metric{db="nb"} 1\n'
+            'fake_metric{db="s\\"b"} 2\n'
+            '# HELP other_metric Other help.\n'
+            '# TYPE other_metric counter\n'
+            'other_metric 3.5\n')
+
+    def test_collect(self):
+        rundir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, rundir)
+        handlers = {
+            "cluster/status": lambda _: CLUSTER_STATUS,
+            "memory/show": lambda _: MEMORY_SHOW,
+        }
+        northd = {"status": lambda _: "Status: active\n"}
+        with FakeOVSDBServer(handlers, name="ovnsb_db.ctl") as sb, \
+                FakeOVSDBServer(northd, name="ovn-northd.42.ctl") as nd:
+            os.symlink(sb.path, os.path.join(rundir, "ovnsb_db.ctl"))
+            os.symlink(nd.path, os.path.join(rundir, "ovn-northd.42.ctl"))
+            with open(os.path.join(rundir, "ovn-northd.pid"), "w") as f:
+                f.write("42\n")
+            samples = parse_metrics(collector.collect(rundir).render())
+        self.assertEquals(samples['ovn_ovsdb_up{db="nb"}'], 0)
+        self.assertEquals(samples['ovn_ovsdb_up{db="sb"}'], 1)
+        self.assertNotIn('ovn_ovsdb_cluster_term{db="nb"}', samples)
+        self.assertEquals(
+            samples['ovn_ovsdb_cluster_role{db="sb",role="leader"}'], 1)
+        self.assertEquals(
+            samples['ovn_ovsdb_cluster_role{db="sb",role="follower"}'], 0)
+        self.assertEquals(samples['ovn_ovsdb_cluster_term{db="sb"}'], 12)
+        self.assertEquals(
+            samples['ovn_ovsdb_cluster_election_timer_milliseconds'
+                    '{db="sb"}'], 4000)
+        self.assertEquals(
+            samples['ovn_ovsdb_cluster_log_entries{db="sb"}'], 1023)
+        self.assertEquals(
+            samples['ovn_ovsdb_cluster_log_index{db="sb"}'], 1025)
+        self.assertEquals(
+            samples['ovn_ovsdb_cluster_uncommitted_entries{db="sb"}'], 3)
+        self.assertEquals(
+            samples['ovn_ovsdb_cluster_unapplied_entries{db="sb"}'], 5)
+        self.assertEquals(
+            samples['ovn_ovsdb_cluster_disconnections{db="sb"}'], 1)
+        self.assertEquals(
+            samples['ovn_ovsdb_cluster_connections'
+                    '{db="sb",direction="outbound"}'], 1)
+        self.assertEquals(
+            samples['ovn_ovsdb_cluster_connections'
+                    '{db="sb",direction="inbound"}'], 2)
+        self.assertEquals(samples['ovn_ovsdb_cluster_servers{db="sb"}'], 3)
+        self.assertEquals(
+            samples['ovn_ovsdb_memory_usage{db="sb",item="cells"}'], 4242)
+        self.assertEquals(samples['ovn_ovsdb_sessions{db="sb"}'], 17)
+        self.assertEquals(samples['ovn_northd_up'], 1)
+        self.assertEquals(samples['ovn_northd_state{state="active"}'], 1)
+        self.assertEquals(samples['ovn_northd_state{state="standby"}'], 0)
+        self.assertIn('ovn_central_collector_duration_seconds', samples)
+
+    def test_collect_northd_not_running(self):
+        metrics = collector.Metrics()
+        collector.collect_northd(metrics, "/nonexistent")
+        samples = parse_metrics(metrics.render())
+        self.assertEquals(samples['ovn_northd_up'], 0)
+        self.assertEquals(samples['ovn_northd_state{state="active"}'], 0)
+
+    def test_write_output_file(self):
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        collector.write_output_file(output_dir, "fake_metric 1\n")
+        self.assertEquals(os.listdir(output_dir), ["ovn_central.prom"])
+        with open(os.path.join(output_dir, "ovn_central.prom")) as f:
+            self.assertEquals(f.read(), "fake_metric 1\n")
+
+    @mock.patch("collect_ovn_central_metrics.write_output_file")
+    @mock.patch("collect_ovn_central_metrics.collect")
+    def test_main(self, mock_collect, mock_write):
+        mock_collect.return_value.render.return_value = "fake-metrics"
+        collector.main(["--rundir", "/fake/run", "--output-dir",
+                        "/fake/out"])
+        mock_collect.assert_called_once_with("/fake/run")
+        mock_write.assert_called_once_with("/fake/out", "fake-metrics")
@@ -0,0 +1,134 @@
+# Copyright 2021 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from charms_openstack import test_utils
+
+import ovn_db_connection_report as connection_report
+
+from unit_tests.fake_ovsdb_server import FakeOVSDBServer
+
+HEADER = ("  sl  local_address rem_address   st tx_queue rx_queue tr "
+          "tm->when retrnsmt   uid  timeout inode\n")
+# 10.0.0.1:6642 <- 10.0.0.5 twice, 10.0.0.1:6641 <- 10.0.0.6, a listening
+# socket and a session to another port
+PROC_NET_TCP = HEADER + (
+    "   0: 00000000:19F2 00000000:0000 0A 00000000:00000000 00:00000000 "
+    "00000000     0        0 1 1 0000000000000000 100 0 0 10 0\n"
+    "   1: 0100000A:19F2 0500000A:C350 01 00000100:00000000 00:00000000 "
+    "00000000     0        0 2 1 0000000000000000 20 4 30 10 -1\n"
+    "   2: 0100000A:19F2 0500000A:C351 01 00000000:00000010 00:00000000 "
+    "00000000     0        0 3 1 0000000000000000 20 4 30 10 -1\n"
+    "   3: 0100000A:19F1 0600000A:C352 01 00000000:00000000 00:00000000 "
+    "00000000     0        0 4 1 0000000000000000 20 4 30 10 -1\n"
+    "   4: 0100000A:0016 0700000A:C353 01 00000000:00000000 00:00000000 "
+    "00000000     0        0 5 1 0000000000000000 20 4 30 10 -1\n"
+)
+# ::ffff:10.0.0.1:16642 <- ::ffff:10.0.0.6
+PROC_NET_TCP6 = HEADER + (
+    "   0: 0000000000000000FFFF00000100000A:4102 "
+    "0000000000000000FFFF00000600000A:C354 01 00000000:00000000 "
+    "00:00000000 00000000     0        0 6 1 0000000000000000 20 4 30 10 "
+    "-1\n"
+)
+
+CLUSTER_STATUS = """a1b2
+Name: OVN_Southbound
+Role: leader
+Servers:
+    a1b2 (a1b2 at ssl:10.0.0.1:6644) (self)
+"""
+
+
+class TestOVNDBConnectionReport(test_utils.PatchHelper):
+
+    def setUp(self):
+        super().setUp()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.paths = []
+        for name, content in (("tcp", PROC_NET_TCP),
+                              ("tcp6", PROC_NET_TCP6)):
+            path = os.path.join(self.tmpdir, name)
+            with open(path, "w") as f:
+                f.write(content)
+            self.paths.append(path)
+
+    @mock.patch("sys.byteorder", "little")
+    def test_decode_address(self):
+        self.assertEquals(connection_report.decode_address("0100007F:19F2"),
+                          ("127.0.0.1", 6642))
+        self.assertEquals(
+            connection_report.decode_address(
+                "0000000000000000FFFF00000600000A:4102"),
+            ("10.0.0.6", 16642))
+        self.assertEquals(
+            connection_report.decode_address(
+                "B80D0120000000000000000001000000:19F1"),
+            ("2001:db8::1", 6641))
+
+    @mock.patch("sys.byteorder", "little")
+    def test_read_sessions(self):
+        self.assertEquals(
+            connection_report.read_sessions(
+                (6642, 16642), paths=self.paths + ["/nonexistent"]),
+            [(6642, "10.0.0.5", 256, 0),
+             (6642, "10.0.0.5", 0, 16),
+             (16642, "10.0.0.6", 0, 0)])
+
+    @mock.patch("sys.byteorder", "little")
+    def test_report(self):
+        handlers = {
+            "cluster/status": lambda _: CLUSTER_STATUS,
+            "memory/show": lambda _: "monitors:3 sessions:4 backlog:256\n",
+        }
+        rundir = os.path.join(self.tmpdir, "run")
+        os.mkdir(rundir)
+        with FakeOVSDBServer(handlers, name="ovnsb_db.ctl") as sb:
+            os.symlink(sb.path, os.path.join(rundir, "ovnsb_db.ctl"))
+            result = json.loads(json.dumps(connection_report.report(
+                rundir, top=0, paths=self.paths)))
+        self.assertIn("error", result["servers"]["nb"])
+        self.assertEquals(result["servers"]["nb"]["sessions"], 1)
+        self.assertEquals(result["servers"]["sb"], {
+            "role": "leader",
+            "memory": {"monitors": 3, "sessions": 4, "backlog": 256},
+            "sessions": 3,
+        })
+        self.assertEquals(result["total-clients"], 2)
+        self.assertEquals(result["clients"], [
+            {"address": "10.0.0.5", "sessions": 2,
+             "sessions-by-port": {"6642": 2},
+             "send-queue-bytes": 256, "receive-queue-bytes": 16},
+            {"address": "10.0.0.6", "sessions": 2,
+             "sessions-by-port": {"6641": 1, "16642": 1},
+             "send-queue-bytes": 0, "receive-queue-bytes": 0},
+        ])
+        result = connection_report.report(rundir, top=1, paths=self.paths)
+        self.assertEquals(result["total-clients"], 2)
+        self.assertEquals([client["address"] for client in result["clients"]],
+                          ["10.0.0.5"])
+
+    @mock.patch("ovn_db_connection_report.report")
+    def test_main(self, mock_report):
+        mock_report.return_value = {"clients": []}
+        with mock.patch("builtins.print") as mock_print:
+            connection_report.main(["--rundir", "/fake/run", "--top", "5"])
+        mock_report.assert_called_once_with("/fake/run", 5)
+        mock_print.assert_called_once_with('{\n  "clients": []\n}')
@@ -12,22 +12,33 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+import shutil
+import tempfile
 from unittest import mock
 
 from charms_openstack import test_utils
 
 import run_ovn_db_connections_check as check
 
+from unit_tests.fake_ovsdb_server import FakeOVSDBServer
+
 
 class TestRunOVNChecks(test_utils.PatchHelper):
 
     @mock.patch('run_ovn_db_connections_check.write_output_file')
-    @mock.patch('run_ovn_db_connections_check.is_leader')
-    def test_run_checks_not_leader(self, mock_leader, mock_write):
-        mock_leader.return_value = False
+    @mock.patch('run_ovn_db_connections_check.check_output')
+    @mock.patch('run_ovn_db_connections_check.check_cluster')
+    def test_run_checks_not_leader(self, mock_cluster, mock_check_output,
+                                   mock_write):
+        mock_cluster.return_value = (
+            [check.Alert(check.NAGIOS_STATUS_WARNING, "fakewarn")],
+            {"OVN_Southbound": "Role: follower\n"})
         check.run_checks()
+        mock_cluster.assert_called_once_with(check.DEFAULT_THRESHOLDS)
+        self.assertFalse(mock_check_output.called)
         mock_write.assert_called_once_with(
-            "OK: no-op (unit is not the DB leader)"
+            "WARNING: warnings[1]: ['fakewarn']"
         )
 
     @mock.patch('run_ovn_db_connections_check.write_output_file')
@@ -35,12 +46,18 @@ class TestRunOVNChecks(test_utils.PatchHelper):
     @mock.patch('run_ovn_db_connections_check.parse_output')
     @mock.patch('run_ovn_db_connections_check.check_connections')
     @mock.patch('run_ovn_db_connections_check.aggregate_alerts')
-    @mock.patch('run_ovn_db_connections_check.is_leader')
-    def test_run_checks_leader(self, mock_leader, mock_aggregate, mock_parse,
-                               mock_check, mock_check_output, mock_write):
-        mock_leader.return_value = True
+    @mock.patch('run_ovn_db_connections_check.check_cluster')
+    def test_run_checks_leader(self, mock_cluster, mock_aggregate, mock_check,
+                               mock_parse, mock_check_output, mock_write):
+        raft_alert = check.Alert(check.NAGIOS_STATUS_OK, "fakeraft")
+        conn_alert = check.Alert(check.NAGIOS_STATUS_OK, "fakeconn")
+        mock_cluster.return_value = (
+            [raft_alert], {"OVN_Southbound": "Role: leader\n"})
+        mock_check.return_value = [conn_alert]
         mock_aggregate.return_value = "OK: fake status"
-        check.run_checks()
+        check.run_checks({"fake": (1, 2)})
+        mock_cluster.assert_called_once_with({"fake": (1, 2)})
+        mock_aggregate.assert_called_once_with([raft_alert, conn_alert])
         mock_write.assert_called_once_with("OK: fake status")
 
     def test_get_uuid(self):
@@ -265,3 +282,249 @@ Vote: self
 """
         result = check.is_leader()
         self.assertFalse(result)
+
+
+class TestConnectionsMonitor(test_utils.PatchHelper):
+
+    CONNECTIONS = {
+        "fake-uuid-1": {"new": {"target": "pssl:6642",
+                                "role": "ovn-controller",
+                                "read_only": False}},
+        "fake-uuid-2": {"new": {"target": "pssl:16642",
+                                "role": "",
+                                "read_only": False}},
+    }
+
+    def fake_server(self, leader):
+        def monitor(params):
+            db, monitor_id, requests = params
+            self.assertEquals(db, monitor_id)
+            self.assertEquals(requests, check.ConnectionsMonitor
+                              .MONITOR_REQUESTS[db])
+            if db == "_Server":
+                return {"Database": {
+                    "fake-db-1": {"new": {"name": "OVN_Northbound",
+                                          "leader": True}},
+                    "fake-db-2": {"new": {"name": "OVN_Southbound",
+                                          "leader": leader}},
+                }}
+            return {"Connection": self.CONNECTIONS}
+
+        return FakeOVSDBServer({"monitor": monitor}, name="ovnsb_db.sock")
+
+    def setUp(self):
+        super().setUp()
+        self.patch_object(check, "check_cluster",
+                          return_value=([], {}))
+
+    def test_not_leader(self):
+        with self.fake_server(leader=False) as server:
+            monitor = check.ConnectionsMonitor(server.path, timeout=5)
+            monitor.start()
+            self.assertFalse(monitor.is_leader())
+            self.check_cluster.return_value = (
+                [check.Alert(check.NAGIOS_STATUS_WARNING, "fakewarn")], {})
+            self.assertEquals(monitor.status(),
+                              "WARNING: warnings[1]: ['fakewarn']")
+            self.check_cluster.assert_called_once_with(
+                check.DEFAULT_THRESHOLDS)
+            monitor.client.close()
+
+    def test_updates(self):
+        with self.fake_server(leader=True) as server:
+            monitor = check.ConnectionsMonitor(server.path, timeout=5)
+            monitor.start()
+            self.assertTrue(monitor.is_leader())
+            self.assertEquals(monitor.connections(), [
+                {"_uuid": ["uuid", "fake-uuid-1"], "target": "pssl:6642",
+                 "role": "ovn-controller", "read_only": False},
+                {"_uuid": ["uuid", "fake-uuid-2"], "target": "pssl:16642",
+                 "role": "", "read_only": False},
+            ])
+            self.assertEquals(monitor.status(),
+                              "OK: OVN DB connections are normal")
+
+            server.sessions[0].notify("update", ["OVN_Southbound", {
+                "Connection": {
+                    "fake-uuid-1": {"new": {"target": "pssl:6642",
+                                            "role": "ovn-controller",
+                                            "read_only": True},
+                                    "old": {"read_only": False}},
+                    "fake-uuid-2": {"old": {"target": "pssl:16642",
+                                            "role": "",
+                                            "read_only": False}},
+                }}])
+            self.assertTrue(monitor.poll())
+            self.assertEquals(
+                monitor.status(),
+                "CRITICAL: critical[2]: ['expected 2 connections, got 1', "
+                "'fake-uuid-1: connection is read only']")
+
+            server.sessions[0].notify("update", ["_Server", {
+                "Database": {
+                    "fake-db-2": {"new": {"name": "OVN_Southbound",
+                                          "leader": False},
+                                  "old": {"leader": True}},
+                }}])
+            self.assertTrue(monitor.poll())
+            self.assertFalse(monitor.is_leader())
+            monitor.client.close()
+
+    @mock.patch("run_ovn_db_connections_check.time.sleep")
+    @mock.patch("run_ovn_db_connections_check.write_output_file")
+    def test_run_daemon(self, mock_write, mock_sleep):
+        monitor = mock.MagicMock()
+        monitor.start.side_effect = [OSError("fake error"), None]
+        monitor.status.return_value = "OK: fake status"
+        monitor.poll.side_effect = [True, SystemExit]
+        with self.assertRaises(SystemExit):
+            check.run_daemon(monitor)
+        mock_write.assert_has_calls([
+            mock.call("UNKNOWN: fake error"),
+            mock.call("OK: fake status"),
+            mock.call("OK: fake status"),
+        ])
+        monitor.client.close.assert_called_once_with()
+        mock_sleep.assert_called_once_with(check.RECONNECT_INTERVAL)
+
+    @mock.patch("run_ovn_db_connections_check.run_checks")
+    @mock.patch("run_ovn_db_connections_check.run_daemon")
+    def test_main(self, mock_daemon, mock_checks):
+        check.main([])
+        mock_checks.assert_called_once_with(check.DEFAULT_THRESHOLDS)
+        self.assertFalse(mock_daemon.called)
+        check.main(["--daemon", "--log-entries", "5", "50"])
+        thresholds = dict(check.DEFAULT_THRESHOLDS)
+        thresholds["log_entries"] = (5, 50)
+        mock_daemon.assert_called_once_with(thresholds=thresholds)
+
+
+CLUSTER_STATUS = """a1b2
+Name: OVN_Southbound
+Cluster ID: 0123 (01234567-89ab-cdef-0123-456789abcdef)
+Server ID: a1b2 (a1b2c3d4-89ab-cdef-0123-456789abcdef)
+Address: ssl:10.0.0.1:6644
+Status: cluster member
+Role: follower
+Term: 12
+Leader: c3d4
+Vote: c3d4
+
+Election timer: 4000
+Log: [2, 1025]
+Entries not yet committed: 150
+Entries not yet applied: 0
+Connections: ->c3d4 (->e5f6) <-c3d4
+Disconnections: 1
+Servers:
+    a1b2 (a1b2 at ssl:10.0.0.1:6644) (self)
+    c3d4 (c3d4 at ssl:10.0.0.2:6644)
+    e5f6 (e5f6 at ssl:10.0.0.3:6644)
+"""
+
+
+class TestRaftChecks(test_utils.PatchHelper):
+
+    def setUp(self):
+        super().setUp()
+        self.status = check.ovsdb_client.parse_cluster_status(CLUSTER_STATUS)
+
+    def test_check_threshold(self):
+        self.assertEquals(
+            check.check_threshold(5, (10, 20), "msg"),
+            check.Alert(check.NAGIOS_STATUS_OK, "msg"))
+        self.assertEquals(
+            check.check_threshold(10, (10, 20), "msg").status,
+            check.NAGIOS_STATUS_WARNING)
+        self.assertEquals(
+            check.check_threshold(25, (10, 20), "msg").status,
+            check.NAGIOS_STATUS_CRITICAL)
+        self.assertEquals(
+            check.check_threshold(25, (0, 0), "msg").status,
+            check.NAGIOS_STATUS_OK)
+        self.assertEquals(
+            check.check_threshold(30, (300, 60), "msg", below=True).status,
+            check.NAGIOS_STATUS_CRITICAL)
+        self.assertEquals(
+            check.check_threshold(120, (300, 60), "msg", below=True).status,
+            check.NAGIOS_STATUS_WARNING)
+        self.assertEquals(
+            check.check_threshold(600, (300, 60), "msg", below=True).status,
+            check.NAGIOS_STATUS_OK)
+
+    def test_log_entries(self):
+        self.assertEquals(check.log_entries(self.status), 1023)
+        self.assertEquals(check.log_entries({}), 0)
+
+    def test_disconnected_servers(self):
+        self.assertEquals(check.disconnected_servers(self.status), 1)
+
+    def test_seconds_since_leader_change(self):
+        state = {}
+        # first term seen is not a change
+        self.assertIsNone(check.seconds_since_leader_change(
+            "OVN_Southbound", self.status, state, 1000))
+        self.assertEquals(state, {
+            "OVN_Southbound": {"term": 12, "changed": None}})
+        self.status["Term"] = "13"
+        self.assertEquals(check.seconds_since_leader_change(
+            "OVN_Southbound", self.status, state, 1100), 0)
+        self.assertEquals(check.seconds_since_leader_change(
+            "OVN_Southbound", self.status, state, 1130), 30)
+        # recent election started by the local server
+        self.status["Last Election started 2500 ms ago, reason"] = "timeout"
+        self.assertEquals(check.seconds_since_leader_change(
+            "OVN_Southbound", self.status, state, 1130), 2.5)
+
+    def test_check_raft(self):
+        state = {"OVN_Southbound": {"term": 11, "changed": None}}
+        alerts = check.check_raft("OVN_Southbound", self.status,
+                                  check.DEFAULT_THRESHOLDS, state, 1000)
+        # leader changes are not alerted on by default
+        self.assertEquals(alerts[1], check.Alert(
+            check.NAGIOS_STATUS_OK, "OVN_Southbound: leader changed 0s ago"))
+        state = {"OVN_Southbound": {"term": 11, "changed": None}}
+        thresholds = dict(check.DEFAULT_THRESHOLDS, leader_change=(300, 60))
+        alerts = check.check_raft("OVN_Southbound", self.status,
+                                  thresholds, state, 1000)
+        self.assertEquals(alerts, [
+            check.Alert(check.NAGIOS_STATUS_WARNING,
+                        "OVN_Southbound: 150 uncommitted entries"),
+            check.Alert(check.NAGIOS_STATUS_CRITICAL,
+                        "OVN_Southbound: leader changed 0s ago"),
+            check.Alert(check.NAGIOS_STATUS_OK,
+                        "OVN_Southbound: 1023 log entries since last "
+                        "snapshot"),
+            check.Alert(check.NAGIOS_STATUS_WARNING,
+                        "OVN_Southbound: 1 disconnected servers"),
+        ])
+
+    @mock.patch("run_ovn_db_connections_check.save_state")
+    @mock.patch("run_ovn_db_connections_check.load_state")
+    @mock.patch("run_ovn_db_connections_check.time.time")
+    def test_check_cluster(self, mock_time, mock_load, mock_save):
+        mock_time.return_value = 1000
+        mock_load.return_value = {}
+        with FakeOVSDBServer({"cluster/status": lambda _: CLUSTER_STATUS},
+                             name="ovnsb_db.ctl") as server:
+            with mock.patch.object(check, "CLUSTER_DBS", (
+                    ("OVN_Northbound", "/nonexistent/ovnnb_db.ctl"),
+                    ("OVN_Southbound", server.path))):
+                alerts, outputs = check.check_cluster(
+                    check.DEFAULT_THRESHOLDS)
+        self.assertEquals(outputs, {"OVN_Southbound": CLUSTER_STATUS})
+        self.assertEquals(alerts[0].status, check.NAGIOS_STATUS_CRITICAL)
+        self.assertTrue(alerts[0].msg.startswith(
+            "OVN_Northbound: unable to get cluster status: "))
+        self.assertEquals(len(alerts), 4)
+        mock_save.assert_called_once_with(
+            {"OVN_Southbound": {"term": 12, "changed": None}})
+
+    def test_load_save_state(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, "state.json")
+        self.assertEquals(check.load_state(path), {})
+        check.save_state({"fake": {"term": 1}}, path)
+        self.assertEquals(check.load_state(path), {"fake": {"term": 1}})
+        self.assertEquals(os.listdir(tmpdir), ["state.json"])
@@ -0,0 +1,233 @@
+# Copyright 2021 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import re
+import subprocess
+import unittest.mock as mock
+
+import charms_openstack.test_utils as test_utils
+
+import charm.openstack.nft as nft
+
+
+def parse_ruleset(script):
+    """Parse the subset of nft syntax produced by ``render_ruleset``.
+
+    :returns: Table statements, sets and rules of the input chain.
+    :rtype: Tuple[List[str], Dict[str, Dict[str, any]], List[str]]
+    """
+    statements = []
+    sets = {}
+    rules = []
+    context = []
+    current_set = None
+    for line in script.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line == '}':
+            context.pop()
+            current_set = None
+            continue
+        m = re.match(r'^(table|set|chain) (.+) \{$', line)
+        if m:
+            context.append(m.group(1))
+            if m.group(1) == 'set':
+                current_set = sets.setdefault(
+                    m.group(2),
+                    {'type': None, 'flags': None, 'elements': set()})
+            continue
+        if not context:
+            statements.append(line)
+        elif context[-1] == 'set':
+            m = re.match(r'^type (\S+)$', line)
+            if m:
+                current_set['type'] = m.group(1)
+                continue
+            m = re.match(r'^flags (\S+)$', line)
+            if m:
+                current_set['flags'] = m.group(1)
+                continue
+            m = re.match(r'^elements = \{ (.+) \}$', line)
+            current_set['elements'] = set(m.group(1).split(', '))
+        elif context[-1] == 'chain':
+            rules.append(line)
+    return statements, sets, rules
+
+
+class TestNft(test_utils.PatchHelper):
+
+    PORT_ADDR_MAP = {
+        (6641, 16642, 6644, 6643,): ('10.0.0.2', '10.0.0.3',
+                                     '2001:db8:0::4'),
+        (6641, 16642,): ('10.0.1.10', '10.0.1.11'),
+        (6641, 6642,): None,
+    }
+
+    def test_port_groups(self):
+        self.assertEquals(nft.port_groups(self.PORT_ADDR_MAP), [
+            nft.PortGroup((6641, 6642), set(), set()),
+            nft.PortGroup((6641, 6643, 6644, 16642),
+                          {'10.0.0.2', '10.0.0.3'}, {'2001:db8::4'}),
+            nft.PortGroup((6641, 16642), {'10.0.1.10', '10.0.1.11'}, set()),
+        ])
+        self.patch_object(nft.ch_core.hookenv, 'log')
+        self.assertEquals(nft.port_groups({(1,): (
+            'not-an-address', '10.0.0.0/24', '10.0.0.5', '10.0.1.7/24',
+            '10.0.2.1/32', '2001:db8::/64', '2001:db8::1')}), [
+            nft.PortGroup((1,), {'10.0.0.0/24', '10.0.1.0/24', '10.0.2.1'},
+                          {'2001:db8::/64'}),
+        ])
+        self.log.assert_called_once_with(
+            'Ignoring invalid firewall address: not-an-address',
+            level=mock.ANY)
+
+    def test_render_ruleset(self):
+        statements, sets, rules = parse_ruleset(
+            nft.render_ruleset('charm-ovn-central', self.PORT_ADDR_MAP))
+        self.assertEquals(statements, [
+            'table inet charm-ovn-central',
+            'delete table inet charm-ovn-central',
+        ])
+        self.assertEquals(sets, {
+            'ovn_v4_6641_6642': {'type': 'ipv4_addr', 'flags': 'interval',
+                                 'elements': set()},
+            'ovn_v6_6641_6642': {'type': 'ipv6_addr', 'flags': 'interval',
+                                 'elements': set()},
+            'ovn_v4_6641_6643_6644_16642': {
+                'type': 'ipv4_addr',
+                'flags': 'interval',
+                'elements': {'10.0.0.2', '10.0.0.3'}},
+            'ovn_v6_6641_6643_6644_16642': {
+                'type': 'ipv6_addr',
+                'flags': 'interval',
+                'elements': {'2001:db8::4'}},
+            'ovn_v4_6641_16642': {
+                'type': 'ipv4_addr',
+                'flags': 'interval',
+                'elements': {'10.0.1.10', '10.0.1.11'}},
+            'ovn_v6_6641_16642': {'type': 'ipv6_addr', 'flags': 'interval',
+                                  'elements': set()},
+        })
+        self.assertEquals(rules, [
+            'type filter hook input priority 0; policy accept;',
+            'iifname "lo" accept',
+            'ct state established,related accept',
+            'tcp dport { 6641, 6642 } ip saddr @ovn_v4_6641_6642 accept',
+            'tcp dport { 6641, 6642 } ip6 saddr @ovn_v6_6641_6642 accept',
+            'tcp dport { 6641, 6643, 6644, 16642 } '
+            'ip saddr @ovn_v4_6641_6643_6644_16642 accept',
+            'tcp dport { 6641, 6643, 6644, 16642 } '
+            'ip6 saddr @ovn_v6_6641_6643_6644_16642 accept',
+            'tcp dport { 6641, 16642 } ip saddr @ovn_v4_6641_16642 accept',
+            'tcp dport { 6641, 16642 } ip6 saddr @ovn_v6_6641_16642 accept',
+            'tcp dport { 6641, 6642, 6643, 6644, 16642 } '
+            'reject with tcp reset',
+        ])
+
+    def test_render_ruleset_loopback(self):
+        _, _, rules = parse_ruleset(
+            nft.render_ruleset('charm-ovn-central', self.PORT_ADDR_MAP))
+        # local clients are accepted before any port is rejected
+        reject = rules.index('tcp dport { 6641, 6642, 6643, 6644, 16642 } '
+                             'reject with tcp reset')
+        self.assertLess(rules.index('iifname "lo" accept'), reject)
+        self.assertLess(
+            rules.index('ct state established,related accept'), reject)
+
+    def test_render_ruleset_networks(self):
+        _, sets, _ = parse_ruleset(nft.render_ruleset(
+            'charm-ovn-central', {(6641,): ('10.0.0.0/24', '10.0.1.1')}))
+        self.assertEquals(sets['ovn_v4_6641']['elements'],
+                          {'10.0.0.0/24', '10.0.1.1'})
+
+    def test_render_ruleset_structure(self):
+        structure = nft.render_ruleset('charm-ovn-central',
+                                       self.PORT_ADDR_MAP, elements=False)
+        _, sets, _ = parse_ruleset(structure)
+        for name, nft_set in sets.items():
+            self.assertEquals(nft_set['elements'], set())
+        # structure does not depend on addresses
+        self.assertEquals(
+            nft.render_ruleset('charm-ovn-central', {
+                (6641, 16642, 6644, 6643,): ('10.0.0.5',),
+                (6641, 16642,): (),
+                (6641, 6642,): None,
+            }, elements=False),
+            structure)
+
+    def test_parse_set_elements(self):
+        listing = json.dumps({'nftables': [
+            {'metainfo': {'json_schema_version': 1}},
+            {'table': {'family': 'inet', 'name': 'charm-ovn-central'}},
+            {'set': {'family': 'inet', 'name': 'ovn_v4_6641_16642',
+                     'table': 'charm-ovn-central', 'type': 'ipv4_addr',
+                     'elem': ['10.0.1.10', '10.0.1.12',
+                              {'prefix': {'addr': '10.0.2.0', 'len': 24}}]}},
+            {'set': {'family': 'inet', 'name': 'ovn_v6_6641_16642',
+                     'table': 'charm-ovn-central', 'type': 'ipv6_addr'}},
+            {'chain': {'family': 'inet', 'name': 'input'}},
+        ]})
+        self.assertEquals(nft.parse_set_elements(listing), {
+            'ovn_v4_6641_16642': {'10.0.1.10', '10.0.1.12', '10.0.2.0/24'},
+            'ovn_v6_6641_16642': set(),
+        })
+
+    def test_render_element_delta(self):
+        port_addr_map = {
+            (6641, 16642,): ('10.0.1.10', '10.0.1.11', '2001:db8::4'),
+        }
+        current = {
+            'ovn_v4_6641_16642': {'10.0.1.10', '10.0.1.12'},
+            'ovn_v6_6641_16642': set(),
+        }
+        self.assertEquals(
+            nft.render_element_delta('t', port_addr_map, current),
+            'delete element inet t ovn_v4_6641_16642 { 10.0.1.12 }\n'
+            'add element inet t ovn_v4_6641_16642 { 10.0.1.11 }\n'
+            'add element inet t ovn_v6_6641_16642 { 2001:db8::4 }\n')
+        current = {
+            'ovn_v4_6641_16642': {'10.0.1.10', '10.0.1.11'},
+            'ovn_v6_6641_16642': {'2001:db8::4'},
+        }
+        self.assertEquals(
+            nft.render_element_delta('t', port_addr_map, current), '')
+        with self.assertRaises(KeyError):
+            nft.render_element_delta('t', port_addr_map, {})
+
+    def test_list_table(self):
+        self.patch_object(nft.subprocess, 'check_output')
+        self.check_output.return_value = 'fake-listing'
+        self.assertEquals(nft.list_table('t'), 'fake-listing')
+        self.check_output.assert_called_once_with(
+            ['nft', '-j', 'list', 'table', 'inet', 't'],
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True)
+        self.check_output.side_effect = subprocess.CalledProcessError(1, '')
+        self.assertIsNone(nft.list_table('t'))
+
+    def test_apply(self):
+        self.patch_object(nft.subprocess, 'run')
+        nft.apply('fake-script')
+        self.run.assert_called_once_with(
+            ['nft', '-f', '-'], input='fake-script', check=True,
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            universal_newlines=True)
+
+    def test_delete_table(self):
+        self.patch_object(nft, 'apply')
+        nft.delete_table('t')
+        self.apply.assert_called_once_with(
+            'table inet t\ndelete table inet t\n')
@@ -13,7 +13,13 @@
 # limitations under the License.
 
 import collections
+import gzip
 import io
+import json
+import os
+import shutil
+import tempfile
+import threading
 import unittest.mock as mock
 
 import charms_openstack.test_utils as test_utils
@@ -21,6 +27,25 @@ import charms_openstack.test_utils as test_utils
 import charm.openstack.ovn_central as ovn_central
 
 
+class FakeKV(dict):
+    """Minimal stand-in for ``charmhelpers.core.unitdata.Storage``."""
+
+    def set(self, key, value):
+        self[key] = value
+
+    def unset(self, key):
+        self.pop(key, None)
+
+
+class FakeClock(object):
+
+    def __init__(self, now=0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
 class Helper(test_utils.PatchHelper):
 
     def setUp(self):
@@ -126,12 +151,224 @@ class TestOVNCentralCharm(Helper):
 
     def test_ports_to_check(self):
         self.target._default_port_list = mock.MagicMock()
-        self.target.ports_to_check()
+        self.target._default_port_list.return_value = [6641, 6642]
+        self.patch_target('sb_relay_ports')
+        self.sb_relay_ports.return_value = [6645]
+        self.assertEquals(self.target.ports_to_check(), [6641, 6642, 6645])
         self.target._default_port_list.assert_called_once_with()
 
+    def test_render_inputs_digest(self):
+        charm_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, charm_dir)
+        template = os.path.join(charm_dir, 'templates', 'ovn-central')
+        os.makedirs(os.path.dirname(template))
+        with open(template, 'w') as fd:
+            fd.write('{{ ovsdb_peer.cluster_local_addr }}')
+        self.patch_object(ovn_central.ch_core.hookenv, 'charm_dir',
+                          return_value=charm_dir)
+        self.patch_object(ovn_central.UssuriOVNCentralCharm, 'options',
+                          create=True, new_callable=mock.PropertyMock)
+        options = self.options
+        options.return_value = mock.MagicMock(
+            ovn_key='key', ovn_cert='cert', ovn_ca_cert='ca',
+            is_charm_leader=False, ovsdb_tuning_ctl_opts=[])
+        ovsdb_peer = mock.MagicMock(
+            cluster_local_addr='10.0.0.1', db_nb_cluster_port=6643,
+            db_sb_cluster_port=6644, db_nb_connection_strs=['ssl:a:6641'],
+            db_sb_connection_strs=['ssl:a:6642'])
+        ovsdb_peer.cluster_remote_addrs = (
+            addr for addr in ('10.0.0.2', '10.0.0.3'))
+        digest = self.target.render_inputs_digest([ovsdb_peer], ['/a'])
+        ovsdb_peer.cluster_remote_addrs = (
+            addr for addr in ('10.0.0.2', '10.0.0.3'))
+        self.assertEquals(
+            self.target.render_inputs_digest([ovsdb_peer], ['/a']), digest)
+        ovsdb_peer.cluster_remote_addrs = ('10.0.0.2',)
+        changed = self.target.render_inputs_digest([ovsdb_peer], ['/a'])
+        self.assertNotEqual(changed, digest)
+        options.return_value.is_charm_leader = True
+        self.assertNotEqual(
+            self.target.render_inputs_digest([ovsdb_peer], ['/a']), changed)
+        options.return_value.is_charm_leader = False
+        os.utime(template, ns=(0, 0))
+        self.assertNotEqual(
+            self.target.render_inputs_digest([ovsdb_peer], ['/a']), changed)
+
+    def test_render_with_interfaces(self):
+        self.patch_object(ovn_central.ch_core.unitdata, 'kv')
+        kv = FakeKV()
+        self.kv.return_value = kv
+        self.patch_object(
+            ovn_central.charms_openstack.charm.OpenStackCharm,
+            'render_with_interfaces', name='base_render')
+        self.patch_object(ovn_central.os.path, 'exists', return_value=True)
+        self.patch_target('render_inputs_digest', return_value='digest1')
+        self.target.render_with_interfaces(['ovsdb_peer'])
+        self.base_render.assert_called_once_with(['ovsdb_peer'],
+                                                 configs=None)
+        self.render_inputs_digest.assert_called_once_with(
+            ['ovsdb_peer'], list(self.target.full_restart_map.keys()))
+        self.assertEquals(kv, {'ovn-central.render-digest': 'digest1'})
+        # unchanged inputs
+        self.target.render_with_interfaces(['ovsdb_peer'])
+        self.assertEquals(self.base_render.call_count, 1)
+        # missing target
+        self.exists.return_value = False
+        self.target.render_with_interfaces(['ovsdb_peer'])
+        self.assertEquals(self.base_render.call_count, 2)
+        # changed inputs, failing render is retried
+        self.exists.return_value = True
+        self.render_inputs_digest.return_value = 'digest2'
+        self.base_render.side_effect = OSError
+        with self.assertRaises(OSError):
+            self.target.render_with_interfaces(['ovsdb_peer'], ['/a'])
+        self.assertEquals(kv, {})
+        self.base_render.side_effect = None
+        self.target.render_with_interfaces(['ovsdb_peer'], ['/a'])
+        self.base_render.assert_called_with(['ovsdb_peer'], configs=['/a'])
+        self.assertEquals(kv, {'ovn-central.render-digest': 'digest2'})
+
+    def test_cluster_status(self):
+        self.patch_target('ovsdb_connection')
+        self.ovsdb_connection.side_effect = OSError
+        self.patch_object(ovn_central.ch_ovn, 'cluster_status')
+        self.cluster_status.side_effect = ['nb-status', 'sb-status',
+                                           'nb-status2']
+        self.assertEquals(self.target.cluster_status('ovnnb_db'), 'nb-status')
+        self.assertEquals(self.target.cluster_status('ovnnb_db'), 'nb-status')
+        self.assertEquals(self.target.cluster_status('ovnsb_db'), 'sb-status')
+        self.cluster_status.assert_has_calls([
+            mock.call('ovnnb_db', rundir='/var/run/ovn',
+                      use_ovs_appctl=False),
+            mock.call('ovnsb_db', rundir='/var/run/ovn',
+                      use_ovs_appctl=False),
+        ])
+        self.assertEquals(self.cluster_status.call_count, 2)
+        self.assertEquals(
+            self.target._cluster_status_cache_stats,
+            {'hit': 1, 'miss': 2})
+        self.target.invalidate_cluster_status('ovnnb_db')
+        self.assertEquals(self.target.cluster_status('ovnnb_db'),
+                          'nb-status2')
+        self.assertEquals(self.target.cluster_status('ovnsb_db'), 'sb-status')
+        self.assertEquals(self.cluster_status.call_count, 3)
+        self.target.invalidate_cluster_status()
+        self.assertEquals(self.target._cluster_status_cache, {})
+
+    def test_cluster_status_not_ready(self):
+        self.patch_target('ovsdb_connection')
+        self.ovsdb_connection.side_effect = OSError
+        self.patch_object(ovn_central.ch_ovn, 'cluster_status')
+        self.cluster_status.side_effect = [ValueError, 'nb-status']
+        self.assertIsNone(self.target.cluster_status('ovnnb_db'))
+        self.assertEquals(self.target.cluster_status('ovnnb_db'), 'nb-status')
+
+    def test_cluster_status_native(self):
+        self.patch_target('ovsdb_connection', return_value=mock.MagicMock())
+        self.patch_object(ovn_central.ch_ovn, 'cluster_status')
+        self.patch_object(ovn_central, 'cluster_status_from_output')
+        conn = self.ovsdb_connection.return_value.__enter__.return_value
+        conn.unixctl.return_value = 'fake-output'
+        self.cluster_status_from_output.return_value = 'sb-status'
+        self.assertEquals(self.target.cluster_status('ovnsb_db'), 'sb-status')
+        self.ovsdb_connection.assert_called_once_with('ovnsb_db',
+                                                      control=True)
+        conn.unixctl.assert_called_once_with('cluster/status',
+                                             'OVN_Southbound')
+        self.cluster_status_from_output.assert_called_once_with('fake-output')
+        self.assertFalse(self.cluster_status.called)
+        conn.unixctl.side_effect = ovn_central.ovsdb_client.OVSDBError(
+            'not clustered')
+        self.assertIsNone(self.target.cluster_status('ovnnb_db'))
+        self.assertFalse(self.cluster_status.called)
+
+    def test_cluster_status_reuse(self):
+        self.patch_object(ovn_central.ch_core.unitdata, 'kv')
+        kv = FakeKV()
+        self.kv.return_value = kv
+        self.patch_object(ovn_central.ch_core.hookenv, 'hook_name')
+        self.patch_object(ovn_central.time, 'time')
+        self.patch_target('ovsdb_connection', return_value=mock.MagicMock())
+        self.patch_object(ovn_central, 'cluster_status_from_output')
+        conn = self.ovsdb_connection.return_value.__enter__.return_value
+        conn.unixctl.return_value = 'fake-output'
+        self.hook_name.return_value = 'config-changed'
+        self.time.return_value = 1000
+        self.target.cluster_status('ovnsb_db')
+        self.assertEquals(kv, {
+            'ovn-central.cluster-status.ovnsb_db': {
+                'output': 'fake-output', 'time': 1000}})
+        # Other hooks always query the server
+        self.target.invalidate_cluster_status()
+        kv['ovn-central.cluster-status.ovnsb_db'] = {
+            'output': 'stored-output', 'time': 1000}
+        self.target.cluster_status('ovnsb_db')
+        self.assertEquals(conn.unixctl.call_count, 2)
+        # update-status reuses recent output
+        self.hook_name.return_value = 'update-status'
+        self.target._cluster_status_cache.clear()
+        self.time.return_value = 1100
+        self.target.cluster_status('ovnsb_db')
+        self.assertEquals(conn.unixctl.call_count, 2)
+        self.cluster_status_from_output.assert_called_with('fake-output')
+        # callers about to change state get a fresh status
+        self.target.cluster_status('ovnsb_db', fresh=True)
+        self.assertEquals(conn.unixctl.call_count, 3)
+        self.target.cluster_status('ovnsb_db', fresh=True)
+        self.assertEquals(conn.unixctl.call_count, 3)
+        # but not if it is too old
+        self.target._cluster_status_cache.clear()
+        self.time.return_value = 1100 + ovn_central.CLUSTER_STATUS_MAX_AGE
+        self.target.cluster_status('ovnsb_db')
+        self.assertEquals(conn.unixctl.call_count, 4)
+        # invalidation drops the stored output
+        self.target.invalidate_cluster_status('ovnsb_db')
+        self.assertEquals(kv, {})
+
+    def test_cluster_status_from_output(self):
+        self.patch_object(ovn_central.ch_ovn, 'OVNClusterStatus')
+        ovn_central.cluster_status_from_output(
+            'a6c3\n'
+            'Name: OVN_Southbound\n'
+            'Cluster ID: 2d8b (2d8b5e4e-6ae8-41b1-a6a8-ea0d26bd26d5)\n'
+            'Server ID: a6c3 (a6c3ee29-4ec6-4d2f-ab0b-9e3a5a4b9b0e)\n'
+            'Address: ssl:10.0.0.1:6644\n'
+            'Status: cluster member\n'
+            'Role: leader\n'
+            'Term: 3\n'
+            'Leader: self\n'
+            'Vote: self\n'
+            '\n'
+            'Election timer: 4000\n'
+            'Log: [2, 10]\n'
+            'Entries not yet committed: 0\n'
+            'Entries not yet applied: 1\n'
+            'Connections: ->5b3e <-5b3e\n'
+            'Servers:\n'
+            '    a6c3 (a6c3 at ssl:10.0.0.1:6644) (self) next_index=8\n'
+            '    5b3e (5b3e at ssl:10.0.0.2:6644) next_index=10\n')
+        self.OVNClusterStatus.assert_called_once_with(
+            'OVN_Southbound',
+            ovn_central.uuid.UUID('2d8b5e4e-6ae8-41b1-a6a8-ea0d26bd26d5'),
+            ovn_central.uuid.UUID('a6c3ee29-4ec6-4d2f-ab0b-9e3a5a4b9b0e'),
+            'ssl:10.0.0.1:6644',
+            'cluster member',
+            'leader',
+            3,
+            'self',
+            True,
+            4000,
+            '[2, 10]',
+            0,
+            1,
+            '->5b3e <-5b3e',
+            [('a6c3', 'ssl:10.0.0.1:6644'), ('5b3e', 'ssl:10.0.0.2:6644')])
+
     def test_cluster_status_mesage(self):
         self.patch_target('cluster_status')
         self.patch_target('is_northd_active')
+        self.patch_target('northd_n_threads')
+        self.northd_n_threads.return_value = None
         self.cluster_status.side_effect = [
             self.FakeClusterStatus(False),
             self.FakeClusterStatus(False),
@@ -179,6 +416,339 @@ class TestOVNCentralCharm(Helper):
         self.assertEquals(
             self.target.cluster_status_message(),
             'leader: ovnnb_db, ovnsb_db northd: active')
+        self.northd_n_threads.return_value = 4
+        self.cluster_status.side_effect = [
+            self.FakeClusterStatus(False),
+            self.FakeClusterStatus(False),
+        ]
+        self.assertEquals(
+            self.target.cluster_status_message(),
+            'northd: active (4 threads)')
+
+    def test_northd_unixctl(self):
+        self.patch_target('ovn_rundir', return_value='/run/ovn')
+        self.patch_target('service_pid')
+        self.patch_object(ovn_central.ovsdb_client, 'OVSDBClient')
+        conn = self.OVSDBClient.return_value.__enter__.return_value
+        conn.unixctl.return_value = 'fake-output'
+        self.service_pid.return_value = None
+        with self.assertRaises(OSError):
+            self.target.northd_unixctl('status')
+        self.assertFalse(self.OVSDBClient.called)
+        self.service_pid.return_value = 4242
+        self.assertEquals(
+            self.target.northd_unixctl(
+                'parallel-build/set-n-threads', '4'),
+            'fake-output')
+        self.service_pid.assert_called_with('ovn-northd')
+        self.OVSDBClient.assert_called_once_with(
+            '/run/ovn/ovn-northd.4242.ctl')
+        conn.unixctl.assert_called_once_with(
+            'parallel-build/set-n-threads', '4')
+
+    def test_is_northd_active(self):
+        self.patch_target('northd_unixctl')
+        self.northd_unixctl.return_value = 'Status: active\n'
+        self.assertTrue(self.target.is_northd_active())
+        self.northd_unixctl.assert_called_once_with('status')
+        self.northd_unixctl.return_value = 'Status: standby\n'
+        self.assertFalse(self.target.is_northd_active())
+        self.northd_unixctl.side_effect = OSError
+        self.assertFalse(self.target.is_northd_active())
+
+    def test_northd_n_threads(self):
+        self.patch_target('northd_unixctl')
+        self.northd_unixctl.return_value = '4\n'
+        self.assertEquals(self.target.northd_n_threads(), 4)
+        self.northd_unixctl.assert_called_once_with(
+            'parallel-build/get-n-threads')
+        self.northd_unixctl.side_effect = ovn_central.ovsdb_client.OVSDBError(
+            'unknown command')
+        self.assertIsNone(self.target.northd_n_threads())
+
+    def test_configure_northd_threads(self):
+        self.patch_target('config')
+        self.config.__getitem__.return_value = 4
+        self.patch_target('northd_n_threads')
+        self.patch_target('northd_unixctl')
+        self.northd_n_threads.return_value = None
+        self.target.configure_northd_threads()
+        self.northd_n_threads.return_value = 4
+        self.target.configure_northd_threads()
+        self.assertFalse(self.northd_unixctl.called)
+        self.northd_n_threads.return_value = 1
+        self.target.configure_northd_threads()
+        self.northd_unixctl.assert_called_once_with(
+            'parallel-build/set-n-threads', '4')
+
+    def test_ovsdb_server_tuning(self):
+        self.patch_target('config')
+        config = {'ovsdb-server-tuning': ''}
+        self.config.__getitem__.side_effect = config.__getitem__
+        self.assertEquals(self.target.ovsdb_server_tuning(), {})
+        config['ovsdb-server-tuning'] = (
+            'memory-trim-on-compaction: true\n'
+            'disable-file-column-diff: false\n')
+        self.assertEquals(self.target.ovsdb_server_tuning(), {
+            'memory-trim-on-compaction': True,
+            'disable-file-column-diff': False,
+        })
+        for invalid in ('- memory-trim-on-compaction',
+                        'memory-trim-on-compaction: 1',
+                        'monitor-cache: true',
+                        'memory-trim-on-compaction: [true'):
+            config['ovsdb-server-tuning'] = invalid
+            with self.assertRaises(ValueError):
+                self.target.ovsdb_server_tuning()
+
+    def test__probe_ovsdb_tunables(self):
+        self.patch_target('ovsdb_connection', return_value=mock.MagicMock())
+        conn = self.ovsdb_connection.return_value.__enter__.return_value
+        conn.unixctl.return_value = (
+            'The available commands are:\n'
+            '  cluster/status          DB\n'
+            '  ovsdb-server/memory-trim-on-compaction on|off\n')
+        self.patch_object(ovn_central.subprocess, 'check_output')
+        self.check_output.return_value = (
+            '  --disable-file-column-diff\n'
+            '                      don\'t use column diff in database file\n')
+        self.patch_object(ovn_central.os.path, 'exists')
+        self.exists.return_value = True
+        with mock.patch.object(
+                ovn_central, 'open',
+                mock.mock_open(read_data='--ovsdb-disable-file-column-diff'),
+                create=True):
+            self.assertEquals(self.target._probe_ovsdb_tunables(), [
+                'disable-file-column-diff', 'memory-trim-on-compaction'])
+        self.ovsdb_connection.assert_called_once_with('ovnsb_db',
+                                                      control=True)
+        conn.unixctl.assert_called_once_with('list-commands')
+        self.check_output.assert_called_once_with(
+            ['ovsdb-server', '--help'], universal_newlines=True)
+        self.exists.return_value = False
+        conn.unixctl.return_value = 'The available commands are:\n'
+        self.assertEquals(self.target._probe_ovsdb_tunables(), [])
+        self.ovsdb_connection.side_effect = OSError
+        self.assertIsNone(self.target._probe_ovsdb_tunables())
+
+    def test_upstream_version(self):
+        self.patch_object(ovn_central.ch_fetch, 'get_upstream_version')
+        self.get_upstream_version.return_value = '21.12.0'
+        self.assertEquals(self.target.upstream_version(), '21.12.0')
+        self.assertEquals(self.target.upstream_version('ovn-central'),
+                          '21.12.0')
+        self.get_upstream_version.assert_called_once_with('ovn-central')
+        self.get_upstream_version.return_value = '2.16.0'
+        self.assertEquals(
+            self.target.upstream_version('openvswitch-common'), '2.16.0')
+        self.assertEquals(self.get_upstream_version.call_count, 2)
+
+    def test_service_pid(self):
+        self.patch_target('ovn_rundir')
+        with tempfile.TemporaryDirectory() as rundir:
+            self.ovn_rundir.return_value = rundir
+            self.assertIsNone(self.target.service_pid('ovnsb_db'))
+            with open(os.path.join(rundir, 'ovnsb_db.pid'), 'w') as f:
+                f.write('4242\n')
+            self.assertEquals(self.target.service_pid('ovnsb_db'), 4242)
+            with open(os.path.join(rundir, 'ovn-northd.pid'), 'w') as f:
+                f.write('')
+            self.assertIsNone(self.target.service_pid('ovn-northd'))
+
+    def test_ovsdb_tunables_supported(self):
+        self.patch_target('upstream_version')
+        versions = {None: None, 'openvswitch-common': '2.17.0'}
+        self.upstream_version.side_effect = lambda package=None: (
+            versions[package])
+        self.patch_target('service_pid')
+        pids = {'ovnnb_db': None, 'ovnsb_db': None}
+        self.service_pid.side_effect = lambda name: pids[name]
+        self.patch_object(ovn_central.ch_core.unitdata, 'kv')
+        kv = FakeKV()
+        self.kv.return_value = kv
+        clock = FakeClock(1000)
+        self.patch_object(ovn_central.time, 'time')
+        self.time.side_effect = clock
+        self.patch_target('_probe_ovsdb_tunables')
+        self.assertIsNone(self.target.ovsdb_tunables_supported())
+        self.assertFalse(self._probe_ovsdb_tunables.called)
+        versions[None] = '21.12.0'
+        self._probe_ovsdb_tunables.return_value = None
+        self.assertIsNone(self.target.ovsdb_tunables_supported())
+        self.assertEquals(kv[ovn_central.OVSDB_TUNABLES_KEY], {
+            'version': ['21.12.0', '2.17.0'], 'supported': None,
+            'pids': pids, 'time': 1000})
+        # failed probe is not repeated before the retry interval passed
+        self._probe_ovsdb_tunables.return_value = [
+            'memory-trim-on-compaction']
+        self.assertIsNone(self.target.ovsdb_tunables_supported())
+        self.assertEquals(self._probe_ovsdb_tunables.call_count, 1)
+        clock.now += ovn_central.OVSDB_TUNABLES_RETRY
+        self.assertEquals(self.target.ovsdb_tunables_supported(),
+                          {'memory-trim-on-compaction'})
+        self.assertEquals(self.target.ovsdb_tunables_supported(),
+                          {'memory-trim-on-compaction'})
+        self.assertEquals(self._probe_ovsdb_tunables.call_count, 2)
+        # an upgrade of either package probes again
+        versions['openvswitch-common'] = '3.0.0'
+        self._probe_ovsdb_tunables.return_value = None
+        self.assertIsNone(self.target.ovsdb_tunables_supported())
+        self.assertEquals(self._probe_ovsdb_tunables.call_count, 3)
+        # as do started servers after a failed probe
+        pids = {'ovnnb_db': 10, 'ovnsb_db': 11}
+        self._probe_ovsdb_tunables.return_value = [
+            'disable-file-column-diff', 'memory-trim-on-compaction']
+        self.assertEquals(self.target.ovsdb_tunables_supported(),
+                          {'disable-file-column-diff',
+                           'memory-trim-on-compaction'})
+        self.assertEquals(kv[ovn_central.OVSDB_TUNABLES_KEY]['version'],
+                          ['21.12.0', '3.0.0'])
+
+    def test_ovsdb_tuning_ctl_opts(self):
+        self.patch_target('ovsdb_server_tuning')
+        self.patch_target('ovsdb_tunables_supported')
+        self.ovsdb_server_tuning.return_value = {
+            'memory-trim-on-compaction': True}
+        self.assertEquals(self.target.ovsdb_tuning_ctl_opts(), [])
+        self.assertFalse(self.ovsdb_tunables_supported.called)
+        self.ovsdb_server_tuning.return_value = {
+            'disable-file-column-diff': True}
+        self.ovsdb_tunables_supported.return_value = None
+        self.assertEquals(self.target.ovsdb_tuning_ctl_opts(), [])
+        self.ovsdb_tunables_supported.return_value = set()
+        self.assertEquals(self.target.ovsdb_tuning_ctl_opts(), [])
+        self.ovsdb_tunables_supported.return_value = {
+            'disable-file-column-diff'}
+        self.assertEquals(self.target.ovsdb_tuning_ctl_opts(),
+                          ['--ovsdb-disable-file-column-diff=yes'])
+        self.ovsdb_server_tuning.side_effect = ValueError
+        self.assertEquals(self.target.ovsdb_tuning_ctl_opts(), [])
+
+    def test_configure_ovsdb_tuning(self):
+        self.patch_target('ovsdb_server_tuning')
+        self.patch_target('ovsdb_tunables_supported')
+        self.patch_target('ovsdb_connection', return_value=mock.MagicMock())
+        self.patch_object(ovn_central.ch_core.unitdata, 'kv')
+        kv = FakeKV()
+        self.kv.return_value = kv
+        pids = {'ovnnb_db': 10, 'ovnsb_db': 11}
+        self.patch_target('service_pid')
+        self.service_pid.side_effect = lambda name: pids[name]
+        conn = self.ovsdb_connection.return_value.__enter__.return_value
+        self.ovsdb_server_tuning.return_value = {
+            'memory-trim-on-compaction': True}
+        # unknown support is retried on the next hook
+        self.ovsdb_tunables_supported.return_value = None
+        self.target.configure_ovsdb_tuning()
+        self.assertFalse(conn.unixctl.called)
+        self.assertEquals(kv, {})
+        self.ovsdb_tunables_supported.return_value = set()
+        self.target.configure_ovsdb_tuning()
+        self.assertFalse(conn.unixctl.called)
+        kv.clear()
+        self.ovsdb_tunables_supported.return_value = {
+            'memory-trim-on-compaction'}
+        self.target.configure_ovsdb_tuning()
+        self.ovsdb_connection.assert_has_calls([
+            mock.call('ovnnb_db', control=True),
+            mock.call('ovnsb_db', control=True),
+        ], any_order=True)
+        conn.unixctl.assert_has_calls([
+            mock.call('ovsdb-server/memory-trim-on-compaction', 'on'),
+            mock.call('ovsdb-server/memory-trim-on-compaction', 'on'),
+        ])
+        self.assertEquals(kv[ovn_central.OVSDB_TUNING_APPLIED_KEY], {
+            'tuning': {'memory-trim-on-compaction': True},
+            'pids': {'ovnnb_db': 10, 'ovnsb_db': 11}})
+        # nothing to do until configuration or processes change
+        conn.unixctl.reset_mock()
+        self.ovsdb_tunables_supported.reset_mock()
+        self.target.configure_ovsdb_tuning()
+        self.assertFalse(conn.unixctl.called)
+        self.assertFalse(self.ovsdb_tunables_supported.called)
+        pids['ovnsb_db'] = 12
+        self.target.configure_ovsdb_tuning()
+        self.assertEquals(conn.unixctl.call_count, 2)
+        conn.unixctl.reset_mock()
+        self.ovsdb_server_tuning.return_value = {}
+        self.target.configure_ovsdb_tuning()
+        conn.unixctl.assert_has_calls([
+            mock.call('ovsdb-server/memory-trim-on-compaction', 'off'),
+            mock.call('ovsdb-server/memory-trim-on-compaction', 'off'),
+        ])
+        # failures are retried on the next hook
+        self.ovsdb_server_tuning.return_value = {
+            'memory-trim-on-compaction': True}
+        conn.unixctl.side_effect = ovn_central.ovsdb_client.OVSDBError('e')
+        self.target.configure_ovsdb_tuning()
+        self.assertEquals(
+            kv[ovn_central.OVSDB_TUNING_APPLIED_KEY]['tuning'],
+            {'memory-trim-on-compaction': False})
+        # not applied to a server that is not running
+        conn.unixctl.side_effect = None
+        pids['ovnnb_db'] = None
+        self.target.configure_ovsdb_tuning()
+        self.assertEquals(
+            kv[ovn_central.OVSDB_TUNING_APPLIED_KEY]['tuning'],
+            {'memory-trim-on-compaction': False})
+
+    def test_configure_northd_parallel_build(self):
+        self.patch_target('config')
+        config = {'ovn-northd-n-threads': 4}
+        self.config.__getitem__.side_effect = config.__getitem__
+        self.patch_target('cluster_status')
+        self.cluster_status.return_value = self.FakeClusterStatus(False)
+        self.patch_target('_configure_northd_parallel_build_native')
+        self.patch_target('run')
+        self.target.configure_northd_parallel_build()
+        self.assertFalse(self._configure_northd_parallel_build_native.called)
+        self.cluster_status.return_value = self.FakeClusterStatus(True)
+        self.target.configure_northd_parallel_build()
+        self._configure_northd_parallel_build_native.assert_called_once_with(
+            'true')
+        self._configure_northd_parallel_build_native.side_effect = OSError
+        self.target.configure_northd_parallel_build()
+        self.run.assert_called_once_with(
+            'ovn-nbctl', 'set', 'NB_Global', '.',
+            'options:use_parallel_build=true')
+        self.run.reset_mock()
+        config['ovn-northd-n-threads'] = 1
+        self.target.configure_northd_parallel_build()
+        self.run.assert_called_once_with(
+            'ovn-nbctl', 'remove', 'NB_Global', '.',
+            'options', 'use_parallel_build')
+
+    def test__configure_northd_parallel_build_native(self):
+        self.patch_target('ovsdb_connection', return_value=mock.MagicMock())
+        conn = self.ovsdb_connection.return_value.__enter__.return_value
+        conn.select.return_value = [
+            {'options': ['map', [['use_parallel_build', 'true']]]}]
+        self.target._configure_northd_parallel_build_native('true')
+        conn.select.assert_called_once_with(
+            'OVN_Northbound', 'NB_Global', columns=['options'])
+        self.assertFalse(conn.transact.called)
+        self.target._configure_northd_parallel_build_native(None)
+        conn.transact.assert_called_once_with('OVN_Northbound', {
+            'op': 'mutate',
+            'table': 'NB_Global',
+            'where': [],
+            'mutations': [
+                ['options', 'delete', ['set', ['use_parallel_build']]],
+            ],
+        })
+        conn.transact.reset_mock()
+        conn.select.return_value = [{'options': ['map', []]}]
+        self.target._configure_northd_parallel_build_native('true')
+        conn.transact.assert_called_once_with('OVN_Northbound', {
+            'op': 'mutate',
+            'table': 'NB_Global',
+            'where': [],
+            'mutations': [
+                ['options', 'delete', ['set', ['use_parallel_build']]],
+                ['options', 'insert',
+                 ['map', [['use_parallel_build', 'true']]]],
+            ],
+        })
 
     def test_enable_services(self):
         self.patch_object(ovn_central.ch_core.host, 'service_resume')
@@ -214,6 +784,306 @@ class TestOVNCentralCharm(Helper):
         self.run.assert_called_once_with(
             'ovsdb-tool', 'join-cluster', '/a/db.file', 'aSchema',
             'ssl:a.b.c.d:1234', 'ssl:e.f.g.h:1234', 'ssl:i.j.k.l:1234')
+        self.run.reset_mock()
+        self.target.join_cluster('/a/db.file',
+                                 'aSchema',
+                                 ['ssl:a.b.c.d:1234'],
+                                 ['ssl:e.f.g.h:1234'],
+                                 cid='fake-cid')
+        self.run.assert_called_once_with(
+            'ovsdb-tool', '--cid=fake-cid', 'join-cluster', '/a/db.file',
+            'aSchema', 'ssl:a.b.c.d:1234', 'ssl:e.f.g.h:1234')
+
+    def test_join_clusters(self):
+        self.patch_target('join_cluster')
+        self.patch_target('invalidate_cluster_status')
+        joins = [
+            ('ovnnb_db.db', 'OVN_Northbound', ['ssl:a:6643'], ['ssl:b:6643']),
+            ('ovnsb_db.db', 'OVN_Southbound', ['ssl:a:6644'], ['ssl:b:6644']),
+        ]
+        # both joins run before either returns
+        barrier = threading.Barrier(2, timeout=10)
+        self.join_cluster.side_effect = lambda *args: barrier.wait()
+        self.target.join_clusters(joins)
+        self.join_cluster.assert_has_calls([
+            mock.call(*joins[0]), mock.call(*joins[1])], any_order=True)
+        self.invalidate_cluster_status.assert_called_once_with()
+
+        # a failed join is raised once all joins are done
+        self.join_cluster.reset_mock()
+        self.invalidate_cluster_status.reset_mock()
+        self.join_cluster.side_effect = [
+            ovn_central.subprocess.CalledProcessError(1, 'ovsdb-tool'),
+            None]
+        with self.assertRaises(ovn_central.subprocess.CalledProcessError):
+            self.target.join_clusters(joins)
+        self.assertEquals(self.join_cluster.call_count, 2)
+        self.invalidate_cluster_status.assert_called_once_with()
+
+        self.join_cluster.reset_mock()
+        self.invalidate_cluster_status.reset_mock()
+        self.target.join_clusters([])
+        self.assertFalse(self.join_cluster.called)
+        self.assertFalse(self.invalidate_cluster_status.called)
+
+    def test_databases_exist(self):
+        self.patch_object(ovn_central.os.path, 'exists')
+        self.exists.return_value = True
+        self.assertTrue(self.target.databases_exist())
+        self.exists.assert_has_calls([
+            mock.call('/var/lib/ovn/ovnnb_db.db'),
+            mock.call('/var/lib/ovn/ovnsb_db.db'),
+        ])
+        self.exists.side_effect = lambda path: path.endswith('ovnnb_db.db')
+        self.assertFalse(self.target.databases_exist())
+
+    def test_join_snapshot_ready(self):
+        self.patch_object(ovn_central.ch_core.unitdata, 'kv')
+        kv = FakeKV()
+        self.kv.return_value = kv
+        clock = FakeClock(1000)
+        self.patch_object(ovn_central.time, 'time')
+        self.time.side_effect = clock
+        self.patch_object(ovn_central.ch_core.hookenv, 'relation_ids')
+        self.relation_ids.return_value = ['ovsdb-peer:1']
+        self.patch_object(ovn_central.ch_core.hookenv, 'related_units')
+        self.related_units.return_value = [
+            'ovn-central/0', 'ovn-central/1', 'ovn-central/4']
+        self.patch_object(ovn_central.ch_core.hookenv, 'local_unit')
+        self.local_unit.return_value = 'ovn-central/3'
+        self.patch_object(ovn_central.ch_core.hookenv, 'relation_set')
+        self.patch_object(ovn_central.ch_core.hookenv, 'relation_get')
+        data = {
+            'ovn-central/0': {},
+            'ovn-central/1': {
+                'ovn-join-snapshot-ready': 'ovn-central/3 ovn-central/4'},
+            'ovn-central/4': {'ovn-join-snapshot-request': 'true'},
+        }
+        self.relation_get.side_effect = (
+            lambda key, unit, rid: data[unit].get(key))
+        self.assertFalse(self.target.join_snapshot_ready())
+        self.assertEquals(kv, {'ovn-central.join-snapshot-requested': 1000})
+        self.relation_set.assert_called_once_with(
+            relation_id='ovsdb-peer:1',
+            relation_settings={'ovn-join-snapshot-request': 'true'})
+        # request is only published once
+        self.relation_set.reset_mock()
+        clock.now += 60
+        self.assertFalse(self.target.join_snapshot_ready())
+        self.assertFalse(self.relation_set.called)
+        data['ovn-central/0']['ovn-join-snapshot-ready'] = 'ovn-central/3'
+        self.assertTrue(self.target.join_snapshot_ready())
+        # unresponsive peers are not waited for indefinitely
+        del data['ovn-central/0']['ovn-join-snapshot-ready']
+        clock.now += ovn_central.JOIN_SNAPSHOT_TIMEOUT
+        self.assertTrue(self.target.join_snapshot_ready())
+
+    def test_clear_join_snapshot_request(self):
+        self.patch_object(ovn_central.ch_core.unitdata, 'kv')
+        kv = FakeKV()
+        self.kv.return_value = kv
+        self.patch_object(ovn_central.ch_core.hookenv, 'relation_ids')
+        self.relation_ids.return_value = ['ovsdb-peer:1']
+        self.patch_object(ovn_central.ch_core.hookenv, 'relation_set')
+        self.target.clear_join_snapshot_request()
+        self.assertFalse(self.relation_set.called)
+        kv['ovn-central.join-snapshot-requested'] = 1000
+        self.target.clear_join_snapshot_request()
+        self.relation_set.assert_called_once_with(
+            relation_id='ovsdb-peer:1',
+            relation_settings={'ovn-join-snapshot-request': None})
+        self.assertEquals(kv, {})
+
+    def test_prepare_join_snapshots(self):
+        self.patch_target('databases_exist')
+        self.databases_exist.return_value = False
+        self.patch_target('compact_ovsdb')
+        self.patch_object(ovn_central.ch_core.hookenv, 'relation_ids')
+        self.relation_ids.return_value = ['ovsdb-peer:1']
+        self.patch_object(ovn_central.ch_core.hookenv, 'related_units')
+        self.related_units.return_value = [
+            'ovn-central/1', 'ovn-central/3', 'ovn-central/4']
+        self.patch_object(ovn_central.ch_core.hookenv, 'local_unit')
+        self.local_unit.return_value = 'ovn-central/0'
+        self.patch_object(ovn_central.ch_core.hookenv, 'relation_set')
+        self.patch_object(ovn_central.ch_core.hookenv, 'relation_get')
+        data = {
+            'ovn-central/0': {
+                'ovn-join-snapshot-ready': 'ovn-central/2 ovn-central/3'},
+            'ovn-central/1': {},
+            'ovn-central/3': {'ovn-join-snapshot-request': 'true'},
+            'ovn-central/4': {'ovn-join-snapshot-request': 'true'},
+        }
+        self.relation_get.side_effect = (
+            lambda key, unit, rid: data[unit].get(key))
+        # joining units have nothing to compact
+        self.target.prepare_join_snapshots()
+        self.assertFalse(self.relation_set.called)
+        self.databases_exist.return_value = True
+        self.compact_ovsdb.side_effect = [
+            ovn_central.subprocess.CalledProcessError(1, 'ovn-appctl'),
+            {'duration': 1}]
+        self.target.prepare_join_snapshots()
+        self.compact_ovsdb.assert_has_calls([
+            mock.call('nb'), mock.call('sb')])
+        self.relation_set.assert_called_once_with(
+            relation_id='ovsdb-peer:1',
+            relation_settings={
+                'ovn-join-snapshot-ready': 'ovn-central/3 ovn-central/4'})
+        # requests already acknowledged are not compacted for again
+        self.compact_ovsdb.reset_mock()
+        self.relation_set.reset_mock()
+        data['ovn-central/0']['ovn-join-snapshot-ready'] = (
+            'ovn-central/3 ovn-central/4')
+        self.target.prepare_join_snapshots()
+        self.assertFalse(self.compact_ovsdb.called)
+        self.assertFalse(self.relation_set.called)
+        # acknowledgement is withdrawn with the request
+        data['ovn-central/3'] = {}
+        data['ovn-central/4'] = {}
+        self.target.prepare_join_snapshots()
+        self.assertFalse(self.compact_ovsdb.called)
+        self.relation_set.assert_called_once_with(
+            relation_id='ovsdb-peer:1',
+            relation_settings={'ovn-join-snapshot-ready': None})
+
+    def test_sb_relay_ports(self):
+        self.patch_target('config')
+        config = {'ovn-sb-relay-count': 0, 'ovn-sb-relay-port': 6645}
+        self.config.__getitem__.side_effect = config.__getitem__
+        self.assertEquals(self.target.sb_relay_ports(), [])
+        config['ovn-sb-relay-count'] = 2
+        self.assertEquals(self.target.sb_relay_ports(), [6645, 6646])
+
+    def test_sb_relay_supported(self):
+        self.patch_target('upstream_version')
+        self.patch_object(ovn_central.ch_fetch.apt_pkg, 'version_compare')
+        self.upstream_version.return_value = None
+        self.assertFalse(self.target.sb_relay_supported())
+        self.upstream_version.return_value = '2.17.9'
+        self.version_compare.return_value = -1
+        self.assertFalse(self.target.sb_relay_supported())
+        self.upstream_version.assert_called_with('openvswitch-common')
+        self.version_compare.assert_called_once_with('2.17.9', '3.3')
+        self.version_compare.return_value = 1
+        self.assertTrue(self.target.sb_relay_supported())
+
+    def test_sb_relay_config(self):
+        self.assertEquals(
+            self.target.sb_relay_config(
+                6645, ['ssl:10.0.0.1:16642', 'ssl:10.0.0.2:16642']),
+            {
+                'remotes': {
+                    'pssl:6645': {'role': 'ovn-controller'},
+                },
+                'databases': {
+                    'OVN_Southbound': {
+                        'service-model': 'relay',
+                        'source': {
+                            'ssl:10.0.0.1:16642': {},
+                            'ssl:10.0.0.2:16642': {},
+                        },
+                    },
+                },
+            })
+
+    def test_configure_sb_relays(self):
+        self.patch_target('sb_relay_ports')
+        self.patch_target('sb_relay_supported', return_value=True)
+        self.patch_object(ovn_central.ch_core.unitdata, 'kv')
+        kv = FakeKV()
+        self.kv.return_value = kv
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        config_path = os.path.join(tmpdir, 'ovn-sb-relay-{}.json')
+        self.patch_object(ovn_central, 'SB_RELAY_CONFIG', new=config_path)
+
+        def _write_file(path, content, perms=None):
+            with open(path, 'w') as f:
+                f.write(content)
+
+        self.patch_object(ovn_central.ch_core.host, 'write_file')
+        self.write_file.side_effect = _write_file
+        self.patch_object(ovn_central.ch_core.host, 'file_hash')
+        self.file_hash.return_value = 'unit-digest'
+        self.patch_object(ovn_central.ch_core.host, 'service')
+        self.patch_object(ovn_central.ch_core.host, 'service_start')
+        self.patch_object(ovn_central.ch_core.host, 'service_restart')
+        self.patch_object(ovn_central.ch_core.host, 'service_stop')
+        self.patch_object(ovn_central.subprocess, 'check_call')
+        remotes = ['ssl:10.0.0.1:16642', 'ssl:10.0.0.2:16642']
+
+        # first run starts the instances
+        self.sb_relay_ports.return_value = [6645, 6646]
+        self.target.configure_sb_relays(remotes)
+        self.write_file.assert_has_calls([
+            mock.call(config_path.format(6645), mock.ANY, perms=0o644),
+            mock.call(config_path.format(6646), mock.ANY, perms=0o644),
+        ])
+        with open(config_path.format(6646)) as f:
+            self.assertEquals(
+                json.load(f),
+                self.target.sb_relay_config(6646, remotes))
+        self.check_call.assert_called_once_with(
+            ['systemctl', 'daemon-reload'])
+        self.service.assert_has_calls([
+            mock.call('enable', 'ovn-sb-relay@6645'),
+            mock.call('enable', 'ovn-sb-relay@6646'),
+        ])
+        self.service_start.assert_has_calls([
+            mock.call('ovn-sb-relay@6645'),
+            mock.call('ovn-sb-relay@6646'),
+        ])
+        self.assertFalse(self.service_restart.called)
+        self.assertEquals(kv[ovn_central.SB_RELAY_KEY], [6645, 6646])
+
+        # unchanged configuration, instance removed
+        self.write_file.reset_mock()
+        self.check_call.reset_mock()
+        self.service.reset_mock()
+        self.service_start.reset_mock()
+        self.sb_relay_ports.return_value = [6645]
+        self.target.configure_sb_relays(remotes)
+        self.service_stop.assert_called_once_with('ovn-sb-relay@6646')
+        self.service.assert_has_calls([
+            mock.call('disable', 'ovn-sb-relay@6646'),
+            mock.call('enable', 'ovn-sb-relay@6645'),
+        ])
+        self.assertFalse(os.path.exists(config_path.format(6646)))
+        self.assertFalse(self.write_file.called)
+        self.assertFalse(self.check_call.called)
+        self.service_start.assert_called_once_with('ovn-sb-relay@6645')
+        self.assertFalse(self.service_restart.called)
+
+        # changed remotes restart running instances
+        self.target.configure_sb_relays(remotes[:1])
+        self.write_file.assert_called_once_with(
+            config_path.format(6645), mock.ANY, perms=0o644)
+        self.assertFalse(self.check_call.called)
+        self.service_restart.assert_called_once_with('ovn-sb-relay@6645')
+
+        # changed template unit reloads systemd and restarts instances
+        self.service_restart.reset_mock()
+        self.file_hash.return_value = 'new-unit-digest'
+        self.target.configure_sb_relays(remotes[:1])
+        self.check_call.assert_called_once_with(
+            ['systemctl', 'daemon-reload'])
+        self.service_restart.assert_called_once_with('ovn-sb-relay@6645')
+
+        # disabled
+        self.service_stop.reset_mock()
+        self.sb_relay_ports.return_value = []
+        self.target.configure_sb_relays(remotes)
+        self.service_stop.assert_called_once_with('ovn-sb-relay@6645')
+        self.assertFalse(os.path.exists(config_path.format(6645)))
+        self.assertEquals(kv[ovn_central.SB_RELAY_KEY], [])
+
+        # not supported by the installed ovsdb-server
+        self.service_start.reset_mock()
+        self.sb_relay_ports.return_value = [6645]
+        self.sb_relay_supported.return_value = False
+        self.target.configure_sb_relays(remotes)
+        self.assertFalse(self.service_start.called)
 
     def test_configure_tls(self):
         self.patch_target('get_certs_and_keys')
@@ -224,84 +1094,482 @@ class TestOVNCentralCharm(Helper):
             'ca': 'fakeca',
             'chain': 'fakechain',
         }]
+        self.patch_target('_write_tls_file')
+        self.patch_target('reload_ssl')
+        self.patch_target('check_tls_in_use')
+        self.patch_target('stage_ca')
+        self.patch_target('publish_ca_ready')
+        self.patch_target('config')
+        config = {'staged-ca-rotation': False}
+        self.config.__getitem__.side_effect = config.__getitem__
+        self.patch_object(ovn_central.ch_core.unitdata, 'kv')
+        kv = FakeKV()
+        self.kv.return_value = kv
+        self.patch_object(ovn_central.time, 'time', return_value=42)
+        self._write_tls_file.return_value = False
+        self.target.configure_tls()
+        self._write_tls_file.assert_has_calls([
+            mock.call('/etc/ovn/ovn-central.crt', 'fakeca\nfakechain',
+                      0o644),
+            mock.call('/etc/ovn/cert_host', 'fakecert', 0o644),
+            mock.call('/etc/ovn/key_host', 'fakekey', 0o640),
+        ])
+        self.assertFalse(self.reload_ssl.called)
+        self.assertEquals(kv, {})
+        self._write_tls_file.side_effect = [False, True, True]
+        self.target.configure_tls()
+        self.reload_ssl.assert_called_once_with()
+        self.check_tls_in_use.assert_called_once_with()
+        self.assertEquals(kv, {
+            ovn_central.TLS_PENDING_KEY: {'cert': 'fakecert', 'time': 42}})
+        self.assertFalse(self.stage_ca.called)
+        self.assertFalse(self.publish_ca_ready.called)
+        # staged rotation waiting for peers only updates the CA bundle
+        # and does not expect the staged certificate to be served
+        kv.clear()
+        config['staged-ca-rotation'] = True
+        self.stage_ca.return_value = ('oldca\nfakeca\nfakechain', False)
+        self._write_tls_file.reset_mock()
+        self._write_tls_file.side_effect = None
+        self._write_tls_file.return_value = True
+        self.target.configure_tls()
+        self.stage_ca.assert_called_once_with('fakeca\nfakechain')
+        self._write_tls_file.assert_called_once_with(
+            '/etc/ovn/ovn-central.crt', 'oldca\nfakeca\nfakechain', 0o644)
+        self.publish_ca_ready.assert_called_once_with('fakeca\nfakechain')
+        self.assertEquals(self.reload_ssl.call_count, 2)
+        self.assertEquals(kv, {})
+        self.stage_ca.return_value = ('oldca\nfakeca\nfakechain', True)
+        self.target.configure_tls()
+        self.assertEquals(self._write_tls_file.call_count, 4)
+        self.assertEquals(kv, {
+            ovn_central.TLS_PENDING_KEY: {'cert': 'fakecert', 'time': 42}})
+
+    def test_stage_ca(self):
+        self.patch_object(ovn_central.ch_core.unitdata, 'kv')
+        kv = FakeKV()
+        self.kv.return_value = kv
+        clock = FakeClock(1000)
+        self.patch_object(ovn_central.time, 'time')
+        self.time.side_effect = clock
+        self.patch_target('peers_not_trusting_ca')
+        self.patch_target('config')
+        config = {'ca-rotation-grace-period': 1}
+        self.config.__getitem__.side_effect = config.__getitem__
+        tls_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tls_dir)
+        ca_file = os.path.join(tls_dir, 'ovn-central.crt')
+        self.patch_object(ovn_central.UssuriOVNCentralCharm, 'options',
+                          create=True, new_callable=mock.PropertyMock)
+        self.options.return_value = mock.MagicMock(ovn_ca_cert=ca_file)
+        # initial deployment, nothing to stage
+        self.assertEquals(self.target.stage_ca('ca1'), ('ca1', True))
+        self.assertFalse(self.peers_not_trusting_ca.called)
+        self.assertFalse(self.target.ca_rotation_in_progress())
+        # new CA is trusted alongside the current one until peers trust it
+        self.peers_not_trusting_ca.return_value = ['ovn-central/1']
+        self.assertEquals(self.target.stage_ca('ca2'), ('ca1\nca2', False))
+        self.peers_not_trusting_ca.assert_called_once_with('ca2')
+        self.assertTrue(self.target.ca_rotation_in_progress())
+        clock.now += 60
+        self.assertEquals(self.target.stage_ca('ca2'), ('ca1\nca2', False))
+        self.peers_not_trusting_ca.return_value = []
+        self.assertEquals(self.target.stage_ca('ca2'), ('ca1\nca2', True))
+        self.assertEquals(kv[ovn_central.TLS_CA_BUNDLE_KEY], {
+            'cas': [{'pem': 'ca1', 'retired': 1060},
+                    {'pem': 'ca2', 'retired': None}],
+            'staged': None})
+        # old CA is pruned after the grace period
+        clock.now += 3599
+        self.assertEquals(self.target.stage_ca('ca2'), ('ca1\nca2', True))
+        clock.now += 1
+        self.assertEquals(self.target.stage_ca('ca2'), ('ca2', True))
+        self.assertFalse(self.target.ca_rotation_in_progress())
+        # unresponsive peers are not waited for indefinitely
+        self.peers_not_trusting_ca.return_value = ['ovn-central/1']
+        self.assertEquals(self.target.stage_ca('ca3'), ('ca2\nca3', False))
+        clock.now += ovn_central.CA_ROTATION_TIMEOUT + 1
+        self.assertEquals(self.target.stage_ca('ca3'), ('ca2\nca3', True))
+
+    def test_stage_ca_enabled_after_deployment(self):
+        self.patch_object(ovn_central.ch_core.unitdata, 'kv')
+        kv = FakeKV()
+        self.kv.return_value = kv
+        self.patch_target('peers_not_trusting_ca', return_value=['peer'])
+        self.patch_target('config')
+        self.config.__getitem__.return_value = 24
+        tls_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tls_dir)
+        ca_file = os.path.join(tls_dir, 'ovn-central.crt')
+        with open(ca_file, 'w') as fd:
+            fd.write('ca1')
+        self.patch_object(ovn_central.UssuriOVNCentralCharm, 'options',
+                          create=True, new_callable=mock.PropertyMock)
+        self.options.return_value = mock.MagicMock(ovn_ca_cert=ca_file)
+        self.assertEquals(self.target.stage_ca('ca1'), ('ca1', True))
+        kv.clear()
+        self.assertEquals(self.target.stage_ca('ca2'), ('ca1\nca2', False))
+
+    def test_peers_not_trusting_ca(self):
+        self.patch_object(ovn_central.ch_core.hookenv, 'relation_ids')
+        self.relation_ids.return_value = ['ovsdb-peer:1']
+        self.patch_object(ovn_central.ch_core.hookenv, 'related_units')
+        self.related_units.return_value = ['ovn-central/0', 'ovn-central/1']
+        self.patch_object(ovn_central.ch_core.hookenv, 'relation_get')
+        digest = ovn_central.hashlib.sha256(b'ca').hexdigest()
+        data = {'ovn-central/0': digest, 'ovn-central/1': 'other'}
+        self.relation_get.side_effect = (
+            lambda key, unit, rid: data[unit])
+        self.assertEquals(self.target.peers_not_trusting_ca('ca'),
+                          ['ovn-central/1'])
+        self.relation_get.assert_called_with(
+            'ovn-tls-ca-ready', unit='ovn-central/1', rid='ovsdb-peer:1')
+        data['ovn-central/1'] = digest
+        self.assertEquals(self.target.peers_not_trusting_ca('ca'), [])
+
+    def test_publish_ca_ready(self):
+        self.patch_object(ovn_central.ch_core.hookenv, 'relation_ids')
+        self.relation_ids.return_value = ['ovsdb-peer:1']
+        self.patch_object(ovn_central.ch_core.hookenv, 'local_unit')
+        self.patch_object(ovn_central.ch_core.hookenv, 'relation_get')
+        self.patch_object(ovn_central.ch_core.hookenv, 'relation_set')
+        digest = ovn_central.hashlib.sha256(b'ca').hexdigest()
+        self.relation_get.return_value = None
+        self.target.publish_ca_ready('ca')
+        self.relation_set.assert_called_once_with(
+            relation_id='ovsdb-peer:1',
+            relation_settings={'ovn-tls-ca-ready': digest})
+        self.relation_set.reset_mock()
+        self.relation_get.return_value = digest
+        self.target.publish_ca_ready('ca')
+        self.assertFalse(self.relation_set.called)
+
+    def test__write_tls_file(self):
+        tls_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tls_dir)
+        path = os.path.join(tls_dir, 'key_host')
+        self.assertTrue(self.target._write_tls_file(path, 'key1', 0o640))
+        with open(path) as fd:
+            self.assertEquals(fd.read(), 'key1')
+        self.assertEquals(os.stat(path).st_mode & 0o777, 0o640)
+        inode = os.stat(path).st_ino
+        self.assertFalse(self.target._write_tls_file(path, 'key1', 0o640))
+        self.assertEquals(os.stat(path).st_ino, inode)
+        self.assertTrue(self.target._write_tls_file(path, 'key2', 0o640))
+        with open(path) as fd:
+            self.assertEquals(fd.read(), 'key2')
+        self.assertEquals(os.listdir(tls_dir), ['key_host'])
+
+    def test_reload_ssl(self):
+        self.patch_target('ovsdb_connection', return_value=mock.MagicMock())
         self.patch_target('service_reload')
-        self.patch('charms_openstack.charm.utils.is_data_changed',
-                   name='is_data_changed')
-        self.is_data_changed().__enter__.return_value = False
-        with mock.patch('builtins.open', create=True) as mocked_open:
-            mocked_file = mock.MagicMock(spec=io.FileIO)
-            mocked_open.return_value = mocked_file
-            self.target.configure_cert = mock.MagicMock()
-            self.target.configure_tls()
-            mocked_open.assert_called_once_with(
-                '/etc/ovn/ovn-central.crt', 'w')
-            mocked_file.__enter__().write.assert_called_once_with(
-                'fakeca\nfakechain')
-            self.target.configure_cert.assert_called_once_with(
-                '/etc/ovn',
-                'fakecert',
-                'fakekey',
-                cn='host')
-            self.assertFalse(self.service_reload.called)
-            self.is_data_changed().__enter__.return_value = True
-            self.target.configure_tls()
-            self.service_reload.assert_called_once_with('ovn-northd')
+        conn = self.ovsdb_connection.return_value.__enter__.return_value
+        conn.unixctl.side_effect = [
+            'punix:/var/run/ovn/ovnnb_db.sock',
+            OSError]
+        self.target.reload_ssl()
+        self.ovsdb_connection.assert_has_calls([
+            mock.call('ovnnb_db', control=True),
+            mock.call('ovnsb_db', control=True),
+        ], any_order=True)
+        conn.unixctl.assert_called_with('ovsdb-server/list-remotes')
+        self.service_reload.assert_called_once_with('ovn-northd')
+
+    def test_check_tls_in_use(self):
+        self.patch_object(ovn_central.ch_core.unitdata, 'kv')
+        kv = FakeKV()
+        self.kv.return_value = kv
+        self.patch_target('_served_certificate')
+        self.patch_object(ovn_central.ssl, 'PEM_cert_to_DER_cert')
+        self.patch_object(ovn_central.time, 'time', return_value=100)
+        self.patch_object(ovn_central.ch_core.hookenv, 'log')
+        self.assertIsNone(self.target.check_tls_in_use())
+        self.assertFalse(self._served_certificate.called)
+        kv[ovn_central.TLS_PENDING_KEY] = {'cert': 'new-pem', 'time': 90}
+        self._served_certificate.side_effect = OSError
+        self.assertFalse(self.target.check_tls_in_use())
+        self._served_certificate.side_effect = None
+        self._served_certificate.return_value = (b'old-der', 10)
+        self.PEM_cert_to_DER_cert.return_value = b'new-der'
+        self.assertFalse(self.target.check_tls_in_use())
+        self.PEM_cert_to_DER_cert.assert_called_with('new-pem')
+        self._served_certificate.return_value = (b'new-der', 40)
+        self.assertTrue(self.target.check_tls_in_use())
+        self.log.assert_called_with(
+            'TLS certificate in use by ovsdb-server 60.0s after issue, '
+            '10.0s after it was written', level=mock.ANY)
+        self.assertEquals(kv, {})
+
+    def test__served_certificate(self):
+        self.patch_object(ovn_central, 'ssl')
+        self.patch_object(ovn_central.socket, 'create_connection')
+        context = self.ssl.SSLContext.return_value
+        tls = context.wrap_socket.return_value.__enter__.return_value
+        tls.getpeercert.side_effect = [
+            b'der', {'notBefore': 'Oct 17 00:00:00 2026 GMT'}]
+        self.ssl.cert_time_to_seconds.return_value = 1234
+        self.assertEquals(self.target._served_certificate(), (b'der', 1234))
+        context.load_verify_locations.assert_called_once_with(
+            cafile='/etc/ovn/ovn-central.crt')
+        context.load_cert_chain.assert_called_once_with(
+            '/etc/ovn/cert_host', '/etc/ovn/key_host')
+        self.create_connection.assert_called_once_with(
+            ('127.0.0.1', 6641), timeout=ovn_central.TLS_CHECK_TIMEOUT)
+        self.ssl.cert_time_to_seconds.assert_called_once_with(
+            'Oct 17 00:00:00 2026 GMT')
 
     def test_configure_ovn_listener(self):
-        self.patch_object(ovn_central.ch_ovsdb, 'SimpleOVSDB')
-        self.patch_target('run')
-        port_map = {6641: {'inactivity_probe': 42},
-                    6642: {'role': 'ovn-controller'}}
+        self.patch_target('_configure_ovn_listener_native')
+        self.patch_target('_configure_ovn_listener_cli')
+        port_map = {6641: {'inactivity_probe': 42}}
         self.patch_target('cluster_status')
+        with self.assertRaises(ValueError):
+            self.target.configure_ovn_listener('aDb', port_map)
 
         cluster_status = self.FakeClusterStatus()
         self.cluster_status.return_value = cluster_status
         cluster_status.is_cluster_leader = False
         self.target.configure_ovn_listener('nb', port_map)
-        self.assertFalse(self.SimpleOVSDB.called)
+        self.assertFalse(self._configure_ovn_listener_native.called)
         cluster_status.is_cluster_leader = True
-        ovsdb = mock.MagicMock()
-        ovsdb.connection.find.side_effect = [
-            [],
-            [{'_uuid': 'fake-uuid'}],
-            [],
-            [{'_uuid': 'fake-uuid'}],
-        ]
-        self.SimpleOVSDB.return_value = ovsdb
         self.target.configure_ovn_listener('nb', port_map)
-        self.run.assert_has_calls([
-            mock.call('ovn-nbctl', '--', '--id=@connection', 'create',
-                      'connection', 'target="pssl:6641"', '--', 'add',
-                      'NB_Global', '.', 'connections', '@connection'),
-            mock.call('ovn-nbctl', '--', '--id=@connection', 'create',
-                      'connection', 'target="pssl:6642"', '--', 'add',
-                      'NB_Global', '.', 'connections', '@connection'),
-        ])
-        ovsdb.connection.set.assert_has_calls([
-            mock.call('fake-uuid', 'inactivity_probe', 42),
-            mock.call('fake-uuid', 'role', 'ovn-controller')
+        self._configure_ovn_listener_native.assert_called_once_with(
+            'nb', port_map)
+        self.assertFalse(self._configure_ovn_listener_cli.called)
+        self._configure_ovn_listener_native.side_effect = OSError
+        self.target.configure_ovn_listener('nb', port_map)
+        self._configure_ovn_listener_cli.assert_called_once_with(
+            'nb', port_map)
+
+    def test__listener_delta(self):
+        port_map = collections.OrderedDict([
+            (6642, {'role': 'ovn-controller', 'inactivity_probe': 42}),
+            (16642, {'inactivity_probe': 42}),
         ])
+        # native JSON-RPC representation
+        self.assertEquals(
+            self.target._listener_delta(port_map, []),
+            ([(6642, {'role': 'ovn-controller', 'inactivity_probe': 42}),
+              (16642, {'inactivity_probe': 42})],
+             []))
+        self.assertEquals(
+            self.target._listener_delta(port_map, [
+                {'_uuid': ['uuid', 'fake-uuid'],
+                 'target': 'pssl:6642',
+                 'role': 'ovn-controller',
+                 'inactivity_probe': ['set', []]},
+                {'_uuid': ['uuid', 'fake-uuid2'],
+                 'target': 'pssl:16642',
+                 'inactivity_probe': 42},
+            ]),
+            ([],
+             [(['uuid', 'fake-uuid'], {'inactivity_probe': 42})]))
+        # SimpleOVSDB representation
+        self.assertEquals(
+            self.target._listener_delta(port_map, [
+                {'_uuid': 'fake-uuid',
+                 'target': 'pssl:6642',
+                 'role': '',
+                 'inactivity_probe': [42]},
+            ]),
+            ([(16642, {'inactivity_probe': 42})],
+             [('fake-uuid', {'role': 'ovn-controller'})]))
+        self.assertEquals(
+            self.target._listener_delta(port_map, [
+                {'_uuid': 'fake-uuid',
+                 'target': 'pssl:6642',
+                 'role': 'ovn-controller',
+                 'inactivity_probe': [42]},
+                {'_uuid': 'fake-uuid2',
+                 'target': 'pssl:16642',
+                 'role': '',
+                 'inactivity_probe': [42]},
+            ]),
+            ([], []))
+
+    def test__configure_ovn_listener_cli(self):
+        self.patch_object(ovn_central.ch_ovsdb, 'SimpleOVSDB')
+        self.patch_target('run')
+        self.patch_target('_listener_delta')
+        self._listener_delta.return_value = ([], [])
+        port_map = {6641: {'inactivity_probe': 42}}
+        self.target._configure_ovn_listener_cli('nb', port_map)
+        self.SimpleOVSDB.assert_called_once_with('ovn-nbctl')
+        self._listener_delta.assert_called_once_with(
+            port_map, self.SimpleOVSDB().connection)
+        self.assertFalse(self.run.called)
+        self._listener_delta.return_value = (
+            [(6641, {'inactivity_probe': 42}),
+             (6642, {'role': 'ovn-controller', 'inactivity_probe': 42})],
+            [('fake-uuid', {'inactivity_probe': 42})])
+        self.target._configure_ovn_listener_cli('sb', port_map)
+        self.run.assert_called_once_with(
+            'ovn-sbctl',
+            '--', '--id=@connection6641', 'create', 'connection',
+            'target="pssl:6641"', 'inactivity_probe=42',
+            '--', 'add', 'SB_Global', '.', 'connections', '@connection6641',
+            '--', '--id=@connection6642', 'create', 'connection',
+            'target="pssl:6642"', 'inactivity_probe=42', 'role=ovn-controller',
+            '--', 'add', 'SB_Global', '.', 'connections', '@connection6642',
+            '--', 'set', 'connection', 'fake-uuid', 'inactivity_probe=42')
+
+    def test__configure_ovn_listener_native(self):
+        self.patch_target('ovsdb_connection', return_value=mock.MagicMock())
+        self.patch_target('_listener_delta')
+        conn = self.ovsdb_connection.return_value.__enter__.return_value
+        conn.select.return_value = ['fake-rows']
+        self._listener_delta.return_value = ([], [])
+        port_map = {
+            6642: {'role': 'ovn-controller', 'inactivity_probe': 42},
+            16642: {'inactivity_probe': 42},
+        }
+        self.target._configure_ovn_listener_native('sb', port_map)
+        self.ovsdb_connection.assert_called_once_with('ovnsb_db')
+        conn.select.assert_called_once_with(
+            'OVN_Southbound', 'Connection',
+            columns=['_uuid', 'inactivity_probe', 'role', 'target'])
+        self._listener_delta.assert_called_once_with(
+            port_map, ['fake-rows'])
+        self.assertFalse(conn.transact.called)
+        self._listener_delta.return_value = (
+            [(6642, {'role': 'ovn-controller', 'inactivity_probe': 42}),
+             (16642, {'inactivity_probe': 42})],
+            [(['uuid', 'fake-uuid'], {'inactivity_probe': 42})])
+        self.target._configure_ovn_listener_native('sb', port_map)
+        conn.transact.assert_called_once_with(
+            'OVN_Southbound',
+            {'op': 'insert',
+             'table': 'Connection',
+             'row': {'target': 'pssl:6642',
+                     'role': 'ovn-controller',
+                     'inactivity_probe': 42},
+             'uuid-name': 'connection6642'},
+            {'op': 'insert',
+             'table': 'Connection',
+             'row': {'target': 'pssl:16642', 'inactivity_probe': 42},
+             'uuid-name': 'connection16642'},
+            {'op': 'mutate',
+             'table': 'SB_Global',
+             'where': [],
+             'mutations': [['connections', 'insert',
+                            ['set', [['named-uuid', 'connection6642'],
+                                     ['named-uuid', 'connection16642']]]]]},
+            {'op': 'update',
+             'table': 'Connection',
+             'where': [['_uuid', '==', ['uuid', 'fake-uuid']]],
+             'row': {'inactivity_probe': 42}})
 
     def test_validate_config(self):
         self.patch_target('config')
-        self.config.__getitem__.return_value = self.target.min_election_timer
+        self.patch_target('sb_relay_supported', return_value=True)
+        config = {
+            'ovsdb-server-election-timer': self.target.min_election_timer,
+            'ovsdb-server-nb-election-timer': 0,
+            'ovsdb-server-sb-election-timer': 0,
+            'ovsdb-server-nb-inactivity-probe': 0,
+            'ovsdb-server-sb-inactivity-probe': 0,
+            'firewall-backend': 'ufw',
+            'ovsdb-compaction-window': '',
+            'ovn-northd-n-threads': 1,
+            'ovn-sb-relay-count': 0,
+            'ovn-sb-relay-port': 6645,
+            'ovsdb-server-tuning': '',
+            'hook-profiling': '',
+            'ca-rotation-grace-period': 24,
+            'ovsdb-server-adaptive-inactivity-probe': False,
+            'ovsdb-server-inactivity-probe-min': 0,
+            'ovsdb-server-inactivity-probe-max': 300,
+        }
+        self.config.__getitem__.side_effect = config.__getitem__
+        self.assertEquals(self.target.validate_config(), (None, None))
+        config['ovsdb-server-sb-election-timer'] = (
+            self.target.max_election_timer + 1)
+        self.assertEquals(
+            self.target.validate_config(),
+            ('blocked', "Invalid configuration: "
+                        "'ovsdb-server-sb-election-timer' must be > 1 < 60."))
+        config['ovsdb-server-sb-election-timer'] = (
+            self.target.max_election_timer)
+        config['ovsdb-server-nb-election-timer'] = (
+            self.target.min_election_timer)
+        self.assertEquals(self.target.validate_config(), (None, None))
+        config['ovsdb-server-nb-inactivity-probe'] = -1
+        self.assertEquals(self.target.validate_config(), ('blocked', mock.ANY))
+        config['ovsdb-server-nb-inactivity-probe'] = 5
+        config['ovsdb-server-sb-inactivity-probe'] = 180
+        self.assertEquals(self.target.validate_config(), (None, None))
+        config['ovsdb-server-adaptive-inactivity-probe'] = True
+        self.assertEquals(self.target.validate_config(), ('blocked', mock.ANY))
+        config['ovsdb-server-inactivity-probe-min'] = 301
+        self.assertEquals(self.target.validate_config(), ('blocked', mock.ANY))
+        config['ovsdb-server-inactivity-probe-min'] = 30
+        self.assertEquals(self.target.validate_config(), (None, None))
+        config['ca-rotation-grace-period'] = -1
+        self.assertEquals(self.target.validate_config(), ('blocked', mock.ANY))
+        config['ca-rotation-grace-period'] = 0
+        self.assertEquals(self.target.validate_config(), (None, None))
+        config['hook-profiling'] = 'cprofile'
         self.assertEquals(self.target.validate_config(), (None, None))
-        self.config.__getitem__.return_value = self.target.max_election_timer
+        config['hook-profiling'] = 'strace'
+        self.assertEquals(self.target.validate_config(), ('blocked', mock.ANY))
+        config['hook-profiling'] = ''
+        config['ovsdb-server-election-timer'] = self.target.max_election_timer
         self.assertEquals(self.target.validate_config(), (None, None))
-        self.config.__getitem__.return_value = (
+        config['ovsdb-server-election-timer'] = (
             self.target.min_election_timer - 1)
         self.assertEquals(self.target.validate_config(), ('blocked', mock.ANY))
-        self.config.__getitem__.return_value = (
+        config['ovsdb-server-election-timer'] = (
             self.target.max_election_timer + 1)
         self.assertEquals(self.target.validate_config(), ('blocked', mock.ANY))
+        config['ovsdb-server-election-timer'] = self.target.max_election_timer
+        config['firewall-backend'] = 'nftables'
+        self.assertEquals(self.target.validate_config(), (None, None))
+        config['firewall-backend'] = 'iptables'
+        self.assertEquals(self.target.validate_config(), ('blocked', mock.ANY))
+        config['firewall-backend'] = 'ufw'
+        config['ovsdb-compaction-window'] = '23:30-01:00'
+        self.assertEquals(self.target.validate_config(), (None, None))
+        config['ovsdb-compaction-window'] = '23:30'
+        self.assertEquals(self.target.validate_config(), ('blocked', mock.ANY))
+        config['ovsdb-compaction-window'] = ''
+        config['ovn-northd-n-threads'] = 0
+        self.assertEquals(self.target.validate_config(), ('blocked', mock.ANY))
+        config['ovn-northd-n-threads'] = 257
+        self.assertEquals(self.target.validate_config(), ('blocked', mock.ANY))
+        config['ovn-northd-n-threads'] = 256
+        self.assertEquals(self.target.validate_config(), (None, None))
+        config['ovsdb-server-tuning'] = 'memory-trim-on-compaction: yes'
+        self.assertEquals(self.target.validate_config(), (None, None))
+        config['ovsdb-server-tuning'] = 'memory-trim: true'
+        self.assertEquals(self.target.validate_config(), ('blocked', mock.ANY))
+        config['ovsdb-server-tuning'] = ''
+        config['ovn-sb-relay-count'] = -1
+        self.assertEquals(self.target.validate_config(), ('blocked', mock.ANY))
+        config['ovn-sb-relay-count'] = 2
+        self.assertEquals(self.target.validate_config(), (None, None))
+        self.sb_relay_supported.return_value = False
+        self.assertEquals(self.target.validate_config(), ('blocked', mock.ANY))
+        self.sb_relay_supported.return_value = True
+        config['ovn-sb-relay-port'] = 6640
+        self.assertEquals(self.target.validate_config(), ('blocked', mock.ANY))
+        config['ovn-sb-relay-port'] = 65535
+        self.assertEquals(self.target.validate_config(), ('blocked', mock.ANY))
 
     def test_configure_ovsdb_election_timer(self):
         with self.assertRaises(ValueError):
             self.target.configure_ovsdb_election_timer('aDb', 42)
         self.patch_target('cluster_status')
-        self.patch_object(ovn_central.time, 'sleep')
+        self.patch_target('election_timer')
+        self.election_timer.return_value = 42
+        self.patch_object(ovn_central.ch_core.unitdata, 'kv')
+        kv = FakeKV()
+        self.kv.return_value = kv
+        clock = FakeClock()
+        self.patch_object(ovn_central.time, 'time')
+        self.time.side_effect = clock
 
         _election_timer = 1000
+        _changed_at = []
 
         class FakeClusterStatus(object):
 
@@ -315,101 +1583,819 @@ class TestOVNCentralCharm(Helper):
 
         def fake_ovn_appctl(db, cmd, **kwargs):
             nonlocal _election_timer
+            if _changed_at:
+                # must not change the timer again before an election window
+                # has passed
+                timestamp, previous, timer = _changed_at[-1]
+                self.assertGreaterEqual(clock.now - timestamp,
+                                        (previous + timer) / 1000)
+            _changed_at.append((clock.now, _election_timer, int(cmd[2])))
             _election_timer = int(cmd[2])
 
+        def converge(db, tgt_timer):
+            while not self.target.configure_ovsdb_election_timer(
+                    db, tgt_timer):
+                clock.now += 1
+
         cluster_status = FakeClusterStatus()
         self.cluster_status.return_value = cluster_status
         self.patch_object(ovn_central.ch_ovn, 'ovn_appctl')
         self.ovn_appctl.side_effect = fake_ovn_appctl
-        self.target.configure_ovsdb_election_timer('sb', 42)
+
+        # first call takes exactly one step and returns immediately
+        self.assertFalse(
+            self.target.configure_ovsdb_election_timer('sb', 42))
+        self.ovn_appctl.assert_called_once_with(
+            'ovnsb_db',
+            ('cluster/change-election-timer', 'OVN_Southbound', '2000'),
+            rundir='/var/run/ovn',
+            use_ovs_appctl=False)
+        self.assertEquals(kv, {'ovn-central.election-timer.sb': {
+            'target': 42000, 'previous': 1000, 'timer': 2000,
+            'timestamp': 0}})
+        self.assertEquals(self.target.election_timer_progress(), {
+            'nb': {'target': 42000, 'timer': 2000},
+            'sb': {'target': 42000, 'timer': 2000}})
+        # no further step until the election window has passed
+        clock.now += 2
+        self.assertFalse(
+            self.target.configure_ovsdb_election_timer('sb', 42))
+        self.assertEquals(self.ovn_appctl.call_count, 1)
+
+        converge('sb', 42)
         self.ovn_appctl.assert_has_calls([
             mock.call(
                 'ovnsb_db',
-                ('cluster/change-election-timer', 'OVN_Southbound', '2000'),
-                rundir='/var/run/ovn',
-                use_ovs_appctl=False),
-            mock.call(
-                'ovnsb_db',
-                ('cluster/change-election-timer', 'OVN_Southbound', '4000'),
-                rundir='/var/run/ovn',
-                use_ovs_appctl=False),
-            mock.call(
-                'ovnsb_db',
-                ('cluster/change-election-timer', 'OVN_Southbound', '8000'),
-                rundir='/var/run/ovn',
-                use_ovs_appctl=False),
-            mock.call(
-                'ovnsb_db',
-                ('cluster/change-election-timer', 'OVN_Southbound', '16000'),
-                rundir='/var/run/ovn',
-                use_ovs_appctl=False),
-            mock.call(
-                'ovnsb_db',
-                ('cluster/change-election-timer', 'OVN_Southbound', '32000'),
-                rundir='/var/run/ovn',
-                use_ovs_appctl=False),
-            mock.call(
-                'ovnsb_db',
-                ('cluster/change-election-timer', 'OVN_Southbound', '42000'),
+                ('cluster/change-election-timer', 'OVN_Southbound', str(t)),
                 rundir='/var/run/ovn',
                 use_ovs_appctl=False)
+            for t in (2000, 4000, 8000, 16000, 32000, 42000)
         ])
-        _election_timer = 42000
+        self.assertEquals(self.ovn_appctl.call_count, 6)
+        self.assertEquals(kv, {})
+        self.assertEquals(self.target.election_timer_progress(), {})
+
         self.ovn_appctl.reset_mock()
-        self.target.configure_ovsdb_election_timer('sb', 1)
+        _changed_at = []
+        self.election_timer.return_value = 1
+        converge('sb', 1)
         self.ovn_appctl.assert_has_calls([
             mock.call(
                 'ovnsb_db',
-                ('cluster/change-election-timer', 'OVN_Southbound', '21000'),
-                rundir='/var/run/ovn',
-                use_ovs_appctl=False),
-            mock.call(
-                'ovnsb_db',
-                ('cluster/change-election-timer', 'OVN_Southbound', '10500'),
-                rundir='/var/run/ovn',
-                use_ovs_appctl=False),
-            mock.call(
-                'ovnsb_db',
-                ('cluster/change-election-timer', 'OVN_Southbound', '5250'),
+                ('cluster/change-election-timer', 'OVN_Southbound', str(t)),
                 rundir='/var/run/ovn',
-                use_ovs_appctl=False),
-            mock.call(
-                'ovnsb_db',
-                ('cluster/change-election-timer', 'OVN_Southbound', '2625'),
-                rundir='/var/run/ovn',
-                use_ovs_appctl=False),
-            mock.call(
-                'ovnsb_db',
-                ('cluster/change-election-timer', 'OVN_Southbound', '1312'),
-                rundir='/var/run/ovn',
-                use_ovs_appctl=False),
-            mock.call(
-                'ovnsb_db',
-                ('cluster/change-election-timer', 'OVN_Southbound', '1000'),
-                rundir='/var/run/ovn',
-                use_ovs_appctl=False),
+                use_ovs_appctl=False)
+            for t in (21000, 10500, 5250, 2625, 1312, 1000)
         ])
+        self.assertEquals(self.target.election_timer_progress(), {})
 
-    def test_configure_ovn(self):
+        # progress is discarded when unit is no longer cluster leader
+        self.ovn_appctl.reset_mock()
+        _changed_at = []
+        self.election_timer.return_value = 2
+        self.assertFalse(
+            self.target.configure_ovsdb_election_timer('nb', 2))
+        self.assertIn('ovn-central.election-timer.nb', kv)
+        cluster_status.is_cluster_leader = False
+        self.assertTrue(
+            self.target.configure_ovsdb_election_timer('nb', 2))
+        self.assertEquals(kv, {})
+        self.assertEquals(self.target.election_timer_progress(), {})
+        self.assertEquals(self.ovn_appctl.call_count, 1)
+
+        # a new leader without local state resumes the change, the
+        # election that moved leadership has passed
+        _changed_at = []
+        cluster_status.is_cluster_leader = True
+        self.election_timer.return_value = 8
+        self.assertEquals(self.target.election_timer_progress(), {
+            'nb': {'target': 8000, 'timer': 2000},
+            'sb': {'target': 8000, 'timer': 2000}})
+        self.assertFalse(
+            self.target.configure_ovsdb_election_timer('nb', 8))
+        self.assertEquals(self.ovn_appctl.call_count, 2)
+        self.assertEquals(_election_timer, 4000)
+
+        # refused changes are retried on a later hook
+        clock.now += 10
+        self.ovn_appctl.side_effect = (
+            ovn_central.subprocess.CalledProcessError(1, 'ovn-appctl'))
+        self.assertFalse(
+            self.target.configure_ovsdb_election_timer('nb', 8))
+        self.assertEquals(self.ovn_appctl.call_count, 3)
+        self.assertEquals(kv['ovn-central.election-timer.nb']['timer'], 4000)
+
+        # invalid target is reported by validate_config
+        self.election_timer.return_value = 0
+        self.assertEquals(self.target.election_timer_progress(), {})
+
+    def test_advance_election_timer(self):
+        self.patch_target('election_timer')
+        self.election_timer.side_effect = lambda db: {'nb': 2, 'sb': 42}[db]
+        self.patch_target('election_timer_progress')
+        self.patch_target('configure_ovsdb_election_timer')
+        self.election_timer_progress.return_value = {}
+        self.target.advance_election_timer()
+        self.assertFalse(self.configure_ovsdb_election_timer.called)
+        self.election_timer_progress.return_value = {
+            'sb': {}, 'nb': {}}
+        self.target.advance_election_timer()
+        self.configure_ovsdb_election_timer.assert_has_calls([
+            mock.call('nb', 2),
+            mock.call('sb', 42),
+        ])
+
+    def test_election_timer(self):
+        self.patch_target('config')
+        config = {
+            'ovsdb-server-election-timer': 4,
+            'ovsdb-server-nb-election-timer': 0,
+            'ovsdb-server-sb-election-timer': 16,
+        }
+        self.config.__getitem__.side_effect = config.__getitem__
+        self.assertEquals(self.target.election_timer('nb'), 4)
+        self.assertEquals(self.target.election_timer('sb'), 16)
+
+    def test_ovsdb_path(self):
+        self.assertEquals(self.target.ovsdb_path('ovnsb_db.db'),
+                          '/var/lib/ovn/ovnsb_db.db')
+
+    def test_transfer_ovsdb_leadership(self):
+        self.patch_target('cluster_status')
+        self.patch_target('invalidate_cluster_status')
+        self.patch_object(ovn_central.ch_ovn, 'ovn_appctl')
+        clock = FakeClock()
+        self.patch_object(ovn_central.time, 'time')
+        self.time.side_effect = clock
+        self.patch_object(ovn_central.time, 'sleep')
+
+        def sleep(seconds):
+            clock.now += seconds
+
+        self.sleep.side_effect = sleep
+        leader = mock.MagicMock(is_cluster_leader=True, election_timer=1000)
+        follower = mock.MagicMock(is_cluster_leader=False)
+        # nothing to do on followers
+        self.cluster_status.return_value = follower
+        self.target.transfer_ovsdb_leadership('sb')
+        self.assertFalse(self.ovn_appctl.called)
+        self.cluster_status.side_effect = [leader, leader, follower]
+        self.target.transfer_ovsdb_leadership('sb')
+        self.ovn_appctl.assert_called_once_with(
+            'ovnsb_db',
+            ('cluster/failure-test', 'transfer-leadership'),
+            rundir='/var/run/ovn',
+            use_ovs_appctl=False)
+        self.assertEquals(clock.now, 2)
+        # leadership did not move within two election timer periods
+        self.cluster_status.side_effect = None
+        self.cluster_status.return_value = leader
+        with self.assertRaises(RuntimeError):
+            self.target.transfer_ovsdb_leadership('sb')
+        self.assertEquals(clock.now, 4)
+
+    def test_compact_ovsdb(self):
+        with self.assertRaises(ValueError):
+            self.target.compact_ovsdb('aDb')
+        self.patch_target('cluster_status')
+        self.cluster_status.return_value = mock.MagicMock(role='leader')
+        self.patch_target('invalidate_cluster_status')
+        self.patch_object(ovn_central.ch_ovn, 'ovn_appctl')
+        self.patch_object(ovn_central.os.path, 'getsize')
+        self.getsize.side_effect = [4096, 1024]
+        self.patch_object(ovn_central.time, 'time')
+        self.time.side_effect = [10, 12.5]
+        self.patch_object(ovn_central.ch_core.unitdata, 'kv')
+        kv = FakeKV()
+        self.kv.return_value = kv
+        expect = {
+            'role': 'leader',
+            'duration': 2.5,
+            'size-before': 4096,
+            'size-after': 1024,
+            'timestamp': 12.5,
+        }
+        self.assertEquals(self.target.compact_ovsdb('nb'), expect)
+        self.cluster_status.assert_called_once_with('ovnnb_db', fresh=True)
+        self.ovn_appctl.assert_called_once_with(
+            'ovnnb_db',
+            ('ovsdb-server/compact', 'OVN_Northbound'),
+            rundir='/var/run/ovn',
+            use_ovs_appctl=False)
+        self.getsize.assert_called_with('/var/lib/ovn/ovnnb_db.db')
+        self.assertEquals(kv, {'ovn-central.compaction.nb': expect})
+
+    def test_parse_compaction_window(self):
+        self.assertEquals(
+            self.target.parse_compaction_window('02:00-04:30'), (120, 270))
+        self.assertEquals(
+            self.target.parse_compaction_window('23:00 - 1:00'), (1380, 60))
+        for window in ('02:00', '02:00-02:00', '24:00-01:00', '2-4',
+                       '02:00-04:60', 'a:b-c:d'):
+            with self.assertRaises(ValueError):
+                self.target.parse_compaction_window(window)
+
+    def test_run_compaction_policy(self):
         self.patch_target('config')
-        self.config.__getitem__.return_value = 42
+        config = {
+            'ovsdb-compaction-window': '',
+            'ovsdb-compaction-log-entries': 1000,
+        }
+        self.config.__getitem__.side_effect = config.__getitem__
+        self.patch_target('cluster_status')
+        self.patch_target('compact_ovsdb')
+        self.patch_target('_ovsdb_server_compact')
+        self.patch_target('invalidate_cluster_status')
+        self.patch_object(ovn_central.ch_core.hookenv, 'local_unit')
+        self.local_unit.return_value = 'ovn-central/1'
+        self.patch_object(ovn_central.ch_core.unitdata, 'kv')
+        kv = FakeKV()
+        self.kv.return_value = kv
+        self.patch_object(ovn_central.time, 'time')
+        servers = [('a1b2', 'ssl:10.0.0.1:6643'),
+                   ('c3d4', 'ssl:10.0.0.2:6643'),
+                   ('e5f6', 'ssl:10.0.0.3:6643')]
+        statuses = {
+            'ovnnb_db': mock.MagicMock(is_cluster_leader=False,
+                                       log='[2, 5000]', servers=servers,
+                                       election_timer=1000),
+            'ovnsb_db': mock.MagicMock(is_cluster_leader=True,
+                                       log='[2, 5000]', servers=servers,
+                                       election_timer=1000),
+        }
+        self.cluster_status.side_effect = lambda db, fresh: statuses[db]
+
+        def run(hour, minute, second=0):
+            self.compact_ovsdb.reset_mock()
+            self._ovsdb_server_compact.reset_mock()
+            self.time.return_value = (86400 * 10 + hour * 3600 +
+                                      minute * 60 + second)
+            self.target.run_compaction_policy()
+            return ([c[1][0] for c in self.compact_ovsdb.mock_calls],
+                    [c[1][0] for c in self._ovsdb_server_compact.mock_calls])
+
+        # disabled
+        self.assertEquals(run(2, 0), ([], []))
+        config['ovsdb-compaction-window'] = '23:00-03:00'
+        # outside window
+        self.assertEquals(run(3, 0), ([], []))
+        self.assertEquals(run(22, 59), ([], []))
+        # unit 1 of 3 followers waits for its slot in the first half
+        self.assertEquals(run(23, 30), ([], []))
+        self.assertEquals(run(23, 40), (['nb'], []))
+        kv['ovn-central.compaction.nb'] = {
+            'timestamp': self.time.return_value}
+        # the leader is asked to compact in the second half, once per
+        # election window
+        self.assertEquals(run(1, 0), ([], ['sb']))
+        self.assertEquals(kv['ovn-central.compaction-handover.sb'],
+                          self.time.return_value)
+        self.invalidate_cluster_status.assert_called_once_with('ovnsb_db')
+        self.assertEquals(run(1, 0, 1), ([], []))
+        # and compacts as a follower once leadership has moved
+        statuses['ovnsb_db'].is_cluster_leader = False
+        self.assertEquals(run(1, 0, 2), (['sb'], []))
+        kv['ovn-central.compaction.sb'] = {
+            'timestamp': self.time.return_value}
+        # once per window
+        self.assertEquals(run(2, 59), ([], []))
+        # log below threshold
+        kv.clear()
+        statuses['ovnnb_db'].log = '[2, 500]'
+        self.assertEquals(run(1, 0), (['sb'], []))
+        # failures are logged
+        self.compact_ovsdb.side_effect = (
+            ovn_central.subprocess.CalledProcessError(1, 'ovn-appctl'))
+        self.assertEquals(run(1, 0), (['sb'], []))
+
+    def test_ovsdb_service(self):
+        self.assertEquals(self.target.ovsdb_service('sb'),
+                          'ovn-ovsdb-server-sb')
+        self.patch_release(ovn_central.TrainOVNCentralCharm.release)
+        self.target = ovn_central.TrainOVNCentralCharm()
+        self.assertEquals(self.target.ovsdb_service('sb'), 'ovn-sb-ovsdb')
+
+    def test_ovsdb_backup_source(self):
+        self.patch_target('cluster_status')
+        self.cluster_status.return_value = None
+        with self.assertRaises(RuntimeError):
+            self.target.ovsdb_backup_source('sb', 16642)
+        status = mock.MagicMock(
+            is_cluster_leader=False, role='follower',
+            server_id=ovn_central.uuid.UUID(
+                'a6c3a5a8-5b4c-4bfe-8d1e-0fe4fbf1b3b8'),
+            servers=[('a6c3', 'ssl:10.0.0.1:6644'),
+                     ('5b3e', 'ssl:10.0.0.2:6644')])
+        self.cluster_status.return_value = status
+        self.assertEquals(self.target.ovsdb_backup_source('sb', 16642),
+                          ('unix:/var/run/ovn/ovnsb_db.sock', 'follower'))
+        status.is_cluster_leader = True
+        self.assertEquals(self.target.ovsdb_backup_source('sb', 16642),
+                          ('ssl:10.0.0.2:16642', 'follower'))
+        self.assertEquals(self.target.ovsdb_backup_source('nb', 16641),
+                          ('ssl:10.0.0.2:16641', 'follower'))
+        status.servers = status.servers[:1]
+        with self.assertRaises(RuntimeError):
+            self.target.ovsdb_backup_source('sb', 16642)
+
+    def test_backup_ovsdb(self):
+        backup_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, backup_dir)
+        self.patch_target('ovsdb_backup_source')
+        self.ovsdb_backup_source.return_value = (
+            'unix:/var/run/ovn/ovnsb_db.sock', 'follower')
+        self.patch_target('_ovsdb_client_cmd')
+        self._ovsdb_client_cmd.side_effect = lambda *args: list(args)
+        self.patch_object(ovn_central.ch_core.host, 'mkdir')
+        self.patch_object(ovn_central.subprocess, 'check_output')
+        self.check_output.return_value = '20.21.0\n'
+        self.patch_object(ovn_central.subprocess, 'Popen')
+        snapshot = (b'OVSDB JSON 42 0123\n' +
+                    b'{}' * ovn_central.STREAM_CHUNK_SIZE)
+        self.Popen.return_value.stdout = io.BytesIO(snapshot)
+        self.Popen.return_value.wait.return_value = 0
+        with self.assertRaises(ValueError):
+            self.target.backup_ovsdb('xb', backup_dir, 16642)
+        result = self.target.backup_ovsdb('sb', backup_dir, 16642)
+        self.ovsdb_backup_source.assert_called_once_with('sb', 16642)
+        self.check_output.assert_called_once_with(
+            ['get-schema-version', 'unix:/var/run/ovn/ovnsb_db.sock',
+             'OVN_Southbound'], universal_newlines=True)
+        self.Popen.assert_called_once_with(
+            ['backup', 'unix:/var/run/ovn/ovnsb_db.sock', 'OVN_Southbound'],
+            stdout=ovn_central.subprocess.PIPE)
+        self.assertEquals(result['bytes'], len(snapshot))
+        self.assertEquals(result['schema-version'], '20.21.0')
+        self.assertEquals(result['role'], 'follower')
+        self.assertTrue(result['file'].startswith(
+            os.path.join(backup_dir, 'OVN_Southbound-')))
+        self.assertEquals(result['compressed-bytes'],
+                          os.path.getsize(result['file']))
+        with gzip.open(result['file']) as f:
+            self.assertEquals(f.read(), snapshot)
+        self.assertEquals(os.listdir(backup_dir),
+                          [os.path.basename(result['file'])])
+
+        # failed backup leaves no file behind
+        os.unlink(result['file'])
+        self.Popen.return_value.stdout = io.BytesIO(b'partial')
+        self.Popen.return_value.wait.return_value = 1
+        with self.assertRaises(ovn_central.subprocess.CalledProcessError):
+            self.target.backup_ovsdb('sb', backup_dir, 16642)
+        self.assertEquals(os.listdir(backup_dir), [])
+
+        # write error is raised as is, partial file removed
+        self.Popen.return_value.stdout = io.BytesIO(b'partial')
+        self.Popen.return_value.wait.return_value = 0
+        out = mock.MagicMock()
+        out.__enter__.return_value.write.side_effect = OSError(28, 'ENOSPC')
+
+        def _open(path, mode):
+            open(path, 'wb').close()
+            return out
+
+        self.patch_object(ovn_central.gzip, 'open', side_effect=_open)
+        with self.assertRaises(OSError) as cm:
+            self.target.backup_ovsdb('sb', backup_dir, 16642)
+        self.assertEquals(cm.exception.errno, 28)
+        self.assertEquals(os.listdir(backup_dir), [])
+
+        # nothing to remove when the file could not be created
+        self.open.side_effect = PermissionError(13, 'EACCES')
+        with self.assertRaises(PermissionError):
+            self.target.backup_ovsdb('sb', backup_dir, 16642)
+        self.assertEquals(os.listdir(backup_dir), [])
+
+    def test__ovsdb_client_cmd(self):
+        self.assertEquals(
+            self.target._ovsdb_client_cmd('backup', 'unix:sock', 'db'),
+            ['ovsdb-client', '--no-leader-only',
+             '--private-key=/etc/ovn/key_host',
+             '--certificate=/etc/ovn/cert_host',
+             '--ca-cert=/etc/ovn/ovn-central.crt',
+             'backup', 'unix:sock', 'db'])
+
+    def test_restore_ovsdb(self):
+        db_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, db_dir)
+        self.patch_target('ovsdb_path')
+        self.ovsdb_path.side_effect = lambda f: os.path.join(db_dir, f)
+        self.patch_object(ovn_central.ch_core.host, 'service_stop')
+        self.patch_object(ovn_central.ch_core.host, 'service_start')
+        self.patch_target('run')
+        restored = []
+        self.run.side_effect = lambda *args: restored.append(
+            open(args[3], 'rb').read())
+        with open(os.path.join(db_dir, 'ovnsb_db.db'), 'wb') as f:
+            f.write(b'old')
+        backup_file = os.path.join(db_dir, 'backup.db.gz')
+        with gzip.open(backup_file, 'wb') as f:
+            f.write(b'snapshot')
+        with self.assertRaises(ValueError):
+            self.target.restore_ovsdb('sb', '/nonexistent', 'ssl:a:6644')
+        saved = self.target.restore_ovsdb('sb', backup_file,
+                                          'ssl:10.0.0.1:6644')
+        self.service_stop.assert_called_once_with('ovn-ovsdb-server-sb')
+        self.service_start.assert_called_once_with('ovn-ovsdb-server-sb')
+        self.run.assert_called_once_with(
+            'ovsdb-tool', 'create-cluster',
+            os.path.join(db_dir, 'ovnsb_db.db'),
+            os.path.join(db_dir, 'ovnsb_db.db.restore'),
+            'ssl:10.0.0.1:6644')
+        self.assertEquals(restored, [b'snapshot'])
+        with open(saved, 'rb') as f:
+            self.assertEquals(f.read(), b'old')
+        self.assertEquals(sorted(os.listdir(db_dir)),
+                          ['backup.db.gz', os.path.basename(saved)])
+
+        # service started again on failure
+        self.service_start.reset_mock()
+        self.run.side_effect = ovn_central.subprocess.CalledProcessError(
+            1, 'ovsdb-tool')
+        with self.assertRaises(ovn_central.subprocess.CalledProcessError):
+            self.target.restore_ovsdb('sb', backup_file, 'ssl:a:6644')
+        self.service_start.assert_called_once_with('ovn-ovsdb-server-sb')
+
+    def test_rejoin_ovsdb(self):
+        self.patch_object(ovn_central.ch_core.host, 'service_stop')
+        self.patch_object(ovn_central.ch_core.host, 'service_start')
+        self.patch_object(ovn_central.os.path, 'exists')
+        self.exists.return_value = True
+        self.patch_object(ovn_central.os, 'rename')
+        self.patch_target('join_cluster')
+        self.patch_object(ovn_central.ch_core.hookenv, 'leader_get')
+        self.leader_get.return_value = 'fake-cid'
+        saved = self.target.rejoin_ovsdb('nb', ['ssl:a:6643'],
+                                         ['ssl:b:6643', 'ssl:c:6643'])
+        self.rename.assert_called_once_with('/var/lib/ovn/ovnnb_db.db', saved)
+        self.leader_get.assert_called_once_with('nb_cid')
+        self.join_cluster.assert_called_once_with(
+            'ovnnb_db.db', 'OVN_Northbound', ['ssl:a:6643'],
+            ['ssl:b:6643', 'ssl:c:6643'], cid='fake-cid')
+        self.service_stop.assert_called_once_with('ovn-ovsdb-server-nb')
+        self.service_start.assert_called_once_with('ovn-ovsdb-server-nb')
+
+    def test_restart_pending(self):
+        self.patch_object(ovn_central.deferred_events, 'get_deferred_events')
+        event = mock.MagicMock()
+        event.service = 'ovn-ovsdb-server-sb'
+        self.get_deferred_events.return_value = [event]
+        self.assertTrue(self.target.restart_pending())
+        event.service = 'openvswitch-switch'
+        self.assertFalse(self.target.restart_pending())
+
+    def test_publish_restart_pending(self):
+        self.patch_target('restart_pending')
+        self.patch_object(ovn_central.ch_core.hookenv, 'relation_ids')
+        self.relation_ids.return_value = ['ovsdb-peer:1']
+        self.patch_object(ovn_central.ch_core.hookenv, 'local_unit')
+        self.local_unit.return_value = 'ovn-central/0'
+        self.patch_object(ovn_central.ch_core.hookenv, 'relation_get')
+        self.patch_object(ovn_central.ch_core.hookenv, 'relation_set')
+        self.restart_pending.return_value = True
+        self.relation_get.return_value = None
+        self.target.publish_restart_pending()
+        self.relation_get.assert_called_once_with(
+            'ovn-restart-pending', unit='ovn-central/0', rid='ovsdb-peer:1')
+        self.relation_set.assert_called_once_with(
+            relation_id='ovsdb-peer:1',
+            relation_settings={'ovn-restart-pending': 'true'})
+        self.relation_set.reset_mock()
+        self.relation_get.return_value = 'true'
+        self.target.publish_restart_pending()
+        self.assertFalse(self.relation_set.called)
+        self.restart_pending.return_value = False
+        self.target.publish_restart_pending()
+        self.relation_set.assert_called_once_with(
+            relation_id='ovsdb-peer:1',
+            relation_settings={'ovn-restart-pending': None})
+
+    def test_peers_restart_pending(self):
+        self.patch_object(ovn_central.ch_core.hookenv, 'relation_ids')
+        self.relation_ids.return_value = ['ovsdb-peer:1']
+        self.patch_object(ovn_central.ch_core.hookenv, 'related_units')
+        self.related_units.return_value = ['ovn-central/2', 'ovn-central/1']
+        self.patch_object(ovn_central.ch_core.hookenv, 'relation_get')
+        self.relation_get.return_value = 'true'
+        self.assertEquals(self.target.peers_restart_pending(),
+                          ['ovn-central/1', 'ovn-central/2'])
+        self.relation_get.assert_has_calls([
+            mock.call('ovn-restart-pending', unit='ovn-central/2',
+                      rid='ovsdb-peer:1'),
+            mock.call('ovn-restart-pending', unit='ovn-central/1',
+                      rid='ovsdb-peer:1'),
+        ])
+        self.relation_get.return_value = None
+        self.assertEquals(self.target.peers_restart_pending(), [])
+
+    def test_wait_for_ovsdb_catch_up(self):
+        self.patch_target('cluster_status')
+        self.patch_target('invalidate_cluster_status')
+        self.patch_object(ovn_central.time, 'sleep')
+        clock = FakeClock()
+        self.patch_object(ovn_central.time, 'time')
+        self.time.side_effect = clock
+        self.sleep.side_effect = lambda secs: setattr(
+            clock, 'now', clock.now + secs)
+        joining = mock.MagicMock(status='joining cluster', leader='unknown',
+                                 entries_not_yet_applied=0)
+        applying = mock.MagicMock(status='cluster member', leader='a6c3',
+                                  entries_not_yet_applied=42)
+        ready = mock.MagicMock(status='cluster member', leader='a6c3',
+                               entries_not_yet_applied=0)
+        self.cluster_status.side_effect = [None, joining, applying, ready]
+        self.target.wait_for_ovsdb_catch_up('sb')
+        self.assertEquals(self.sleep.call_count, 3)
+        self.invalidate_cluster_status.assert_called_with('ovnsb_db')
+        self.cluster_status.assert_called_with('ovnsb_db')
+        self.cluster_status.side_effect = None
+        self.cluster_status.return_value = applying
+        with self.assertRaises(RuntimeError):
+            self.target.wait_for_ovsdb_catch_up('sb', timeout=10)
+
+    def test_rolling_restart(self):
+        self.patch_target('cluster_status')
+        self.patch_target('peers_restart_pending')
+        self.patch_target('transfer_ovsdb_leadership')
+        self.patch_target('wait_for_ovsdb_catch_up')
+        self.patch_target('publish_restart_pending')
+        self.patch_object(ovn_central.ch_core.host, 'service_restart')
+        self.patch_object(ovn_central.deferred_events, 'process_svc_restart')
+        follower = mock.MagicMock(is_cluster_leader=False,
+                                  connections='->5b3e <-5b3e')
+        leader = mock.MagicMock(is_cluster_leader=True,
+                                connections='->5b3e <-5b3e')
+        disconnected = mock.MagicMock(is_cluster_leader=False,
+                                      connections='(->5b3e) <-5b3e')
+
+        # peers pending restart
+        self.cluster_status.side_effect = [follower, leader]
+        self.peers_restart_pending.return_value = ['ovn-central/1']
+        with self.assertRaises(RuntimeError):
+            self.target.rolling_restart()
+        self.assertFalse(self.service_restart.called)
+
+        # another unit restarting
+        self.cluster_status.side_effect = [follower, disconnected]
+        with self.assertRaises(RuntimeError):
+            self.target.rolling_restart()
+        self.assertFalse(self.service_restart.called)
+
+        # forced
+        self.cluster_status.side_effect = [follower, leader]
+        timings = self.target.rolling_restart(force=True)
+        self.transfer_ovsdb_leadership.assert_called_once_with('sb')
+        self.assertEquals(self.service_restart.mock_calls, [
+            mock.call('ovn-ovsdb-server-nb'),
+            mock.call('ovn-ovsdb-server-sb'),
+            mock.call('ovn-northd'),
+        ])
+        self.assertEquals(self.process_svc_restart.mock_calls, [
+            mock.call('ovn-ovsdb-server-nb'),
+            mock.call('ovn-ovsdb-server-sb'),
+            mock.call('ovn-northd'),
+            mock.call('ovn-central'),
+        ])
+        self.wait_for_ovsdb_catch_up.assert_has_calls([
+            mock.call('nb'), mock.call('sb')])
+        self.assertEquals(list(timings.keys()), [
+            'transfer-leadership-sb', 'restart', 'catch-up-nb',
+            'catch-up-sb', 'total'])
+        self.publish_restart_pending.assert_called_once_with()
+
+        # follower restarts without checking peers
+        self.transfer_ovsdb_leadership.reset_mock()
+        self.peers_restart_pending.reset_mock()
+        self.cluster_status.side_effect = [follower, follower]
+        timings = self.target.rolling_restart()
+        self.assertFalse(self.peers_restart_pending.called)
+        self.assertFalse(self.transfer_ovsdb_leadership.called)
+        self.assertEquals(list(timings.keys()), [
+            'restart', 'catch-up-nb', 'catch-up-sb', 'total'])
+
+    def test_configure_ovn(self):
+        self.patch_target('election_timer')
+        self.election_timer.side_effect = lambda db: {'nb': 2, 'sb': 42}[db]
+        self.patch_target('inactivity_probe')
+        self.inactivity_probe.side_effect = lambda db: {
+            'nb': 42, 'sb': 60}[db]
         self.patch_target('configure_ovn_listener')
         self.patch_target('configure_ovsdb_election_timer')
+        self.patch_target('configure_northd_parallel_build')
         self.target.configure_ovn(1, 2, 3)
-        self.config.__getitem__.assert_has_calls([
-            mock.call('ovsdb-server-inactivity-probe'),
-            mock.call('ovsdb-server-election-timer'),
-        ])
         self.configure_ovn_listener.assert_has_calls([
             mock.call('nb', {1: {'inactivity_probe': 42000}}),
             mock.call('sb', {2: {'role': 'ovn-controller',
-                                 'inactivity_probe': 42000}}),
-            mock.call('sb', {3: {'inactivity_probe': 42000}}),
+                                 'inactivity_probe': 60000},
+                             3: {'inactivity_probe': 60000}}),
         ])
         self.configure_ovsdb_election_timer.assert_has_calls([
-            mock.call('nb', 42),
+            mock.call('nb', 2),
             mock.call('sb', 42),
         ])
+        self.configure_northd_parallel_build.assert_called_once_with()
+
+    def test_inactivity_probe(self):
+        self.patch_target('config')
+        config = {
+            'ovsdb-server-inactivity-probe': 60,
+            'ovsdb-server-nb-inactivity-probe': 0,
+            'ovsdb-server-sb-inactivity-probe': 0,
+            'ovsdb-server-adaptive-inactivity-probe': False,
+            'ovsdb-server-inactivity-probe-min': 30,
+            'ovsdb-server-inactivity-probe-max': 300,
+        }
+        self.config.__getitem__.side_effect = config.__getitem__
+        self.patch_target('current_inactivity_probe')
+        self.current_inactivity_probe.side_effect = lambda db: {
+            'nb': None, 'sb': 120}[db]
+        self.assertEquals(self.target.inactivity_probe('sb'), 60)
+        self.assertFalse(self.current_inactivity_probe.called)
+        config['ovsdb-server-sb-inactivity-probe'] = 180
+        self.assertEquals(self.target.inactivity_probe('nb'), 60)
+        self.assertEquals(self.target.inactivity_probe('sb'), 180)
+        config['ovsdb-server-sb-inactivity-probe'] = 0
+        config['ovsdb-server-adaptive-inactivity-probe'] = True
+        self.assertEquals(self.target.inactivity_probe('nb'), 60)
+        self.assertEquals(self.target.inactivity_probe('sb'), 120)
+        config['ovsdb-server-inactivity-probe-max'] = 90
+        self.assertEquals(self.target.inactivity_probe('sb'), 90)
+        config['ovsdb-server-inactivity-probe'] = 10
+        self.assertEquals(self.target.inactivity_probe('nb'), 30)
+
+    def test_current_inactivity_probe(self):
+        self.patch_target('ovsdb_connection', return_value=mock.MagicMock())
+        conn = self.ovsdb_connection.return_value.__enter__.return_value
+        conn.select.return_value = [
+            {'inactivity_probe': 90000},
+            {'inactivity_probe': 120000},
+            {'inactivity_probe': ['set', []]},
+        ]
+        self.assertEquals(self.target.current_inactivity_probe('sb'), 120)
+        self.ovsdb_connection.assert_called_once_with('ovnsb_db')
+        conn.select.assert_called_once_with(
+            'OVN_Southbound', 'Connection', columns=['inactivity_probe'])
+        conn.select.return_value = [{'inactivity_probe': ['set', []]}]
+        self.assertIsNone(self.target.current_inactivity_probe('sb'))
+        conn.select.side_effect = OSError
+        self.assertIsNone(self.target.current_inactivity_probe('nb'))
+
+    def test_sample_ovsdb_load(self):
+        self.patch_target('ovsdb_connection', return_value=mock.MagicMock())
+        conn = self.ovsdb_connection.return_value.__enter__.return_value
+        outputs = {
+            'memory/show': 'cells:42 monitors:3 sessions:1200 backlog:0',
+            'coverage/show': (
+                'Event coverage, avg rate over last: 5 seconds, last '
+                'minute, last hour,  hash=2c3f1ef9:\n'
+                'poll_create_node    12.0/sec     10.017/sec        '
+                '9.0003/sec   total: 60042\n'
+                'long_poll_interval   0.0/sec      0.017/sec        '
+                '0.0003/sec   total: 3\n'),
+        }
+        conn.unixctl.side_effect = lambda cmd: outputs[cmd]
+        self.patch_object(ovn_central.time, 'time')
+        self.time.side_effect = [0, 0.01, 1, 1.25, 2, 2.001, 3, 3, 4, 4.02]
+        self.assertEquals(self.target.sample_ovsdb_load('ovnsb_db'), {
+            'latency': 250,
+            'sessions': 1200,
+            'long-polls': 3,
+        })
+        self.ovsdb_connection.assert_called_once_with(
+            'ovnsb_db', control=True)
+        self.time.side_effect = None
+        self.time.return_value = 5
+        outputs['coverage/show'] = ''
+        outputs['memory/show'] = ''
+        self.assertEquals(self.target.sample_ovsdb_load('ovnsb_db'), {
+            'latency': 0,
+            'sessions': 0,
+            'long-polls': 0,
+        })
+        conn.unixctl.side_effect = ovn_central.ovsdb_client.OVSDBError('e')
+        self.assertIsNone(self.target.sample_ovsdb_load('ovnsb_db'))
+
+    def test_next_inactivity_probe(self):
+        self.patch_target('config')
+        config = {
+            'ovsdb-server-inactivity-probe-min': 30,
+            'ovsdb-server-inactivity-probe-max': 300,
+        }
+        self.config.__getitem__.side_effect = config.__getitem__
+        self.assertEquals(
+            self.target.next_inactivity_probe(60, 1000, 10, 0), 120)
+        self.assertEquals(
+            self.target.next_inactivity_probe(60, 200, 10, 1), 120)
+        self.assertEquals(
+            self.target.next_inactivity_probe(200, 2000, 10, 0), 300)
+        self.assertEquals(
+            self.target.next_inactivity_probe(60, 200, 10, 0), 60)
+        self.assertEquals(
+            self.target.next_inactivity_probe(60, 10, 10, 0), 45)
+        self.assertEquals(
+            self.target.next_inactivity_probe(35, 10, 10, 0), 30)
+        # probe traffic of 6001 sessions kept under 100 per second
+        self.assertEquals(
+            self.target.next_inactivity_probe(60, 10, 6001, 0), 61)
+
+    def test_adapt_inactivity_probe(self):
+        self.patch_target('config')
+        config = {
+            'ovsdb-server-inactivity-probe': 60,
+            'ovsdb-server-nb-inactivity-probe': 0,
+            'ovsdb-server-sb-inactivity-probe': 0,
+            'ovsdb-server-adaptive-inactivity-probe': False,
+            'ovsdb-server-inactivity-probe-min': 30,
+            'ovsdb-server-inactivity-probe-max': 300,
+        }
+        self.config.__getitem__.side_effect = config.__getitem__
+        self.patch_object(ovn_central.ch_core.unitdata, 'kv')
+        kv = FakeKV()
+        self.kv.return_value = kv
+        clock = FakeClock(10000)
+        self.patch_object(ovn_central.time, 'time')
+        self.time.side_effect = clock
+        self.patch_target('cluster_status')
+        self.cluster_status.side_effect = (
+            lambda db, fresh: self.FakeClusterStatus(db == 'ovnsb_db'))
+        self.patch_target('sample_ovsdb_load')
+        self.sample_ovsdb_load.return_value = {
+            'latency': 1500, 'sessions': 100, 'long-polls': 5}
+        # listeners in the clustered database, possibly written while
+        # another unit was leader
+        listeners = {'nb': None, 'sb': None}
+        self.patch_target('current_inactivity_probe')
+        self.current_inactivity_probe.side_effect = listeners.get
+        self.patch_target('configure_ovn_listener')
+
+        def _configure_ovn_listener(db, port_map):
+            listeners[db] = max(settings['inactivity_probe']
+                                for settings in port_map.values()) // 1000
+
+        self.configure_ovn_listener.side_effect = _configure_ovn_listener
+        kv['ovn-central.inactivity-probe.sb'] = {'time': 0}
+        self.target.adapt_inactivity_probe(6641, 6642, 16642)
+        self.assertEquals(kv, {})
+        self.assertFalse(self.sample_ovsdb_load.called)
+
+        config['ovsdb-server-adaptive-inactivity-probe'] = True
+        self.target.adapt_inactivity_probe(6641, 6642, 16642)
+        self.sample_ovsdb_load.assert_called_once_with('ovnsb_db')
+        self.assertEquals(kv, {'ovn-central.inactivity-probe.sb': {
+            'time': 10000, 'long-polls': 5}})
+        self.configure_ovn_listener.assert_called_once_with('sb', {
+            6642: {'role': 'ovn-controller', 'inactivity_probe': 120000},
+            16642: {'inactivity_probe': 120000},
+        })
+
+        # rate limited
+        self.configure_ovn_listener.reset_mock()
+        clock.now += 60
+        self.target.adapt_inactivity_probe(6641, 6642, 16642)
+        self.assertFalse(self.configure_ovn_listener.called)
+        self.assertEquals(listeners['sb'], 120)
+
+        # no long poll intervals since the previous sample and idle
+        clock.now += ovn_central.INACTIVITY_PROBE_INTERVAL
+        self.sample_ovsdb_load.return_value = {
+            'latency': 10, 'sessions': 100, 'long-polls': 5}
+        self.target.adapt_inactivity_probe(6641, 6642, 16642)
+        self.assertEquals(listeners['sb'], 90)
+        self.configure_ovn_listener.assert_called_once_with('sb', {
+            6642: {'role': 'ovn-controller', 'inactivity_probe': 90000},
+            16642: {'inactivity_probe': 90000},
+        })
+
+        # counter starts over after restart of ovsdb-server
+        self.configure_ovn_listener.reset_mock()
+        clock.now += ovn_central.INACTIVITY_PROBE_INTERVAL
+        self.sample_ovsdb_load.return_value = {
+            'latency': 200, 'sessions': 100, 'long-polls': 1}
+        self.target.adapt_inactivity_probe(6641, 6642, 16642)
+        self.assertEquals(kv['ovn-central.inactivity-probe.sb'], {
+            'time': clock.now, 'long-polls': 1})
+        self.assertEquals(listeners['sb'], 180)
+
+        # steady load
+        self.configure_ovn_listener.reset_mock()
+        clock.now += ovn_central.INACTIVITY_PROBE_INTERVAL
+        self.target.adapt_inactivity_probe(6641, 6642, 16642)
+        self.assertFalse(self.configure_ovn_listener.called)
+
+        self.sample_ovsdb_load.return_value = None
+        self.target.adapt_inactivity_probe(6641, 6642, 16642)
+        self.assertFalse(self.configure_ovn_listener.called)
+
+        # leadership moved to a unit without local state, it continues
+        # from the value on the listeners
+        kv.unset('ovn-central.inactivity-probe.sb')
+        self.sample_ovsdb_load.return_value = {
+            'latency': 1500, 'sessions': 100, 'long-polls': 0}
+        self.target.adapt_inactivity_probe(6641, 6642, 16642)
+        self.configure_ovn_listener.assert_called_once_with('sb', {
+            6642: {'role': 'ovn-controller', 'inactivity_probe': 300000},
+            16642: {'inactivity_probe': 300000},
+        })
 
     def test_initialize_firewall(self):
         self.patch_object(ovn_central, 'ch_ufw')
@@ -422,21 +2408,100 @@ class TestOVNCentralCharm(Helper):
         ])
 
     def test_configure_firewall(self):
+        self.patch_target('config')
+        config = {'firewall-backend': 'ufw'}
+        self.config.__getitem__.side_effect = config.__getitem__
+        self.patch_object(ovn_central.ch_core.unitdata, 'kv')
+        kv = FakeKV()
+        self.kv.return_value = kv
+        self.patch_object(ovn_central, 'nft')
+        self.patch_target('_configure_firewall_ufw')
+        self.patch_target('_configure_firewall_nftables')
+        self.target.configure_firewall('fake-map')
+        self._configure_firewall_ufw.assert_called_once_with('fake-map')
+        self.assertFalse(self._configure_firewall_nftables.called)
+        self.assertEquals(kv, {'ovn-central.firewall-backend': 'ufw'})
+        # switch to nftables removes ufw rules
+        self._configure_firewall_ufw.reset_mock()
+        config['firewall-backend'] = 'nftables'
+        self.target.configure_firewall('fake-map')
+        self._configure_firewall_ufw.assert_called_once_with({})
+        self._configure_firewall_nftables.assert_called_once_with('fake-map')
+        self.assertEquals(kv, {'ovn-central.firewall-backend': 'nftables'})
+        # subsequent runs do not touch ufw
+        self._configure_firewall_ufw.reset_mock()
+        self.target.configure_firewall('fake-map')
+        self.assertFalse(self._configure_firewall_ufw.called)
+        self.assertFalse(self.nft.delete_table.called)
+        # switch back to ufw removes nftables table
+        config['firewall-backend'] = 'ufw'
+        self.target.configure_firewall('fake-map')
+        self.nft.delete_table.assert_called_once_with('charm-ovn-central')
+        self._configure_firewall_ufw.assert_called_once_with('fake-map')
+        # invalid backend is ignored
+        self._configure_firewall_ufw.reset_mock()
+        config['firewall-backend'] = 'iptables'
+        self.target.configure_firewall('fake-map')
+        self.assertFalse(self._configure_firewall_ufw.called)
+
+    def test__configure_firewall_nftables(self):
+        self.patch_object(ovn_central.ch_core.unitdata, 'kv')
+        kv = FakeKV()
+        self.kv.return_value = kv
+        self.patch_object(ovn_central.shutil, 'which')
+        self.patch_object(ovn_central.ch_fetch, 'apt_install')
+        self.patch_object(ovn_central.nft, 'list_table')
+        self.patch_object(ovn_central.nft, 'apply')
+        port_addr_map = {
+            (1, 2,): ('a.b.c.d',),
+        }
+        self.patch_object(ovn_central.nft, 'render_ruleset')
+        self.render_ruleset.return_value = 'fake-ruleset'
+        self.patch_object(ovn_central.nft, 'parse_set_elements')
+        self.patch_object(ovn_central.nft, 'render_element_delta')
+        self.which.return_value = None
+        # first run loads full ruleset
+        self.target._configure_firewall_nftables(port_addr_map)
+        self.apt_install.assert_called_once_with(['nftables'], fatal=True)
+        self.assertFalse(self.list_table.called)
+        self.apply.assert_called_once_with('fake-ruleset')
+        self.assertIn('ovn-central.nftables-structure', kv)
+        # subsequent runs apply element changes only
+        self.which.return_value = '/usr/sbin/nft'
+        self.apply.reset_mock()
+        self.list_table.return_value = 'fake-listing'
+        self.parse_set_elements.return_value = 'fake-elements'
+        self.render_element_delta.return_value = 'fake-delta'
+        self.target._configure_firewall_nftables(port_addr_map)
+        self.render_element_delta.assert_called_once_with(
+            'charm-ovn-central', port_addr_map, 'fake-elements')
+        self.apply.assert_called_once_with('fake-delta')
+        # nothing to do
+        self.apply.reset_mock()
+        self.render_element_delta.return_value = ''
+        self.target._configure_firewall_nftables(port_addr_map)
+        self.assertFalse(self.apply.called)
+        # table removed outside of charm
+        self.list_table.return_value = None
+        self.target._configure_firewall_nftables(port_addr_map)
+        self.apply.assert_called_once_with('fake-ruleset')
+        # structure changed
+        self.apply.reset_mock()
+        self.list_table.reset_mock()
+        self.render_ruleset.side_effect = ['other-structure', 'fake-ruleset']
+        self.target._configure_firewall_nftables(port_addr_map)
+        self.assertFalse(self.list_table.called)
+        self.apply.assert_called_once_with('fake-ruleset')
+        self.assertEquals(self.apt_install.call_count, 1)
+
+    def test__configure_firewall_ufw(self):
         self.patch_object(ovn_central, 'ch_ufw')
-        self.ch_ufw.status.return_value = [
-            (42, {
-                'action': 'allow in',
-                'from': 'q.r.s.t',
-                'comment': 'charm-ovn-central'}),
-            (51, {
-                'action': 'reject in',
-                'from': 'any',
-                'comment': 'charm-ovn-central'}),
-        ]
-        self.target.configure_firewall({
+        self.ch_ufw.status.return_value = []
+        self.target._configure_firewall_ufw({
             (1, 2, 3, 4,): ('a.b.c.d', 'e.f.g.h',),
             (1, 2,): ('i.j.k.l', 'm.n.o.p',),
         })
+        self.ch_ufw.status.assert_called_once_with()
         self.ch_ufw.modify_access.assert_has_calls([
             mock.call(src=None, dst='any', port=1,
                       proto='tcp', action='reject',
@@ -477,56 +2542,74 @@ class TestOVNCentralCharm(Helper):
             mock.call('m.n.o.p', port=2, proto='tcp', action='allow',
                       prepend=True, comment='charm-ovn-central'),
         ], any_order=True)
-        self.ch_ufw.modify_access.assert_has_calls([
-            mock.call(None, dst=None, action='delete', index=42)
-        ])
-        self.ch_ufw.reset_mock()
-        self.target.configure_firewall({
-            (1, 2, 3, 4,): ('a.b.c.d', 'e.f.g.h',),
-            (1, 2, 5,): None,
+        self.assertEquals(self.ch_ufw.modify_access.call_count, 16)
+
+    def test__configure_firewall_ufw_reconcile(self):
+        self.patch_object(ovn_central, 'ch_ufw')
+        self.ch_ufw.status.return_value = [
+            (1, {'to': '1/tcp', 'action': 'allow in', 'from': 'a.b.c.d',
+                 'comment': 'charm-ovn-central'}),
+            (2, {'to': '2/tcp', 'action': 'allow in', 'from': 'a.b.c.d',
+                 'comment': 'charm-ovn-central'}),
+            (3, {'to': '3/tcp', 'action': 'allow in', 'from': 'a.b.c.d',
+                 'comment': 'charm-ovn-central'}),
+            (4, {'to': '1/tcp', 'action': 'allow in', 'from': 'q.r.s.t',
+                 'comment': 'charm-ovn-central'}),
+            (5, {'to': '22/tcp', 'action': 'allow in', 'from': 'q.r.s.t',
+                 'comment': ''}),
+            (6, {'to': '1/tcp', 'action': 'reject in', 'from': 'any',
+                 'comment': 'charm-ovn-central'}),
+            (7, {'to': '2/tcp', 'action': 'reject in', 'from': 'any',
+                 'comment': 'charm-ovn-central'}),
+            (8, {'to': '3/tcp', 'action': 'reject in', 'from': 'any',
+                 'comment': 'charm-ovn-central'}),
+            (9, {'to': '1/tcp', 'action': 'reject in', 'from': 'any',
+                 'comment': 'charm-ovn-central'}),
+        ]
+        self.target._configure_firewall_ufw({
+            (1, 2,): ('a.b.c.d', 'e.f.g.h'),
         })
-        self.ch_ufw.modify_access.assert_has_calls([
-            mock.call(src=None, dst='any', port=1,
-                      proto='tcp', action='reject',
-                      comment='charm-ovn-central'),
-            mock.call(src=None, dst='any', port=2,
-                      proto='tcp', action='reject',
-                      comment='charm-ovn-central'),
-            mock.call(src=None, dst='any', port=3,
-                      proto='tcp', action='reject',
-                      comment='charm-ovn-central'),
-            mock.call(src=None, dst='any', port=4,
-                      proto='tcp', action='reject',
-                      comment='charm-ovn-central'),
-            mock.call(src=None, dst='any', port=5,
-                      proto='tcp', action='reject',
-                      comment='charm-ovn-central'),
-        ], any_order=True)
-        self.ch_ufw.modify_access.assert_has_calls([
-            mock.call('a.b.c.d', port=1, proto='tcp', action='allow',
-                      prepend=True, comment='charm-ovn-central'),
+        self.assertEquals(self.ch_ufw.modify_access.mock_calls, [
+            # stale rules are deleted in reverse order
+            mock.call(None, dst=None, action='delete', index=8),
+            mock.call(None, dst=None, action='delete', index=4),
+            mock.call(None, dst=None, action='delete', index=3),
             mock.call('e.f.g.h', port=1, proto='tcp', action='allow',
                       prepend=True, comment='charm-ovn-central'),
-            mock.call('a.b.c.d', port=2, proto='tcp', action='allow',
-                      prepend=True, comment='charm-ovn-central'),
             mock.call('e.f.g.h', port=2, proto='tcp', action='allow',
                       prepend=True, comment='charm-ovn-central'),
-            mock.call('a.b.c.d', port=3, proto='tcp', action='allow',
-                      prepend=True, comment='charm-ovn-central'),
-            mock.call('e.f.g.h', port=3, proto='tcp', action='allow',
-                      prepend=True, comment='charm-ovn-central'),
-            mock.call('a.b.c.d', port=4, proto='tcp', action='allow',
-                      prepend=True, comment='charm-ovn-central'),
-            mock.call('e.f.g.h', port=4, proto='tcp', action='allow',
-                      prepend=True, comment='charm-ovn-central'),
-        ], any_order=True)
-        self.ch_ufw.modify_access.assert_has_calls([
-            mock.call(None, dst=None, action='delete', index=42)
         ])
+        # nothing to do when firewall is up to date
+        self.ch_ufw.modify_access.reset_mock()
+        self.ch_ufw.status.return_value = [
+            (1, {'to': '1/tcp', 'action': 'allow in', 'from': 'a.b.c.d',
+                 'comment': 'charm-ovn-central'}),
+            (2, {'to': '1/tcp', 'action': 'reject in', 'from': 'any',
+                 'comment': 'charm-ovn-central'}),
+        ]
+        self.target._configure_firewall_ufw({
+            (1,): ('a.b.c.d',),
+        })
+        self.assertFalse(self.ch_ufw.modify_access.called)
 
     def test_render_nrpe(self):
         self.patch_object(ovn_central.nrpe, 'NRPE')
         self.patch_object(ovn_central.nrpe, 'add_init_service_checks')
+        self.patch_object(ovn_central.ch_core.hookenv, 'charm_dir',
+                          return_value='/charm')
+        self.patch_object(ovn_central.ch_core.host, 'rsync')
+        self.patch_target('config')
+        config = {'ovn-db-connections-monitor': False}
+        for check, (warn, crit) in (
+                ('uncommitted-entries', (100, 1000)),
+                ('leader-change', (300, 60)),
+                ('log-entries', (10000, 100000)),
+                ('disconnected-servers', (1, 2))):
+            config['nagios-raft-{}-warn'.format(check)] = warn
+            config['nagios-raft-{}-crit'.format(check)] = crit
+        self.config.__getitem__.side_effect = config.__getitem__
+        self.patch_target('_disable_connections_monitor')
+        self.patch_target('_enable_connections_monitor')
 
         with mock.patch('builtins.open', create=True) as mocked_open:
             mocked_file = mock.MagicMock(spec=io.FileIO)
@@ -546,12 +2629,134 @@ class TestOVNCentralCharm(Helper):
             self.NRPE.assert_has_calls([
                 mock.call().write(),
             ])
+            self.rsync.assert_has_calls([
+                mock.call('/charm/files/run_ovn_db_connections_check.py',
+                          '/usr/local/bin', options=['--executability']),
+                mock.call('/charm/lib/charm/openstack/ovsdb_client.py',
+                          '/usr/local/bin', options=['--executability']),
+            ])
             mocked_file.__enter__().write.assert_called_once_with(
                 '# Juju generated - DO NOT EDIT\n'
                 '*/5 * * * * '
                 'root /usr/local/bin/run_ovn_db_connections_check.py '
+                '--uncommitted-entries 100 1000 --leader-change 300 60 '
+                '--log-entries 10000 100000 --disconnected-servers 1 2 '
                 '| logger -p local0.notice\n\n'
             )
+            self._disable_connections_monitor.assert_called_once_with()
+            self.assertFalse(self._enable_connections_monitor.called)
+
+    def test_render_nrpe_connections_monitor(self):
+        self.patch_object(ovn_central.nrpe, 'NRPE')
+        self.patch_object(ovn_central.nrpe, 'add_init_service_checks')
+        self.patch_object(ovn_central.ch_core.host, 'rsync')
+        self.patch_object(ovn_central.os.path, 'exists', return_value=True)
+        self.patch_object(ovn_central.os, 'unlink')
+        self.patch_target('config')
+        config = collections.defaultdict(lambda: 0)
+        config['ovn-db-connections-monitor'] = True
+        self.config.__getitem__.side_effect = config.__getitem__
+        self.patch_target('_disable_connections_monitor')
+        self.patch_target('_enable_connections_monitor')
+        with mock.patch('builtins.open', create=True) as mocked_open:
+            self.target.render_nrpe()
+            self.assertFalse(mocked_open.called)
+        self._enable_connections_monitor.assert_called_once_with(
+            '/usr/local/bin/run_ovn_db_connections_check.py '
+            '--uncommitted-entries 0 0 --leader-change 0 0 '
+            '--log-entries 0 0 --disconnected-servers 0 0')
+        self.unlink.assert_called_once_with(
+            '/etc/cron.d/check_ovn_db_connections')
+        self.assertFalse(self._disable_connections_monitor.called)
+
+    def test__remove_script(self):
+        self.patch_object(ovn_central.os, 'unlink')
+        self.patch_object(ovn_central.os.path, 'exists')
+        existing = {
+            '/etc/cron.d/fake',
+            '/usr/local/bin/run_ovn_db_connections_check.py',
+            '/usr/local/bin/collect_ovn_central_metrics.py',
+            '/usr/local/bin/ovsdb_client.py',
+        }
+        self.exists.side_effect = lambda path: path in existing
+        self.target._remove_script('collect_ovn_central_metrics.py',
+                                   cron_file='/etc/cron.d/fake')
+        # the client module is still used by the other script
+        self.assertEquals(self.unlink.mock_calls, [
+            mock.call('/etc/cron.d/fake'),
+            mock.call('/usr/local/bin/collect_ovn_central_metrics.py'),
+        ])
+        existing.remove('/usr/local/bin/run_ovn_db_connections_check.py')
+        self.unlink.reset_mock()
+        self.target._remove_script('collect_ovn_central_metrics.py')
+        self.assertEquals(self.unlink.mock_calls, [
+            mock.call('/usr/local/bin/collect_ovn_central_metrics.py'),
+            mock.call('/usr/local/bin/ovsdb_client.py'),
+        ])
+
+    def test_configure_metrics_exporter(self):
+        self.patch_target('config')
+        config = {'prometheus-textfile-directory': ''}
+        self.config.__getitem__.side_effect = config.__getitem__
+        self.patch_target('_install_script')
+        self.patch_target('_remove_script')
+        self.patch_object(ovn_central.ch_core.host, 'mkdir')
+        self.patch_object(ovn_central.ch_core.host, 'write_file')
+        self.target.configure_metrics_exporter()
+        self._remove_script.assert_called_once_with(
+            'collect_ovn_central_metrics.py',
+            cron_file='/etc/cron.d/ovn-central-metrics')
+        self.assertFalse(self._install_script.called)
+        self._remove_script.reset_mock()
+        config['prometheus-textfile-directory'] = '/fake/textfile'
+        self.target.configure_metrics_exporter()
+        self.assertFalse(self._remove_script.called)
+        self._install_script.assert_called_once_with(
+            'collect_ovn_central_metrics.py')
+        self.mkdir.assert_called_once_with('/fake/textfile', perms=0o755)
+        self.write_file.assert_called_once_with(
+            '/etc/cron.d/ovn-central-metrics',
+            '# Juju generated - DO NOT EDIT\n'
+            '* * * * * root /usr/local/bin/collect_ovn_central_metrics.py '
+            '--rundir /var/run/ovn --output-dir /fake/textfile '
+            '2>&1 | logger -p local0.notice\n\n',
+            perms=0o644)
+
+    def test__enable_connections_monitor(self):
+        self.patch_object(ovn_central.ch_core.host, 'write_file')
+        self.patch_object(ovn_central.ch_core.host, 'service')
+        self.patch_object(ovn_central.ch_core.host, 'service_restart')
+        self.patch_object(ovn_central.subprocess, 'check_call')
+        self.target._enable_connections_monitor('/fake/check.py')
+        self.write_file.assert_called_once_with(
+            '/etc/systemd/system/ovn-db-connections-check.service',
+            mock.ANY, perms=0o644)
+        self.assertIn('ExecStart=/fake/check.py --daemon\n',
+                      self.write_file.call_args[0][1])
+        self.check_call.assert_called_once_with(
+            ['systemctl', 'daemon-reload'])
+        self.service.assert_called_once_with(
+            'enable', 'ovn-db-connections-check')
+        self.service_restart.assert_called_once_with(
+            'ovn-db-connections-check')
+
+    def test__disable_connections_monitor(self):
+        self.patch_object(ovn_central.os.path, 'exists', return_value=False)
+        self.patch_object(ovn_central.os, 'unlink')
+        self.patch_object(ovn_central.ch_core.host, 'service_stop')
+        self.patch_object(ovn_central.ch_core.host, 'service')
+        self.patch_object(ovn_central.subprocess, 'check_call')
+        self.target._disable_connections_monitor()
+        self.assertFalse(self.service_stop.called)
+        self.exists.return_value = True
+        self.target._disable_connections_monitor()
+        self.service_stop.assert_called_once_with('ovn-db-connections-check')
+        self.service.assert_called_once_with(
+            'disable', 'ovn-db-connections-check')
+        self.unlink.assert_called_once_with(
+            '/etc/systemd/system/ovn-db-connections-check.service')
+        self.check_call.assert_called_once_with(
+            ['systemctl', 'daemon-reload'])
 
     def test_configure_deferred_restarts(self):
         self.patch_object(
@@ -0,0 +1,159 @@
+# Copyright 2021 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import unittest
+
+import charm.openstack.ovsdb_client as ovsdb_client
+
+from unit_tests.fake_ovsdb_server import FakeError, FakeOVSDBServer
+
+
+class TestOVSDBClient(unittest.TestCase):
+
+    def test_parse_cluster_status(self):
+        status = ovsdb_client.parse_cluster_status(
+            'a1b2\n'
+            'Name: OVN_Southbound\n'
+            'Role: leader\n'
+            'Log: [2, 1025]\n'
+            'Connections: ->c3d4 (->e5f6) <-c3d4\n'
+            'Servers:\n'
+            '    a1b2 (a1b2 at ssl:10.0.0.1:6644) (self)\n'
+            '    c3d4 (c3d4 at ssl:10.0.0.2:6644)\n')
+        self.assertEquals(status, {
+            'Name': 'OVN_Southbound',
+            'Role': 'leader',
+            'Log': '[2, 1025]',
+            'Connections': '->c3d4 (->e5f6) <-c3d4',
+            'Servers': [
+                'a1b2 (a1b2 at ssl:10.0.0.1:6644) (self)',
+                'c3d4 (c3d4 at ssl:10.0.0.2:6644)',
+            ],
+        })
+
+    def test_parse_memory_show(self):
+        usage = ovsdb_client.parse_memory_show(
+            'cells:4242 monitors:3 raft-log:1023 sessions:17 triggers:0\n')
+        self.assertEquals(list(usage.items()), [
+            ('cells', 4242), ('monitors', 3), ('raft-log', 1023),
+            ('sessions', 17), ('triggers', 0)])
+        self.assertEquals(ovsdb_client.parse_memory_show(''), {})
+
+    def test_transact(self):
+        def transact(params):
+            self.assertEquals(params[0], 'OVN_Northbound')
+            return [{'rows': [{'_uuid': ['uuid', 'fake-uuid']}]}]
+
+        with FakeOVSDBServer({'transact': transact}) as server:
+            with ovsdb_client.OVSDBClient(server.path) as client:
+                self.assertEquals(
+                    client.select('OVN_Northbound', 'Connection',
+                                  where=[['target', '==', 'pssl:6641']],
+                                  columns=['_uuid']),
+                    [{'_uuid': ['uuid', 'fake-uuid']}])
+            self.assertEquals(server.requests, [{
+                'method': 'transact',
+                'params': [
+                    'OVN_Northbound',
+                    {'op': 'select',
+                     'table': 'Connection',
+                     'where': [['target', '==', 'pssl:6641']],
+                     'columns': ['_uuid']},
+                ],
+                'id': 1,
+            }])
+
+    def test_transact_operation_error(self):
+        def transact(params):
+            return [{}, {'error': 'constraint violation',
+                         'details': 'fake details'}]
+
+        with FakeOVSDBServer({'transact': transact}) as server:
+            with ovsdb_client.OVSDBClient(server.path) as client:
+                with self.assertRaises(ovsdb_client.OVSDBError) as ctx:
+                    client.transact('OVN_Northbound', {}, {})
+                self.assertEquals(ctx.exception.error, 'constraint violation')
+                self.assertEquals(ctx.exception.details, 'fake details')
+
+    def test_unixctl(self):
+        def cluster_status(params):
+            self.assertEquals(params, ['OVN_Southbound'])
+            return 'Role: leader\n'
+
+        with FakeOVSDBServer({'cluster/status': cluster_status}) as server:
+            with ovsdb_client.OVSDBClient(server.path) as client:
+                self.assertEquals(
+                    client.unixctl('cluster/status', 'OVN_Southbound'),
+                    'Role: leader\n')
+                # connection is reused for subsequent requests
+                self.assertEquals(
+                    client.unixctl('cluster/status', 'OVN_Southbound'),
+                    'Role: leader\n')
+            self.assertEquals(len(server.sessions), 1)
+            self.assertEquals([req['id'] for req in server.requests], [1, 2])
+
+    def test_unixctl_error(self):
+        def fail(params):
+            raise FakeError('"bogus" is not a valid command')
+
+        with FakeOVSDBServer({'bogus': fail}) as server:
+            with ovsdb_client.OVSDBClient(server.path) as client:
+                with self.assertRaises(ovsdb_client.OVSDBError):
+                    client.unixctl('bogus')
+
+    def test_echo_and_partial_messages(self):
+        with FakeOVSDBServer({'list_dbs': lambda _: ['OVN_Southbound']},
+                             echo_first=True, chunk_size=3) as server:
+            with ovsdb_client.OVSDBClient(server.path) as client:
+                self.assertEquals(client.request('list_dbs', []),
+                                  ['OVN_Southbound'])
+                # the echo reply is sent before the second request and the
+                # server processes messages in order
+                self.assertEquals(client.request('list_dbs', []),
+                                  ['OVN_Southbound'])
+            self.assertEquals(server.requests[:3], [
+                {'method': 'list_dbs', 'params': [], 'id': 1},
+                {'id': 'echo', 'result': [], 'error': None},
+                {'method': 'list_dbs', 'params': [], 'id': 2},
+            ])
+
+    def test_monitor(self):
+        def monitor(params):
+            self.assertEquals(params, [
+                'OVN_Southbound', 'fake-id',
+                {'Connection': {'columns': ['target']}}])
+            return {'Connection': {'fake-uuid': {'new': {
+                'target': 'pssl:6642'}}}}
+
+        with FakeOVSDBServer({'monitor': monitor}) as server:
+            with ovsdb_client.OVSDBClient(server.path,
+                                          timeout=0.5) as client:
+                self.assertEquals(
+                    client.monitor('OVN_Southbound', 'fake-id',
+                                   {'Connection': {'columns': ['target']}}),
+                    {'Connection': {'fake-uuid': {'new': {
+                        'target': 'pssl:6642'}}}})
+                server.sessions[0].notify('update', ['fake-id', {}])
+                self.assertEquals(client.wait_notification(), {
+                    'id': None, 'method': 'update',
+                    'params': ['fake-id', {}]})
+                # returns None on timeout
+                self.assertIsNone(client.wait_notification())
+
+    def test_connect_missing_socket(self):
+        client = ovsdb_client.OVSDBClient(
+            os.path.join('/nonexistent', 'ovnnb_db.ctl'))
+        with self.assertRaises(OSError):
+            client.unixctl('cluster/status', 'OVN_Northbound')
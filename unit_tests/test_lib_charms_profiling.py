@@ -0,0 +1,149 @@
+# Copyright 2021 Canonical Ltd
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+import mock
+
+import charms_openstack.test_utils as test_utils
+
+import charm.openstack.profiling as profiling
+
+from unit_tests.fake_ovsdb_server import FakeError, FakeOVSDBServer
+
+
+class TestProfiling(test_utils.PatchHelper):
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(profiling.disable)
+
+    def test_profiled_commands(self):
+        profiler = profiling.enable('config-changed')
+        self.assertIs(profiling.enable('config-changed'), profiler)
+        subprocess.check_output([sys.executable, '-c', 'print(42)'])
+        with self.assertRaises(subprocess.CalledProcessError):
+            subprocess.check_call([sys.executable, '-c', 'exit(3)'])
+        with FakeOVSDBServer({
+                'cluster/status': lambda params: 'status',
+                'memory/show': self._fail}) as server:
+            client = profiling.ovsdb_client.OVSDBClient(server.path)
+            self.assertEquals(
+                client.unixctl('cluster/status', 'OVN_Southbound'),
+                'status')
+            with self.assertRaises(profiling.ovsdb_client.OVSDBError):
+                client.unixctl('memory/show')
+            client.close()
+        self.assertIs(profiling.disable(), profiler)
+        self.assertIs(subprocess.Popen, profiling.ProfiledPopen.__bases__[0])
+        self.assertFalse(hasattr(profiling.ovsdb_client.OVSDBClient.request,
+                                 '__wrapped__'))
+        self.assertEquals(
+            [(cmd['handler'], cmd['kind'], cmd['command'][-1],
+              cmd['returncode']) for cmd in profiler.commands],
+            [('(none)', 'exec', 'print(42)', 0),
+             ('(none)', 'exec', 'exit(3)', 3),
+             ('(none)', 'rpc', 'OVN_Southbound', 0),
+             ('(none)', 'rpc', 'memory/show', 1)])
+        # nothing is recorded once disabled
+        subprocess.check_output([sys.executable, '-c', 'print(42)'])
+        self.assertEquals(len(profiler.commands), 4)
+
+    @staticmethod
+    def _fail(params):
+        raise FakeError('fake')
+
+    def test_profiled_invoke(self):
+        handler = mock.MagicMock()
+        handler.id.return_value = 'reactive/ovn_central_handlers.py:render'
+        invoked = []
+
+        def _invoke(handler):
+            invoked.append(handler)
+            if profiling._profiler:
+                profiling._profiler.record_command(
+                    'exec', ['ovsdb-tool'], 0.5, 0)
+
+        invoke = profiling._profiled_invoke(_invoke)
+        # pass through when not profiling
+        invoke(handler)
+        self.assertEquals(invoked, [handler])
+        profiler = profiling.enable('config-changed')
+        invoke(handler)
+        invoke(handler)
+        profiler.record_command('exec', ['/usr/sbin/ufw', 'status'], 0.25, 0)
+        self.assertEquals(profiler.handler, '(none)')
+        summary = profiler.summary()
+        self.assertEquals(summary['hook'], 'config-changed')
+        self.assertEquals(
+            summary['handlers']['reactive/ovn_central_handlers.py:render'],
+            {'calls': 2, 'duration': mock.ANY, 'commands': 2,
+             'command_duration': 1.0})
+        self.assertEquals(summary['handlers']['(none)'], {
+            'calls': 0, 'duration': 0.0, 'commands': 1,
+            'command_duration': 0.25})
+        self.assertEquals(list(summary['by-command'].items()), [
+            ('ovsdb-tool', {'count': 2, 'duration': 1.0, 'failures': 0}),
+            ('ufw', {'count': 1, 'duration': 0.25, 'failures': 0}),
+        ])
+
+    def test_write_output(self):
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        profiler = profiling.enable('update-status', cprofile=True)
+        profiler.record_command('exec', ['ovn-appctl', 'status'], 0.1, 0)
+        profiling.disable()
+        for n in range(3):
+            profiler.start = 1600000000 + n
+            path = profiling.write_output(profiler, output_dir, retention=2)
+        self.assertEquals(sorted(os.listdir(output_dir)), [
+            'profile-20200913T122641Z-update-status.json',
+            'profile-20200913T122641Z-update-status.prof',
+            'profile-20200913T122642Z-update-status.json',
+            'profile-20200913T122642Z-update-status.prof',
+        ])
+        with open(path) as summary_file:
+            summary = json.load(summary_file)
+        self.assertEquals(summary['hook'], 'update-status')
+        self.assertEquals(summary['commands'][0]['command'],
+                          ['ovn-appctl', 'status'])
+
+    def test_enable_from_config(self):
+        self.patch_object(profiling.ch_core.hookenv, 'config')
+        self.patch_object(profiling.ch_core.hookenv, 'hook_name')
+        self.patch_object(profiling.ch_core.hookenv, 'atexit')
+        self.patch_object(profiling, 'enable')
+        self.config.return_value = {'hook-profiling': ''}
+        profiling.enable_from_config()
+        self.assertFalse(self.enable.called)
+        self.assertFalse(self.atexit.called)
+        self.config.return_value = {'hook-profiling': 'cprofile'}
+        self.hook_name.return_value = 'config-changed'
+        profiling.enable_from_config()
+        self.enable.assert_called_once_with('config-changed', cprofile=True)
+        self.atexit.assert_called_once_with(profiling._finish)
+
+    def test__finish(self):
+        self.patch_object(profiling, 'write_output')
+        profiling._finish()
+        self.assertFalse(self.write_output.called)
+        profiler = profiling.enable('config-changed')
+        profiling._finish()
+        self.write_output.assert_called_once_with(profiler)
+        self.assertIsNone(profiling._profiler)
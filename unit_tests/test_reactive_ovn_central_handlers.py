@@ -31,6 +31,15 @@ class TestRegisteredHooks(test_utils.TestRegisteredHooks):
         ]
         hook_set = {
             'when_none': {
+                'advance_election_timer': ('charm.paused',),
+                'run_compaction_policy': ('charm.paused',),
+                'configure_northd_threads': ('charm.paused',),
+                'configure_ovsdb_tuning': ('charm.paused',),
+                'check_tls_in_use': ('charm.paused',),
+                'advance_ca_rotation': ('charm.paused',),
+                'adapt_inactivity_probe': ('charm.paused',),
+                'prepare_join_snapshots': ('charm.paused',
+                                           'is-update-status-hook',),
                 'announce_leader_ready': ('is-update-status-hook',
                                           'leadership.set.nb_cid',
                                           'leadership.set.sb_cid'),
@@ -48,6 +57,30 @@ class TestRegisteredHooks(test_utils.TestRegisteredHooks):
                 'configure_nrpe': ('charm.paused', 'is-update-status-hook',),
             },
             'when': {
+                'advance_election_timer': ('config.rendered',
+                                           'leadership.set.nb_cid',
+                                           'leadership.set.sb_cid',),
+                'run_compaction_policy': ('config.rendered',
+                                          'leadership.set.nb_cid',
+                                          'leadership.set.sb_cid',),
+                'configure_northd_threads': ('config.rendered',),
+                'configure_ovsdb_tuning': ('config.rendered',),
+                'check_tls_in_use': ('config.rendered',),
+                'advance_ca_rotation': ('config.rendered',
+                                        'certificates.available',),
+                'adapt_inactivity_probe': ('is-update-status-hook',
+                                           'config.rendered',
+                                           'ovsdb-peer.available',),
+                'publish_restart_pending': ('ovsdb-peer.connected',),
+                'prepare_join_snapshots': ('config.rendered',
+                                           'ovsdb-peer.available',),
+                'retry_deferred_join': ('is-update-status-hook',
+                                        'cluster.join-deferred',
+                                        'ovsdb-peer.available',
+                                        'leadership.set.nb_cid',
+                                        'leadership.set.sb_cid',
+                                        'certificates.connected',
+                                        'certificates.available',),
                 'announce_leader_ready': ('config.rendered',
                                           'certificates.connected',
                                           'certificates.available',
@@ -73,9 +106,21 @@ class TestRegisteredHooks(test_utils.TestRegisteredHooks):
                            'certificates.connected',
                            'certificates.available',),
                 'configure_nrpe': ('config.rendered',),
+                'configure_metrics_exporter': ('charm.installed',),
                 'remove_nrpe_config': ('nrpe-external-master.configured',),
+                'reconfigure_nrpe': ('nrpe-external-master.configured',),
             },
             'when_any': {
+                'reconfigure_nrpe': (
+                    'config.changed.ovn-db-connections-monitor',
+                    'config.changed.nagios-raft-uncommitted-entries-warn',
+                    'config.changed.nagios-raft-uncommitted-entries-crit',
+                    'config.changed.nagios-raft-leader-change-warn',
+                    'config.changed.nagios-raft-leader-change-crit',
+                    'config.changed.nagios-raft-log-entries-warn',
+                    'config.changed.nagios-raft-log-entries-crit',
+                    'config.changed.nagios-raft-disconnected-servers-warn',
+                    'config.changed.nagios-raft-disconnected-servers-crit',),
                 'configure_nrpe': ('config.changed.nagios_context',
                                    'config.changed.nagios_servicegroups',
                                    'endpoint.nrpe-external-master.changed',
@@ -83,6 +128,7 @@ class TestRegisteredHooks(test_utils.TestRegisteredHooks):
             },
             'when_not': {
                 'configure_deferred_restarts': ('is-update-status-hook',),
+                'configure_metrics_exporter': ('is-update-status-hook',),
                 'remove_nrpe_config': ('nrpe-external-master.available',),
                 'configure_nrpe': ('nrpe-external-master.configured',),
             },
@@ -109,6 +155,74 @@ class TestOvnCentralHandlers(test_utils.PatchHelper):
         self.target.initialize_firewall.assert_called_once_with()
         self.set_flag.assert_called_once_with('charm.firewall_initialized')
 
+    def test_advance_election_timer(self):
+        self.target.election_timer_progress.return_value = {}
+        handlers.advance_election_timer()
+        self.assertFalse(self.target.advance_election_timer.called)
+        self.target.election_timer_progress.return_value = {
+            'sb': {'timer': 2000}}
+        handlers.advance_election_timer()
+        self.target.advance_election_timer.assert_called_once_with()
+        self.target.assess_status.assert_called_once_with()
+
+    def test_run_compaction_policy(self):
+        handlers.run_compaction_policy()
+        self.target.run_compaction_policy.assert_called_once_with()
+
+    def test_configure_northd_threads(self):
+        handlers.configure_northd_threads()
+        self.target.configure_northd_threads.assert_called_once_with()
+
+    def test_configure_ovsdb_tuning(self):
+        handlers.configure_ovsdb_tuning()
+        self.target.configure_ovsdb_tuning.assert_called_once_with()
+
+    def test_check_tls_in_use(self):
+        handlers.check_tls_in_use()
+        self.target.check_tls_in_use.assert_called_once_with()
+
+    def test_advance_ca_rotation(self):
+        self.patch_object(handlers.reactive, 'endpoint_from_flag')
+        self.target.ca_rotation_in_progress.return_value = False
+        handlers.advance_ca_rotation()
+        self.assertFalse(self.target.configure_tls.called)
+        self.target.ca_rotation_in_progress.return_value = True
+        handlers.advance_ca_rotation()
+        self.endpoint_from_flag.assert_called_once_with(
+            'certificates.available')
+        self.target.configure_tls.assert_called_once_with(
+            certificates_interface=self.endpoint_from_flag())
+
+    def test_adapt_inactivity_probe(self):
+        self.patch_object(handlers.reactive, 'endpoint_from_name')
+        self.patch_object(handlers.reactive, 'endpoint_from_flag')
+        ovsdb = mock.MagicMock()
+        ovsdb.db_sb_port = 6642
+        self.endpoint_from_name.return_value = ovsdb
+        ovsdb_peer = mock.MagicMock()
+        ovsdb_peer.db_nb_port = 6641
+        ovsdb_peer.db_sb_admin_port = 16642
+        self.endpoint_from_flag.return_value = ovsdb_peer
+        handlers.adapt_inactivity_probe()
+        self.endpoint_from_flag.assert_called_once_with(
+            'ovsdb-peer.available')
+        self.target.adapt_inactivity_probe.assert_called_once_with(
+            6641, 6642, 16642)
+
+    def test_publish_restart_pending(self):
+        handlers.publish_restart_pending()
+        self.target.publish_restart_pending.assert_called_once_with()
+
+    def test_configure_metrics_exporter(self):
+        handlers.configure_metrics_exporter()
+        self.target.configure_metrics_exporter.assert_called_once_with()
+
+    def test_reconfigure_nrpe(self):
+        self.patch_object(handlers.reactive, 'clear_flag')
+        handlers.reconfigure_nrpe()
+        self.clear_flag.assert_called_once_with(
+            'nrpe-external-master.configured')
+
     def test_announce_leader_ready(self):
         self.patch_object(handlers.reactive, 'endpoint_from_name')
         self.patch_object(handlers.reactive, 'endpoint_from_flag')
@@ -156,6 +270,7 @@ class TestOvnCentralHandlers(test_utils.PatchHelper):
     def test_configure_firewall(self):
         self.patch_object(handlers.reactive, 'endpoint_from_flag')
         ovsdb_peer = mock.MagicMock()
+        self.target.sb_relay_ports.return_value = []
         self.endpoint_from_flag.side_effect = (ovsdb_peer, None)
         handlers.configure_firewall()
         self.endpoint_from_flag.assert_has_calls([
@@ -185,23 +300,56 @@ class TestOvnCentralHandlers(test_utils.PatchHelper):
             (ovsdb_peer.db_nb_port,
                 ovsdb_peer.db_sb_admin_port,): ovsdb_cms.client_remote_addrs,
         })
+        self.target.configure_firewall.reset_mock()
+        self.target.sb_relay_ports.return_value = [6645]
+        ovsdb_peer.cluster_local_addr = '10.0.0.1'
+        ovsdb_peer.cluster_remote_addrs = ('10.0.0.2', '10.0.0.3')
+        self.endpoint_from_flag.side_effect = (ovsdb_peer, ovsdb_cms)
+        handlers.configure_firewall()
+        self.target.configure_firewall.assert_called_once_with({
+            (ovsdb_peer.db_nb_port,
+                ovsdb_peer.db_sb_admin_port,
+                ovsdb_peer.db_sb_cluster_port,
+                ovsdb_peer.db_nb_cluster_port,):
+            ovsdb_peer.cluster_remote_addrs,
+            (ovsdb_peer.db_nb_port,
+                ovsdb_peer.db_sb_admin_port,): ovsdb_cms.client_remote_addrs,
+            (ovsdb_peer.db_sb_admin_port,): (
+                '10.0.0.1', '10.0.0.2', '10.0.0.3'),
+        })
 
     def test_publish_addr_to_clients(self):
         self.patch_object(handlers.reactive, 'endpoint_from_flag')
         ovsdb_peer = mock.MagicMock()
         ovsdb_peer.cluster_local_addr = mock.PropertyMock().return_value = (
             'a.b.c.d')
+        ovsdb_peer.db_connection_strs.side_effect = lambda addrs, port: [
+            'ssl:{}:{}'.format(addr, port) for addr in addrs]
+        relation = mock.MagicMock()
+        relation.to_publish_raw = {}
         ovsdb = mock.MagicMock()
+        ovsdb.relations = [relation]
         ovsdb_cms = mock.MagicMock()
+        self.target.sb_relay_ports.return_value = []
         self.endpoint_from_flag.side_effect = [ovsdb_peer, ovsdb, ovsdb_cms]
         handlers.publish_addr_to_clients()
         ovsdb.publish_cluster_local_addr.assert_called_once_with('a.b.c.d')
         ovsdb_cms.publish_cluster_local_addr.assert_called_once_with('a.b.c.d')
+        self.assertEquals(relation.to_publish_raw,
+                          {'sb-relay-connection-strs': None})
+        self.target.sb_relay_ports.return_value = [6645, 6646]
+        self.endpoint_from_flag.side_effect = [ovsdb_peer, ovsdb, ovsdb_cms]
+        handlers.publish_addr_to_clients()
+        self.assertEquals(relation.to_publish_raw, {
+            'sb-relay-connection-strs':
+            'ssl:a.b.c.d:6645,ssl:a.b.c.d:6646'})
 
     def test_render(self):
         self.patch_object(handlers.reactive, 'endpoint_from_name')
         self.patch_object(handlers.reactive, 'endpoint_from_flag')
         self.patch_object(handlers.reactive, 'set_flag')
+        self.patch_object(handlers.reactive, 'clear_flag')
+        self.target.config = {'ovsdb-fast-join': False}
         ovsdb_peer = mock.MagicMock()
         # re-using the same conection strings for both NB and SB DBs here, the
         # implementation detail is unit tested in the interface
@@ -215,17 +363,46 @@ class TestOvnCentralHandlers(test_utils.PatchHelper):
         self.endpoint_from_flag.assert_called_once_with('ovsdb-peer.available')
         self.target.render_with_interfaces.assert_called_once_with(
             [ovsdb_peer])
-        self.target.join_cluster.assert_has_calls([
-            mock.call('ovnnb_db.db',
-                      'OVN_Northbound',
-                      connection_strs,
-                      connection_strs),
-            mock.call('ovnsb_db.db',
-                      'OVN_Southbound',
-                      connection_strs,
-                      connection_strs),
+        self.target.join_clusters.assert_called_once_with([
+            ('ovnnb_db.db',
+             'OVN_Northbound',
+             connection_strs,
+             connection_strs),
+            ('ovnsb_db.db',
+             'OVN_Southbound',
+             connection_strs,
+             connection_strs),
         ])
+        self.target.clear_join_snapshot_request.assert_called_once_with()
+        self.clear_flag.assert_called_once_with('cluster.join-deferred')
         self.target.assess_status.assert_called_once_with()
         self.target.enable_services.return_value = True
         handlers.render()
         self.set_flag.assert_called_once_with('config.rendered')
+        self.target.configure_sb_relays.assert_called_once_with(
+            connection_strs)
+
+    def test_render_fast_join(self):
+        self.patch_object(handlers.reactive, 'endpoint_from_name')
+        self.patch_object(handlers.reactive, 'endpoint_from_flag')
+        self.patch_object(handlers.reactive, 'set_flag')
+        self.patch_object(handlers.reactive, 'clear_flag')
+        self.target.config = {'ovsdb-fast-join': True}
+        self.target.databases_exist.return_value = False
+        self.target.join_snapshot_ready.return_value = False
+        handlers.render()
+        self.set_flag.assert_called_once_with('cluster.join-deferred')
+        self.assertFalse(self.target.join_clusters.called)
+        self.assertFalse(self.target.enable_services.called)
+        self.target.assess_status.assert_called_once_with()
+        self.set_flag.reset_mock()
+        self.target.join_snapshot_ready.return_value = True
+        self.target.enable_services.return_value = False
+        handlers.render()
+        self.assertFalse(self.set_flag.called)
+        self.assertTrue(self.target.join_clusters.called)
+        self.clear_flag.assert_called_once_with('cluster.join-deferred')
+
+    def test_prepare_join_snapshots(self):
+        handlers.prepare_join_snapshots()
+        self.target.prepare_join_snapshots.assert_called_once_with()